@@ -0,0 +1,261 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=================
+ Codec Benchmark
+=================
+
+Compares encode/decode throughput and message size of `wolfe._codec`
+against pickle and JSON::
+
+    python -m bench.codec [--nodes N] [--repeat N]
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import argparse as _argparse
+import cPickle as _pickle
+import datetime as _dt
+import json as _json
+import timeit as _timeit
+
+import wolfe as _wolfe
+from wolfe import _codec
+from wolfe.scheduler import _job
+
+
+def todo_graph(nodes, predecessors=(1, 2)):
+    """
+    Create a synthetic todo graph
+
+    The graph consists of short chains fanning out from the root. Ten
+    descriptions and twenty locks are used.
+
+    :Parameters:
+      `nodes` : ``int``
+        Approximate number of nodes
+
+      `predecessors` : iterable
+        Job IDs the root depends on
+
+    :Return: The root todo
+    :Rtype: `Todo`
+    """
+    descs = [_wolfe.TodoDescription('bench.description.%d' % num, group='g')
+             for num in xrange(10)]
+    locks = [_wolfe.Lock('bench/lock/%d' % num) for num in xrange(20)]
+    when = _dt.datetime(2016, 1, 1)
+    root = descs[0].todo(depends_on=predecessors)
+    for num in xrange(max(0, nodes - 1) // 4):
+        todo = root
+        for depth in xrange(4):
+            todo = todo.on_success(descs[(num + depth) % 10].todo(
+                locks=[locks[(num + depth) % 20]], importance=depth,
+                not_before=when if depth == 3 else None,
+            ))
+    return root
+
+
+def jobs(count):
+    """
+    Create synthetic jobs
+
+    :Parameters:
+      `count` : ``int``
+        Number of jobs
+
+    :Return: List of jobs
+    :Rtype: ``list``
+    """
+    return _job.joblist_from_todo(todo_graph(count, ()))
+
+
+def _plain_todo(todo):
+    """ Turn todo graph into JSON compatible structure """
+    nodes, index, todos = [], {id(todo): 0}, [todo]
+    for todo in todos:
+        successors = []
+        for succ in todo.successors():
+            if id(succ) not in index:
+                index[id(succ)] = len(todos)
+                todos.append(succ)
+            successors.append(index[id(succ)])
+        nodes.append({
+            'desc': todo.desc.name,
+            'locks': [[lock.name, lock.exclusive] for lock in todo.locks],
+            'importance': todo.importance,
+            'group': todo.group,
+            'not_before': todo.not_before and todo.not_before.isoformat(),
+            'predecessors': todo.predecessors(),
+            'successors': successors,
+        })
+    return nodes
+
+
+def _plain_job(job):
+    """ Turn job into JSON compatible structure """
+    return {
+        'id': job.id,
+        'desc': job.desc.name,
+        'group': job.group,
+        'locks': [[lock.name, lock.exclusive] for lock in job.locks],
+        'importance': job.importance,
+        'not_before': job.not_before and job.not_before.isoformat(),
+        'extra': job.extra,
+        'predecessors': sorted(job.predecessors),
+    }
+
+
+def _from_plain_todo(nodes):
+    """ Turn JSON structure into todo graph """
+    descs, todos = {}, []
+    for node in nodes:
+        desc = descs.get(node['desc'])
+        if desc is None:
+            desc = descs[node['desc']] = _wolfe.TodoDescription(node['desc'])
+        todos.append(_wolfe.Todo(
+            desc, depends_on=node['predecessors'],
+            locks=[_wolfe.Lock(*lock) for lock in node['locks']],
+            importance=node['importance'], group=node['group'],
+            not_before=node['not_before'] and _dt.datetime.strptime(
+                node['not_before'], '%Y-%m-%dT%H:%M:%S'
+            ),
+        ))
+    for todo, node in zip(todos, nodes):
+        for idx in node['successors']:
+            todo.on_success(todos[idx])
+    return todos[0]
+
+
+def _from_plain_job(value):
+    """ Turn JSON structure into job """
+    return _job.Job(
+        value['id'], _wolfe.TodoDescription(value['desc']), value['group'],
+        [_wolfe.Lock(*lock) for lock in value['locks']],
+        value['importance'], value['not_before'] and _dt.datetime.strptime(
+            value['not_before'], '%Y-%m-%dT%H:%M:%S'
+        ), value['extra'], value['predecessors'], [],
+    )
+
+
+#: Codecs to compare (``{name: {kind: (encode, decode)}}``)
+CODECS = {
+    'wolfe': {
+        'todo': (_codec.encode_todo, _codec.decode_todo),
+        'job': (_codec.encode_job, _codec.decode_job),
+    },
+    'pickle': {
+        'todo': (lambda x: _pickle.dumps(x, 2), _pickle.loads),
+        'job': (lambda x: _pickle.dumps(x, 2), _pickle.loads),
+    },
+    'json': {
+        'todo': (lambda x: _json.dumps(_plain_todo(x)),
+                 lambda x: _from_plain_todo(_json.loads(x))),
+        'job': (lambda x: _json.dumps(_plain_job(x)),
+                lambda x: _from_plain_job(_json.loads(x))),
+    },
+}
+
+
+def measure(func, arg, repeat):
+    """
+    Measure the best runtime of a call
+
+    :Parameters:
+      `func` : callable
+        Function to call
+
+      `arg` : any
+        Argument to pass
+
+      `repeat` : ``int``
+        Number of repetitions
+
+    :Return: Best runtime in seconds
+    :Rtype: ``float``
+    """
+    return min(_timeit.repeat(lambda: func(arg), number=1, repeat=repeat))
+
+
+def run(nodes, repeat):
+    """
+    Run the benchmark
+
+    :Parameters:
+      `nodes` : ``int``
+        Graph size
+
+      `repeat` : ``int``
+        Number of repetitions
+
+    :Return: Results (``[(codec, kind, bytes, encode/s, decode/s), ...]``)
+    :Rtype: ``list``
+    """
+    samples = {'todo': todo_graph(nodes), 'job': jobs(nodes)}
+    results = []
+    for name in ('wolfe', 'pickle', 'json'):
+        for kind in ('todo', 'job'):
+            encode, decode = CODECS[name][kind]
+            if kind == 'todo':
+                sample, count = samples[kind], nodes
+                size = len(encode(sample))
+                enc = measure(encode, sample, repeat)
+                dec = measure(decode, encode(sample), repeat)
+            else:
+                sample, count = samples[kind], len(samples[kind])
+                data = [encode(job) for job in sample]
+                size = sum(map(len, data)) // count
+                enc = measure(lambda x: map(encode, x), sample, repeat)
+                dec = measure(lambda x: map(decode, x), data, repeat)
+            results.append((name, kind, size, count / enc, count / dec))
+    return results
+
+
+def main(argv=None):
+    """
+    Run the codec benchmark and print the results
+
+    :Parameters:
+      `argv` : ``list``
+        Command line arguments. If omitted or ``None``, ``sys.argv[1:]`` is
+        used.
+    """
+    parser = _argparse.ArgumentParser(prog='python -m bench.codec')
+    parser.add_argument('--nodes', type=int, default=10001,
+                        help="Number of todo graph nodes / jobs")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Number of repetitions, the best one counts")
+    options = parser.parse_args(argv)
+
+    print "%-8s %-5s %12s %14s %14s" % (
+        'codec', 'kind', 'bytes', 'encode/s', 'decode/s'
+    )
+    for name, kind, size, enc, dec in run(options.nodes, options.repeat):
+        print "%-8s %-5s %12d %14.0f %14.0f" % (name, kind, size, enc, dec)
+    print "(todo: nodes per second, graph size; " \
+        "job: jobs per second, average size)"
+
+
+if __name__ == '__main__':
+    main()
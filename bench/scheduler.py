@@ -0,0 +1,415 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=====================
+ Scheduler Benchmark
+=====================
+
+Micro-benchmarks of the scheduler hot paths (``enter_todo``,
+``request_job`` and ``finish_job``) using reproducible synthetic
+workloads. Every workload runs in a fresh process, so peak memory can be
+measured reliably::
+
+    python -m bench.scheduler [--scale N] [--output results.json] [name ...]
+    python -m bench.scheduler --policy fifo --policy priority [name ...]
+    python -m bench.scheduler --compare old.json new.json
+
+With multiple ``--policy`` options, every workload runs with each of the
+scheduling policies, so the built-in policies can be compared against each
+other.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import argparse as _argparse
+import datetime as _dt
+import json as _json
+import platform as _platform
+import resource as _resource
+import subprocess as _subprocess
+import sys as _sys
+import timeit as _timeit
+
+import wolfe as _wolfe
+
+#: Timer function
+#:
+#: :Type: callable
+timer = _timeit.default_timer
+
+#: Number of executors used by the workloads
+#:
+#: :Type: ``int``
+EXECUTORS = 8
+
+
+def wide_fanout(scale):
+    """ Graphs with a root and 100 direct successors each """
+    desc = _wolfe.TodoDescription('fanout')
+    for _ in xrange(scale):
+        root = desc.todo()
+        for _ in xrange(100):
+            root.on_success(desc.todo())
+        yield root
+
+
+def deep_chain(scale):
+    """ Chains of 100 todos each """
+    desc = _wolfe.TodoDescription('chain')
+    for _ in xrange(scale):
+        root = todo = desc.todo()
+        for _ in xrange(99):
+            todo = todo.on_success(desc.todo())
+        yield root
+
+
+def hot_lock(scale):
+    """ Independent todos contending for two locks """
+    desc = _wolfe.TodoDescription('hot')
+    locks = [_wolfe.Lock('hot1'), _wolfe.Lock('hot2')]
+    for num in xrange(scale * 100):
+        yield desc.todo(locks=locks[num % 2:][:1], importance=num % 7)
+
+
+def many_groups(scale):
+    """ Independent todos spread over 100 groups """
+    desc = _wolfe.TodoDescription('grouped')
+    for num in xrange(scale * 100):
+        yield desc.todo(group='group%d' % (num % 100), importance=num % 7)
+
+
+def delayed_backlog(scale):
+    """ Immediate todos on top of a large backlog of delayed ones """
+    desc = _wolfe.TodoDescription('delayed')
+    later = _dt.datetime.utcnow() + _dt.timedelta(days=1)
+    for num in xrange(scale * 1000):
+        yield desc.todo(
+            not_before=later + _dt.timedelta(seconds=num % 3600)
+        )
+    for _ in xrange(scale * 100):
+        yield desc.todo()
+
+
+#: Available workloads (``{name: (groups, factory)}``)
+WORKLOADS = {
+    'wide_fanout': (None, wide_fanout),
+    'deep_chain': (None, deep_chain),
+    'hot_lock': (None, hot_lock),
+    'many_groups': (['group%d' % num for num in xrange(100)], many_groups),
+    'delayed_backlog': (None, delayed_backlog),
+}
+
+
+#: Available scheduling policies (``{name: factory}``)
+POLICIES = {
+    'fifo': _wolfe.FifoPolicy,
+    'priority': _wolfe.PriorityPolicy,
+    'buckets': lambda: _wolfe.PriorityPolicy((0, 6)),
+    'aging': lambda: _wolfe.AgingPolicy(60),
+    'deadline': _wolfe.DeadlinePolicy,
+    'critical_path': _wolfe.CriticalPathPolicy,
+    'dependents': _wolfe.DependentsPolicy,
+    'sept': _wolfe.SeptPolicy,
+}
+
+#: Default scheduling policy
+#:
+#: :Type: ``str``
+DEFAULT_POLICY = 'priority'
+
+
+def stats(timings, total=None):
+    """
+    Compute statistics of operation timings
+
+    :Parameters:
+      `timings` : ``list``
+        Operation durations in seconds
+
+      `total` : ``float``
+        Total runtime. If omitted or ``None``, the sum of `timings` is used.
+
+    :Return: Statistics (``count``, ``ops_per_sec``, ``p50_us`` and
+             ``p99_us``)
+    :Rtype: ``dict``
+    """
+    if not timings:
+        return dict(count=0, ops_per_sec=0.0, p50_us=0.0, p99_us=0.0)
+    timings = sorted(timings)
+    count = len(timings)
+    if total is None:
+        total = sum(timings)
+
+    def percentile(pct):
+        """ Pick nearest rank percentile in microseconds """
+        return timings[min(count - 1, int(count * pct / 100.0))] * 1e6
+
+    return dict(
+        count=count,
+        ops_per_sec=count / total if total else 0.0,
+        p50_us=percentile(50),
+        p99_us=percentile(99),
+    )
+
+
+def run_workload(name, scale, policy=DEFAULT_POLICY):
+    """
+    Run a single workload in the current process
+
+    All todos are entered first. Then the executors request and finish jobs
+    round-robin until nothing is left to do.
+
+    :Parameters:
+      `name` : ``str``
+        Workload name
+
+      `scale` : ``int``
+        Workload scale
+
+      `policy` : ``str``
+        Name of the scheduling policy
+
+    :Return: Results (per-operation `stats` plus ``peak_rss_kb``)
+    :Rtype: ``dict``
+    """
+    groups, factory = WORKLOADS[name]
+    todos = list(factory(scale))
+    main = _wolfe.Main(policy=POLICIES[policy]())
+    success = _wolfe.Executor('bench').result(0, '', '')
+    executors = [_wolfe.Executor('exe%d' % num, groups=groups)
+                 for num in xrange(EXECUTORS)]
+    enter, request, finish = [], [], []
+
+    for todo in todos:
+        start = timer()
+        main.enter_todo(todo)
+        enter.append(timer() - start)
+
+    running = {}
+    while True:
+        for exe in executors:
+            if exe.uid not in running:
+                start = timer()
+                job = main.request_job(exe)
+                request.append(timer() - start)
+                if job is not None:
+                    running[exe.uid] = job.id
+        if not running:
+            break
+        for uid, job_id in running.items():
+            start = timer()
+            main.finish_job(uid, job_id, success)
+            finish.append(timer() - start)
+        running.clear()
+
+    result = dict(
+        enter=stats(enter), request=stats(request), finish=stats(finish),
+    )
+    result['peak_rss_kb'] = _resource.getrusage(
+        _resource.RUSAGE_SELF
+    ).ru_maxrss
+    return result
+
+
+def run(names, scale, policies=None):
+    """
+    Run workloads, each in a fresh process
+
+    :Parameters:
+      `names` : iterable
+        Workload names
+
+      `scale` : ``int``
+        Workload scale
+
+      `policies` : ``list``
+        Names of the scheduling policies to run each workload with. If
+        omitted or ``None``, the default policy is used.
+
+    :Return: Results (``{name: result}``). With multiple policies, the
+             results are keyed by ``name/policy``.
+    :Rtype: ``dict``
+    """
+    policies = policies or [DEFAULT_POLICY]
+    results = {}
+    for name in names:
+        for policy in policies:
+            proc = _subprocess.Popen([
+                _sys.executable, '-m', 'bench.scheduler',
+                '--scale', str(scale), '--policy', policy, '--child', name,
+            ], stdout=_subprocess.PIPE)
+            output = proc.communicate()[0]
+            if proc.returncode:
+                raise RuntimeError("Workload %s (%s) failed" % (name, policy))
+            key = name if len(policies) == 1 else '%s/%s' % (name, policy)
+            results[key] = _json.loads(output)
+    return results
+
+
+def report(results, stream=None):
+    """
+    Print results as table
+
+    :Parameters:
+      `results` : ``dict``
+        Results as returned by `run`
+
+      `stream` : ``file``
+        Stream to write to. If omitted or ``None``, stdout is used.
+    """
+    if stream is None:
+        stream = _sys.stdout
+    stream.write("%-28s %-8s %9s %12s %10s %10s %10s\n" % (
+        'workload', 'op', 'count', 'ops/s', 'p50 us', 'p99 us', 'rss kb'
+    ))
+    for name in sorted(results):
+        result = results[name]
+        for op in ('enter', 'request', 'finish'):
+            stat = result[op]
+            stream.write("%-28s %-8s %9d %12.0f %10.1f %10.1f %10d\n" % (
+                name, op, stat['count'], stat['ops_per_sec'],
+                stat['p50_us'], stat['p99_us'], result['peak_rss_kb'],
+            ))
+
+
+def compare(old, new, threshold, stream=None):
+    """
+    Compare two result files
+
+    :Parameters:
+      `old` : ``dict``
+        Baseline results (as saved by `main`)
+
+      `new` : ``dict``
+        New results (as saved by `main`)
+
+      `threshold` : ``float``
+        Relative change (in percent) considered a regression
+
+      `stream` : ``file``
+        Stream to write to. If omitted or ``None``, stdout is used.
+
+    :Return: Number of regressions found
+    :Rtype: ``int``
+    """
+    if stream is None:
+        stream = _sys.stdout
+    old, new = old['results'], new['results']
+    regressions = 0
+    stream.write("%-28s %-8s %-12s %12s %12s %8s\n" % (
+        'workload', 'op', 'metric', 'old', 'new', 'change'
+    ))
+    for name in sorted(set(old) & set(new)):
+        rows = [
+            (op, metric, old[name][op][metric], new[name][op][metric])
+            for op in ('enter', 'request', 'finish')
+            for metric in ('ops_per_sec', 'p50_us', 'p99_us')
+        ]
+        rows.append(('-', 'peak_rss_kb', old[name]['peak_rss_kb'],
+                     new[name]['peak_rss_kb']))
+        for op, metric, before, after in rows:
+            change = (after - before) * 100.0 / before if before else 0.0
+            # throughput should go up, everything else down
+            worse = -change if metric == 'ops_per_sec' else change
+            flag = ''
+            if worse > threshold:
+                flag = ' !'
+                regressions += 1
+            stream.write("%-28s %-8s %-12s %12.1f %12.1f %+7.1f%%%s\n" % (
+                name, op, metric, before, after, change, flag
+            ))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the scheduler benchmarks
+
+    :Parameters:
+      `argv` : ``list``
+        Command line arguments. If omitted or ``None``, ``sys.argv[1:]`` is
+        used.
+
+    :Return: Exit code
+    :Rtype: ``int``
+    """
+    parser = _argparse.ArgumentParser(prog='python -m bench.scheduler')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help="Workloads to run (default: all of %s)"
+                        % ', '.join(sorted(WORKLOADS)))
+    parser.add_argument('--scale', type=int, default=20,
+                        help="Workload scale")
+    parser.add_argument('--output', metavar='FILE',
+                        help="Save the results as JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="Compare two saved results")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="Regression threshold in percent")
+    parser.add_argument('--policy', action='append', metavar='POLICY',
+                        choices=sorted(POLICIES),
+                        help="Scheduling policy, may be repeated to compare "
+                        "policies (default: %s, choices: %s)"
+                        % (DEFAULT_POLICY, ', '.join(sorted(POLICIES))))
+    parser.add_argument('--child', help=_argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    if options.child:
+        _json.dump(run_workload(
+            options.child, options.scale,
+            (options.policy or [DEFAULT_POLICY])[-1],
+        ), _sys.stdout)
+        return 0
+
+    if options.compare:
+        with open(options.compare[0]) as fp:
+            old = _json.load(fp)
+        with open(options.compare[1]) as fp:
+            new = _json.load(fp)
+        return 1 if compare(old, new, options.threshold) else 0
+
+    names = options.names or sorted(WORKLOADS)
+    for name in names:
+        if name not in WORKLOADS:
+            parser.error("Unknown workload: %s" % (name,))
+
+    results = run(names, options.scale, options.policy)
+    report(results)
+    if options.output:
+        with open(options.output, 'w') as fp:
+            _json.dump(dict(
+                meta=dict(
+                    scale=options.scale,
+                    policies=options.policy or [DEFAULT_POLICY],
+                    python=_platform.python_version(),
+                    implementation=_platform.python_implementation(),
+                    platform=_platform.platform(),
+                    date=_dt.datetime.utcnow().isoformat(),
+                ),
+                results=results,
+            ), fp, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
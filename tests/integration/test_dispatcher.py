@@ -0,0 +1,171 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+============================
+ Tests for wolfe.dispatcher
+============================
+
+Tests for wolfe.dispatcher
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import os as _os
+import shutil as _shutil
+import tempfile as _tempfile
+import threading as _threading
+
+from nose.tools import assert_equals, assert_false, assert_true, assert_raises
+
+import wolfe as _wolfe
+from wolfe import dispatcher as _dispatcher
+
+
+def with_server(func):
+    """ Run the test function against a running dispatcher """
+    def proxy():
+        """ Test proxy """
+        tmpdir = _tempfile.mkdtemp()
+        try:
+            server = _dispatcher.Server(_os.path.join(tmpdir, 'sock'))
+            thread = _threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                client = _dispatcher.Client(server.address, size=2)
+                try:
+                    func(client)
+                finally:
+                    client.close()
+            finally:
+                server.shutdown()
+                thread.join()
+                server.close()
+            assert_false(_os.path.exists(server.address))
+        finally:
+            _shutil.rmtree(tmpdir)
+    proxy.__name__ = func.__name__
+    proxy.__doc__ = func.__doc__
+    return proxy
+
+
+@with_server
+def test_roundtrip(client):
+    """ dispatcher: Jobs are entered, requested and finished remotely """
+    exe = _wolfe.Executor('remote')
+    todo = _wolfe.TodoDescription('abc').todo(locks=[_wolfe.Lock('l')])
+    todo.on_success(_wolfe.TodoDescription('def').todo())
+
+    job_id = client.enter_todo(todo)
+    job = client.request_job(exe)
+    assert_equals((job.id, job.desc.name), (job_id, 'abc'))
+    assert_equals([lock.name for lock in job.locks], ['l'])
+
+    with assert_raises(_wolfe.InvalidExecutorError):
+        client.finish_job('other', job_id, exe.result(0, '', ''))
+    client.finish_job(exe.uid, job_id, exe.result(0, '', ''))
+
+    job = client.request_job(exe)
+    assert_equals(job.desc.name, 'def')
+    assert_equals(job.predecessors, set([job_id]))
+    client.finish_job(exe.uid, job.id, exe.result(0, '', ''))
+
+    assert_true(client.request_job(exe) is None)
+    assert_equals(client.metrics(), '')
+
+
+@with_server
+def test_finish_and_request(client):
+    """ dispatcher: Finishing a job hands out its successor """
+    exe = _wolfe.Executor('remote')
+    todo = _wolfe.TodoDescription('first').todo()
+    todo.on_success(_wolfe.TodoDescription('second').todo())
+
+    job_id = client.enter_todo(todo)
+    assert_equals(client.request_job(exe).id, job_id)
+    job = client.finish_and_request(exe, job_id, exe.result(0, '', ''))
+    assert_equals(job.desc.name, 'second')
+    assert_true(client.finish_and_request(
+        exe, job.id, exe.result(0, '', '')
+    ) is None)
+    with assert_raises(_wolfe.JobNotFoundError):
+        client.finish_and_request(exe, job.id, exe.result(0, '', ''))
+
+
+@with_server
+def test_pipeline(client):
+    """ dispatcher: Pipelined requests are answered in order """
+    exes = [_wolfe.Executor('exe%d' % num) for num in xrange(11)]
+    exe = exes[0]
+    desc = _wolfe.TodoDescription('pipe')
+
+    pipe = client.pipeline()
+    for _ in xrange(10):
+        pipe.enter_todo(desc.todo())
+    job_ids = pipe.execute()
+    assert_equals(len(job_ids), 10)
+    assert_equals(len(pipe), 0)
+
+    for executor in exes:
+        pipe.request_job(executor)
+    jobs = pipe.execute()
+    assert_equals([job.id for job in jobs[:10]], job_ids)
+    assert_true(jobs[10] is None)
+
+    pipe.finish_job(exe.uid, job_ids[0], exe.result(0, '', ''))
+    pipe.finish_job(exe.uid, job_ids[0], exe.result(0, '', ''))
+    pipe.finish_job(exes[1].uid, job_ids[1], exe.result(0, '', ''))
+    with assert_raises(_wolfe.JobNotFoundError):
+        pipe.execute()
+    with assert_raises(_wolfe.JobNotFoundError):
+        client.finish_job(exes[1].uid, job_ids[1], exe.result(0, '', ''))
+
+
+@with_server
+def test_concurrent(client):
+    """ dispatcher: Concurrent clients share the pool """
+    desc = _wolfe.TodoDescription('concurrent')
+    done, errors = [], []
+
+    def run(num):
+        exe = _wolfe.Executor('exe%d' % num)
+        try:
+            for _ in xrange(20):
+                client.enter_todo(desc.todo())
+                job = client.request_job(exe)
+                if job is not None:
+                    client.finish_job(exe.uid, job.id, exe.result(0, '', ''))
+                    done.append(job.id)
+        except Exception as e:  # pylint: disable = broad-except
+            errors.append(e)
+
+    threads = [_threading.Thread(target=run, args=(num,))
+               for num in xrange(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert_equals(errors, [])
+    assert_equals(len(done), 80)
+    assert_equals(len(set(done)), 80)
@@ -31,9 +31,12 @@ if __doc__:  # pragma: no cover
 __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
+import datetime as _dt
 import itertools as _it
+import threading as _threading
+import time as _time
 
-from nose.tools import assert_equals, assert_true, assert_raises
+from nose.tools import assert_equals, assert_false, assert_true, assert_raises
 from .. import _util as _test
 
 import wolfe as _wolfe
@@ -121,3 +124,723 @@ def test_complex():
 
     with assert_raises(_wolfe.JobNotFoundError):
         wolfe.finish_job(exe.uid, 6, success)
+
+
+def _run_threaded(wolfe):
+    """ Run concurrent producers and executors """
+    success = _test.Bunch(failed=False)
+    groups = ('g1', 'g2', 'g3')
+    locks = [_wolfe.Lock('lock%d' % num) for num in xrange(3)]
+    started, finished, held, errors = [], set(), set(), []
+    lock = _threading.Lock()
+
+    def produce(num):
+        desc = _wolfe.TodoDescription('chain%d' % num)
+        for idx in xrange(20):
+            todo = desc.todo(group=groups[idx % 3], locks=locks[idx % 2:][:1])
+            todo.on_success(desc.todo(group=groups[(idx + 1) % 3]))
+            wolfe.enter_todo(todo)
+
+    def execute(num):
+        exe = _wolfe.Executor('exe%d' % num, groups=groups)
+        idle = 0
+        try:
+            while idle < 200:
+                job = wolfe.request_job(exe)
+                if job is None:
+                    idle += 1
+                    _time.sleep(0.001)
+                    continue
+                idle = 0
+                names = set(item.name for item in job.locks)
+                with lock:
+                    assert all(pre in finished for pre in job.predecessors)
+                    assert not names & held
+                    held.update(names)
+                    started.append(job.id)
+                with lock:
+                    held.difference_update(names)
+                    finished.add(job.id)
+                wolfe.finish_job(exe.uid, job.id, success)
+        except Exception as e:  # pylint: disable = broad-except
+            errors.append(e)
+
+    threads = [_threading.Thread(target=produce, args=(num,))
+               for num in xrange(4)]
+    threads.extend(_threading.Thread(target=execute, args=(num,))
+                   for num in xrange(4))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert_equals(errors, [])
+    assert_equals(len(started), 160)
+    assert_equals(len(set(started)), 160)
+    assert_equals(wolfe._scheduler.jobs, {})
+
+
+def test_threaded():
+    """ scheduler: Concurrent producers and executors are served properly """
+    _run_threaded(_wolfe.Main(threadsafe=True))
+
+
+def test_threaded_deferred():
+    """ scheduler: Concurrent calls work with deferred locking """
+    _run_threaded(_wolfe.Main(threadsafe=True, defer_locks=True))
+
+
+def test_threaded_fair_share():
+    """ scheduler: Concurrent calls work with fair share dispatch """
+    limits = _wolfe.Limits(weights={'g1': 2})
+    _run_threaded(_wolfe.Main(threadsafe=True, limits=limits))
+    _run_threaded(_wolfe.Main(threadsafe=True, defer_locks=True,
+                              limits=limits))
+
+
+def test_threaded_limits():
+    """ scheduler: Concurrent calls work with concurrency limits """
+    limits = dict(groups={'g1': 1}, names={'chain0': 1})
+    _run_threaded(_wolfe.Main(threadsafe=True,
+                              limits=_wolfe.Limits(**limits)))
+    _run_threaded(_wolfe.Main(threadsafe=True, defer_locks=True,
+                              limits=_wolfe.Limits(weights={}, **limits)))
+
+
+def test_metrics():
+    """ scheduler: Metrics reflect the scheduler state """
+    success = _test.Bunch(failed=False)
+    wolfe = _wolfe.Main(metrics=True)
+    exe = _wolfe.Executor('metered', groups=['g1', 'g2'])
+    exe2 = _wolfe.Executor('metered2', groups=['g1', 'g2'])
+    lock = _wolfe.Lock('metered')
+
+    todo = _wolfe.TodoDescription('abc').todo(group='g1', locks=[lock])
+    todo.on_success(_wolfe.TodoDescription('def').todo(group='g2'))
+    wolfe.enter_todo(todo)
+    wolfe.enter_todo(_wolfe.TodoDescription('ghi').todo(
+        group='g2', locks=[lock]
+    ))
+
+    job = wolfe.request_job(exe)
+    snap = wolfe.metrics.snapshot()
+    assert_equals(snap['wolfe_jobs'][2], [({}, 3)])
+    assert_equals(snap['wolfe_jobs_entered_total'][2], [({}, 3)])
+    assert_equals(snap['wolfe_jobs_dispatched_total'][2], [({}, 1)])
+    assert_equals(snap['wolfe_jobs_executing'][2], [({}, 1)])
+    assert_equals(snap['wolfe_jobs_waiting'][2], [({}, 1)])
+    assert_equals(snap['wolfe_locks_held'][2], [({}, 1)])
+    assert_equals(snap['wolfe_lock_waiters'][2], [({}, 1)])
+    assert_equals(snap['wolfe_lock_conflicts_total'][2], [({}, 1)])
+    assert_equals(snap['wolfe_group_jobs_queued'][2], [
+        ({'group': 'g2'}, 0),
+    ])
+
+    wolfe.finish_job(exe.uid, job.id, success)
+    job2 = wolfe.request_job(exe)
+    job3 = wolfe.request_job(exe2)
+    wolfe.finish_job(exe.uid, job2.id, success)
+    wolfe.finish_job(exe2.uid, job3.id, _test.Bunch(failed=True))
+
+    snap = wolfe.metrics.snapshot()
+    assert_equals(snap['wolfe_jobs_finished_total'][2], [
+        ({'result': 'failure'}, 1), ({'result': 'success'}, 2),
+    ])
+    assert_equals(snap['wolfe_jobs_failed'][2], [({}, 1)])
+    assert_equals(snap['wolfe_locks_acquired_total'][2], [({}, 2)])
+    assert_equals(sorted(
+        (labels['method'], value['count'])
+        for labels, value in snap['wolfe_api_seconds'][2]
+    ), [('enter_todo', 2), ('finish_and_request', 0), ('finish_job', 3),
+        ('request_job', 3)])
+    assert_true('wolfe_group_jobs_picked_total{group="g2"} 2\n'
+                in wolfe.metrics.prometheus())
+
+
+def test_breakdown():
+    """ scheduler: Job timelines are recorded """
+    wolfe = _wolfe.Main(metrics=True)
+    exe = _wolfe.Executor('timed')
+    lock = _wolfe.Lock('timed')
+
+    job_id = wolfe.enter_todo(_wolfe.TodoDescription('abc').todo(
+        locks=[lock]
+    ))
+    job_id2 = wolfe.enter_todo(_wolfe.TodoDescription('def').todo(
+        locks=[lock]
+    ))
+    breakdown = wolfe.breakdown(job_id2)
+    assert_true(breakdown['delay'] >= 0)
+    assert_equals(breakdown['lock'], None)
+
+    job = wolfe.request_job(exe)
+    assert_equals(job.id, job_id)
+    wolfe.finish_job(exe.uid, job_id, _test.Bunch(failed=True))
+
+    breakdown = wolfe.breakdown(job_id)
+    assert_true(all(value >= 0 for value in breakdown.values()))
+    assert_true(wolfe.breakdown(job_id2)['lock'] >= 0)
+    assert_equals(wolfe.breakdown(job_id2)['queue'], None)
+
+    snap = wolfe.metrics.snapshot()
+    assert_equals(sorted(
+        (labels['phase'], value['count'])
+        for labels, value in snap['wolfe_job_phase_seconds'][2]
+    ), [('delay', 1), ('dependency', 1), ('lock', 1), ('queue', 1),
+        ('run', 1)])
+
+    with assert_raises(_wolfe.JobNotFoundError):
+        wolfe.breakdown(-1)
+
+
+def test_lock_contention():
+    """ scheduler: Lock contention is profiled """
+    success = _test.Bunch(failed=False)
+    wolfe = _wolfe.Main(profile_locks=True)
+    hot, cold = _wolfe.Lock('hot'), _wolfe.Lock('cold')
+
+    for _ in xrange(5):
+        wolfe.enter_todo(_wolfe.TodoDescription('abc').todo(locks=[hot]))
+    wolfe.enter_todo(_wolfe.TodoDescription('def').todo(locks=[cold]))
+
+    exe = _wolfe.Executor('contended')
+    while True:
+        job = wolfe.request_job(exe)
+        if job is None:
+            break
+        wolfe.finish_job(exe.uid, job.id, success)
+
+    report = wolfe.lock_contention()
+    assert_equals([item['name'] for item in report['top']], ['hot'])
+    hot = report['top'][0]
+    assert_equals(hot['acquisitions'], 5)
+    assert_equals(hot['conflicts'], 4)
+    assert_equals(hot['handoffs'], 4)
+    assert_equals(hot['max_waiters'], 4)
+    assert_equals(hot['max_streak'], 4)
+    assert_equals([item['name'] for item in report['convoys']], ['hot'])
+
+    assert_equals(_wolfe.Main().lock_contention(), {'top': [], 'convoys': []})
+
+
+def test_deferred_locks():
+    """ scheduler: Deferred locking leaves queued jobs' locks available """
+    success = _test.Bunch(failed=False)
+    lock = _wolfe.Lock('deferred')
+    desc = _wolfe.TodoDescription('abc')
+
+    for defer, expected in ((False, None), (True, 'def')):
+        wolfe = _wolfe.Main(defer_locks=defer)
+        wolfe.enter_todo(desc.todo(group='g1', locks=[lock]))
+        wolfe.enter_todo(_wolfe.TodoDescription('def').todo(
+            group='g2', locks=[lock]
+        ))
+        job = wolfe.request_job(_wolfe.Executor('exe2', groups=['g2']))
+        assert_equals(job and job.desc.name, expected)
+
+    exe1 = _wolfe.Executor('exe1', groups=['g1'])
+    assert_equals(wolfe.request_job(exe1), None)
+    wolfe.finish_job('exe2', job.id, success)
+    assert_equals(wolfe.request_job(exe1).desc.name, 'abc')
+
+    # Heads with taken locks are skipped
+    exe3 = _wolfe.Executor('exe3', groups=['g3'])
+    wolfe.enter_todo(desc.todo(group='g3', locks=[lock], importance=5))
+    wolfe.enter_todo(_wolfe.TodoDescription('ghi').todo(group='g3'))
+    assert_equals(wolfe.request_job(exe3).desc.name, 'ghi')
+
+
+def test_priority_inheritance():
+    """ scheduler: Lock holders inherit the importance of waiters """
+    lock = _wolfe.Lock('inherited')
+    desc = _wolfe.TodoDescription('low', group='g1')
+
+    wolfe = _wolfe.Main()
+    for _ in xrange(3):
+        wolfe.enter_todo(desc.todo())
+    holder_id = wolfe.enter_todo(desc.todo(locks=[lock]))
+    exe = _wolfe.Executor('low', groups=['g1'])
+
+    wolfe.enter_todo(_wolfe.TodoDescription('high').todo(
+        group='g2', locks=[lock], importance=10
+    ))
+    assert_equals(wolfe.request_job(exe).id, holder_id)
+
+
+def test_hierarchical_locks():
+    """ scheduler: Lock paths conflict with ancestors and descendants """
+    success = _test.Bunch(failed=False)
+    wolfe = _wolfe.Main()
+    exe1 = _wolfe.Executor('exe1')
+    exe2 = _wolfe.Executor('exe2')
+
+    table_id = wolfe.enter_todo(_wolfe.TodoDescription('table').todo(
+        locks=[_wolfe.Lock('db/customers')]
+    ))
+    db_id = wolfe.enter_todo(_wolfe.TodoDescription('db').todo(
+        locks=[_wolfe.Lock('db')]
+    ))
+    other_id = wolfe.enter_todo(_wolfe.TodoDescription('other').todo(
+        locks=[_wolfe.Lock('db/orders')]
+    ))
+
+    assert_equals(wolfe.request_job(exe1).id, table_id)
+    assert_equals(wolfe.request_job(exe2).id, other_id)
+    wolfe.finish_job(exe1.uid, table_id, success)
+    assert_equals(wolfe.request_job(exe1), None)
+    wolfe.finish_job(exe2.uid, other_id, success)
+    assert_equals(wolfe.request_job(exe1).id, db_id)
+
+    with assert_raises(_wolfe.LockConflict):
+        _wolfe.TodoDescription('both').todo(
+            locks=[_wolfe.Lock('db'), _wolfe.Lock('db/orders')]
+        )
+
+
+def test_deduplication():
+    """ scheduler: Duplicate todos are merged into pending jobs """
+    success = _test.Bunch(failed=False)
+    desc = _wolfe.TodoDescription('reindex')
+    exe = _wolfe.Executor('dedup')
+
+    wolfe = _wolfe.Main(merge_duplicates=False)
+    job_id = wolfe.enter_todo(desc.todo(not_before=3600, dedup_key='c42'))
+    assert_equals(wolfe.enter_todo(desc.todo(dedup_key='c42')), job_id)
+    assert_true(wolfe.request_job(exe) is None)
+
+    wolfe = _wolfe.Main()
+    job_id = wolfe.enter_todo(desc.todo(not_before=3600, dedup_key='c42'))
+    root = desc.todo(dedup_key='c42', importance=7)
+    root.on_success(_wolfe.TodoDescription('child').todo())
+    assert_equals(wolfe.enter_todo(root), job_id)
+
+    # The merged job is undelayed and the child waits for it
+    assert_equals(wolfe.request_job(exe).id, job_id)
+    child_id, = [
+        item.id for item in wolfe._scheduler.jobs.values()
+        if item.desc.name == 'child'
+    ]
+    assert_equals(wolfe._scheduler.jobs[child_id].predecessors,
+                  set([job_id]))
+    assert_equals(wolfe._scheduler.jobs[job_id].importance, 7)
+
+    # Handed out jobs are not pending anymore
+    again_id = wolfe.enter_todo(desc.todo(dedup_key='c42'))
+    assert_true(again_id not in (job_id, child_id))
+
+    wolfe.finish_job(exe.uid, job_id, success)
+    assert_equals(wolfe.request_job(exe).id, child_id)
+    assert_equals(wolfe.request_job(_wolfe.Executor('other')).id, again_id)
+
+
+def test_threaded_deduplication():
+    """ scheduler: Duplicates never see a half-entered pending job """
+    success = _test.Bunch(failed=False)
+    desc = _wolfe.TodoDescription('reindex')
+    exe = _wolfe.Executor('dedup')
+    wolfe = _wolfe.Main(threadsafe=True)
+    scheduler = wolfe._scheduler
+
+    # Stretch the time between creating and entering the first job
+    entering = _threading.Event()
+    enter_job = scheduler._enter_job
+
+    def slow_enter_job(job, now=None):
+        if job.dedup_key is not None and not entering.is_set():
+            entering.set()
+            _time.sleep(0.2)
+        enter_job(job, now)
+    scheduler._enter_job = slow_enter_job
+
+    def duplicate():
+        entering.wait()
+        root = desc.todo(dedup_key='c42')
+        root.on_success(_wolfe.TodoDescription('child').todo())
+        result.append(wolfe.enter_todo(root))
+
+    result = []
+    thread = _threading.Thread(target=duplicate)
+    thread.start()
+    job_id = wolfe.enter_todo(desc.todo(dedup_key='c42'))
+    thread.join()
+    assert_equals(result, [job_id])
+
+    # The child waits for the pending job
+    assert_equals(wolfe.request_job(exe).id, job_id)
+    assert_true(wolfe.request_job(_wolfe.Executor('other')) is None)
+    wolfe.finish_job(exe.uid, job_id, success)
+    assert_equals(wolfe.request_job(exe).desc.name, 'child')
+
+
+def test_cancel_job():
+    """ scheduler: Jobs are cancelled wherever they are """
+    success = _test.Bunch(failed=False)
+    lock = _wolfe.Lock('cancel')
+    desc = _wolfe.TodoDescription('cancel')
+    exe = _wolfe.Executor('cancel')
+
+    wolfe = _wolfe.Main()
+    delayed_id = wolfe.enter_todo(desc.todo(not_before=3600))
+    holder_id = wolfe.enter_todo(desc.todo(locks=[lock]))
+    blocked_id = wolfe.enter_todo(desc.todo(locks=[lock]))
+    root = desc.todo(importance=-1)
+    root.on_success(desc.todo())
+    root_id = wolfe.enter_todo(root)
+
+    assert_equals(wolfe.cancel_job(delayed_id), [delayed_id])
+    assert_equals(wolfe.cancel_job(blocked_id), [blocked_id])
+    assert_equals(wolfe.cancel_job(root_id), [root_id, root_id + 1])
+    with assert_raises(_wolfe.JobNotFoundError):
+        wolfe.cancel_job(root_id)
+
+    # Queued lock holders release their locks
+    other_id = wolfe.enter_todo(desc.todo(locks=[lock]))
+    assert_equals(wolfe.cancel_job(holder_id), [holder_id])
+    assert_equals(wolfe.request_job(exe).id, other_id)
+    with assert_raises(_wolfe.JobExecutingError):
+        wolfe.cancel_job(other_id)
+    wolfe.finish_job(exe.uid, other_id, success)
+
+    assert_true(wolfe.request_job(exe) is None)
+    assert_equals(wolfe._scheduler.jobs, {})
+    assert_equals(wolfe._scheduler._groups, {})
+
+    # Cancelled predecessors are never done
+    with assert_raises(_wolfe.DependencyCancelled) as ctx:
+        wolfe.enter_todo(desc.todo(depends_on=[holder_id, other_id]))
+    assert_equals(ctx.exception.args, ([holder_id],))
+    assert_equals(wolfe._scheduler.jobs, {})
+
+
+def test_cancel_delayed_dependent():
+    """ scheduler: Delayed dependents of cancelled jobs do not hang """
+    desc = _wolfe.TodoDescription('cancel')
+    exe = _wolfe.Executor('cancel')
+    wolfe = _wolfe.Main()
+    root_id = wolfe.enter_todo(desc.todo(not_before=3600))
+    dependent_id = wolfe.enter_todo(desc.todo(
+        depends_on=[root_id], not_before=3600
+    ))
+    assert_equals(wolfe.cancel_job(root_id), [root_id])
+
+    # Let the dependent be due now
+    wolfe._scheduler._delayed.peek().not_before = 0
+    assert_true(wolfe.request_job(exe) is None)
+    assert_equals(wolfe._scheduler.jobs, {})
+    assert_equals(len(wolfe._scheduler._waiting), 0)
+    assert_false(wolfe._scheduler.is_done(dependent_id))
+
+
+def test_set_importance():
+    """ scheduler: Importance of queued jobs can be changed """
+    desc = _wolfe.TodoDescription('bulk')
+    exe = _wolfe.Executor('importance')
+
+    wolfe = _wolfe.Main()
+    job_ids = [wolfe.enter_todo(desc.todo()) for _ in xrange(50)]
+    other_id = wolfe.enter_todo(_wolfe.TodoDescription('other').todo())
+
+    wolfe.set_importance(job_ids[30], 5)
+    assert_equals(sorted(wolfe.reprioritize(-1, name='bulk')), job_ids)
+    wolfe.set_importance(job_ids[20], 3)
+    with assert_raises(_wolfe.JobNotFoundError):
+        wolfe.set_importance(0, 3)
+
+    assert_equals(wolfe.request_job(exe).id, job_ids[20])
+    assert_equals(wolfe.request_job(_wolfe.Executor('x')).id, other_id)
+    assert_equals(wolfe.request_job(_wolfe.Executor('y')).id, job_ids[0])
+
+
+def test_aging():
+    """ scheduler: Waiting jobs age and overtake newer important ones """
+    for policy, expected in ((None, 'high'),
+                             (_wolfe.AgingPolicy(0.01), 'low')):
+        wolfe = _wolfe.Main(policy=policy)
+        wolfe.enter_todo(_wolfe.TodoDescription('low').todo())
+        _time.sleep(0.05)
+        wolfe.enter_todo(
+            _wolfe.TodoDescription('high').todo(importance=1)
+        )
+        job = wolfe.request_job(_wolfe.Executor('aging'))
+        assert_equals(job.desc.name, expected)
+
+
+def test_fair_share():
+    """ scheduler: Shared executors serve groups by their weights """
+    success = _test.Bunch(failed=False)
+    exe = _wolfe.Executor('shared', groups=['bulk', 'tenant'])
+
+    for weights, expected in ((None, 'b' * 8), ({'tenant': 3}, 'btttbttt')):
+        wolfe = _wolfe.Main(limits=_wolfe.Limits(weights=weights))
+        for _ in xrange(10):
+            wolfe.enter_todo(_wolfe.TodoDescription('b').todo(
+                group='bulk', importance=1
+            ))
+        for _ in xrange(10):
+            wolfe.enter_todo(_wolfe.TodoDescription('t').todo(
+                group='tenant'
+            ))
+
+        names = []
+        for _ in xrange(8):
+            job = wolfe.request_job(exe)
+            names.append(job.desc.name)
+            wolfe.finish_job(exe.uid, job.id, success)
+        assert_equals(''.join(names), expected)
+
+
+def test_limits():
+    """ scheduler: Groups and names are limited in concurrency """
+    success = _test.Bunch(failed=False)
+    desc = _wolfe.TodoDescription('mail')
+    rebuild = _wolfe.TodoDescription('rebuild')
+
+    for weights in (None, {}):
+        wolfe = _wolfe.Main(limits=_wolfe.Limits(
+            weights=weights, groups={'email': 2}, names={'rebuild': 1},
+        ))
+        for _ in xrange(3):
+            wolfe.enter_todo(desc.todo(group='email', importance=1))
+            wolfe.enter_todo(rebuild.todo())
+        exes = [_wolfe.Executor('exe%d' % num, groups=['email', 'default'])
+                for num in xrange(4)]
+
+        jobs = dict((exe, wolfe.request_job(exe)) for exe in exes[:3])
+        assert_equals(sorted(job.desc.name for job in jobs.values()),
+                      ['mail', 'mail', 'rebuild'])
+        assert_equals(wolfe.request_job(exes[3]), None)
+
+        for name in ('mail', 'rebuild'):
+            exe = [exe for exe, job in jobs.items()
+                   if job.desc.name == name][0]
+            wolfe.finish_job(exe.uid, jobs.pop(exe).id, success)
+            assert_equals(wolfe.request_job(exe).desc.name, name)
+            assert_equals(wolfe.request_job(exes[3]), None)
+
+
+def test_rate_limits():
+    """ scheduler: Groups are rate limited """
+    desc = _wolfe.TodoDescription('api')
+    exe = _wolfe.Executor('rate', groups=['api'])
+
+    for weights in (None, {}):
+        wolfe = _wolfe.Main(limits=_wolfe.Limits(
+            weights=weights, rates={'api': 20},
+        ))
+        assert_equals(wolfe.retry_after(exe), None)
+        for _ in xrange(25):
+            wolfe.enter_todo(desc.todo(group='api'))
+        assert_equals(wolfe.retry_after(exe), 0.0)
+        assert_equals(wolfe.retry_after(_wolfe.Executor('other')), None)
+
+        executors = [_wolfe.Executor('api%d' % num, groups=['api'])
+                     for num in xrange(25)]
+        jobs = [wolfe.request_job(item) for item in executors]
+        assert_equals(len([job for job in jobs if job is not None]), 20)
+
+        delay = wolfe.retry_after(exe)
+        assert_true(0 < delay <= 0.05)
+        _time.sleep(delay)
+        assert_true(wolfe.request_job(exe) is not None)
+
+
+def test_deadlines():
+    """ scheduler: Jobs are ordered by deadline and expire """
+    desc = _wolfe.TodoDescription('notify', group='notify')
+    exe = _wolfe.Executor('notify', groups=['notify'])
+    past = _dt.datetime.utcnow() - _dt.timedelta(seconds=10)
+
+    wolfe = _wolfe.Main(policies={'notify': _wolfe.DeadlinePolicy()})
+    later_id = wolfe.enter_todo(desc.todo(not_after=600, importance=9))
+    none_id = wolfe.enter_todo(desc.todo(importance=20))
+    soon_id = wolfe.enter_todo(desc.todo(not_after=60))
+    expired = desc.todo(not_after=past)
+    expired.on_success(desc.todo())
+    expired_id = wolfe.enter_todo(expired)
+
+    assert_equals(wolfe.expire_jobs(), [expired_id])
+    assert_equals(wolfe.expire_jobs(), [])
+    assert_true(expired_id + 1 not in wolfe._scheduler.jobs)
+    executors = [_wolfe.Executor('notify%d' % num, groups=['notify'])
+                 for num in xrange(3)]
+    assert_equals([wolfe.request_job(item).id for item in executors],
+                  [soon_id, later_id, none_id])
+
+    # Expired jobs are diverted into the expired group
+    late = _wolfe.Executor('late', groups=['late'])
+    wolfe = _wolfe.Main(limits=_wolfe.Limits(expired_group='late'))
+    delayed_id = wolfe.enter_todo(desc.todo(not_before=3600, not_after=past))
+    queued_id = wolfe.enter_todo(desc.todo(not_after=past))
+    assert_true(wolfe.request_job(exe) is None)
+    assert_equals(wolfe.request_job(late).id, queued_id)
+    assert_true(wolfe.request_job(
+        _wolfe.Executor('late2', groups=['late'])
+    ) is None)
+    assert_equals(wolfe._scheduler.jobs[delayed_id].group, 'late')
+
+
+def test_critical_path():
+    """ scheduler: Jobs on the critical path run first """
+    short = _wolfe.TodoDescription('short')
+    slow = _wolfe.TodoDescription('slow')
+    exe = _wolfe.Executor('cp')
+
+    critical_path = _wolfe.CriticalPathPolicy({'slow': 60})
+    for policy, expected in ((None, 0), (critical_path, 1)):
+        wolfe = _wolfe.Main(policy=policy)
+        ids = [wolfe.enter_todo(short.todo()), None]
+        root = short.todo()
+        root.on_success(slow.todo())
+        ids[1] = wolfe.enter_todo(root)
+
+        assert_equals(wolfe.request_job(exe).id, ids[expected])
+
+
+def test_prefer_dependents():
+    """ scheduler: Jobs unblocking the most jobs run first """
+    desc = _wolfe.TodoDescription('unblock')
+    exe = _wolfe.Executor('unblock')
+
+    for policy, expected in ((None, 0), (_wolfe.DependentsPolicy(), 1)):
+        wolfe = _wolfe.Main(policy=policy)
+        ids = [wolfe.enter_todo(desc.todo()), wolfe.enter_todo(desc.todo())]
+
+        # Dependents entered later reorder the queued job
+        for _ in xrange(3):
+            wolfe.enter_todo(desc.todo(depends_on=[ids[1]]))
+        assert_equals(wolfe._scheduler.jobs[ids[1]].dependents, 3)
+
+        assert_equals(wolfe.request_job(exe).id, ids[expected])
+
+
+def test_foreign_locks():
+    """ scheduler: Lock objects not created by wolfe are accepted """
+    class ForeignLock(object):
+        def __init__(self, name):
+            self.name = name
+            self.exclusive = True
+
+    success = _test.Bunch(failed=False)
+    desc = _wolfe.TodoDescription('foreign')
+    wolfe = _wolfe.Main()
+    first_id = wolfe.enter_todo(desc.todo(locks=[ForeignLock('f/1')]))
+    second_id = wolfe.enter_todo(desc.todo(locks=[ForeignLock('f')]))
+
+    exe = _wolfe.Executor('foreign')
+    assert_equals(wolfe.request_job(exe).id, first_id)
+    assert_true(wolfe.request_job(_wolfe.Executor('other')) is None)
+    wolfe.finish_job(exe.uid, first_id, success)
+    assert_equals(wolfe.request_job(exe).id, second_id)
+
+
+def test_mixed_policies():
+    """ scheduler: Executors serve groups with different policies """
+    desc = _wolfe.TodoDescription('mixed')
+    for groups in (('a', 'b'), ('b', 'a')):
+        wolfe = _wolfe.Main(policies={'a': _wolfe.FifoPolicy()})
+        exe = _wolfe.Executor('mixed', groups=groups)
+        low_id = wolfe.enter_todo(desc.todo(group='a'))
+        high_id = wolfe.enter_todo(desc.todo(group='b', importance=1))
+        other_id = wolfe.enter_todo(desc.todo(group='b'))
+
+        result = []
+        for _ in xrange(3):
+            job = wolfe.request_job(exe)
+            result.append(job.id)
+            wolfe.finish_job(exe.uid, job.id, _test.Bunch(failed=False))
+        assert_equals(result, [high_id, low_id, other_id])
+
+
+def test_sept():
+    """ scheduler: Jobs expected to run shortest run first """
+    success = _test.Bunch(failed=False)
+    slow, fast = _wolfe.TodoDescription('slow'), _wolfe.TodoDescription('fast')
+    wolfe = _wolfe.Main(policy=_wolfe.SeptPolicy())
+    wolfe._scheduler.durations.observe('slow', 60)
+    wolfe._scheduler.durations.observe('fast', 1)
+
+    slow_id = wolfe.enter_todo(slow.todo())
+    fast_id = wolfe.enter_todo(fast.todo())
+    new_id = wolfe.enter_todo(_wolfe.TodoDescription('new').todo())
+    assert_equals(wolfe._scheduler.jobs[slow_id].expected_runtime, 60.0)
+
+    for job_id, exe in zip((new_id, fast_id, slow_id), 'abc'):
+        exe = _wolfe.Executor(exe)
+        assert_equals(wolfe.request_job(exe).id, job_id)
+        wolfe.finish_job(exe.uid, job_id, success)
+
+    assert_true(wolfe.expected_runtime('new') < 1)
+    assert_equals(wolfe.runtime_report()['fast']['count'], 2)
+    assert_true(wolfe.expected_runtime('slow', 1) > 50)
+
+
+def test_finish_and_request():
+    """ scheduler: Freed jobs continue on the finishing executor """
+    success = _test.Bunch(failed=False)
+    desc = _wolfe.TodoDescription('chain')
+    wolfe = _wolfe.Main(metrics=True)
+    exe, other = _wolfe.Executor('exe'), _wolfe.Executor('other')
+
+    filler_id = wolfe.enter_todo(desc.todo(importance=5))
+    first = desc.todo(importance=9)
+    second = first.on_success(desc.todo())
+    second.on_success(desc.todo(group='elsewhere'))
+    first_id = wolfe.enter_todo(first)
+
+    assert_equals(wolfe.request_job(exe).id, first_id)
+    job = wolfe.finish_and_request(exe, first_id, success)
+    assert_equals((job.id, job.importance), (first_id + 1, 0))
+    assert_equals(wolfe.request_job(exe), job)
+
+    # The next successor does not match the executor's groups
+    assert_equals(wolfe.finish_and_request(exe, job.id, success).id,
+                  filler_id)
+    assert_true(wolfe.request_job(other) is None)
+    assert_equals(wolfe.request_job(
+        _wolfe.Executor('elsewhere', groups=['elsewhere'])
+    ).id, first_id + 2)
+
+    snap = wolfe.metrics.snapshot()
+    assert_equals(snap['wolfe_jobs_continued_total'][2], [({}, 1)])
+    with assert_raises(_wolfe.InvalidExecutorError):
+        wolfe.finish_and_request(other, filler_id, success)
+
+
+def test_policies():
+    """ scheduler: Group queues follow their scheduling policies """
+    class Recorder(_wolfe.PriorityPolicy):
+        def __init__(self):
+            super(Recorder, self).__init__()
+            self.calls = []
+
+        def enqueued(self, job):
+            self.calls.append(('enqueued', job.id))
+
+        def dequeued(self, job):
+            self.calls.append(('dequeued', job.id))
+
+        def finished(self, job):
+            self.calls.append(('finished', job.id))
+
+    success = _test.Bunch(failed=False)
+    desc = _wolfe.TodoDescription('policy')
+    recorder = Recorder()
+    wolfe = _wolfe.Main(policy=recorder, policies={
+        'fifo': _wolfe.FifoPolicy(),
+    })
+
+    fifo = _wolfe.Executor('fifo', groups=['fifo'])
+    first_id = wolfe.enter_todo(desc.todo(group='fifo'))
+    wolfe.enter_todo(desc.todo(group='fifo', importance=5))
+    assert_equals(wolfe.request_job(fifo).id, first_id)
+
+    exe = _wolfe.Executor('default')
+    low_id = wolfe.enter_todo(desc.todo())
+    high_id = wolfe.enter_todo(desc.todo(importance=5))
+    assert_equals(wolfe.request_job(exe).id, high_id)
+    wolfe.finish_job(exe.uid, high_id, success)
+    wolfe.cancel_job(low_id)
+    assert_equals(recorder.calls, [
+        ('enqueued', low_id), ('enqueued', high_id), ('dequeued', high_id),
+        ('finished', high_id), ('dequeued', low_id),
+    ])
@@ -0,0 +1,181 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+======================================
+ Tests for wolfe.dispatcher._protocol
+======================================
+
+Tests for wolfe.dispatcher._protocol.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import datetime as _dt
+
+from nose.tools import assert_equals, assert_false, assert_true, assert_raises
+from ... import _util as _test
+
+from wolfe import _exceptions
+from wolfe import _lock
+from wolfe import _todo
+from wolfe.dispatcher import _protocol
+
+# pylint: disable = protected-access
+
+
+def test_frame_reader_too_large():
+    """ FrameReader rejects oversized payloads """
+    reader = _protocol.FrameReader()
+    reader.feed(_protocol.HEADER.pack(_protocol.MAX_PAYLOAD + 1, 1, 1))
+
+    with assert_raises(_exceptions.ProtocolError):
+        list(reader)
+
+
+def test_frame_reader_chunks():
+    """ FrameReader joins chunks only for complete headers and frames """
+    reader = _protocol.FrameReader()
+    data = _protocol.frame(_protocol.HELLO, 1, 'x' * 100) \
+        + _protocol.frame(_protocol.RESULT, 2, 'yz')
+    result = []
+    for idx in xrange(len(data)):
+        reader.feed(data[idx])
+        result.extend(reader)
+        if 9 <= idx < 108:
+            assert_equals(len(reader._chunks), idx - 7)
+
+    assert_equals(result, [(1, 1, 'x' * 100), (128, 2, 'yz')])
+    assert_equals(reader._chunks, [])
+    assert_false(reader)
+
+
+def test_decode_invalid():
+    """ decode rejects invalid payloads """
+    with assert_raises(_exceptions.ProtocolError):
+        _protocol.decode('{')
+    with assert_raises(_exceptions.ProtocolError):
+        _protocol.decode_job('{')
+
+
+def test_todo_roundtrip():
+    """ encode_todo/decode_todo restore the todo graph """
+    desc = _todo.TodoDescription('desc', locks=[_lock.Lock('a')], group='g')
+    when = _dt.datetime(2016, 1, 2, 3, 4, 5, 6)
+    root = desc.todo(depends_on=[3], importance=7, not_before=when)
+    child1 = root.on_success(desc.todo(locks=[_lock.Lock('b', False)]))
+    child2 = root.on_success(_todo.TodoDescription('other').todo())
+    child1.on_success(child2)
+
+    todo = _protocol.decode_todo(_protocol.encode_todo(root))
+    assert_equals(todo.desc.name, 'desc')
+    assert_equals(todo.desc.group, 'g')
+    assert_equals([lock.name for lock in todo.locks], ['a'])
+    assert_equals(todo.importance, 7)
+    assert_equals(todo.not_before, when)
+    assert_equals(todo.predecessors(), (3,))
+
+    succ1, succ2 = todo.successors()
+    assert_true(succ1.desc is todo.desc)
+    assert_equals([(lock.name, lock.exclusive) for lock in succ1.locks],
+                  [('b', False)])
+    assert_equals(succ2.desc.name, 'other')
+    assert_equals(succ1.successors(), (succ2,))
+
+
+def test_decode_todo_invalid():
+    """ decode_todo rejects invalid representations """
+    with assert_raises(_exceptions.ProtocolError):
+        _protocol.decode_todo(_protocol.encode(None))
+
+
+def test_job_roundtrip():
+    """ encode_job/decode_job restore the job """
+    assert_equals(_protocol.encode_job(None), '')
+    assert_true(_protocol.decode_job('') is None)
+
+    desc = _todo.TodoDescription('desc', importance=3)
+    job = _protocol.decode_job(_protocol.encode_job(
+        _protocol._codec._job.Job(
+            10, desc, 'g', [_lock.Lock('l')], 5, None, {'x': 1}, [2, 1], []
+        )
+    ))
+    assert_equals(job.id, 10)
+    assert_equals(job.desc.name, 'desc')
+    assert_equals(job.desc.importance, 3)
+    assert_equals(job.group, 'g')
+    assert_equals([lock.name for lock in job.locks], ['l'])
+    assert_equals(job.importance, 5)
+    assert_equals(job.extra, {'x': 1})
+    assert_equals(job.predecessors, set([1, 2]))
+
+
+def test_result_roundtrip():
+    """ encode_result/decode_result restore the result """
+    result = _protocol.decode_result(_protocol.encode_result(
+        _protocol._execution.Result(2, 'out', 'err')
+    ))
+    assert_equals((result.exit_code, result.failed), (2, True))
+    assert_equals((result.stdout, result.stderr), ('out', 'err'))
+
+    assert_equals(
+        _protocol.encode_result(_test.Bunch(failed=False)), [0, None, None]
+    )
+
+
+def test_error_roundtrip():
+    """ encode_error/decode_error restore wolfe exceptions """
+    exc = _protocol.decode_error(_protocol.encode_error(
+        _exceptions.JobNotFoundError(12)
+    ))
+    assert_true(isinstance(exc, _exceptions.JobNotFoundError))
+    assert_equals(exc.args, (12,))
+
+    exc = _protocol.decode_error(_protocol.encode_error(
+        KeyError(object)
+    ))
+    assert_true(isinstance(exc, _exceptions.RemoteError))
+    assert_equals(exc.args, ('KeyError', [repr(object)]))
+
+    exc = _protocol.decode_error(None)
+    assert_true(isinstance(exc, _exceptions.ProtocolError))
+
+
+def test_decode_error_signature():
+    """ decode_error wraps exceptions not accepting the arguments """
+    class StrictError(_exceptions.Error):
+        """ Exception with a fixed signature """
+        def __init__(self, job_id):
+            """ Initialization """
+            super(StrictError, self).__init__(job_id)
+
+    with _test.patched(_exceptions, 'StrictError', StrictError):
+        exc = _protocol.decode_error(['StrictError', [1, 2]])
+        assert_true(isinstance(exc, _exceptions.RemoteError))
+        assert_equals(exc.args, ('StrictError', [1, 2]))
+
+        exc = _protocol.decode_error(['StrictError', 3])
+        assert_true(isinstance(exc, _exceptions.RemoteError))
+
+        exc = _protocol.decode_error(['StrictError', [1]])
+        assert_true(isinstance(exc, StrictError))
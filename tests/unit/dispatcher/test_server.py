@@ -0,0 +1,184 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+====================================
+ Tests for wolfe.dispatcher._server
+====================================
+
+Tests for wolfe.dispatcher._server.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_true
+from ... import _util as _test
+
+from wolfe import _exceptions
+from wolfe.dispatcher import _protocol
+from wolfe.dispatcher import _server
+
+# pylint: disable = protected-access
+
+
+def _responses(data):
+    """ Parse responses """
+    reader = _protocol.FrameReader()
+    reader.feed(data)
+    return [(opcode, request_id, _protocol.decode(payload))
+            for opcode, request_id, payload in reader]
+
+
+def test_dispatcher_enter_todo():
+    """ Dispatcher maps enter_todo """
+    main = _test.mock.MagicMock()
+    main.enter_todo.return_value = 23
+    todo = _protocol._codec._todo.TodoDescription('x').todo()
+
+    result = _server.Dispatcher(main).dispatch(
+        _protocol.ENTER_TODO, _protocol.encode_todo(todo)
+    )
+    assert_equals(result, (_protocol.RESULT, _protocol.encode(23)))
+    assert_equals(main.enter_todo.call_args[0][0].desc.name, 'x')
+
+
+def test_dispatcher_request_job():
+    """ Dispatcher maps request_job """
+    main = _test.mock.MagicMock()
+    main.request_job.return_value = None
+
+    result = _server.Dispatcher(main).dispatch(
+        _protocol.REQUEST_JOB, _protocol.encode(['exe', ['g']])
+    )
+    assert_equals(result, (_protocol.RESULT, ''))
+    executor = main.request_job.call_args[0][0]
+    assert_equals((executor.uid, executor.groups), ('exe', ('g',)))
+
+
+def test_dispatcher_finish_job():
+    """ Dispatcher maps finish_job and reports errors """
+    main = _test.mock.MagicMock()
+    main.finish_job.side_effect = _exceptions.JobNotFoundError(3)
+
+    result = _server.Dispatcher(main).dispatch(
+        _protocol.FINISH_JOB, _protocol.encode(['exe', 3, [0, 'o', 'e']])
+    )
+    assert_equals(result, (
+        _protocol.ERROR, _protocol.encode(['JobNotFoundError', [3]])
+    ))
+    ex_id, job_id, res = main.finish_job.call_args[0]
+    assert_equals((ex_id, job_id, res.exit_code), ('exe', 3, 0))
+
+
+def test_dispatcher_finish_and_request():
+    """ Dispatcher maps finish_and_request """
+    main = _test.mock.MagicMock()
+    main.finish_and_request.return_value = None
+
+    result = _server.Dispatcher(main).dispatch(
+        _protocol.FINISH_AND_REQUEST,
+        _protocol.encode([['exe', ['g']], 3, [1, 'o', 'e']]),
+    )
+    assert_equals(result, (_protocol.RESULT, ''))
+    executor, job_id, res = main.finish_and_request.call_args[0]
+    assert_equals((executor.uid, executor.groups), ('exe', ('g',)))
+    assert_equals((job_id, res.exit_code), (3, 1))
+
+    opcode, payload = _server.Dispatcher(main).dispatch(
+        _protocol.FINISH_AND_REQUEST, _protocol.encode([1, 2])
+    )
+    assert_equals(opcode, _protocol.ERROR)
+    assert_equals(_protocol.decode(payload)[0], 'ProtocolError')
+
+
+def test_dispatcher_invalid():
+    """ Dispatcher rejects invalid requests """
+    dispatcher = _server.Dispatcher(_test.mock.MagicMock())
+
+    opcode, payload = dispatcher.dispatch(99, _protocol.encode(None))
+    assert_equals(opcode, _protocol.ERROR)
+    assert_equals(_protocol.decode(payload)[0], 'ProtocolError')
+
+    opcode, payload = dispatcher.dispatch(
+        _protocol.FINISH_JOB, _protocol.encode([1])
+    )
+    assert_equals(opcode, _protocol.ERROR)
+    assert_equals(_protocol.decode(payload)[0], 'ProtocolError')
+
+
+def test_connection_handshake():
+    """ Connection requires a handshake """
+    dispatcher = _test.mock.MagicMock()
+    dispatcher.dispatch.return_value = (_protocol.RESULT, '1')
+    conn = _server.Connection(dispatcher)
+
+    resp = _responses(conn.feed(_protocol.frame(_protocol.REQUEST_JOB, 1, '')))
+    assert_equals(resp, [
+        (_protocol.ERROR, 1, ['ProtocolError', ['Handshake required']]),
+    ])
+
+    resp = _responses(conn.feed(_protocol.frame(
+        _protocol.HELLO, 2, _protocol.encode(99)
+    )))
+    assert_equals(resp[0][:2], (_protocol.ERROR, 2))
+
+    assert_equals(dispatcher.mock_calls, [])
+
+
+def test_connection_batch():
+    """ Connection answers pipelined requests in one batch """
+    dispatcher = _test.mock.MagicMock()
+    dispatcher.dispatch.side_effect = [
+        (_protocol.RESULT, _protocol.encode(1)),
+        (_protocol.RESULT, _protocol.encode(2)),
+    ]
+    conn = _server.Connection(dispatcher)
+    version = _protocol.encode(_protocol.VERSION)
+    data = ''.join([
+        _protocol.frame(_protocol.HELLO, 1, version),
+        _protocol.frame(_protocol.ENTER_TODO, 2, 'a'),
+        _protocol.frame(_protocol.REQUEST_JOB, 3, 'b'),
+    ])
+
+    assert_equals(conn.feed(data[:-1]), _protocol.frame(
+        _protocol.RESULT, 1, version
+    ) + _protocol.frame(_protocol.RESULT, 2, _protocol.encode(1)))
+    assert_true(conn._reader)
+    assert_equals(_responses(conn.feed(data[-1:])), [
+        (_protocol.RESULT, 3, 2),
+    ])
+    assert_equals(map(tuple, dispatcher.mock_calls), [
+        ('dispatch', (_protocol.ENTER_TODO, 'a'), {}),
+        ('dispatch', (_protocol.REQUEST_JOB, 'b'), {}),
+    ])
+
+
+def test_dispatcher_metrics():
+    """ Dispatcher exports metrics """
+    main = _test.mock.MagicMock()
+    main.metrics.prometheus.return_value = 'metrics\n'
+
+    result = _server.Dispatcher(main).dispatch(
+        _protocol.METRICS, _protocol.encode(None)
+    )
+    assert_equals(result, (_protocol.RESULT, _protocol.encode('metrics\n')))
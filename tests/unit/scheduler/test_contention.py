@@ -0,0 +1,134 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=======================================
+ Tests for wolfe.scheduler._contention
+=======================================
+
+Tests for wolfe.scheduler._contention.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_false, assert_true
+
+from wolfe.scheduler import _contention
+
+# pylint: disable = protected-access
+
+
+def _clock(*values):
+    """ Create a clock returning the values in order """
+    return iter(values).next
+
+
+def test_contention_wait_and_hold():
+    """ Contention records wait and hold durations """
+    profiler = _contention.Contention(_clock(1.0, 2.0, 2.5, 5.0, 5.0, 6.0))
+    assert_true(profiler.enabled)
+
+    profiler.entered('L', 1, 0)
+    profiler.entered('L', 2, 1)
+    profiler.acquired('L', 1)
+    profiler.released('L', 1)
+    profiler.acquired('L', 2)
+    profiler.released('L', 0)
+
+    stats = profiler._stats['L']
+    assert_equals(stats.as_dict(), {
+        'name': 'L',
+        'acquisitions': 2,
+        'conflicts': 1,
+        'handoffs': 1,
+        'max_waiters': 1,
+        'hold_total': 3.5,
+        'hold_max': 2.5,
+        'wait_total': 4.5,
+        'wait_max': 3.0,
+        'streak': 0,
+        'max_streak': 1,
+    })
+    assert_equals(profiler._held, {})
+    assert_equals(profiler._announced, {})
+
+
+def test_contention_forget():
+    """ Contention.forget drops announcements """
+    profiler = _contention.Contention(_clock(1.0))
+    profiler.entered('L', 1, 2)
+    profiler.forget('L', 1)
+    profiler.forget('L', 2)
+
+    assert_equals(profiler._announced, {})
+    assert_equals(profiler._stats['L'].max_waiters, 2)
+
+
+def test_contention_top():
+    """ Contention.top ranks by wait time, then conflicts """
+    profiler = _contention.Contention(_clock(0.0, 0.0, 0.0))
+    for name, conflicts, wait in (('a', 1, 1.0), ('b', 5, 1.0),
+                                  ('c', 2, 7.0), ('d', 0, 0.0)):
+        stats = profiler._get(name)
+        stats.conflicts, stats.wait_total = conflicts, wait
+
+    assert_equals([item.name for item in profiler.top()], ['c', 'b', 'a'])
+    assert_equals([item.name for item in profiler.top(2)], ['c', 'b'])
+
+
+def test_contention_convoys():
+    """ Contention.convoys finds chains of handoffs """
+    profiler = _contention.Contention(_clock(*[0.0] * 20))
+    for waiters in (3, 2, 1, 0, 1):
+        profiler.released('a', waiters)
+    for waiters in (1, 1, 1, 1):
+        profiler.released('b', waiters)
+    profiler.released('c', 1)
+
+    assert_equals(
+        [(item.name, item.max_streak, item.streak)
+         for item in profiler.convoys()],
+        [('b', 4, 4), ('a', 3, 1)]
+    )
+    assert_equals(
+        [item.name for item in profiler.convoys(min_length=1)],
+        ['b', 'a', 'c']
+    )
+
+    report = profiler.report(count=1, min_length=4)
+    assert_equals(report['top'], [])
+    assert_equals([item['name'] for item in report['convoys']], ['b'])
+
+
+def test_null():
+    """ NULL profiler records nothing """
+    profiler = _contention.NULL
+    assert_false(profiler.enabled)
+
+    profiler.entered('L', 1, 2)
+    profiler.acquired('L', 1)
+    profiler.released('L', 1)
+    profiler.forget('L', 1)
+    assert_equals(profiler.top(), [])
+    assert_equals(profiler.convoys(), [])
+    assert_equals(profiler.report(), {'top': [], 'convoys': []})
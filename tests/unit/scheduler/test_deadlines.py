@@ -0,0 +1,68 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+======================================
+ Tests for wolfe.scheduler._deadlines
+======================================
+
+Tests for wolfe.scheduler._deadlines.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+
+from nose.tools import assert_equals, assert_true
+from ... import _util as _test
+
+from wolfe.scheduler import _deadlines
+
+# pylint: disable = protected-access
+
+
+def _job(job_id, deadline):
+    """ Create job dummy """
+    return _test.Bunch(
+        id=job_id, deadline=deadline, importance=0, inherited=None
+    )
+
+
+def test_deadlines():
+    """ Deadlines hands out the expired jobs by deadline """
+    deadlines = _deadlines.Deadlines()
+    assert_equals(deadlines.expired(100), [])
+    deadlines.put(_job(1, None))
+    assert_true(deadlines._queue is None)
+
+    jobs = [_job(job_id, deadline) for job_id, deadline in (
+        (2, 30), (3, 10), (4, 20), (5, 200),
+    )]
+    for job in jobs:
+        deadlines.put(job)
+    deadlines.discard(jobs[2])
+    deadlines.discard(_job(6, None))
+
+    assert_equals([job.id for job in deadlines.expired(30)], [3, 2])
+    assert_equals(deadlines.expired(30), [])
+    assert_equals([job.id for job in deadlines.expired(200)], [5])
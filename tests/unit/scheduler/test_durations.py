@@ -0,0 +1,90 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+======================================
+ Tests for wolfe.scheduler._durations
+======================================
+
+Tests for wolfe.scheduler._durations.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_raises, assert_true
+
+from wolfe.scheduler import _durations
+
+# pylint: disable = protected-access
+# pylint: disable = missing-docstring
+
+
+def test_sketch():
+    """ Sketch estimates quantiles within the accuracy """
+    sketch = _durations.Sketch(0.01)
+    assert_equals(sketch.quantile(0.5), None)
+
+    for value in xrange(1, 1001):
+        sketch.add(value)
+    sketch.add(0)
+    assert_equals(sketch.count, 1001)
+    assert_equals(sketch.quantile(0), 0.0)
+    for q, value in ((0.5, 500), (0.9, 900), (0.99, 990), (1, 1000)):
+        assert_true(abs(sketch.quantile(q) - value) <= value * 0.01)
+    assert_true(len(sketch._buckets) < 400)
+
+    with assert_raises(ValueError):
+        sketch.quantile(1.5)
+    with assert_raises(ValueError):
+        _durations.Sketch(0)
+
+
+def test_durations():
+    """ Durations keep moving averages and quantiles per name """
+    durations = _durations.Durations(alpha=0.5)
+    assert_equals(durations.expected('build'), None)
+    assert_equals(durations.report(), {})
+
+    for seconds in (10, 20, 40, -5):
+        durations.observe('build', seconds)
+    durations.observe('lint', 1)
+
+    assert_equals(len(durations), 2)
+    assert_equals(durations.expected('build'), 13.75)
+    assert_equals(durations.expected('lint'), 1.0)
+    assert_equals(durations.expected('build', 0), 0.0)
+    assert_true(abs(durations.expected('build', 1) - 40) <= 0.4)
+
+    report = durations.report()
+    assert_equals(sorted(report), ['build', 'lint'])
+    assert_equals(report['build']['count'], 4)
+    assert_equals(report['build']['expected'], 13.75)
+    assert_equals(sorted(report['lint']), [
+        'count', 'expected', 'p50', 'p90', 'p99',
+    ])
+
+    with assert_raises(ValueError):
+        _durations.Durations(alpha=0)
+    with assert_raises(ValueError):
+        _durations.Durations(accuracy=1)
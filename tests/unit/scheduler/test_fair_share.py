@@ -0,0 +1,141 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+=======================================
+ Tests for wolfe.scheduler._fair_share
+=======================================
+
+Tests for wolfe.scheduler._fair_share.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_false, assert_raises, assert_true
+
+from wolfe.scheduler import _fair_share
+
+# pylint: disable = protected-access
+# pylint: disable = missing-docstring
+
+
+class _Group(list):
+    """ Sample group """
+
+    def __init__(self, name, *jobs):
+        super(_Group, self).__init__(jobs)
+        self.name = name
+
+    def peek(self, acquirable=None):
+        for job in self:
+            if acquirable is None or acquirable(job):
+                return job
+        return None
+
+
+def _dispatch(share, groups, names, count):
+    result = []
+    for _ in xrange(count):
+        found = share.pick(names, groups)
+        if found is None:
+            break
+        job, group = found
+        group.remove(job)
+        share.charge(group.name)
+        result.append(job)
+    return result
+
+
+def test_fair_share_init():
+    """ FairShare initializes properly """
+    share = _fair_share.FairShare({'foo': 2})
+    assert_equals(share._weights, {'foo': 2})
+    assert_equals(share._share('foo').weight, 2.0)
+    assert_equals(share._share('bar').weight, 1.0)
+    assert_true(share._share('foo') is share._share('foo'))
+
+    with assert_raises(ValueError):
+        _fair_share.FairShare({'foo': 0})
+
+
+def test_fair_share_weights():
+    """ FairShare dispatches in proportion to the weights """
+    groups = {
+        'a': _Group('a', *['a%d' % num for num in xrange(20)]),
+        'b': _Group('b', *['b%d' % num for num in xrange(20)]),
+    }
+    share = _fair_share.FairShare({'a': 3})
+    for name in groups:
+        share.activate(name, groups[name])
+
+    result = _dispatch(share, groups, ('a', 'b'), 8)
+    assert_equals(result, ['a0', 'b0', 'a1', 'a2', 'a3', 'b1', 'a4', 'a5'])
+
+
+def test_fair_share_idle():
+    """ FairShare does not let idle groups bank credit """
+    groups = {'a': _Group('a', *['a%d' % num for num in xrange(10)])}
+    share = _fair_share.FairShare()
+    share.activate('a', groups['a'])
+    share.activate('b', None)
+    assert_equals(_dispatch(share, groups, ('a', 'b'), 4),
+                  ['a0', 'a1', 'a2', 'a3'])
+
+    groups['b'] = _Group('b', 'b0', 'b1', 'b2')
+    share.activate('b', groups['b'])
+    assert_equals(_dispatch(share, groups, ('a', 'b'), 4),
+                  ['b0', 'a4', 'b1', 'a5'])
+
+
+def test_fair_share_deactivate():
+    """ FairShare drops empty groups from the selection lazily """
+    groups = {'a': _Group('a', 'a0'), 'b': _Group('b', 'b0', 'b1')}
+    share = _fair_share.FairShare()
+    share.activate('a', groups['a'])
+    share.activate('b', groups['b'])
+    share.activate('b', groups['b'])
+
+    assert_equals(share.pick(('b', 'c'), groups)[0], 'b0')
+    assert_equals(_dispatch(share, groups, ('a', 'b'), 5), ['a0', 'b0', 'b1'])
+    assert_false(share._shares['a'].active)
+    assert_false(share._shares['b'].active)
+    assert_equals(len(share._heaps[('a', 'b')]), 0)
+    assert_equals(len(share._heaps[('b', 'c')]), 0)
+
+    groups['a'].append('a1')
+    share.activate('a', groups['a'])
+    assert_equals(share.pick(('a', 'b'), groups), ('a1', groups['a']))
+    assert_equals(share.pick(('b', 'c'), groups), None)
+
+
+def test_fair_share_acquirable():
+    """ FairShare skips groups without available jobs """
+    groups = {'a': _Group('a', 'a0'), 'b': _Group('b', 'b0')}
+    share = _fair_share.FairShare()
+    for name in groups:
+        share.activate(name, groups[name])
+
+    found = share.pick(('a', 'b'), groups, lambda job: job != 'a0')
+    assert_equals(found, ('b0', groups['b']))
+    assert_true(share._shares['a'].active)
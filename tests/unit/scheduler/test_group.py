@@ -48,21 +48,20 @@ class _Scheduler(object):
     just_me = id(_group)
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util', name='util')
-def test_group_init(job_queue, util):
+@_test.patch(_group, '_policy', name='policy')
+def test_group_init(policy):
     """ Group initializes properly """
     scheduler = _Scheduler()
-    util.QueuedJob = 'laber'
     queue = []
-    job_queue.JobQueue.side_effect = lambda x: queue
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
     group = _group.Group('foo', 'locks', scheduler)
 
     assert_equals(group.name, 'foo')
     assert_equals(group._locks, 'locks')
+    assert_true(group.policy is policy.PriorityPolicy())
     assert_true(queue is group._queue)
-    assert_equals(map(tuple, job_queue.JobQueue.mock_calls), [
-        ('', ('laber',), {}),
+    assert_equals(map(tuple, policy.PriorityPolicy().queue.mock_calls), [
+        ('', (), {}),
     ])
     assert_equals(group._scheduler.just_me, scheduler.just_me)
     assert_false(group)
@@ -75,20 +74,27 @@ def test_group_init(job_queue, util):
         group._scheduler.just_me
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util')
-def test_group_schedule_false(job_queue):
+def test_group_init_policy():
+    """ Group lets the passed policy create the queue """
+    policy = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', _Scheduler(), policy=policy)
+
+    assert_true(group.policy is policy)
+    assert_true(group._queue is policy.queue())
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_schedule_false(policy):
     """ Group.schedule return false on locked jobs """
-    job_queue.JobQueue.side_effect = lambda x: None
+    policy.PriorityPolicy().queue.side_effect = lambda: None
     scheduler = _test.mock.MagicMock()
     group = _group.Group('foo', 'locks', scheduler)
 
     assert_false(group.schedule(_test.Bunch(locks_waiting=2)))
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util', name='util')
-def test_group_schedule_true(job_queue, util):
+@_test.patch(_group, '_policy', name='policy')
+def test_group_schedule_true(policy):
     """ Group.schedule return true on scheduled jobs """
     scheduler = _test.mock.MagicMock()
     locks = _test.mock.MagicMock()
@@ -98,9 +104,11 @@ def test_group_schedule_true(job_queue, util):
     job = _test.Bunch(locks_waiting=0, id=23)
     assert_true(group.schedule(job))
 
-    assert_equals(map(tuple, job_queue.mock_calls), [
-        ('JobQueue', (util.QueuedJob,), {}),
-        ('JobQueue().put', (job,), {}),
+    assert_equals(map(tuple, policy.mock_calls), [
+        ('PriorityPolicy', (), {}),
+        ('PriorityPolicy().queue', (), {}),
+        ('PriorityPolicy().queue().put', (job,), {}),
+        ('PriorityPolicy().enqueued', (job,), {}),
     ])
 
     assert_equals(map(tuple, scheduler.mock_calls), [
@@ -111,9 +119,8 @@ def test_group_schedule_true(job_queue, util):
     ])
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util', name='util')
-def test_group_schedule_assert(job_queue, util):
+@_test.patch(_group, '_policy', name='policy')
+def test_group_schedule_assert(policy):
     """ Group.schedule raises assertion error on inconsistent jobs """
     scheduler = _test.mock.MagicMock()
     locks = _test.mock.MagicMock()
@@ -124,8 +131,9 @@ def test_group_schedule_assert(job_queue, util):
     with assert_raises(AssertionError):
         group.schedule(job)
 
-    assert_equals(map(tuple, job_queue.mock_calls), [
-        ('JobQueue', (util.QueuedJob,), {}),
+    assert_equals(map(tuple, policy.mock_calls), [
+        ('PriorityPolicy', (), {}),
+        ('PriorityPolicy().queue', (), {}),
     ])
 
     assert_equals(map(tuple, scheduler.mock_calls), [
@@ -136,42 +144,39 @@ def test_group_schedule_assert(job_queue, util):
     ])
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util')
-def test_group_peek_empty(job_queue):
+@_test.patch(_group, '_policy', name='policy')
+def test_group_peek_empty(policy):
     """ Group.peek returns None if empty """
     queue = []
-    job_queue.JobQueue.side_effect = lambda x: queue
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
     scheduler = _test.mock.MagicMock()
     group = _group.Group('foo', 'locks', scheduler)
 
     assert_equals(group.peek(), None)
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util')
-def test_group_peek_something(job_queue):
+@_test.patch(_group, '_policy', name='policy')
+def test_group_peek_something(policy):
     """ Group.peek returns the tip if not empty """
     class queue(list):
         def peek(self):
             return self[0]
     queue = queue([4])
-    job_queue.JobQueue.side_effect = lambda x: queue
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
     scheduler = _test.mock.MagicMock()
     group = _group.Group('foo', 'locks', scheduler)
 
     assert_equals(group.peek(), 4)
 
 
-@_test.patch(_group, '_job_queue', name='job_queue')
-@_test.patch(_group, '_util')
-def test_group_get_something(job_queue):
+@_test.patch(_group, '_policy', name='policy')
+def test_group_get_something(policy):
     " Group.get extracts the tip if not empty, raises IndexError otherwise "
     class queue(list):
         def get(self):
             return self.pop(0)
     queue = queue([4, 5])
-    job_queue.JobQueue.side_effect = lambda x: queue
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
     scheduler = _test.mock.MagicMock()
     locks = _test.mock.MagicMock()
     group = _group.Group('foo', locks, scheduler)
@@ -191,3 +196,151 @@ def test_group_get_something(job_queue):
         ('del_group', ('foo',), {}),
         ('del_group', ('foo',), {}),
     ])
+    assert_equals(map(tuple, policy.PriorityPolicy().dequeued.mock_calls), [
+        ('', (4,), {}),
+        ('', (5,), {}),
+    ])
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_get_expected(policy):
+    """ Group.get only extracts the expected tip """
+    class queue(list):
+        def peek(self):
+            return self[0]
+
+        def get(self):
+            return self.pop(0)
+    queue = queue([4, 5])
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
+    scheduler = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', scheduler, threadsafe=True)
+
+    assert_equals(group.get(5), None)
+    assert_equals(queue, [4, 5])
+    assert_equals(group.get(4), 4)
+    assert_equals(queue, [5])
+    assert_equals(group.get(5), 5)
+    assert_equals(group.get(5), None)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('del_group', ('foo',), {}),
+        ('del_group', ('foo',), {}),
+    ])
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_put(policy):
+    """ Group.put queues without touching locks """
+    scheduler = _test.mock.MagicMock()
+    locks = _test.mock.MagicMock()
+    group = _group.Group('foo', locks, scheduler)
+
+    job = _test.Bunch(locks_waiting=1, id=23)
+    group.put(job)
+
+    assert_equals(map(tuple, policy.mock_calls), [
+        ('PriorityPolicy', (), {}),
+        ('PriorityPolicy().queue', (), {}),
+        ('PriorityPolicy().queue().put', (job,), {}),
+        ('PriorityPolicy().enqueued', (job,), {}),
+    ])
+    assert_equals(map(tuple, locks.mock_calls), [])
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_peek_acquirable(policy):
+    """ Group.peek selects acquirable jobs """
+    policy.PriorityPolicy().queue().select.side_effect = lambda x: x('job')
+    scheduler = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', scheduler)
+
+    assert_equals(group.peek(lambda job: 'ok(%s)' % job), 'ok(job)')
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_take(policy):
+    """ Group.take extracts jobs from anywhere """
+    class queue(list):
+        def remove(self, item):
+            list.remove(self, item)
+            return 'job%d' % item
+    queue = queue([4, 5])
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
+    scheduler = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', scheduler, threadsafe=True)
+
+    assert_equals(group.take(5), 'job5')
+    assert_equals(queue, [4])
+    assert_equals(map(tuple, scheduler.mock_calls), [])
+    assert_equals(group.take(5), None)
+    assert_equals(group.take(4), 'job4')
+    assert_equals(group.take(4), None)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('del_group', ('foo',), {}),
+        ('del_group', ('foo',), {}),
+    ])
+    assert_equals(map(tuple, policy.PriorityPolicy().dequeued.mock_calls), [
+        ('', ('job5',), {}),
+        ('', ('job4',), {}),
+    ])
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_reorder(policy):
+    """ Group.reorder asks the queue """
+    queue = policy.PriorityPolicy().queue()
+    queue.reorder.side_effect = [True, False]
+    scheduler = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', scheduler)
+
+    assert_true(group.reorder(_test.Bunch(id=3)))
+    assert_false(group.reorder(_test.Bunch(id=4)))
+    assert_equals(map(tuple, queue.reorder.mock_calls), [
+        ('', (3,), {}),
+        ('', (4,), {}),
+    ])
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_discard(policy):
+    """ Group.discard removes jobs by ID """
+    policy.PriorityPolicy().queue().discard.side_effect = ['job', None]
+    policy.PriorityPolicy().queue().__nonzero__.side_effect = [True, False]
+    scheduler = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', scheduler)
+
+    assert_equals(group.discard(3), 'job')
+    assert_equals(group.discard(4), None)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('del_group', ('foo',), {}),
+    ])
+    assert_equals(map(tuple, policy.PriorityPolicy().dequeued.mock_calls), [
+        ('', ('job',), {}),
+    ])
+
+
+@_test.patch(_group, '_policy', name='policy')
+def test_group_pick(policy):
+    """ Group.pick extracts jobs by ID """
+    class queue(list):
+        def discard(self, job_id):
+            if job_id not in self:
+                return None
+            self.remove(job_id)
+            return 'job%d' % job_id
+    queue = queue([4, 5])
+    policy.PriorityPolicy().queue.side_effect = lambda: queue
+    scheduler = _test.mock.MagicMock()
+    group = _group.Group('foo', 'locks', scheduler, threadsafe=True)
+
+    assert_equals(group.pick(5), 'job5')
+    assert_equals(group.pick(5), None)
+    assert_equals(map(tuple, scheduler.mock_calls), [])
+    assert_equals(group.pick(4), 'job4')
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('del_group', ('foo',), {}),
+    ])
+    assert_equals(map(tuple, policy.PriorityPolicy().dequeued.mock_calls), [
+        ('', ('job5',), {}),
+        ('', ('job4',), {}),
+    ])
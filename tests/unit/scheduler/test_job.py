@@ -34,7 +34,7 @@ __docformat__ = "restructuredtext en"
 import itertools as _it
 import operator as _op
 
-from nose.tools import assert_equals, assert_raises
+from nose.tools import assert_equals, assert_raises, assert_true
 
 from ... import _util as _test
 
@@ -68,15 +68,24 @@ def test_job_init(lock):
 
     job = _job.Job(2, "DESC", "GROUP", "LK", 3, 10, "EXTRA", [1], "ATT")
 
+    timeline = job.__dict__.pop('timeline')
+    assert_true(isinstance(timeline, _job._timeline.Timeline))
     assert_equals(job.__dict__, {
         'attempts': 'ATT',
+        'bottom_level': None,
+        'dedup_key': None,
+        'deadline': None,
+        'dependents': 0,
         'desc': 'DESC',
+        'expected_runtime': None,
         'extra': 'EXTRA',
         'group': 'GROUP',
         'id': 2,
         'importance': 3,
+        'inherited': None,
         'locks': ['L', 'K'],
         'locks_waiting': None,
+        'not_after': None,
         'not_before': 10,
         'predecessors': set([1]),
         'predecessors_waiting': None,
@@ -133,7 +142,7 @@ def test_job_from_todo(gen_id, job_class):
 
     todo = _test.Bunch(
         desc="lalala", group="baz", locks=["foo", "bar"], importance=18,
-        not_before=10
+        not_before=10, dedup_key='KEY', not_after=20,
     )
 
     job = _job.job_from_todo(todo)
@@ -143,7 +152,8 @@ def test_job_from_todo(gen_id, job_class):
         ('', (), {}),
     ])
     assert_equals(map(tuple, job_class.mock_calls), [(
-        '', (23, 'lalala', 'baz', ['foo', 'bar'], 18, 10, {}, set([]), []), {}
+        '', (23, 'lalala', 'baz', ['foo', 'bar'], 18, 10, {}, set([]), [],
+             'KEY', 20), {}
     )])
 
 
@@ -256,6 +266,41 @@ def test_joblist_from_todo_dag(job_factory):
     ])
 
 
+@_test.patch(_job, 'bottom_levels', name='bottom_levels')
+@_test.patch(_job, 'job_from_todo', name='job_factory')
+@_test.patch(_job, '_lock')
+def test_joblist_from_todo_runtime(bottom_levels, job_factory):
+    """ joblist_from_todo computes bottom levels, if asked to """
+    job_factory.side_effect = lambda x: _test.Bunch(t=x, id=20)
+    todo = _test.Bunch(predecessors=lambda: (), successors=lambda: ())
+
+    jobs = _job.joblist_from_todo(todo)
+    assert_equals(bottom_levels.mock_calls, [])
+
+    jobs = _job.joblist_from_todo(todo, 'RUNTIME')
+    assert_equals(map(tuple, bottom_levels.mock_calls), [
+        ('', (jobs, 'RUNTIME'), {}),
+    ])
+
+
+def test_bottom_levels():
+    """ bottom_levels computes the longest paths to the sinks """
+    def job(job_id, *predecessors):
+        return _test.Bunch(
+            id=job_id, predecessors=set(predecessors), bottom_level=None,
+            desc=_test.Bunch(name='slow' if job_id == 22 else 'fast'),
+        )
+
+    # 20 -> 21 -> 23, 20 -> 22 -> 23, 21 -> 24; 1 is outside
+    jobs = [job(20, 1), job(21, 20), job(22, 20), job(23, 21, 22),
+            job(24, 21)]
+    _job.bottom_levels(jobs, lambda x: {'slow': 10.0}.get(x.desc.name, 1.0))
+
+    assert_equals(map(_op.attrgetter('id', 'bottom_level'), jobs), [
+        (20, 12.0), (21, 2.0), (22, 11.0), (23, 1.0), (24, 1.0),
+    ])
+
+
 @_test.patch(_job, 'job_from_todo', name='job_factory')
 @_test.patch(_job, '_lock')
 def test_joblist_from_todo_cycle(job_factory):
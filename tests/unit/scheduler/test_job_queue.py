@@ -122,3 +122,187 @@ def test_job_queue_iter():
         (2, [1], [1]),
         (1, [], []),
     ])
+
+
+def test_job_queue_select():
+    """ Job queue selects in queue order """
+    queue = _job_queue.JobQueue(Wrapper)
+    assert_equals(queue.select(lambda job: True), None)
+
+    for job_id in (4, 9, 2, 7, 5, 8):
+        queue.put(_test.Bunch(id=job_id))
+
+    seen = []
+
+    def odd(job):
+        seen.append(job.id)
+        return job.id % 2
+
+    assert_equals(queue.select(odd).job.id, 9)
+    assert_equals(queue.select(lambda job: job.id < 5).job.id, 4)
+    assert_equals(seen, [9])
+    assert_equals(len(queue), 6)
+
+
+def test_job_queue_remove():
+    """ Job queue removes items from anywhere """
+    queue = _job_queue.JobQueue(Wrapper)
+    for job_id in (4, 9, 2, 7, 5, 8):
+        queue.put(_test.Bunch(id=job_id))
+
+    item = queue.select(lambda job: job.id == 5)
+    assert_equals(queue.remove(item).id, 5)
+    assert_false(5 in queue)
+    with assert_raises(ValueError):
+        queue.remove(item)
+
+    last = queue._queue[-1]
+    assert_equals(queue.remove(last).id, last.job.id)
+
+    assert_equals([job.id for job in queue], [
+        job_id for job_id in (9, 8, 7, 4, 2) if job_id != last.job.id
+    ])
+
+
+def test_job_queue_reorder():
+    """ Job queue restores the order after changes """
+
+    class Ordered(object):
+        def __init__(self, job):
+            self.job, self.order = job, job.order
+
+        def __lt__(self, other):
+            return self.order < other.order
+
+    queue = _job_queue.JobQueue(Ordered)
+    jobs = [_test.Bunch(id=job_id, order=job_id) for job_id in (4, 9, 2, 7)]
+    for job in jobs:
+        queue.put(job)
+
+    assert_false(queue.reorder(5))
+    jobs[1].order = 1
+    assert_true(queue.reorder(9))
+    assert_equals(queue.peek().job.id, 9)
+    jobs[1].order = 8
+    assert_true(queue.reorder(9))
+    assert_equals([job.id for job in queue], [2, 4, 7, 9])
+    assert_equals(queue._ids, {})
+
+
+def test_job_queue_discard():
+    """ Job queue removes jobs by ID and keeps its index consistent """
+    queue = _job_queue.JobQueue(Wrapper)
+    for job_id in xrange(1, 101):
+        queue.put(_test.Bunch(id=job_id))
+
+    assert_equals(queue.discard(200), None)
+    for job_id in xrange(3, 101, 3):
+        assert_equals(queue.discard(job_id).id, job_id)
+        for idx, item in enumerate(queue._queue):
+            assert_equals(queue._ids[item.job.id], idx)
+    assert_false(3 in queue)
+    assert_equals(queue.discard(3), None)
+
+    assert_equals([job.id for job in queue], [
+        job_id for job_id in xrange(100, 0, -1) if job_id % 3
+    ])
+
+
+class Leveled(object):
+    """ Test wrapper for the bucket queue """
+
+    def __init__(self, job):
+        self.job, self.importance = job, job.importance
+
+
+def _leveled(job_id, importance=0):
+    return _test.Bunch(id=job_id, importance=importance)
+
+
+def test_bucket_queue_empty():
+    """ Bucket queue starts empty and shows it """
+    queue = _job_queue.BucketQueue(Leveled, -1, 1)
+
+    assert_equals(len(queue._buckets), 3)
+    assert_false(queue)
+    assert_equals(len(queue), 0)
+    assert_false(1 in queue)
+    with assert_raises(IndexError):
+        queue.peek()
+    with assert_raises(IndexError):
+        queue.get()
+    assert_equals(queue.select(lambda job: True), None)
+
+    with assert_raises(ValueError):
+        _job_queue.BucketQueue(Leveled, 1, 0)
+
+
+def test_bucket_queue_order():
+    """ Bucket queue orders by importance, then by ID """
+    queue = _job_queue.BucketQueue(Leveled, -2, 2)
+    for job_id, importance in ((5, 0), (2, 0), (3, 1), (9, -1), (1, 0),
+                               (7, 1), (4, 0), (8, 5), (6, -7)):
+        queue.put(_leveled(job_id, importance))
+
+    assert_equals(len(queue), 9)
+    assert_true(4 in queue)
+    assert_equals(queue._occupied, 0b11111)
+    assert_equals(queue.peek().job.id, 8)
+    assert_equals([job.id for job in queue], [8, 3, 7, 1, 2, 4, 5, 9, 6])
+    assert_false(queue)
+    assert_equals(queue._occupied, 0)
+
+
+def test_bucket_queue_select():
+    """ Bucket queue finds the first matching job in queue order """
+    queue = _job_queue.BucketQueue(Leveled, 0, 3)
+    for job_id, importance in ((1, 0), (2, 3), (3, 1), (4, 3)):
+        queue.put(_leveled(job_id, importance))
+
+    assert_equals(queue.select(lambda job: job.id < 4).job.id, 2)
+    assert_equals(queue.select(lambda job: job.importance < 3).job.id, 3)
+    assert_equals(queue.select(lambda job: False), None)
+
+    assert_equals(queue.remove(queue.select(lambda job: job.id == 3)).id, 3)
+    with assert_raises(ValueError):
+        queue.remove(Leveled(_leveled(3, 1)))
+    assert_equals(queue.select(lambda job: job.importance < 3).job.id, 1)
+    assert_equals([job.id for job in queue], [2, 4, 1])
+
+
+def test_bucket_queue_reorder_discard():
+    """ Bucket queue moves and removes jobs lazily """
+    queue = _job_queue.BucketQueue(Leveled, 0, 2)
+    jobs = [_leveled(job_id) for job_id in xrange(1, 6)]
+    for job in jobs:
+        queue.put(job)
+
+    assert_false(queue.reorder(9))
+    jobs[3].importance = 2
+    assert_true(queue.reorder(4))
+    assert_equals(queue.peek().job.id, 4)
+    assert_equals(queue.discard(2).id, 2)
+    assert_equals(queue.discard(2), None)
+    assert_false(2 in queue)
+    assert_equals(len(queue), 4)
+    assert_equals(queue._stale, 2)
+
+    assert_equals([job.id for job in queue], [4, 1, 3, 5])
+    assert_equals(queue._stale, 0)
+    assert_equals(queue._ids, {})
+
+
+def test_bucket_queue_compact():
+    """ Bucket queue drops stale entries, if they outnumber the live ones """
+    queue = _job_queue.BucketQueue(Leveled, 0, 0)
+    for job_id in xrange(1, 201):
+        queue.put(_leveled(job_id))
+    for job_id in xrange(1, 201, 2):
+        queue.discard(job_id)
+    assert_equals(len(queue._buckets[0]), 200)
+
+    for job_id in xrange(2, 68, 2):
+        queue.discard(job_id)
+    assert_equals(queue._stale, 0)
+    assert_equals(len(queue._buckets[0]), 67)
+    assert_equals([job.id for job in queue], range(68, 201, 2))
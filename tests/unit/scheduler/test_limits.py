@@ -0,0 +1,131 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+===================================
+ Tests for wolfe.scheduler._limits
+===================================
+
+Tests for wolfe.scheduler._limits.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_false, assert_raises, assert_true
+from ... import _util as _test
+
+from wolfe.scheduler import _limits
+
+# pylint: disable = protected-access
+
+
+def _job(job_id, group, name):
+    """ Create job dummy """
+    return _test.Bunch(id=job_id, group=group, desc=_test.Bunch(name=name))
+
+
+def test_admission_init():
+    """ Admission sets up the configured limits only """
+    admission = _limits.Admission()
+    assert_true(admission.fair_share is None)
+    assert_true(admission.expired_group is None)
+    assert_false(admission.limits_names)
+    assert_false(admission.blocked('a'))
+    assert_equals(admission.due(), [])
+    assert_equals(admission.ready_at(['a']), None)
+
+    admission = _limits.Admission(_limits.Limits(
+        weights={'a': 2}, names={'x': 1}, rates={'a': 5},
+        expired_group='late',
+    ))
+    assert_true(admission.fair_share is not None)
+    assert_equals(admission.expired_group, 'late')
+    assert_true(admission.limits_names)
+    assert_true(admission.ready_at(['a']) is not None)
+    assert_equals(admission.ready_at(['b']), None)
+
+    with assert_raises(ValueError):
+        _limits.Admission(_limits.Limits(rates={'a': 0}))
+
+
+def test_admission_limits():
+    """ Admission admits executed jobs within the group and name limits """
+    admission = _limits.Admission(_limits.Limits(
+        groups={'a': 2}, names={'x': 1}
+    ))
+    job1 = _job(1, 'a', 'y')
+    job2 = _job(2, 'a', 'x')
+    job3 = _job(3, 'a', 'y')
+    job4 = _job(4, 'b', 'x')
+
+    assert_true(admission.admit(job1))
+    assert_true(admission.admit(job2))
+    assert_true(admission.blocked('a'))
+    assert_false(admission.blocked('b'))
+    assert_false(admission.admit(job3))
+    assert_false(admission.name_open(job4))
+    assert_false(admission.admit(job4))
+    assert_equals(admission._running_groups, {'a': 2})
+    assert_equals(admission._running_names, {'x': 1, 'y': 1})
+
+    assert_true(admission.dismiss(job2))
+    assert_true(admission.name_open(job4))
+    assert_true(admission.admit(job4))
+    assert_false(admission.dismiss(job4))
+    assert_false(admission.dismiss(job1))
+    assert_equals(admission._running_groups, {})
+    assert_equals(admission._running_names, {})
+
+
+def test_admission_rates():
+    """ Admission takes and refunds rate limit tokens """
+    admission = _limits.Admission(_limits.Limits(rates={'a': (1, 1)}))
+    job = _job(1, 'a', 'x')
+
+    assert_true(admission.admit(job))
+    assert_false(admission.dismiss(job, refund=True))
+    assert_true(admission.admit(job))
+    admission.dismiss(job)
+    assert_false(admission.admit(job))
+    assert_true(admission.blocked('a'))
+
+
+def test_admission_activate():
+    """ Admission announces unblocked groups to the fair share dispatcher """
+    admission = _limits.Admission(_limits.Limits(
+        weights={}, groups={'a': 1}
+    ))
+    activated = []
+    admission.fair_share = _test.Bunch(
+        activate=lambda name, group: activated.append((name, group))
+    )
+
+    admission.activate('a', 'A')
+    assert_true(admission.admit(_job(1, 'a', 'x')))
+    admission.activate('a', 'A')
+    admission.activate('b', 'B')
+    assert_equals(activated, [('a', 'A'), ('b', 'B')])
+
+    admission = _limits.Admission()
+    admission.activate('a', 'A')
@@ -36,6 +36,7 @@ import collections as _collections
 from nose.tools import assert_equals, assert_raises, assert_false, assert_true
 from ... import _util as _test
 
+from wolfe import _lock as _wolfe_lock
 from wolfe.scheduler import _locks
 
 
@@ -51,8 +52,21 @@ class _Scheduler(object):
 
 
 def _lock(name, exclusive=True):
-    """ Create lock dummy """
-    return _test.Bunch(**locals())
+    """ Create lock """
+    return _wolfe_lock.Lock(name, exclusive)
+
+
+def _names(mapping):
+    """ Map lock IDs back to names """
+    return dict(
+        (_wolfe_lock.REGISTRY.name(key), value)
+        for key, value in mapping.items()
+    )
+
+
+def _job(importance=0, inherited=None, **kwargs):
+    """ Create job dummy """
+    return _test.Bunch(importance=importance, inherited=inherited, **kwargs)
 
 
 def test_locks_init():
@@ -66,6 +80,8 @@ def test_locks_init():
     assert_equals(locks._waiting.default_factory, set)
     assert_equals(type(locks._free), _collections.defaultdict)
     assert_equals(locks._free.default_factory, set)
+    assert_false(locks.deferred)
+    assert_true(_locks.Locks(scheduler, deferred=1).deferred is True)
 
     # scheduler should be weakref'd. Test that by deleting our reference:
     del scheduler
@@ -76,17 +92,18 @@ def test_locks_init():
 def test_locks_enter():
     """ Locks.enter enters locks properly """
     scheduler = _test.mock.MagicMock()
-    job = _test.Bunch(locks=(_lock('foo'), _lock('bar')), id=42)
+    job = _job(locks=(_lock('foo'), _lock('bar')), id=42)
 
     locks = _locks.Locks(scheduler)
-    locks._acquired['foo'] = 1
+    locks._acquired[_lock('foo').id] = 1
+    locks._index.hold('foo', 1)
 
     locks.enter(job)
 
     assert_equals(job.locks_waiting, 1)
-    assert_equals(locks._waiting, {'foo': set([42])})
-    assert_equals(locks._free, {'bar': set([42])})
-    assert_equals(locks._acquired, {'foo': 1})
+    assert_equals(_names(locks._waiting), {'foo': set([42])})
+    assert_equals(_names(locks._free), {'bar': set([42])})
+    assert_equals(_names(locks._acquired), {'foo': 1})
 
 
 def test_locks_acquire_false():
@@ -102,41 +119,47 @@ def test_locks_acquire_false():
 def test_locks_acquire_true():
     """ Locks.acquire acquires locks properly """
     scheduler = _test.mock.MagicMock()
-    job = _test.Bunch(id=24, locks=(_lock('foo'), _lock('bar')))
-    job2 = _test.Bunch(id=25, locks=(_lock('foo'),))
+    job = _job(id=24, locks=(_lock('foo'), _lock('bar')))
+    job2 = _job(id=25, locks=(_lock('foo'),))
     scheduler.jobs = {24: job, 25: job2}
 
+    baz = _lock('baz')
     locks = _locks.Locks(scheduler)
-    locks._acquired['baz'] = 2
+    locks._acquired[baz.id] = 2
+    locks._index.hold('baz', 2)
     locks.enter(job)
     locks.enter(job2)
 
     assert_equals(job.locks_waiting, 0)
     assert_equals(job2.locks_waiting, 0)
-    assert_equals(locks._waiting, {})
-    assert_equals(locks._free, {'foo': set([24, 25]), 'bar': set([24])})
-    assert_equals(locks._acquired, {'baz': 2})
+    assert_equals(_names(locks._waiting), {})
+    assert_equals(_names(locks._free), {
+        'foo': set([24, 25]), 'bar': set([24]),
+    })
+    assert_equals(_names(locks._acquired), {'baz': 2})
 
     assert_true(locks.acquire(job))
 
     assert_equals(job.locks_waiting, 0)
     assert_equals(job2.locks_waiting, 1)
-    assert_equals(locks._waiting, {'foo': set([25])})
-    assert_equals(locks._free, {})
-    assert_equals(locks._acquired, {'baz': 2, 'foo': 24, 'bar': 24})
+    assert_equals(_names(locks._waiting), {'foo': set([25])})
+    assert_equals(_names(locks._free), {})
+    assert_equals(_names(locks._acquired), {'baz': 2, 'foo': 24, 'bar': 24})
 
 
 def test_locks_release():
     """ Locks.release releases locks properly """
     scheduler = _test.mock.MagicMock()
 
-    job = _test.Bunch(id=24, locks=(_lock('foo'), _lock('bar')))
-    job2 = _test.Bunch(id=25, locks=(_lock('foo'),))
-    job3 = _test.Bunch(id=26, locks=(_lock('bar'), _lock('zonk')))
+    job = _job(id=24, locks=(_lock('foo'), _lock('bar')))
+    job2 = _job(id=25, locks=(_lock('foo'),))
+    job3 = _job(id=26, locks=(_lock('bar'), _lock('zonk')))
     scheduler.jobs = {24: job, 25: job2, 26: job3}
 
+    baz = _lock('baz')
     locks = _locks.Locks(scheduler)
-    locks._acquired['baz'] = 3
+    locks._acquired[baz.id] = 3
+    locks._index.hold('baz', 3)
     locks.enter(job)
     locks.enter(job2)
     locks.enter(job3)
@@ -144,13 +167,13 @@ def test_locks_release():
     assert_equals(job.locks_waiting, 0)
     assert_equals(job2.locks_waiting, 0)
     assert_equals(job3.locks_waiting, 0)
-    assert_equals(locks._waiting, {})
-    assert_equals(locks._free, {
+    assert_equals(_names(locks._waiting), {})
+    assert_equals(_names(locks._free), {
         'foo': set([24, 25]),
         'bar': set([24, 26]),
         'zonk': set([26]),
     })
-    assert_equals(locks._acquired, {'baz': 3})
+    assert_equals(_names(locks._acquired), {'baz': 3})
 
     assert_true(locks.acquire(job2))
     assert_true(locks.acquire(job3))
@@ -158,9 +181,9 @@ def test_locks_release():
     assert_equals(job.locks_waiting, 2)
     assert_equals(job2.locks_waiting, 0)
     assert_equals(job3.locks_waiting, 0)
-    assert_equals(locks._waiting, {'foo': set([24]), 'bar': set([24])})
-    assert_equals(locks._free, {})
-    assert_equals(locks._acquired, {
+    assert_equals(_names(locks._waiting), {'foo': set([24]), 'bar': set([24])})
+    assert_equals(_names(locks._free), {})
+    assert_equals(_names(locks._acquired), {
         'baz': 3,
         'foo': 25,
         'bar': 26,
@@ -172,15 +195,290 @@ def test_locks_release():
     assert_equals(job.locks_waiting, 1)
     assert_equals(job2.locks_waiting, 0)
     assert_equals(job3.locks_waiting, 0)
-    assert_equals(locks._waiting, {'bar': set([24])})
-    assert_equals(locks._free, {'foo': set([24])})
-    assert_equals(locks._acquired, {'baz': 3, 'bar': 26, 'zonk': 26})
+    assert_equals(_names(locks._waiting), {'bar': set([24])})
+    assert_equals(_names(locks._free), {'foo': set([24])})
+    assert_equals(_names(locks._acquired), {'baz': 3, 'bar': 26, 'zonk': 26})
 
     assert_equals(locks.release(job3), [job])
 
     assert_equals(job.locks_waiting, 0)
     assert_equals(job2.locks_waiting, 0)
     assert_equals(job3.locks_waiting, 0)
-    assert_equals(locks._waiting, {})
-    assert_equals(locks._free, {'foo': set([24]), 'bar': set([24])})
-    assert_equals(locks._acquired, {'baz': 3})
+    assert_equals(_names(locks._waiting), {})
+    assert_equals(_names(locks._free), {'foo': set([24]), 'bar': set([24])})
+    assert_equals(_names(locks._acquired), {'baz': 3})
+
+
+def test_locks_is_free():
+    """ Locks.is_free detects acquirable jobs """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('foo'), _lock('bar')))
+    job2 = _job(id=25, locks=(_lock('foo'),))
+    job3 = _job(id=26, locks=())
+    scheduler.jobs = {24: job, 25: job2, 26: job3}
+
+    locks = _locks.Locks(scheduler, threadsafe=True)
+    locks.enter(job)
+    locks.enter(job2)
+    locks.enter(job3)
+
+    assert_true(locks.is_free(job))
+    assert_true(locks.is_free(job2))
+    assert_true(locks.is_free(job3))
+
+    assert_true(locks.acquire(job))
+    assert_false(locks.is_free(job))
+    assert_false(locks.is_free(job2))
+
+    assert_equals(locks.release(job), [job2])
+    assert_false(locks.is_free(job))
+    assert_true(locks.is_free(job2))
+
+
+def test_locks_profile():
+    """ Locks reports to the contention profiler """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('foo'),))
+    job2 = _job(id=25, locks=(_lock('foo'), _lock('bar')))
+    scheduler.jobs = {24: job, 25: job2}
+
+    profiler = _test.mock.MagicMock()
+    profiler.enabled = True
+    locks = _locks.Locks(scheduler, profiler=profiler)
+    locks.enter(job)
+    assert_true(locks.acquire(job))
+    locks.enter(job2)
+    assert_equals(locks.release(job), [job2])
+    assert_true(locks.acquire(job2))
+    assert_equals(locks.release(job2), [])
+
+    assert_equals(map(tuple, profiler.mock_calls), [
+        ('entered', ('foo', 24, 0), {}),
+        ('acquired', ('foo', 24), {}),
+        ('entered', ('foo', 25, 1), {}),
+        ('entered', ('bar', 25, 0), {}),
+        ('released', ('foo', 1), {}),
+        ('acquired', ('foo', 25), {}),
+        ('acquired', ('bar', 25), {}),
+        ('released', ('foo', 0), {}),
+        ('released', ('bar', 0), {}),
+    ])
+
+
+def test_locks_try_acquire():
+    """ Locks.try_acquire acquires all or nothing """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('foo'), _lock('bar')))
+    job2 = _job(id=25, locks=(_lock('bar'),))
+    job3 = _job(id=26, locks=())
+
+    locks = _locks.Locks(scheduler)
+    locks._acquired[_lock('foo').id] = 1
+    locks._index.hold('foo', 1)
+
+    assert_false(locks.is_available(job))
+    assert_true(locks.is_available(job2))
+    assert_true(locks.is_available(job3))
+
+    assert_false(locks.try_acquire(job))
+    assert_equals(_names(locks._acquired), {'foo': 1})
+    assert_true(locks.try_acquire(job2))
+    assert_true(locks.try_acquire(job3))
+    assert_equals(_names(locks._acquired), {'foo': 1, 'bar': 25})
+    assert_equals(_names(locks._waiting), {})
+    assert_equals(_names(locks._free), {})
+
+    job2.locks_waiting = 0
+    assert_equals(locks.release(job2), [])
+    assert_equals(_names(locks._acquired), {'foo': 1})
+
+
+def test_locks_inherit():
+    """ Locks passes importance on to lock holders """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('foo'), _lock('bar')), importance=1)
+    job2 = _job(id=25, locks=(_lock('foo'),), importance=5)
+    job3 = _job(id=26, locks=(_lock('bar'),), importance=3)
+    job4 = _job(id=27, locks=(_lock('foo'),), importance=7)
+    scheduler.jobs = {24: job, 25: job2, 26: job3, 27: job4}
+
+    locks = _locks.Locks(scheduler)
+    locks.enter(job)
+    locks.enter(job2)
+
+    # job2 waits for job, which is not queued yet
+    assert_true(locks.acquire(job))
+    assert_equals(job.inherited, 5)
+    assert_equals(map(tuple, scheduler.mock_calls), [])
+
+    # job3 has less importance than inherited already
+    locks.enter(job3)
+    assert_equals(job.inherited, 5)
+    assert_equals(map(tuple, scheduler.mock_calls), [])
+
+    # job4 raises it further and the queue is reordered
+    locks.enter(job4)
+    assert_equals(job.inherited, 7)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('reorder', (job,), {}),
+    ])
+
+    locks.release(job)
+    assert_equals(job.inherited, None)
+
+
+def test_locks_hierarchy():
+    """ Locks conflict with ancestors and descendants """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('db/a'),))
+    job2 = _job(id=25, locks=(_lock('db'),))
+    job3 = _job(id=26, locks=(_lock('db/a/1'), _lock('x')))
+    job4 = _job(id=27, locks=(_lock('db/b'),))
+    scheduler.jobs = {24: job, 25: job2, 26: job3, 27: job4}
+
+    locks = _locks.Locks(scheduler)
+    for item in (job, job2, job3, job4):
+        locks.enter(item)
+    assert_equals(_names(locks._free), {
+        'db/a': set([24]), 'db': set([25]), 'db/a/1': set([26]),
+        'x': set([26]), 'db/b': set([27]),
+    })
+
+    assert_true(locks.acquire(job))
+    assert_equals(job2.locks_waiting, 1)
+    assert_equals(job3.locks_waiting, 1)
+    assert_equals(job4.locks_waiting, 0)
+    assert_equals(_names(locks._waiting), {
+        'db': set([25]), 'db/a/1': set([26]),
+    })
+    assert_equals(_names(locks._free), {'x': set([26]), 'db/b': set([27])})
+
+    assert_true(locks.acquire(job4))
+    assert_equals(job2.locks_waiting, 1)
+
+    assert_equals(sorted(locks.release(job)), [job3])
+    assert_equals(job2.locks_waiting, 1)
+    assert_equals(_names(locks._waiting), {'db': set([25])})
+
+    assert_equals(locks.release(job4), [job2])
+    assert_equals(_names(locks._waiting), {})
+    assert_equals(_names(locks._free), {
+        'db': set([25]), 'db/a/1': set([26]), 'x': set([26]),
+    })
+    assert_true(locks.is_available(job2))
+    assert_true(locks.acquire(job2))
+    assert_false(locks.is_available(job3))
+
+
+def test_locks_withdraw():
+    """ Locks.withdraw removes entered locks """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('foo'), _lock('bar')))
+    job2 = _job(id=25, locks=(_lock('foo'),))
+    scheduler.jobs = {24: job, 25: job2}
+
+    profiler = _test.mock.MagicMock()
+    profiler.enabled = True
+    locks = _locks.Locks(scheduler, profiler=profiler)
+    locks.enter(job)
+    locks.enter(job2)
+    assert_true(locks.acquire(job2))
+    assert_equals(job.locks_waiting, 1)
+
+    assert_true(locks.withdraw(job))
+    assert_false(locks.withdraw(job))
+    assert_equals(job.locks_waiting, None)
+    assert_equals(_names(locks._waiting), {})
+    assert_equals(_names(locks._free), {})
+    assert_equals(locks.release(job2), [])
+    assert_equals(locks._index._root, {})
+    assert_equals([call for call in map(tuple, profiler.mock_calls)
+                   if call[0] == 'forget'], [
+        ('forget', ('foo', 24), {}),
+        ('forget', ('bar', 24), {}),
+    ])
+
+
+def test_locks_reprioritize():
+    """ Locks.reprioritize passes raised importance on to holders """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('db/a'),), importance=1)
+    job2 = _job(id=25, locks=(_lock('db'),), importance=1)
+    job3 = _job(id=26, locks=(_lock('x'),), importance=1)
+    scheduler.jobs = {24: job, 25: job2, 26: job3}
+
+    locks = _locks.Locks(scheduler)
+    locks.enter(job)
+    assert_true(locks.acquire(job))
+    locks.enter(job2)
+    locks.enter(job3)
+    assert_equals(job.inherited, None)
+
+    job2.importance = 5
+    locks.reprioritize(job2)
+    job3.importance = 9
+    locks.reprioritize(job3)
+    assert_equals(job.inherited, 5)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('reorder', (job,), {}),
+    ])
+
+
+def test_locks_reprioritize_lower():
+    """ Locks.reprioritize lowers the inherited importance again """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('db'),), importance=1)
+    job2 = _job(id=25, locks=(_lock('db/a'),), importance=7)
+    job3 = _job(id=26, locks=(_lock('db/b'),), importance=4)
+    scheduler.jobs = {24: job, 25: job2, 26: job3}
+
+    locks = _locks.Locks(scheduler)
+    locks.enter(job)
+    assert_true(locks.acquire(job))
+    locks.enter(job2)
+    locks.enter(job3)
+    assert_equals(job.inherited, 7)
+
+    job2.importance = 2
+    locks.reprioritize(job2)
+    assert_equals(job.inherited, 4)
+
+    job3.importance = 0
+    locks.reprioritize(job3)
+    assert_equals(job.inherited, 2)
+
+    job2.importance = 1
+    locks.reprioritize(job2)
+    assert_equals(job.inherited, None)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('reorder', (job,), {}),
+        ('reorder', (job,), {}),
+        ('reorder', (job,), {}),
+        ('reorder', (job,), {}),
+    ])
+
+
+def test_locks_withdraw_inherited():
+    """ Locks.withdraw lowers the importance inherited from the job """
+    scheduler = _test.mock.MagicMock()
+    job = _job(id=24, locks=(_lock('foo'),), importance=1)
+    job2 = _job(id=25, locks=(_lock('foo'),), importance=7)
+    job3 = _job(id=26, locks=(_lock('foo'),), importance=3)
+    scheduler.jobs = {24: job, 25: job2, 26: job3}
+
+    locks = _locks.Locks(scheduler)
+    locks.enter(job)
+    assert_true(locks.acquire(job))
+    locks.enter(job2)
+    locks.enter(job3)
+    assert_equals(job.inherited, 7)
+
+    assert_true(locks.withdraw(job2))
+    assert_equals(job.inherited, 3)
+    assert_true(locks.withdraw(job3))
+    assert_equals(job.inherited, None)
+    assert_equals(map(tuple, scheduler.mock_calls), [
+        ('reorder', (job,), {}),
+        ('reorder', (job,), {}),
+        ('reorder', (job,), {}),
+    ])
@@ -0,0 +1,76 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+====================================
+ Tests for wolfe.scheduler._pending
+====================================
+
+Tests for wolfe.scheduler._pending.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+
+from nose.tools import assert_equals, assert_true
+from ... import _util as _test
+
+from wolfe.scheduler import _pending
+
+# pylint: disable = protected-access
+
+
+def _job(job_id, key):
+    """ Create job dummy """
+    return _test.Bunch(id=job_id, dedup_key=key)
+
+
+def test_pending_find():
+    """ Pending.find enters new jobs and merges duplicates """
+    entered, merged = [], []
+    pending = _pending.Pending()
+    job1, job2, job3 = _job(1, 'a'), _job(2, 'a'), _job(3, 'b')
+
+    for job in (job1, job2, job3):
+        pending.find(job, entered.append, lambda *args: merged.append(args))
+    assert_equals(entered, [job1, job3])
+    assert_equals(merged, [(job1, job2)])
+    assert_equals(pending._jobs, {'a': job1, 'b': job3})
+
+    pending = _pending.Pending(merge=False)
+    assert_true(pending.find(job1, entered.append, None) is None)
+    assert_true(pending.find(job2, None, None) is job1)
+
+
+def test_pending_discard():
+    """ Pending.discard forgets the pending job only """
+    pending = _pending.Pending(threadsafe=True)
+    job1, job2 = _job(1, 'a'), _job(2, 'a')
+    pending.find(job1, lambda job: None, None)
+
+    pending.discard(job2)
+    pending.discard(_job(3, None))
+    assert_equals(pending._jobs, {'a': job1})
+    pending.discard(job1)
+    assert_equals(pending._jobs, {})
@@ -0,0 +1,170 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+===================================
+ Tests for wolfe.scheduler._policy
+===================================
+
+Tests for wolfe.scheduler._policy.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_false, assert_raises, assert_true
+from ... import _util as _test
+
+from wolfe import interfaces as _interfaces
+from wolfe.scheduler import _policy
+
+# pylint: disable = protected-access
+# pylint: disable = missing-docstring
+
+
+def _job(job_id, **kwargs):
+    """ Create job dummy """
+    kwargs.setdefault('importance', 0)
+    kwargs.setdefault('inherited', None)
+    return _test.Bunch(id=job_id, **kwargs)
+
+
+def _order(policy, *jobs):
+    """ Put jobs into a policy's queue and get them out again """
+    queue = policy.queue()
+    for job in jobs:
+        queue.put(job)
+    return [queue.get().id for _ in jobs]
+
+
+def test_policy_interface():
+    """ Built-in policies implement the interface """
+    for policy in (_policy.FifoPolicy(), _policy.PriorityPolicy(),
+                   _policy.AgingPolicy(1), _policy.DeadlinePolicy(),
+                   _policy.CriticalPathPolicy(), _policy.DependentsPolicy()):
+        assert_true(_interfaces.implements(
+            policy, _interfaces.SchedulingPolicyInterface
+        ))
+        job = _job(1)
+        policy.enqueued(job)
+        policy.dequeued(job)
+        policy.finished(job)
+
+
+def test_fifo_policy():
+    """ FifoPolicy ignores the importance """
+    assert_equals(_order(
+        _policy.FifoPolicy(), _job(3), _job(1, importance=-5),
+        _job(2, importance=5),
+    ), [1, 2, 3])
+
+
+@_test.patch(_policy, '_job_queue', name='job_queue')
+def test_priority_policy(job_queue):
+    """ PriorityPolicy uses a bucket queue for bounded importance ranges """
+    job_queue.JobQueue.side_effect = lambda x: ['QUEUE', x]
+    job_queue.BucketQueue.side_effect = lambda x, y, z: ['BUCKETS', x, y, z]
+
+    assert_equals(_policy.PriorityPolicy().queue(),
+                  ['QUEUE', _policy._util.QueuedJob])
+    assert_equals(_policy.PriorityPolicy([-2, 3]).queue(),
+                  ['BUCKETS', _policy._util.QueuedJob, -2, 3])
+
+
+def test_priority_policy_order():
+    """ PriorityPolicy orders by importance and then ID """
+    for policy in (_policy.PriorityPolicy(), _policy.PriorityPolicy((0, 9))):
+        assert_equals(_order(
+            policy, _job(3), _job(1), _job(2, importance=5),
+        ), [2, 1, 3])
+
+
+@_test.patch(_policy._util, '_timeline', name='timeline')
+def test_aging_policy(timeline):
+    """ AgingPolicy lets older jobs overtake more important ones """
+    timeline.monotonic.return_value = 100.0
+    old = _job(2, timeline=_test.Bunch(freed=0.0))
+    new = _job(1, importance=3, timeline=_test.Bunch(freed=90.0))
+    assert_equals(_order(_policy.AgingPolicy(10), old, new), [2, 1])
+    assert_equals(_order(_policy.AgingPolicy(60), old, new), [1, 2])
+
+    with assert_raises(ValueError):
+        _policy.AgingPolicy(0)
+
+
+def test_deadline_policy():
+    """ DeadlinePolicy orders by deadline """
+    assert_equals(_order(
+        _policy.DeadlinePolicy(), _job(1, deadline=None, importance=9),
+        _job(2, deadline=200), _job(3, deadline=100),
+    ), [3, 2, 1])
+
+
+def test_critical_path_policy():
+    """ CriticalPathPolicy orders by bottom level and estimates runtimes """
+    policy = _policy.CriticalPathPolicy({'slow': 60})
+    assert_equals(_order(
+        policy, _job(1, bottom_level=1.0), _job(2, bottom_level=5.0),
+    ), [2, 1])
+
+    def desc(name):
+        """ Create job dummy with a description name """
+        return _test.Bunch(desc=_test.Bunch(name=name))
+
+    assert_equals(policy.estimate(desc('slow')), 60)
+    assert_equals(policy.estimate(desc('fast')), 1.0)
+    assert_equals(policy.estimate(desc('fast'), 3.5), 3.5)
+
+
+def test_dependents_policy():
+    """ DependentsPolicy orders by the number of dependents """
+    assert_equals(_order(
+        _policy.DependentsPolicy(), _job(1, dependents=0),
+        _job(2, dependents=4),
+    ), [2, 1])
+
+
+def test_sept_policy():
+    """ SeptPolicy orders by expected runtime """
+    jobs = (
+        _job(1, expected_runtime=60.0), _job(2, expected_runtime=None),
+        _job(3, expected_runtime=2.0),
+        _job(4, expected_runtime=9.0, importance=1),
+    )
+    assert_equals(_order(_policy.SeptPolicy(), *jobs), [4, 2, 3, 1])
+    assert_equals(_order(_policy.SeptPolicy(30), *jobs), [4, 3, 2, 1])
+
+
+def test_policies():
+    """ Policies finds the group policies """
+    policies = _policy.Policies()
+    assert_equals(type(policies.get('x')), _policy.PriorityPolicy)
+    assert_false(policies.uses(_policy.CriticalPathPolicy))
+
+    fifo = _policy.FifoPolicy()
+    policies = _policy.Policies(fifo, {'b': _policy.CriticalPathPolicy()})
+    assert_true(policies.get('a') is fifo)
+    assert_equals(type(policies.get('b')), _policy.CriticalPathPolicy)
+    assert_true(policies.uses(_policy.CriticalPathPolicy))
+    assert_true(policies.uses(_policy.FifoPolicy))
+    assert_false(policies.uses(_policy.DependentsPolicy))
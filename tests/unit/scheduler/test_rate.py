@@ -0,0 +1,99 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+=================================
+ Tests for wolfe.scheduler._rate
+=================================
+
+Tests for wolfe.scheduler._rate.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_false, assert_raises, assert_true
+from ... import _util as _test
+
+from wolfe.scheduler import _rate
+
+# pylint: disable = protected-access
+# pylint: disable = missing-docstring
+
+
+def test_token_bucket():
+    """ TokenBucket refills over time up to the burst """
+    bucket = _rate.TokenBucket(4, 8, now=10.0)
+    assert_equals((bucket.rate, bucket.burst, bucket.tokens),
+                  (4.0, 8.0, 8.0))
+    assert_equals(sum(bucket.take(10.0) for _ in xrange(10)), 8)
+    assert_equals(bucket.ready_at(10.0), 10.25)
+    assert_false(bucket.take(10.125))
+    assert_true(bucket.take(10.25))
+
+    bucket.refund()
+    assert_true(bucket.take(10.25))
+    assert_equals(bucket.ready_at(20.0), 20.0)
+    assert_equals(bucket.tokens, 8.0)
+
+    assert_equals(_rate.TokenBucket(0.5, now=0.0).burst, 1.0)
+    with assert_raises(ValueError):
+        _rate.TokenBucket(0)
+    with assert_raises(ValueError):
+        _rate.TokenBucket(1, 0.5)
+
+
+@_test.patch(_rate, '_timeline', name='timeline')
+def test_rate_limits(timeline):
+    """ RateLimits block groups and tell when they are due """
+    timeline.monotonic.return_value = 0.0
+    limits = _rate.RateLimits({'api': (2, 1), 'other': 1})
+
+    assert_equals(sorted(limits._buckets), ['api', 'other'])
+    assert_equals(limits._buckets['other'].burst, 1.0)
+    assert_false(limits.blocked('api'))
+    assert_false(limits.blocked('free'))
+    assert_true(limits.take('free'))
+    assert_true(limits.take('api'))
+    assert_false(limits.take('api'))
+
+    assert_true(limits.blocked('api'))
+    assert_true(limits.blocked('api'))
+    assert_equals(limits._refills, [(0.5, 'api')])
+    assert_equals(limits.due(), [])
+    assert_equals(limits.ready_at(['free', 'api', 'other']), 0.0)
+    assert_equals(limits.ready_at(['free', 'api']), 0.5)
+    assert_equals(limits.ready_at(['free']), None)
+
+    timeline.monotonic.return_value = 0.25
+    limits.refund('api')
+    limits.refund('free')
+    assert_true(limits.take('api'))
+    assert_true(limits.blocked('api'))
+
+    timeline.monotonic.return_value = 0.5
+    assert_equals(limits.due(), ['api'])
+    assert_equals(limits.due(), [])
+    assert_equals(limits._blocked, set())
+    assert_true(limits.blocked('api'))
+    assert_equals(limits._refills, [(0.75, 'api')])
@@ -38,6 +38,7 @@ from nose.tools import assert_equals, assert_false, assert_true, assert_raises
 from ... import _util as _test
 
 from wolfe.scheduler import _scheduler
+from wolfe.scheduler import _timeline
 
 # pylint: disable = protected-access
 # pylint: disable = missing-docstring
@@ -45,6 +46,15 @@ from wolfe.scheduler import _scheduler
 # pylint: disable = no-self-use
 
 
+def _job(**kwargs):
+    """ Create job dummy """
+    kwargs.setdefault('dedup_key', None)
+    kwargs.setdefault('deadline', None)
+    kwargs.setdefault('group', 'default')
+    kwargs.setdefault('desc', _test.Bunch(name='desc'))
+    return _test.Bunch(timeline=_timeline.Timeline(), **kwargs)
+
+
 @_test.patch(_scheduler, '_locks', name='locks')
 @_test.patch(_scheduler, '_job_queue', name='job_queue')
 @_test.patch(_scheduler, '_util', name='util')
@@ -53,24 +63,69 @@ def test_scheduler_init(locks, job_queue, util, waiting):
     """ Scheduler properly initializes """
     util.DelayedJob = 'DELAYEDJOB'
     job_queue.JobQueue.side_effect = lambda x: ('JOBQUEUE', x)
-    locks.Locks.side_effect = lambda x: ('LOCKS', x)
-    waiting.Waiting.side_effect = lambda x: ('WAITING', x)
+    locks.Locks.side_effect = lambda x, y, m, p, d: ('LOCKS', x, y, d)
+    waiting.Waiting.side_effect = lambda x, y, m, r: ('WAITING', x, y)
 
     scheduler = _scheduler.Scheduler("FINI")
 
+    assert_equals(
+        sorted(scheduler.__dict__.pop('_stats')._phases),
+        sorted(_timeline.PHASES)
+    )
+    assert_equals(
+        type(scheduler.__dict__.pop('_policies').get('x')),
+        _scheduler._policy.PriorityPolicy
+    )
+    assert_equals(
+        type(scheduler.__dict__.pop('durations')),
+        _scheduler._durations.Durations
+    )
+    assert_equals(
+        type(scheduler.__dict__.pop('_admission')),
+        _scheduler._limits.Admission
+    )
+    pending = scheduler.__dict__.pop('_pending')
+    assert_equals(pending._jobs, {})
+    assert_true(pending._merge is True)
+    assert_equals(
+        scheduler.__dict__.pop('_deadlines')._queue, None
+    )
     assert_equals(scheduler.__dict__, {
         'jobs': {},
         '_delayed': ('JOBQUEUE', 'DELAYEDJOB'),
+        '_delayed_lock': _scheduler._sync.NOLOCK,
         '_executing': {},
         '_executors': {},
         '_failed': set([]),
+        '_cancelled': set([]),
         '_finished': 'FINI',
         '_groups': {},
-        '_locks': ('LOCKS', scheduler),
-        '_waiting': ('WAITING', scheduler),
+        '_groups_lock': _scheduler._sync.NOLOCK,
+        '_locks': ('LOCKS', scheduler, False, False),
+        '_threadsafe': False,
+        '_waiting': ('WAITING', scheduler, False),
+        'metrics': _scheduler._metrics.NULL,
     })
 
 
+@_test.patch(_scheduler, '_locks', name='locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting', name='waiting')
+def test_scheduler_init_threadsafe(locks, waiting):
+    """ Scheduler properly initializes in thread safe mode """
+    locks.Locks.side_effect = lambda x, y, m, p, d: ('LOCKS', x, y, d)
+    waiting.Waiting.side_effect = lambda x, y, m, r: ('WAITING', x, y)
+
+    scheduler = _scheduler.Scheduler("FINI", threadsafe=1, defer_locks=1)
+
+    assert_true(scheduler._threadsafe is True)
+    assert_equals(scheduler._locks, ('LOCKS', scheduler, True, 1))
+    assert_equals(scheduler._waiting, ('WAITING', scheduler, True))
+    assert_true(scheduler._delayed_lock is not _scheduler._sync.NOLOCK)
+    assert_true(scheduler._groups_lock is not _scheduler._sync.NOLOCK)
+
+
 @_test.patch(_scheduler, '_locks')
 @_test.patch(_scheduler, '_job_queue')
 @_test.patch(_scheduler, '_util')
@@ -111,21 +166,24 @@ def test_scheduler_execution_attempt():
 @_test.patch(_scheduler, '_group', name='group')
 def test_scheduler_get_group(group):
     """ Scheduler.get_group creates a new group or returns an existing """
-    group.Group.side_effect = lambda x, y, z: ['GROUP', x, y, z]
+    group.Group.side_effect = lambda x, y, z, t, m, p: ['GROUP', x, y, z]
     scheduler = _scheduler.Scheduler("FINI")
+    policy = scheduler.policy('lolo')
 
     result1 = scheduler.get_group('lolo')
     assert_equals(result1, [
         'GROUP', 'lolo', scheduler._locks, scheduler
     ])
     assert_equals(map(tuple, group.mock_calls), [
-        ('Group', ('lolo', scheduler._locks, scheduler), {}),
+        ('Group', ('lolo', scheduler._locks, scheduler, False,
+                   scheduler.metrics, policy), {}),
     ])
 
     result2 = scheduler.get_group('lolo')
     assert_true(result1 is result2)
     assert_equals(map(tuple, group.mock_calls), [
-        ('Group', ('lolo', scheduler._locks, scheduler), {}),
+        ('Group', ('lolo', scheduler._locks, scheduler, False,
+                   scheduler.metrics, policy), {}),
     ])
 
     result3 = scheduler.get_group('xoxo')
@@ -133,10 +191,52 @@ def test_scheduler_get_group(group):
         'GROUP', 'xoxo', scheduler._locks, scheduler
     ])
     assert_equals(map(tuple, group.mock_calls), [
-        ('Group', ('lolo', scheduler._locks, scheduler), {}),
-        ('Group', ('xoxo', scheduler._locks, scheduler), {}),
+        ('Group', ('lolo', scheduler._locks, scheduler, False,
+                   scheduler.metrics, policy), {}),
+        ('Group', ('xoxo', scheduler._locks, scheduler, False,
+                   scheduler.metrics, policy), {}),
     ])
 
+    scheduler = _scheduler.Scheduler("FINI", policies={'lolo': 'POLICY'})
+    scheduler.get_group('lolo')
+    assert_equals(group.mock_calls[-1][1][-1], 'POLICY')
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting', name='waiting')
+def test_scheduler_policy(waiting):
+    """ Scheduler chooses the group policies """
+    policy = _scheduler._policy
+
+    scheduler = _scheduler.Scheduler("FINI")
+    assert_equals(type(scheduler.policy('x')), policy.PriorityPolicy)
+    assert_equals(scheduler.policy('x').importance_range, None)
+    assert_equals(waiting.Waiting.mock_calls[-1][1][-1], False)
+
+    fifo = policy.FifoPolicy()
+    scheduler = _scheduler.Scheduler(
+        "FINI", policy=fifo,
+        policies={'b': 'B', 'c': policy.DependentsPolicy()},
+    )
+    assert_true(scheduler.policy('x') is fifo)
+    assert_true(scheduler.policy('a') is fifo)
+    assert_equals(scheduler.policy('b'), 'B')
+    assert_equals(type(scheduler.policy('c')), policy.DependentsPolicy)
+    assert_equals(waiting.Waiting.mock_calls[-1][1][-1], True)
+    assert_false(scheduler._policies.uses(policy.CriticalPathPolicy))
+
+    scheduler = _scheduler.Scheduler(
+        "FINI", policies={'c': policy.CriticalPathPolicy()}
+    )
+    assert_true(scheduler._policies.uses(policy.CriticalPathPolicy))
+
+    scheduler = _scheduler.Scheduler(
+        "FINI", policy=policy.CriticalPathPolicy()
+    )
+    assert_true(scheduler._policies.uses(policy.CriticalPathPolicy))
+
 
 @_test.patch(_scheduler, '_locks')
 @_test.patch(_scheduler, '_job_queue')
@@ -165,6 +265,19 @@ def test_scheduler_del_group():
     assert_equals(scheduler._groups, {'y': [1]})
 
 
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+def test_scheduler_del_group_threadsafe():
+    """ Scheduler.del_group keeps groups in thread safe mode """
+    scheduler = _scheduler.Scheduler("FINI", threadsafe=True)
+
+    scheduler._groups['x'] = []
+    scheduler.del_group('x')
+    assert_equals(scheduler._groups, {'x': []})
+
+
 @_test.patch(_scheduler, '_locks')
 @_test.patch(_scheduler, '_job_queue')
 @_test.patch(_scheduler, '_util')
@@ -175,21 +288,98 @@ def test_scheduler_enter_todo(job):
     entered = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_job(self, job):
+        def _enter_job(self, job, now=None):
             entered.append(job)
 
     ids = _it.count(2).next
 
-    job.joblist_from_todo.side_effect = lambda x: [
-        _test.Bunch(id=ids(), todo=x) for _ in xrange(2)
+    job.joblist_from_todo.side_effect = lambda x, r: [
+        _job(id=ids(), todo=x, runtime=r, predecessors=set())
+        for _ in xrange(2)
     ]
 
     scheduler = Scheduler("FINI")
 
     assert_equals(scheduler.enter_todo('t0d0'), 2)
-    assert_equals(map(_op.attrgetter('id', 'todo'), entered), [
-        (2, 't0d0'), (3, 't0d0'),
+    assert_equals(map(_op.attrgetter('id', 'todo', 'runtime'), entered), [
+        (2, 't0d0', None), (3, 't0d0', None),
+    ])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+@_test.patch(_scheduler, '_job', name='job')
+def test_scheduler_enter_todo_critical_path(job):
+    """ Scheduler.enter_todo estimates runtimes for the critical path """
+    runtimes = []
+    job.joblist_from_todo.side_effect = lambda x, r: runtimes.extend([
+        r(_job(desc=_test.Bunch(name=name))) for name in ('fast', 'other')
+    ]) or []
+
+    scheduler = _scheduler.Scheduler("FINI", policy=(
+        _scheduler._policy.CriticalPathPolicy({'fast': 0.25})
+    ))
+    scheduler.enter_todo('t0d0')
+    assert_equals(runtimes, [0.25, 1.0])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+@_test.patch(_scheduler, '_job', name='job')
+def test_scheduler_enter_todo_dedup(job):
+    """ Scheduler.enter_todo replaces duplicates by pending jobs """
+    entered = []
+
+    class Scheduler(_scheduler.Scheduler):
+        def _enter_job(self, job, now=None):
+            entered.append(job)
+
+    def make(job_id, key, importance=1, predecessors=()):
+        return _job(
+            id=job_id, dedup_key=key, importance=importance,
+            not_before=None, group='g', predecessors=set(predecessors),
+        )
+
+    job.joblist_from_todo.side_effect = [
+        [make(2, 'a'), make(3, None, predecessors=[2])],
+        [make(4, 'a', importance=5), make(5, 'b', predecessors=[4, 1])],
+        [make(6, 'a', importance=3)],
+    ]
+
+    scheduler = Scheduler("FINI")
+    assert_equals(scheduler.enter_todo('t0d0'), 2)
+    assert_equals(scheduler.enter_todo('t0d0'), 2)
+    assert_equals(scheduler.enter_todo('t0d0'), 2)
+
+    assert_equals(map(_op.attrgetter('id', 'predecessors'), entered), [
+        (2, set()), (3, set([2])), (5, set([1, 2])),
     ])
+    assert_equals(entered[0].importance, 5)
+    assert_equals(sorted(scheduler._pending._jobs), ['a', 'b'])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+@_test.patch(_scheduler, '_job', name='job')
+def test_scheduler_enter_todo_dedup_keep(job):
+    """ Scheduler.enter_todo leaves pending jobs alone, if configured """
+    jobs = [
+        _job(id=job_id, dedup_key='a', importance=job_id, predecessors=set())
+        for job_id in (2, 3)
+    ]
+    job.joblist_from_todo.side_effect = [[item] for item in jobs]
+
+    scheduler = _scheduler.Scheduler("FINI", merge_duplicates=False)
+    scheduler._enter_job = lambda job, now=None: None
+    assert_equals(scheduler.enter_todo('t0d0'), 2)
+    assert_equals(scheduler.enter_todo('t0d0'), 2)
+    assert_equals(jobs[0].importance, 2)
 
 
 @_test.patch(_scheduler, '_locks')
@@ -202,7 +392,7 @@ def test_scheduler_enter_todo_cycle(job):
     entered = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_job(self, job):
+        def _enter_job(self, job, now=None):
             entered.append(job)
 
     job.joblist_from_todo.side_effect = [
@@ -228,24 +418,25 @@ def test_scheduler_enter_job_timed(locks, job_queue, util, waiting):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_undelayed(self, job):
+        def _enter_undelayed(self, job, now=None):
             undelayed.append(job)
 
-    job = _test.Bunch(id=25, not_before=2)
+    job = _job(id=25, not_before=2)
     scheduler = Scheduler('FINI')
     scheduler._enter_job(job)
 
     assert_equals(scheduler.jobs, {25: job})
     assert_equals(undelayed, [])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
         ('JobQueue().put', (job,), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -259,10 +450,10 @@ def test_scheduler_enter_job_undelayed(locks, job_queue, util, waiting):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_undelayed(self, job):
+        def _enter_undelayed(self, job, now=None):
             undelayed.append(job)
 
-    job = _test.Bunch(id=25, not_before=0)
+    job = _job(id=25, not_before=0)
     scheduler = Scheduler('FINI')
 
     scheduler._enter_job(job)
@@ -270,13 +461,14 @@ def test_scheduler_enter_job_undelayed(locks, job_queue, util, waiting):
     assert_equals(scheduler.jobs, {25: job})
     assert_equals(undelayed, [job])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -290,10 +482,10 @@ def test_scheduler_enter_undelayed(locks, job_queue, util, waiting):
     independent = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _schedule_independent(self, job):
+        def _schedule_independent(self, job, now=None):
             independent.append(job)
 
-    job = _test.Bunch(id=25, not_before=0)
+    job = _job(id=25, not_before=0, predecessors=set([24]))
     scheduler = Scheduler('FINI')
     scheduler._waiting.put.side_effect = [True]
 
@@ -301,13 +493,14 @@ def test_scheduler_enter_undelayed(locks, job_queue, util, waiting):
 
     assert_equals(independent, [])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
         ('Waiting().put', (job,), {}),
     ])
 
@@ -322,10 +515,10 @@ def test_scheduler_enter_undelayed_schedule(locks, job_queue, util, waiting):
     independent = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _schedule_independent(self, job):
+        def _schedule_independent(self, job, now=None):
             independent.append(job)
 
-    job = _test.Bunch(id=25, not_before=0)
+    job = _job(id=25, not_before=0)
     scheduler = Scheduler('FINI')
     scheduler._waiting.put.side_effect = [False]
 
@@ -333,13 +526,14 @@ def test_scheduler_enter_undelayed_schedule(locks, job_queue, util, waiting):
 
     assert_equals(independent, [job])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
         ('Waiting().put', (job,), {}),
     ])
 
@@ -364,21 +558,26 @@ def test_scheduler_schedule_independent(locks, job_queue, util, waiting):
         def get_group(self, name):
             return Group(name)
 
-    job = _test.Bunch(id=25, not_before=0, group='lala')
+    job = _job(id=25, not_before=0, group='lala')
     scheduler = Scheduler('FINI')
+    scheduler._locks.deferred = False
 
     scheduler._schedule_independent(job)
 
     assert_equals(scheduled, [job])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
+        ('Locks().guard', (job,), {}),
+        ('Locks().guard().__enter__', (), {}),
         ('Locks().enter', (job,), {}),
+        ('Locks().guard().__exit__', (None, None, None), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -392,7 +591,7 @@ def test_scheduler_undelay_jobs_future(locks, job_queue, util, waiting, time):
     util.DelayedJob = 'DELAYEDJOB'
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_undelayed(self, job):
+        def _enter_undelayed(self, job, now=None):
             raise AssertionError("_enter_undelayed called")
 
     time.time.side_effect = [10.2]
@@ -402,7 +601,8 @@ def test_scheduler_undelay_jobs_future(locks, job_queue, util, waiting, time):
     scheduler._undelay_jobs()
 
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -411,7 +611,7 @@ def test_scheduler_undelay_jobs_future(locks, job_queue, util, waiting, time):
         ('JobQueue().peek', (), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -426,7 +626,7 @@ def test_scheduler_undelay_jobs_past(locks, job_queue, util, waiting, time):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_undelayed(self, job):
+        def _enter_undelayed(self, job, now=None):
             undelayed.append(job)
 
     job1 = _test.Bunch(not_before=9)
@@ -442,7 +642,8 @@ def test_scheduler_undelay_jobs_past(locks, job_queue, util, waiting, time):
 
     assert_equals(undelayed, [job1, job2])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -456,7 +657,7 @@ def test_scheduler_undelay_jobs_past(locks, job_queue, util, waiting, time):
         ('JobQueue().__nonzero__', (), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -471,7 +672,7 @@ def test_scheduler_undelay_jobs_both(locks, job_queue, util, waiting, time):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _enter_undelayed(self, job):
+        def _enter_undelayed(self, job, now=None):
             undelayed.append(job)
 
     job1 = _test.Bunch(not_before=9)
@@ -487,7 +688,8 @@ def test_scheduler_undelay_jobs_both(locks, job_queue, util, waiting, time):
 
     assert_equals(undelayed, [job1, job2])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -502,7 +704,7 @@ def test_scheduler_undelay_jobs_both(locks, job_queue, util, waiting, time):
         ('JobQueue().peek', (), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -526,7 +728,8 @@ def test_scheduler_undelay_jobs_empty(locks, job_queue, util, waiting):
 
     assert_equals(undelayed, [])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', (), {}),
@@ -534,7 +737,7 @@ def test_scheduler_undelay_jobs_empty(locks, job_queue, util, waiting):
         ('JobQueue().__nonzero__', (), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
 
 
@@ -552,25 +755,25 @@ def test_scheduler_unwait_jobs(locks, job_queue, util, waiting):
         def is_done(self, job_id):
             return True
 
-        def _schedule_independent(self, job):
+        def _schedule_independent(self, job, now=None):
             independent.append(job)
 
-    job1 = _test.Bunch(id=12)
-    job2 = _test.Bunch(id=13)
-    job3 = _test.Bunch(id=14)
+    job1 = _job(id=12)
+    job2 = _job(id=13)
+    job3 = _job(id=14)
 
     scheduler = Scheduler('FINI')
     scheduler._waiting.free.side_effect = [[job3, job1, job2]]
     job_queue.JobQueue().__iter__.side_effect = [iter([job1, job2, job3])]
 
-    scheduler._unwait_jobs(10)
-
+    assert_equals(scheduler._unwait_jobs(10), [job1, job2, job3])
     assert_equals(independent, [job1, job2, job3])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
         ('Waiting().free', (10,), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
@@ -591,19 +794,20 @@ def test_scheduler_unwait_jobs(locks, job_queue, util, waiting):
 def test_scheduler_request_job(locks, job_queue, util, waiting):
     """ Scheduler.request_job returns the correct job """
     util.DelayedJob = 'DELAYEDJOB'
+    util.precedes.side_effect = lambda item, other: item < other
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _undelay_jobs(self):
+        def _undelay_jobs(self, now=None):
             undelayed.append(1)
 
     class Job(_test.Bunch):
         def __lt__(self, other):
             return self.order < other.order or self.job.id < other.job.id
 
-    job1 = Job(order=6, job=_test.Bunch(id=10))
-    job2 = Job(order=5, job=_test.Bunch(id=11))
-    job3 = Job(order=7, job=_test.Bunch(id=12))
+    job1 = Job(order=6, job=_job(id=10))
+    job2 = Job(order=5, job=_job(id=11))
+    job3 = Job(order=7, job=_job(id=12))
 
     group1 = _test.mock.MagicMock()
     group1.peek.side_effect = [job1]
@@ -618,6 +822,7 @@ def test_scheduler_request_job(locks, job_queue, util, waiting):
     group3.get.side_effect = [job3.job]
 
     scheduler = Scheduler('FINI')
+    scheduler._locks.deferred = False
     scheduler._groups.update(
         group1=group1,
         group2=group2,
@@ -634,23 +839,24 @@ def test_scheduler_request_job(locks, job_queue, util, waiting):
     assert_equals(scheduler._executing, {11: 'ATT'})
     assert_equals(scheduler._executors, {'lala': 11})
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
     assert_equals(map(tuple, group1.mock_calls), [
-        ('peek', (), {}),
+        ('peek', (None,), {}),
     ])
     assert_equals(map(tuple, group2.mock_calls), [
-        ('peek', (), {}),
-        ('get', (), {}),
+        ('peek', (None,), {}),
+        ('get', (job2,), {}),
     ])
     assert_equals(map(tuple, group3.mock_calls), [
-        ('peek', (), {}),
+        ('peek', (None,), {}),
     ])
 
 
@@ -666,16 +872,16 @@ def test_scheduler_request_job_default(locks, job_queue, util, waiting,
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _undelay_jobs(self):
+        def _undelay_jobs(self, now=None):
             undelayed.append(1)
 
     class Job(_test.Bunch):
         def __lt__(self, other):
             return self.order < other.order or self.job.id < other.job.id
 
-    job1 = Job(order=6, job=_test.Bunch(id=10))
-    job2 = Job(order=5, job=_test.Bunch(id=11))
-    job3 = Job(order=7, job=_test.Bunch(id=12))
+    job1 = Job(order=6, job=_job(id=10))
+    job2 = Job(order=5, job=_job(id=11))
+    job3 = Job(order=7, job=_job(id=12))
 
     group1 = _test.mock.MagicMock()
     group1.peek.side_effect = [job1]
@@ -690,6 +896,7 @@ def test_scheduler_request_job_default(locks, job_queue, util, waiting,
     group3.get.side_effect = [job3.job]
 
     scheduler = Scheduler('FINI')
+    scheduler._locks.deferred = False
     scheduler._groups.update(
         group1=group1,
         group2=group2,
@@ -705,17 +912,18 @@ def test_scheduler_request_job_default(locks, job_queue, util, waiting,
     assert_equals(scheduler._executing, {10: 'ATT'})
     assert_equals(scheduler._executors, {'lala': 10})
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
     assert_equals(map(tuple, group1.mock_calls), [
-        ('peek', (), {}),
-        ('get', (), {}),
+        ('peek', (None,), {}),
+        ('get', (job1,), {}),
     ])
     assert_equals(map(tuple, group2.mock_calls), [
     ])
@@ -733,16 +941,16 @@ def test_scheduler_request_job_again(locks, job_queue, util, waiting):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _undelay_jobs(self):
+        def _undelay_jobs(self, now=None):
             undelayed.append(1)
 
     class Job(_test.Bunch):
         def __lt__(self, other):
             return self.order < other.order or self.job.id < other.job.id
 
-    job1 = Job(order=6, job=_test.Bunch(id=10))
-    job2 = Job(order=5, job=_test.Bunch(id=11))
-    job3 = Job(order=7, job=_test.Bunch(id=12))
+    job1 = Job(order=6, job=_job(id=10))
+    job2 = Job(order=5, job=_job(id=11))
+    job3 = Job(order=7, job=_job(id=12))
 
     group1 = _test.mock.MagicMock()
     group1.peek.side_effect = [job1]
@@ -760,6 +968,7 @@ def test_scheduler_request_job_again(locks, job_queue, util, waiting):
     attempt2 = _test.Bunch(executor='lala', which=2)
 
     scheduler = Scheduler('FINI')
+    scheduler._locks.deferred = False
     scheduler.jobs.update({
         10: job1.job,
         11: job2.job,
@@ -783,10 +992,11 @@ def test_scheduler_request_job_again(locks, job_queue, util, waiting):
     assert_equals(scheduler._executing, {11: attempt})
     assert_equals(scheduler._executors, {'lala': 11})
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -794,8 +1004,8 @@ def test_scheduler_request_job_again(locks, job_queue, util, waiting):
     assert_equals(map(tuple, group1.mock_calls), [
     ])
     assert_equals(map(tuple, group2.mock_calls), [
-        ('peek', (), {}),
-        ('get', (), {}),
+        ('peek', (None,), {}),
+        ('get', (job2,), {}),
     ])
     assert_equals(map(tuple, group3.mock_calls), [
     ])
@@ -811,16 +1021,16 @@ def test_scheduler_request_job_none_1(locks, job_queue, util, waiting):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _undelay_jobs(self):
+        def _undelay_jobs(self, now=None):
             undelayed.append(1)
 
     class Job(_test.Bunch):
         def __lt__(self, other):
             return self.order < other.order or self.job.id < other.job.id
 
-    job1 = Job(order=6, job=_test.Bunch(id=10))
-    job2 = Job(order=5, job=_test.Bunch(id=11))
-    job3 = Job(order=7, job=_test.Bunch(id=12))
+    job1 = Job(order=6, job=_job(id=10))
+    job2 = Job(order=5, job=_job(id=11))
+    job3 = Job(order=7, job=_job(id=12))
 
     group1 = _test.mock.MagicMock()
     group1.peek.side_effect = [job1]
@@ -835,6 +1045,7 @@ def test_scheduler_request_job_none_1(locks, job_queue, util, waiting):
     group3.get.side_effect = [job3.job]
 
     scheduler = Scheduler('FINI')
+    scheduler._locks.deferred = False
     scheduler._groups.update(
         group1=group1,
         group2=group2,
@@ -849,10 +1060,11 @@ def test_scheduler_request_job_none_1(locks, job_queue, util, waiting):
     assert_equals(scheduler._executing, {})
     assert_equals(scheduler._executors, {})
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -875,16 +1087,16 @@ def test_scheduler_request_job_none_2(locks, job_queue, util, waiting):
     undelayed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _undelay_jobs(self):
+        def _undelay_jobs(self, now=None):
             undelayed.append(1)
 
     class Job(_test.Bunch):
         def __lt__(self, other):
             return self.order < other.order or self.job.id < other.job.id
 
-    job1 = Job(order=6, job=_test.Bunch(id=10))
-    job2 = Job(order=5, job=_test.Bunch(id=11))
-    job3 = Job(order=7, job=_test.Bunch(id=12))
+    job1 = Job(order=6, job=_job(id=10))
+    job2 = Job(order=5, job=_job(id=11))
+    job3 = Job(order=7, job=_job(id=12))
 
     group1 = _test.mock.MagicMock()
     group1.peek.side_effect = [job1]
@@ -899,10 +1111,11 @@ def test_scheduler_request_job_none_2(locks, job_queue, util, waiting):
     group3.get.side_effect = [job3.job]
 
     group4 = _test.mock.MagicMock()
-    group4.peek.side_effect = lambda: None
+    group4.peek.side_effect = lambda x: None
     group4.get.side_effect = [IndexError]
 
     scheduler = Scheduler('FINI')
+    scheduler._locks.deferred = False
     scheduler._groups.update(
         group1=group1,
         group2=group2,
@@ -918,10 +1131,11 @@ def test_scheduler_request_job_none_2(locks, job_queue, util, waiting):
     assert_equals(scheduler._executing, {})
     assert_equals(scheduler._executors, {})
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -933,7 +1147,7 @@ def test_scheduler_request_job_none_2(locks, job_queue, util, waiting):
     assert_equals(map(tuple, group3.mock_calls), [
     ])
     assert_equals(map(tuple, group4.mock_calls), [
-        ('peek', (), {}),
+        ('peek', (None,), {}),
     ])
 
 
@@ -949,13 +1163,15 @@ def test_scheduler_finish_job(locks, job_queue, util, waiting):
     finished = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _unwait_jobs(self, finished_id):
+        def _unwait_jobs(self, finished_id, now=None):
             unwaited.append(finished_id)
+            return []
 
-    job = _test.Bunch(id=56, attempts=[])
-    job2 = _test.Bunch(id=55)
+    job = _job(id=56, attempts=[])
+    job2 = _job(id=55)
     attempt = _test.mock.MagicMock()
     attempt.executor = 'lolo'
+    attempt.start = 12300
     attempt2 = _test.mock.MagicMock()
     attempt2.executor = 'lala'
     result = _test.Bunch(failed=False)
@@ -971,7 +1187,7 @@ def test_scheduler_finish_job(locks, job_queue, util, waiting):
     scheduler._locks.release.side_effect = lambda x: []
     job_queue.JobQueue().__iter__.side_effect = lambda: iter(())
 
-    scheduler.finish_job(56, 12345, result)
+    assert_equals(scheduler.finish_job(56, 12345, result), [])
 
     assert_equals(scheduler.jobs, {55: job2})
     assert_equals(scheduler._executing, {55: attempt2})
@@ -979,12 +1195,14 @@ def test_scheduler_finish_job(locks, job_queue, util, waiting):
     assert_equals(scheduler._failed, set())
     assert_equals(finished, [job])
     assert_equals(unwaited, [56])
+    assert_equals(scheduler.durations.expected(job.desc.name), 45.0)
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
         ('Locks().release', (job,), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -999,6 +1217,29 @@ def test_scheduler_finish_job(locks, job_queue, util, waiting):
     ])
 
 
+def test_scheduler_finish_and_request():
+    """ Scheduler.finish_and_request prefers the freed jobs """
+    calls = []
+
+    class Scheduler(_scheduler.Scheduler):
+        def finish_job(self, job_id, end, result):
+            calls.append(('finish_job', job_id, end, result))
+            return ['FREED']
+
+        def request_job(self, executor, prefer=None):
+            calls.append(('request_job', executor, prefer))
+            return 'NEXT'
+
+    scheduler = Scheduler('FINI')
+    assert_equals(
+        scheduler.finish_and_request(56, 12345, 'RESULT', 'EXE'), 'NEXT'
+    )
+    assert_equals(calls, [
+        ('finish_job', 56, 12345, 'RESULT'),
+        ('request_job', 'EXE', ['FREED']),
+    ])
+
+
 @_test.patch(_scheduler, '_locks', name='locks')
 @_test.patch(_scheduler, '_job_queue', name='job_queue')
 @_test.patch(_scheduler, '_util', name='util')
@@ -1012,14 +1253,15 @@ def test_scheduler_finish_job_failed(locks, job_queue, util, waiting):
     failed = []
 
     class Scheduler(_scheduler.Scheduler):
-        def _unwait_jobs(self, finished_id):
+        def _unwait_jobs(self, finished_id, now=None):
             unwaited.append(finished_id)
+            return []
 
         def _fail_job(self, job):
             failed.append(job)
 
-    job = _test.Bunch(id=56, attempts=[])
-    job2 = _test.Bunch(id=55)
+    job = _job(id=56, attempts=[])
+    job2 = _job(id=55)
     attempt = _test.mock.MagicMock()
     attempt.executor = 'lolo'
     attempt2 = _test.mock.MagicMock()
@@ -1045,12 +1287,14 @@ def test_scheduler_finish_job_failed(locks, job_queue, util, waiting):
     assert_equals(failed, [job])
     assert_equals(finished, [])
     assert_equals(unwaited, [])
+    assert_equals(len(scheduler.durations), 0)
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
         ('Locks().release', (job,), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -1089,16 +1333,17 @@ def test_scheduler_finish_job_unlock(locks, job_queue, util, waiting):
         def get_group(self, name):
             return Group(name)
 
-        def _unwait_jobs(self, finished_id):
+        def _unwait_jobs(self, finished_id, now=None):
             unwaited.append(finished_id)
+            return []
 
         def _fail_job(self, job):
             failed.append(job)
 
-    job = _test.Bunch(id=56, attempts=[])
-    job2 = _test.Bunch(id=55)
-    job3 = _test.Bunch(id=57, group='lala')
-    job4 = _test.Bunch(id=58, group='lolo')
+    job = _job(id=56, attempts=[])
+    job2 = _job(id=55)
+    job3 = _job(id=57, group='lala')
+    job4 = _job(id=58, group='lolo')
     attempt = _test.mock.MagicMock()
     attempt.executor = 'xxx'
     attempt2 = _test.mock.MagicMock()
@@ -1114,6 +1359,7 @@ def test_scheduler_finish_job_unlock(locks, job_queue, util, waiting):
     scheduler._executors['yyy'] = 55
 
     scheduler._locks.release.side_effect = lambda x: [job3, job4]
+    scheduler._locks.is_free.side_effect = lambda x: True
     job_queue.JobQueue().__iter__.side_effect = lambda: iter((job4, job3))
 
     scheduler.finish_job(56, 12345, result)
@@ -1126,11 +1372,20 @@ def test_scheduler_finish_job_unlock(locks, job_queue, util, waiting):
     assert_equals(unwaited, [])
     assert_equals(scheduled, [job4, job3])
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
         ('Locks().release', (job,), {}),
+        ('Locks().guard', (job4,), {}),
+        ('Locks().guard().__enter__', (), {}),
+        ('Locks().is_free', (job4,), {}),
+        ('Locks().guard().__exit__', (None, None, None), {}),
+        ('Locks().guard', (job3,), {}),
+        ('Locks().guard().__enter__', (), {}),
+        ('Locks().is_free', (job3,), {}),
+        ('Locks().guard().__exit__', (None, None, None), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
@@ -1155,7 +1410,7 @@ def test_scheduler_fail_job(locks, job_queue, util, waiting):
     """ Scheduler._fail_job adds job ID to failed set """
     util.DelayedJob = 'DELAYEDJOB'
 
-    job = _test.Bunch(id=23)
+    job = _job(id=23)
     scheduler = _scheduler.Scheduler('FINI')
     scheduler.jobs[23] = job
     scheduler._failed.add(12)
@@ -1164,11 +1419,152 @@ def test_scheduler_fail_job(locks, job_queue, util, waiting):
 
     assert_equals(scheduler._failed, set([12, 23]))
     assert_equals(map(tuple, locks.mock_calls), [
-        ('Locks', (scheduler,), {}),
+        ('Locks', (scheduler, False, _scheduler._metrics.NULL, None,
+                   False), {}),
     ])
     assert_equals(map(tuple, waiting.mock_calls), [
-        ('Waiting', (scheduler,), {}),
+        ('Waiting', (scheduler, False, _scheduler._metrics.NULL, False), {}),
     ])
     assert_equals(map(tuple, job_queue.mock_calls), [
         ('JobQueue', ('DELAYEDJOB',), {}),
     ])
+
+
+@_test.patch(_scheduler, '_locks', name='locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+def test_scheduler_reschedule(locks):
+    """ Scheduler._reschedule ignores stale lock releases """
+    scheduled = []
+
+    class Group(object):
+        def schedule(self, job):
+            scheduled.append(job)
+
+    class Scheduler(_scheduler.Scheduler):
+        def get_group(self, name):
+            return Group()
+
+    job = _job(id=25, group='lala')
+    scheduler = Scheduler('FINI')
+    scheduler._locks.is_free.side_effect = [False, True]
+
+    scheduler._reschedule(job)
+    assert_equals(scheduled, [])
+
+    scheduler._reschedule(job)
+    assert_equals(scheduled, [job])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+def test_scheduler_reorder():
+    """ Scheduler.reorder passes jobs to their queued group """
+    group = _test.mock.MagicMock()
+    scheduler = _scheduler.Scheduler('FINI')
+    scheduler._groups['lala'] = group
+
+    job = _test.Bunch(id=25, group='lala')
+    scheduler.reorder(job)
+    scheduler.reorder(_test.Bunch(id=26, group='lolo'))
+
+    assert_equals(map(tuple, group.mock_calls), [
+        ('reorder', (job,), {}),
+    ])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+def test_scheduler_set_importance():
+    """ Scheduler.set_importance reorders queue and lock holders """
+    group = _test.mock.MagicMock()
+    scheduler = _scheduler.Scheduler('FINI')
+    scheduler._groups['lala'] = group
+    job = _job(id=25, group='lala', importance=1)
+    scheduler.jobs[25] = job
+
+    assert_false(scheduler.set_importance(26, 5))
+    assert_true(scheduler.set_importance(25, 5))
+    assert_true(scheduler.set_importance(25, 5))
+    assert_equals(job.importance, 5)
+
+    assert_equals(map(tuple, group.mock_calls), [
+        ('reorder', (job,), {}),
+    ])
+    assert_equals(map(tuple, scheduler._locks.reprioritize.mock_calls), [
+        ('', (job,), {}),
+    ])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+def test_scheduler_reprioritize():
+    """ Scheduler.reprioritize changes matching jobs """
+    changed = []
+
+    class Scheduler(_scheduler.Scheduler):
+        def _set_importance(self, job, importance):
+            changed.append((job.id, importance))
+
+    scheduler = Scheduler('FINI')
+    for job_id, group, name in [(1, 'a', 'x'), (2, 'a', 'y'), (3, 'b', 'x'),
+                                (4, 'a', 'x')]:
+        scheduler.jobs[job_id] = _job(
+            id=job_id, group=group, desc=_test.Bunch(name=name)
+        )
+    scheduler._executing[4] = 'ATT'
+
+    assert_equals(sorted(scheduler.reprioritize(7, group='a')), [1, 2])
+    assert_equals(sorted(scheduler.reprioritize(8, name='x')), [1, 3])
+    assert_equals(scheduler.reprioritize(9, group='b', name='y'), [])
+    assert_equals(sorted(changed), [(1, 7), (1, 8), (2, 7), (3, 8)])
+
+
+@_test.patch(_scheduler, '_locks')
+@_test.patch(_scheduler, '_job_queue')
+@_test.patch(_scheduler, '_util')
+@_test.patch(_scheduler, '_waiting')
+def test_scheduler_limits():
+    """ Scheduler applies the dispatch limits """
+    activated = []
+
+    class Scheduler(_scheduler.Scheduler):
+        def _activate(self, name):
+            activated.append(name)
+
+    scheduler = Scheduler('FINI', limits=_scheduler._limits.Limits(
+        groups={'a': 1}, names={'x': 1}
+    ))
+    job1 = _job(id=1, group='a', desc=_test.Bunch(name='y'))
+    job2 = _job(id=2, group='a', desc=_test.Bunch(name='x'))
+    job4 = _job(id=4, group='b', desc=_test.Bunch(name='x'))
+
+    assert_true(scheduler._admission.admit(job2))
+    scheduler._dismiss(job2)
+    assert_equals(activated, ['a'])
+    assert_true(scheduler._admission.admit(job4))
+    scheduler._dismiss(job4)
+    assert_equals(activated, ['a'])
+
+    scheduler._locks.deferred = False
+    name_open = scheduler._acquirable()
+    assert_equals(map(name_open, [job1, job2]), [True, True])
+    assert_true(scheduler._admission.admit(job2))
+    assert_equals(map(name_open, [job1, job2]), [True, False])
+    scheduler._dismiss(job2)
+
+    scheduler._locks.deferred = True
+    scheduler._locks.is_available.side_effect = lambda job: job.id != 1
+    acquirable = scheduler._acquirable()
+    assert_equals(map(acquirable, [job1, job2, job4]), [False, True, True])
+    scheduler._admission = _scheduler._limits.Admission()
+    assert_true(scheduler._acquirable() is scheduler._locks.is_available)
+    scheduler._locks.deferred = False
+    assert_equals(scheduler._acquirable(), None)
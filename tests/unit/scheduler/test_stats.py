@@ -0,0 +1,63 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+
+==================================
+ Tests for wolfe.scheduler._stats
+==================================
+
+Tests for wolfe.scheduler._stats.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+
+from nose.tools import assert_equals
+from ... import _util as _test
+
+from wolfe import _metrics
+from wolfe.scheduler import _stats
+
+# pylint: disable = protected-access
+
+
+def test_stats():
+    """ Stats records the phases of finished jobs, if enabled """
+    stats = _stats.Stats()
+    assert_equals(stats.entered, _metrics.NULL_METRIC)
+    stats.observe(None)
+
+    registry = _metrics.Registry()
+    stats = _stats.Stats(registry)
+    stats.observe(_test.Bunch(breakdown=lambda: {
+        'queue': 0.5, 'run': 2.0, 'lock': None,
+    }))
+    stats.succeeded.inc()
+    assert_equals(stats.succeeded.value, 1)
+    assert_equals(stats.failed.value, 0)
+    assert_equals(sorted(
+        labels['phase'] for labels, value
+        in registry.snapshot()['wolfe_job_phase_seconds'][2]
+        if value['count']
+    ), ['queue', 'run'])
@@ -0,0 +1,92 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=====================================
+ Tests for wolfe.scheduler._timeline
+=====================================
+
+Tests for wolfe.scheduler._timeline.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import time as _time
+
+from nose.tools import assert_equals, assert_true
+from ... import _util as _test
+
+from wolfe.scheduler import _timeline
+
+# pylint: disable = protected-access
+
+
+def test_monotonic():
+    """ monotonic clock does not go backwards """
+    first = _timeline.monotonic()
+    second = _timeline.monotonic()
+    assert_true(isinstance(first, float))
+    assert_true(second >= first)
+
+
+def test_monotonic_other_platform():
+    """ monotonic clock falls back to time.time outside of Linux """
+    with _test.patched(_timeline, '_sys', _test.Bunch(platform='darwin')):
+        clock = _timeline._find_monotonic()
+    assert_true(clock is getattr(_time, 'monotonic', _time.time))
+
+
+def test_breakdown_empty():
+    """ Timeline.breakdown reports nothing for a fresh timeline """
+    assert_equals(_timeline.Timeline().breakdown(), dict(
+        (phase, None) for phase in _timeline.PHASES
+    ))
+
+
+def test_breakdown_complete():
+    """ Timeline.breakdown computes all phases """
+    timeline = _timeline.Timeline()
+    timeline.entered, timeline.ready, timeline.freed = 1.0, 1.0, 2.5
+    timeline.queued, timeline.dispatched, timeline.finished = 3.0, 3.5, 7.0
+
+    assert_equals(timeline.breakdown(), {
+        'delay': 0.0,
+        'dependency': 1.5,
+        'lock': 0.5,
+        'queue': 0.5,
+        'run': 3.5,
+    })
+
+
+def test_breakdown_gap():
+    """ Timeline.breakdown skips phases with missing stamps """
+    timeline = _timeline.Timeline()
+    timeline.entered, timeline.ready, timeline.freed = 1.0, 2.0, 2.0
+
+    assert_equals(timeline.breakdown(), {
+        'delay': 1.0,
+        'dependency': 0.0,
+        'lock': None,
+        'queue': None,
+        'run': None,
+    })
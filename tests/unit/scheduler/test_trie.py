@@ -0,0 +1,102 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=================================
+ Tests for wolfe.scheduler._trie
+=================================
+
+Tests for wolfe.scheduler._trie.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_false, assert_true
+
+from wolfe.scheduler import _trie
+
+# pylint: disable = protected-access
+
+
+def _related(trie, name):
+    """ Find related lock names (the tests announce names as IDs) """
+    return sorted(trie.related(name))
+
+
+def test_trie_hold_release():
+    """ LockTrie tracks held locks and prunes released ones """
+    trie = _trie.LockTrie()
+    trie.hold('db/a/1', 1)
+    trie.hold('db/b', 2)
+
+    assert_true(trie.conflicts('db'))
+    assert_true(trie.conflicts('db/a'))
+    assert_true(trie.conflicts('db/a/1'))
+    assert_true(trie.conflicts('db/a/1/x'))
+    assert_false(trie.conflicts('db/a/2'))
+    assert_false(trie.conflicts('db/c'))
+    assert_false(trie.conflicts('other'))
+    assert_equals(sorted(trie.holders('db')), [1, 2])
+    assert_equals(trie.holders('db/a/1/x'), [1])
+    assert_equals(trie.holders('db/c'), [])
+
+    trie.release('db/a/1')
+    assert_false(trie.conflicts('db/a'))
+    assert_true(trie.conflicts('db'))
+    assert_equals(trie._root['db'].children.keys(), ['b'])
+
+    trie.release('db/b')
+    assert_equals(trie._root, {})
+
+
+def test_trie_announce_withdraw():
+    """ LockTrie finds related announced locks """
+    trie = _trie.LockTrie()
+    for name in ('db', 'db/a', 'db/a/1', 'db/b', 'dbx', 'db/a'):
+        trie.announce(name, name)
+
+    assert_equals(_related(trie, 'db/a'), ['db', 'db/a', 'db/a/1'])
+    assert_equals(_related(trie, 'db/b/7'), ['db', 'db/b'])
+    assert_equals(_related(trie, 'db/c'), ['db'])
+    assert_equals(_related(trie, 'x'), [])
+
+    trie.withdraw('db/a')
+    assert_equals(_related(trie, 'db/a'), ['db', 'db/a', 'db/a/1'])
+    trie.withdraw('db/a')
+    assert_equals(_related(trie, 'db/a'), ['db', 'db/a/1'])
+
+    for name in ('db', 'db/a/1', 'db/b', 'dbx'):
+        trie.withdraw(name)
+    assert_equals(trie._root, {})
+
+
+def test_trie_mixed():
+    """ LockTrie keeps nodes, which are held or announced """
+    trie = _trie.LockTrie()
+    trie.hold('db/a', 1)
+    trie.announce('db/a', 'db/a')
+    trie.release('db/a')
+    assert_false(trie.conflicts('db'))
+    assert_equals(_related(trie, 'db'), ['db/a'])
+    trie.withdraw('db/a')
+    assert_equals(trie._root, {})
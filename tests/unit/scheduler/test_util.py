@@ -33,7 +33,7 @@ __docformat__ = "restructuredtext en"
 
 import datetime as _dt
 
-from nose.tools import assert_equals, assert_raises, assert_true
+from nose.tools import assert_equals, assert_false, assert_raises, assert_true
 from ... import _util as _test
 
 from wolfe.scheduler import _util
@@ -44,7 +44,10 @@ from wolfe.scheduler import _util
 # pylint: disable = protected-access
 
 
-def test_scheduled_time():
+@_test.patch(_util, '_pytz', None)
+@_test.patch(_util, '_dt', name='dt')
+@_test.patch(_util, '_time', name='time')
+def test_scheduled_time(dt, time):
     class Job(object):
         def __init__(self, not_before):
             self.not_before = not_before
@@ -53,11 +56,8 @@ def test_scheduled_time():
         def utcoffset(self, dt):
             return _dt.timedelta(0)
 
-    _util._time = _test.mock.Mock()
-    _util._time.time.side_effect = iter([20, 21, 22, 23, 24, 25])
-    _util._dt = _test.mock.Mock()
-    _util._dt.datetime.utcnow.return_value = _dt.datetime(2006, 12, 6, 16, 30)
-    _util._pytz = None
+    time.time.side_effect = iter([20, 21, 22, 23, 24, 25])
+    dt.datetime.utcnow.return_value = _dt.datetime(2006, 12, 6, 16, 30)
 
     assert_equals(_util.scheduled_time(Job(0)), 20)
     assert_equals(_util.scheduled_time(Job(6)), 27)
@@ -76,15 +76,32 @@ def test_scheduled_time():
 
     def localize(dto):
         return (dto - _dt.timedelta(hours=1)).replace(tzinfo=tzinfo())
-    _util._pytz = _test.mock.Mock()
-    _util._pytz.UTC.localize.side_effect = localize
+    with _test.patched(_util, '_pytz') as pytz:
+        pytz.UTC.localize.side_effect = localize
 
-    assert_equals(
-        _util.scheduled_time(Job(
-            _dt.datetime(2006, 12, 6, 17, tzinfo=tzinfo())
-        )),
-        5425
-    )
+        assert_equals(
+            _util.scheduled_time(Job(
+                _dt.datetime(2006, 12, 6, 17, tzinfo=tzinfo())
+            )),
+            5425
+        )
+
+
+@_test.patch(_util, '_dt', name='dt')
+@_test.patch(_util, '_time', name='time')
+def test_deadline(dt, time):
+    class Job(object):
+        def __init__(self, not_after):
+            self.not_after = not_after
+
+    time.time.return_value = 20.5
+    dt.datetime.utcnow.return_value = _dt.datetime(2006, 12, 6, 16, 30)
+
+    assert_true(_util.deadline(Job(None)) is None)
+    assert_equals(_util.deadline(Job(0)), 20)
+    assert_equals(_util.deadline(Job(-6)), 14)
+    assert_equals(_util.deadline(Job(_dt.datetime(2006, 12, 6, 16, 29))), -40)
+    assert_equals(_util.deadline(Job(_dt.datetime(2006, 12, 6, 17))), 1820)
 
 
 def test_queued_job():
@@ -92,6 +109,7 @@ def test_queued_job():
         def __init__(self, job_id, importance):
             self.id = job_id
             self.importance = importance
+            self.inherited = None
 
     queued1 = _util.QueuedJob(Job(1, 2))
     queued2 = _util.QueuedJob(Job(2, 1))
@@ -100,6 +118,150 @@ def test_queued_job():
     assert_true(queued3 < queued1)
     assert_true(queued3 < queued2)
 
+    job = Job(4, 1)
+    job.inherited = 5
+    queued4 = _util.QueuedJob(job)
+    assert_equals(queued4.importance, 5)
+    assert_true(queued4 < queued3)
+
+    job.inherited = 0
+    assert_equals(_util.QueuedJob(job).importance, 1)
+    assert_false(_util.QueuedJob(job) < queued1)
+    assert_false(queued2 < queued3)
+
+
+def test_aging_job():
+    class Job(object):
+        def __init__(self, job_id, importance, freed):
+            self.id = job_id
+            self.importance = importance
+            self.inherited = None
+            self.timeline = _test.Bunch(freed=freed)
+
+    old = _util.AgingJob(Job(1, 0, 100.0), 10)
+    new = _util.AgingJob(Job(2, 1, 105.0), 10)
+    newer = _util.AgingJob(Job(3, 1, 115.0), 10)
+    assert_equals(old.rank, -10.0)
+    assert_true(new < old)
+    assert_true(old < newer)
+    assert_false(newer < old)
+
+    tie = _util.AgingJob(Job(4, 2, 120.0), 10)
+    assert_true(old < tie)
+    assert_false(tie < old)
+
+    job = Job(5, 1, 130.0)
+    job.inherited = 4
+    assert_equals(_util.AgingJob(job, 10).rank, -9.0)
+
+    with _test.patched(_util._timeline, 'monotonic') as monotonic:
+        monotonic.return_value = 200.0
+        assert_equals(_util.AgingJob(Job(6, 0, None), 20).rank, -10.0)
+
+
+def test_critical_path_job():
+    class Job(object):
+        def __init__(self, job_id, importance, bottom_level):
+            self.id = job_id
+            self.importance = importance
+            self.inherited = None
+            self.bottom_level = bottom_level
+
+    short = _util.CriticalPathJob(Job(1, 0, 2.0))
+    long_ = _util.CriticalPathJob(Job(2, 0, 5.0))
+    none = _util.CriticalPathJob(Job(3, 0, None))
+    assert_true(long_ < short)
+    assert_false(short < long_)
+    assert_true(short < none)
+    assert_equals(none.bottom_level, 0.0)
+
+    important = _util.CriticalPathJob(Job(4, 1, 1.0))
+    assert_true(important < long_)
+    assert_false(long_ < important)
+    assert_true(_util.CriticalPathJob(Job(5, 0, 2.0)) > short)
+
+
+def test_dependents_job():
+    class Job(object):
+        def __init__(self, job_id, importance, dependents):
+            self.id = job_id
+            self.importance = importance
+            self.inherited = None
+            self.dependents = dependents
+
+    leaf = _util.DependentsJob(Job(1, 0, 0))
+    blocker = _util.DependentsJob(Job(2, 0, 10))
+    assert_true(blocker < leaf)
+    assert_false(leaf < blocker)
+
+    important = _util.DependentsJob(Job(3, 1, 0))
+    assert_true(important < blocker)
+    assert_false(blocker < important)
+    assert_true(leaf < _util.DependentsJob(Job(4, 0, 0)))
+
+
+def test_shortest_job():
+    class Job(object):
+        def __init__(self, job_id, importance, expected_runtime):
+            self.id = job_id
+            self.importance = importance
+            self.inherited = None
+            self.expected_runtime = expected_runtime
+
+    long_ = _util.ShortestJob(Job(1, 0, 60.0))
+    short = _util.ShortestJob(Job(2, 0, 0.5))
+    assert_true(short < long_)
+    assert_false(long_ < short)
+
+    unknown = _util.ShortestJob(Job(3, 0, None))
+    assert_true(unknown < short)
+    assert_true(short < _util.ShortestJob(Job(3, 0, None), unknown=10))
+
+    important = _util.ShortestJob(Job(4, 1, 3600.0))
+    assert_true(important < short)
+    assert_false(short < important)
+
+
+def test_precedes():
+    def job(job_id, importance, inherited=None):
+        return _test.Bunch(
+            id=job_id, importance=importance, inherited=inherited,
+            dependents=0,
+        )
+
+    fifo = _util.FifoJob(job(1, 0))
+    queued = _util.QueuedJob(job(2, 1))
+    assert_true(_util.precedes(queued, fifo))
+    assert_false(_util.precedes(fifo, queued))
+    assert_true(_util.precedes(_util.FifoJob(job(3, 0, 2)), queued))
+    assert_true(_util.precedes(fifo, _util.DependentsJob(job(4, 0))))
+
+    # Same wrappers use their own order
+    assert_true(_util.precedes(fifo, _util.FifoJob(job(5, 9))))
+    assert_equals(_util.effective_importance(job(6, 3, 1)), 3)
+
+
+def test_deadline_job():
+    class Job(object):
+        def __init__(self, job_id, importance, deadline):
+            self.id = job_id
+            self.importance = importance
+            self.inherited = None
+            self.deadline = deadline
+
+    soon = _util.DeadlineJob(Job(1, 0, 100))
+    later = _util.DeadlineJob(Job(2, 5, 200))
+    never = _util.DeadlineJob(Job(3, 9, None))
+    assert_true(soon < later)
+    assert_false(later < soon)
+    assert_true(later < never)
+    assert_false(never < soon)
+
+    same = _util.DeadlineJob(Job(4, 1, 100))
+    assert_true(same < soon)
+    assert_false(soon < same)
+    assert_true(_util.DeadlineJob(Job(5, 10, None)) < never)
+
 
 def test_delayed_job():
     class Job(object):
@@ -88,6 +88,7 @@ def test_waiting_put_true():
     scheduler = _test.mock.MagicMock()
     scheduler.is_done.side_effect = lambda x: x != 20
     job = _test.Bunch(predecessors=[18, 20, 21], id=24)
+    scheduler.jobs = {}
 
     waiting = _waiting.Waiting(scheduler)
 
@@ -143,3 +144,52 @@ def test_waiting_free():
         ('is_done', (20,), {}),
         ('is_done', (22,), {}),
     ])
+
+
+def test_waiting_dependents_count():
+    """ Waiting maintains the dependents counters of waited-for jobs """
+    scheduler = _test.mock.MagicMock()
+    scheduler.is_done.side_effect = lambda x: x not in (20, 22)
+    pre1 = _test.Bunch(id=20, dependents=0)
+    pre2 = _test.Bunch(id=22, dependents=0)
+    job = _test.Bunch(predecessors=[18, 20, 22], id=24)
+    job2 = _test.Bunch(predecessors=[20], id=25)
+    scheduler.jobs = {20: pre1, 22: pre2, 24: job, 25: job2}
+
+    waiting = _waiting.Waiting(scheduler)
+    assert_true(waiting.put(job))
+    assert_true(waiting.put(job2))
+    assert_equals((pre1.dependents, pre2.dependents), (2, 1))
+    assert_equals(scheduler.reorder.mock_calls, [])
+
+    waiting = _waiting.Waiting(scheduler, reorder=True)
+    assert_true(waiting.put(job))
+    assert_equals((pre1.dependents, pre2.dependents), (3, 2))
+    assert_true(waiting.discard(job))
+    assert_equals((pre1.dependents, pre2.dependents), (2, 1))
+    # The predecessors are visited in set order
+    call = _test.mock.call
+    assert_equals(scheduler.reorder.call_count, 4)
+    scheduler.reorder.assert_has_calls([
+        call(pre1), call(pre1), call(pre2), call(pre2),
+    ], any_order=True)
+
+
+def test_waiting_discard():
+    """ Waiting.discard takes jobs out of waiting state """
+    scheduler = _test.mock.MagicMock()
+    scheduler.is_done.side_effect = lambda x: x not in (20, 22)
+    job = _test.Bunch(predecessors=[18, 20, 22], id=24)
+    job2 = _test.Bunch(predecessors=[20], id=25)
+
+    waiting = _waiting.Waiting(scheduler)
+    assert_true(waiting.put(job))
+    assert_true(waiting.put(job2))
+    assert_equals(sorted(waiting.dependents(20)), [24, 25])
+
+    assert_true(waiting.discard(job))
+    assert_false(waiting.discard(job))
+    assert_equals(waiting._waiting, set([25]))
+    assert_equals(dict(waiting._waiting_for), {20: set([25])})
+    assert_equals(waiting.dependents(20), [25])
+    assert_equals(waiting.dependents(22), [])
@@ -0,0 +1,198 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+========================
+ Tests for wolfe._codec
+========================
+
+Tests for wolfe._codec.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import datetime as _dt
+
+from nose.tools import assert_equals, assert_true, assert_raises
+from .. import _util as _test
+
+from wolfe import _codec
+from wolfe import _exceptions
+from wolfe import _execution
+from wolfe import _lock
+from wolfe import _todo
+from wolfe.scheduler import _job
+
+# pylint: disable = protected-access
+
+
+def test_values():
+    """ dumps/loads round-trip plain values """
+    values = [
+        None, True, False, 0, 1, -1, 127, 128, -129, 2 ** 70, -2 ** 70,
+        1.5, '', 'abc\x00\xff', u'\xe9', [1, [2]], (1, (2,)), {'a': {1: 2}},
+        _dt.datetime(2016, 2, 29, 23, 59, 59, 999999),
+    ]
+    for value in values:
+        result = _codec.loads(_codec.dumps(value))
+        assert_equals(result, value)
+        assert_equals(type(result), type(value))
+
+
+def test_varints():
+    """ Small integers are stored in a single byte """
+    assert_equals(_codec.dumps(63), 'WV\x03\x03\x7e')
+    assert_equals(_codec.dumps(-64), 'WV\x03\x03\x7f')
+    assert_equals(_codec.dumps(64), 'WV\x03\x03\x80\x01')
+
+
+def test_dumps_invalid():
+    """ dumps rejects unsupported types """
+    with assert_raises(TypeError):
+        _codec.dumps(object())
+
+
+def test_loads_invalid():
+    """ loads rejects invalid data """
+    valid = _codec.dumps([1, 'abc'])
+    for data in ('', 'XV\x03', 'WT\x03', 'WV\x00', valid[:-1], valid + 'x',
+                 'WV\x03\x42', 'WV\x03\x09\x01\x07\x00\x00'):
+        with assert_raises(_exceptions.DecodeError):
+            _codec.loads(data)
+
+
+def test_todo():
+    """ encode_todo/decode_todo round-trip todo graphs """
+    desc = _todo.TodoDescription(
+        'desc', locks=[_lock.Lock('a')], importance=3, group='g'
+    )
+    when = _dt.datetime(2016, 1, 2, 3, 4, 5, 6)
+    root = desc.todo(depends_on=[5, 3], not_before=when, dedup_key=u'k',
+                     not_after=when)
+    child1 = root.on_success(desc.todo(
+        locks=[_lock.Lock('b', False), _lock.Lock('a')]
+    ))
+    child2 = root.on_success(_todo.TodoDescription(u'other').todo())
+    child1.on_success(child2)
+    child2.on_success(desc.todo(importance=9))
+
+    todo = _codec.decode_todo(_codec.encode_todo(root))
+    assert_equals(todo.desc.name, 'desc')
+    assert_equals(todo.desc.importance, 3)
+    assert_equals(todo.desc.group, 'g')
+    assert_equals([lock.name for lock in todo.desc.locks], ['a'])
+    assert_equals(todo.group, 'g')
+    assert_equals(todo.importance, 3)
+    assert_equals(todo.not_before, when)
+    assert_equals(todo.predecessors(), (5, 3))
+    assert_equals(todo.dedup_key, u'k')
+    assert_equals(todo.not_after, when)
+
+    succ1, succ2 = todo.successors()
+    assert_true(succ1.desc is todo.desc)
+    assert_equals([(lock.name, lock.exclusive) for lock in succ1.locks],
+                  [('a', True), ('b', False)])
+    assert_equals(succ2.desc.name, u'other')
+    assert_equals(type(succ2.desc.name), unicode)
+    assert_true(succ2.desc.locks is None)
+    assert_true(succ2.dedup_key is None)
+    assert_true(succ2.not_after is None)
+    assert_equals(succ1.successors(), (succ2,))
+    last, = succ2.successors()
+    assert_equals(last.importance, 9)
+    assert_true(last.desc is todo.desc)
+    assert_equals(last.successors(), ())
+
+
+def test_todo_interned():
+    """ encode_todo stores names and descriptions once """
+    desc = _todo.TodoDescription('some_description_name')
+    root = desc.todo(locks=[_lock.Lock('some_lock_name')])
+    for _ in xrange(10):
+        root.on_success(desc.todo(locks=[_lock.Lock('some_lock_name')]))
+
+    data = _codec.encode_todo(root)
+    assert_equals(data.count('some_description_name'), 1)
+    assert_equals(data.count('some_lock_name'), 1)
+    assert_true(len(data) < 200)
+
+
+def test_decode_todo_invalid():
+    """ decode_todo rejects invalid data """
+    data = _codec.encode_todo(_todo.TodoDescription('x').todo())
+    for data in (data[:-1], 'WT\x03\x00', _codec.dumps(None),
+                 data[:-1] + '\x01\x02'):
+        with assert_raises(_exceptions.DecodeError):
+            _codec.decode_todo(data)
+
+
+@_test.patch(_execution._time, 'time', name='time')
+def test_job(time):
+    """ encode_job/decode_job round-trip jobs """
+    time.return_value = 7.5
+    desc = _todo.TodoDescription('desc', group='g')
+    attempt = _execution.Executor('exe').attempt()
+    attempt.finish(8.5, _execution.Result(1, 'out', u'err'))
+    job = _job.Job(
+        100, desc, 'g', [_lock.Lock('l')], 5, _dt.datetime(2016, 1, 1),
+        {'x': [1]}, [2, 99, 50], [attempt, _execution.Attempt(
+            _execution.Executor('other')
+        )], ('customer', 42), _dt.datetime(2016, 1, 2),
+    )
+
+    result = _codec.decode_job(_codec.encode_job(job))
+    assert_equals(result.id, 100)
+    assert_equals((result.desc.name, result.desc.group), ('desc', 'g'))
+    assert_equals(result.group, 'g')
+    assert_equals([lock.name for lock in result.locks], ['l'])
+    assert_equals(result.importance, 5)
+    assert_equals(result.not_before, _dt.datetime(2016, 1, 1))
+    assert_equals(result.extra, {'x': [1]})
+    assert_equals(result.predecessors, set([2, 50, 99]))
+    assert_equals(result.dedup_key, ('customer', 42))
+    assert_equals(result.not_after, _dt.datetime(2016, 1, 2))
+    assert_equals(result.deadline, job.deadline)
+
+    first, second = result.attempts
+    assert_equals(first.executor, 'exe')
+    assert_equals((first.start, first.end), (7.5, 8.5))
+    assert_equals(
+        (first.result.exit_code, first.result.failed, first.result.stdout,
+         first.result.stderr),
+        (1, True, 'out', u'err'),
+    )
+    assert_equals(second.executor, 'other')
+    assert_true(second.end is None)
+    assert_true(second.result is None)
+
+
+def test_decode_job_invalid():
+    """ decode_job rejects invalid data """
+    data = _codec.encode_job(_job.Job(
+        3, _todo.TodoDescription('x'), 'g', [], 1, None, {}, [1], []
+    ))
+    for data in (data[:-1], data + '\x00',
+                 data.replace('\x01\x02', '\x01\x05'),
+                 _codec.encode_todo(_todo.TodoDescription('x').todo())):
+        with assert_raises(_exceptions.DecodeError):
+            _codec.decode_job(data)
@@ -31,7 +31,10 @@ if __doc__:  # pragma: no cover
 __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
-from nose.tools import assert_equals, assert_raises
+import cPickle as _pickle
+import gc as _gc
+
+from nose.tools import assert_equals, assert_raises, assert_false, assert_true
 from .. import _util as _test
 
 from wolfe import _lock
@@ -56,25 +59,98 @@ def test_lock_init_maximal():
     assert_equals(lock2.exclusive, False)
 
 
+def test_lock_interned():
+    """ _lock.Lock instances are interned """
+    lock = _lock.Lock("internedname")
+
+    assert_true(_lock.Lock("internedname", exclusive=1) is lock)
+    assert_false(_lock.Lock("internedname", exclusive=False) is lock)
+    assert_true(_pickle.loads(_pickle.dumps(lock, 2)) is lock)
+    assert_equals(_lock.REGISTRY.name(lock.id), "internedname")
+    assert_equals(_lock.Lock("internedname/sub").root, lock.id)
+    assert_equals(lock.root, lock.id)
+
+
+def test_lock_registry():
+    """ _lock.Registry maps names to IDs """
+    registry = _lock.Registry()
+    lock = registry.lock('a')
+    lock2 = registry.lock('b/c')
+
+    assert_equals((lock.id, lock.root), (0, 0))
+    assert_equals((lock2.id, lock2.root), (1, 2))
+    assert_equals(registry.id('b'), 2)
+    assert_equals(registry.name(1), 'b/c')
+    assert_true(registry.lock('a', exclusive=False).id is lock.id)
+    with assert_raises(IndexError):
+        registry.name(3)
+    with assert_raises(KeyError):
+        registry.id('c')
+
+
+def test_lock_registry_release():
+    """ _lock.Registry releases names of collected locks """
+    registry = _lock.Registry()
+    lock = registry.lock('a/b')
+    lock2 = registry.lock('a/c')
+    assert_equals(len(registry), 3)
+
+    del lock
+    _gc.collect()
+    assert_equals(len(registry), 2)
+    with assert_raises(IndexError):
+        registry.name(0)
+    assert_equals(registry.name(lock2.root), 'a')
+
+    lock = registry.lock('d')
+    assert_equals(lock.id, 0)
+    del lock, lock2
+    _gc.collect()
+    assert_equals(len(registry), 0)
+
+
 def test_lock_validate_none():
-    """ _lock.validate returns empty list for None """
-    assert_equals([], _lock.validate(None))
+    """ _lock.validate returns empty lock set for None """
+    assert_equals((), _lock.validate(None))
 
 
 def test_lock_validate_empty():
-    """ _lock.validate returns empty list for empty sequence """
-    assert_equals([], _lock.validate(iter(())))
+    """ _lock.validate returns empty lock set for empty sequence """
+    assert_equals((), _lock.validate(iter(())))
 
 
 def test_lock_validate_happy():
-    """ _lock.validate returns ordered, squashed list of locks """
+    """ _lock.validate returns ordered, squashed set of locks """
     lock1 = _test.Bunch(name='foo', exclusive=True)
     lock2 = _test.Bunch(name='baz', exclusive=False)
     lock3 = _test.Bunch(name='foo', exclusive=True)
     lock4 = _test.Bunch(name='bar', exclusive=True)
 
     result = _lock.validate([lock1, lock2, lock3, lock4])
-    assert_equals(result, [lock4, lock2, lock1])
+    assert_equals(result, (
+        _lock.Lock('bar'), _lock.Lock('baz', False), _lock.Lock('foo'),
+    ))
+    assert_equals(type(result), _lock.LockSet)
+    assert_true(_lock.validate(result) is result)
+
+
+def test_lock_validate_foreign():
+    """ _lock.validate interns foreign lock objects """
+    class ForeignLock(object):
+        __implements__ = [_lock._interfaces.LockInterface]
+
+        def __init__(self, name, exclusive=True):
+            self.name = name
+            self.exclusive = exclusive
+
+    lock = _lock.Lock('foreign/x')
+    result = _lock.validate([ForeignLock('foreign/x', 1), lock])
+    assert_equals(len(result), 1)
+    assert_true(result[0] is lock)
+    assert_true(
+        _lock.validate([ForeignLock('foreign/y', 0)])[0] is
+        _lock.Lock('foreign/y', exclusive=False)
+    )
 
 
 def test_lock_validate_conflict():
@@ -86,3 +162,24 @@ def test_lock_validate_conflict():
 
     with assert_raises(_lock.LockConflict):
         _lock.validate([lock1, lock2, lock3, lock4])
+
+
+def test_lock_validate_hierarchy():
+    """ _lock.validate rejects locks together with their ancestors """
+    lock1 = _test.Bunch(name='db/a/1', exclusive=True)
+    lock2 = _test.Bunch(name='db-a', exclusive=True)
+    lock3 = _test.Bunch(name='db/b', exclusive=True)
+    lock4 = _test.Bunch(name='db', exclusive=True)
+
+    assert_equals([lock.name for lock in _lock.validate([
+        lock1, lock2, lock3
+    ])], ['db-a', 'db/a/1', 'db/b'])
+    with assert_raises(_lock.LockConflict) as e:
+        _lock.validate([lock1, lock2, lock4])
+    assert_equals(e.exception.args, ('db/a/1',))
+
+
+def test_lock_ancestors():
+    """ _lock.ancestors lists the lock's path prefixes """
+    assert_equals(_lock.ancestors('a/b/c'), ['a', 'a/b'])
+    assert_equals(_lock.ancestors('a'), [])
@@ -31,7 +31,7 @@ if __doc__:  # pragma: no cover
 __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
-from nose.tools import assert_equals, assert_raises
+from nose.tools import assert_equals, assert_raises, assert_true
 from .. import _util as _test
 
 from wolfe import _main
@@ -44,11 +44,63 @@ from wolfe import _main
 def test_init(junk_yard, scheduler):
     """ Main properly initializes the scheduler """
     junk_yard.JunkYard = lambda: 'blah'
-    scheduler.Scheduler = lambda x: 'blub(%r)' % x
+    scheduler.Scheduler = lambda x, metrics, **kwargs: (x, kwargs)
+    defaults = dict(
+        threadsafe=False, profile_locks=False, defer_locks=False,
+        merge_duplicates=True, limits=None, policy=None, policies=None,
+    )
 
-    result = _main.Main()._scheduler
+    def expected(**kwargs):
+        result = dict(defaults)
+        result.update(kwargs)
+        return 'blah', result
 
-    assert_equals(result, "blub('blah')")
+    main = _main.Main()
+    assert_equals(main._scheduler, expected())
+    assert_true(main.metrics is _main._metrics.NULL)
+
+    for kwargs in (dict(threadsafe=True), dict(profile_locks=True),
+                   dict(defer_locks=True), dict(merge_duplicates=False),
+                   dict(limits='limits'),
+                   dict(policy='fifo', policies={'foo': 'edf'})):
+        assert_equals(_main.Main(**kwargs)._scheduler, expected(**kwargs))
+
+    main = _main.Main(threadsafe=True, metrics=True)
+    assert_true(main.metrics.enabled)
+    assert_true(main.metrics._threadsafe)
+
+    registry = _main._metrics.Registry()
+    assert_true(_main.Main(metrics=registry).metrics is registry)
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+@_test.patch(_main, '_time', name='time')
+def test_metrics(time):
+    """ Main records API latencies """
+    main = _main.Main(metrics=True)
+    main._scheduler.execution_attempt.side_effect = \
+        {23: _test.Bunch(executor='ex1')}.get
+
+    time.time.side_effect = [
+        1.0, 1.5, 2.0, 2.25, 3.0, 4.0, 5.0, 5.125, 6.0, 6.5,
+    ]
+    main.enter_todo('todo')
+    main.request_job('exe')
+    main.finish_job('ex1', 23, 'result')
+    main.finish_and_request(_test.Bunch(uid='ex1'), 23, 'result')
+    with assert_raises(_main.InvalidExecutorError):
+        main.finish_job('ex2', 23, 'result')
+
+    assert_equals(dict(
+        (labels['method'], (value['count'], value['sum']))
+        for labels, value in main.metrics.snapshot()['wolfe_api_seconds'][2]
+    ), {
+        'enter_todo': (1, 0.5),
+        'request_job': (1, 0.25),
+        'finish_job': (2, 1.5),
+        'finish_and_request': (1, 0.125),
+    })
 
 
 @_test.patch(_main, '_junk_yard')
@@ -128,3 +180,112 @@ def test_finish_job_2(time):
     with assert_raises(_main.JobNotFoundError) as e:
         main.finish_job('ex1', 23, 'result')
     assert_equals(e.exception.args, (23,))
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_breakdown():
+    """ Main.breakdown asks the scheduler """
+    main = _main.Main()
+
+    main._scheduler.breakdown.side_effect = {23: {'run': 1.0}}.get
+
+    assert_equals(main.breakdown(23), {'run': 1.0})
+    with assert_raises(_main.JobNotFoundError) as e:
+        main.breakdown(24)
+    assert_equals(e.exception.args, (24,))
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_retry_after():
+    """ Main.retry_after asks the scheduler """
+    main = _main.Main()
+
+    main._scheduler.retry_after.side_effect = {'exe': 0.25}.get
+
+    assert_equals(main.retry_after('exe'), 0.25)
+    assert_equals(main.retry_after('other'), None)
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_set_importance():
+    """ Main.set_importance and Main.reprioritize ask the scheduler """
+    main = _main.Main()
+
+    main._scheduler.set_importance.side_effect = [True, False]
+    main._scheduler.reprioritize.side_effect = [[1, 2]]
+
+    main.set_importance(23, 5)
+    with assert_raises(_main.JobNotFoundError) as e:
+        main.set_importance(24, 5)
+    assert_equals(e.exception.args, (24,))
+
+    assert_equals(main.reprioritize(7, group='g'), [1, 2])
+    with assert_raises(ValueError):
+        main.reprioritize(7)
+    assert_equals(map(tuple, main._scheduler.reprioritize.mock_calls), [
+        ('', (7,), {'group': 'g', 'name': None}),
+    ])
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_cancel_job():
+    """ Main.cancel_job asks the scheduler """
+    main = _main.Main()
+
+    main._scheduler.execution_attempt.side_effect = {25: 'ATT'}.get
+    main._scheduler.cancel_job.side_effect = {23: [23, 26]}.get
+
+    assert_equals(main.cancel_job(23), [23, 26])
+    with assert_raises(_main.JobNotFoundError) as e:
+        main.cancel_job(24)
+    assert_equals(e.exception.args, (24,))
+    with assert_raises(_main.JobExecutingError) as e:
+        main.cancel_job(25)
+    assert_equals(e.exception.args, (25,))
+    assert_equals(map(tuple, main._scheduler.cancel_job.mock_calls), [
+        ('', (23,), {}),
+        ('', (24,), {}),
+    ])
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_expire_jobs():
+    """ Main.expire_jobs asks the scheduler """
+    main = _main.Main()
+
+    main._scheduler.expire_jobs.return_value = [23, 24]
+
+    assert_equals(main.expire_jobs(), [23, 24])
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_lock_contention():
+    """ Main.lock_contention reports the scheduler's profile """
+    main = _main.Main()
+
+    main._scheduler.contention.report.side_effect = \
+        lambda top, convoy: (top, convoy)
+
+    assert_equals(main.lock_contention(), (10, 3))
+    assert_equals(main.lock_contention(2, convoy=5), (2, 5))
+
+
+@_test.patch(_main, '_junk_yard')
+@_test.patch(_main, '_scheduler')
+def test_expected_runtime():
+    """ Main.expected_runtime and runtime_report ask the durations """
+    main = _main.Main()
+    durations = main._scheduler.durations
+
+    durations.expected.side_effect = lambda name, q: (name, q)
+    durations.report.return_value = 'REPORT'
+
+    assert_equals(main.expected_runtime('build'), ('build', None))
+    assert_equals(main.expected_runtime('build', 0.9), ('build', 0.9))
+    assert_equals(main.runtime_report(), 'REPORT')
@@ -0,0 +1,166 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==========================
+ Tests for wolfe._metrics
+==========================
+
+Tests for wolfe._metrics.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from nose.tools import assert_equals, assert_true, assert_raises
+
+from wolfe import _metrics
+
+# pylint: disable = protected-access
+
+
+def test_null():
+    """ The null registry hands out dummies """
+    registry = _metrics.NULL
+    metric = registry.counter('a', 'b', x='y')
+
+    assert_true(metric is _metrics.NULL_METRIC)
+    assert_true(registry.gauge('a', 'b') is metric)
+    assert_true(registry.histogram('a', 'b') is metric)
+    metric.inc()
+    metric.dec()
+    metric.set(3)
+    metric.observe(1.0)
+    registry.callback('c', 'd', lambda: 1)
+    assert_equals(metric.value, 0)
+    assert_equals(registry.snapshot(), {})
+    assert_equals(registry.prometheus(), '')
+
+
+def test_registry_identity():
+    """ Registry returns the same metric for the same name and labels """
+    registry = _metrics.Registry()
+
+    counter = registry.counter('c', 'help', a='1', b='2')
+    assert_true(registry.counter('c', 'other', b='2', a='1') is counter)
+    assert_true(registry.counter('c', 'help') is not counter)
+    assert_true(isinstance(registry.gauge('g', 'help'), _metrics.Gauge))
+
+    with assert_raises(ValueError):
+        registry.gauge('c', 'help')
+    with assert_raises(ValueError):
+        registry.callback('c', 'help', lambda: 1)
+    registry.callback('cb', 'help', lambda: 1)
+    with assert_raises(ValueError):
+        registry.counter('cb', 'help')
+
+
+def test_registry_threadsafe():
+    """ Thread safe registries use real locks """
+    registry = _metrics.Registry(threadsafe=True)
+    counter = registry.counter('c', 'help')
+
+    assert_true(counter._lock is not _metrics._sync.NOLOCK)
+    counter.inc(3)
+    assert_equals(counter.value, 3)
+
+
+def test_gauge():
+    """ Gauges go up and down """
+    gauge = _metrics.Gauge(_metrics._sync.NOLOCK)
+    gauge.inc(5)
+    gauge.dec(2)
+    assert_equals(gauge.value, 3)
+    gauge.set(1.5)
+    assert_equals(gauge.value, 1.5)
+
+
+def test_histogram_precision():
+    """ Histogram quantiles are within the relative error bound """
+    hist = _metrics.Histogram(_metrics._sync.NOLOCK)
+    for num in xrange(1, 100001):
+        hist.observe(num * 1e-5)
+
+    assert_equals(hist.count, 100000)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        expected = q * 1.0
+        assert_true(abs(hist.quantile(q) - expected) <= expected / 64)
+    assert_true(len(hist._buckets) < 2000)
+
+
+def test_histogram_empty():
+    """ Empty histograms report nothing """
+    hist = _metrics.Histogram(_metrics._sync.NOLOCK)
+    assert_true(hist.quantile(0.5) is None)
+    assert_equals(hist.snapshot()['buckets'], [])
+
+    hist.observe(-1)
+    assert_equals(hist.buckets(), [(0, 1, 1)])
+
+
+def test_snapshot():
+    """ Registry.snapshot collects metrics and callbacks """
+    registry = _metrics.Registry()
+    registry.counter('c', 'counter', x='1').inc()
+    registry.histogram('h', 'hist', unit=1.0).observe(3)
+    registry.callback('g', 'gauge', lambda: [
+        ({'k': 'b'}, 2), ({'k': 'a'}, 1),
+    ])
+    registry.callback('dead', 'gone', _raise_reference_error)
+
+    snap = registry.snapshot()
+    assert_equals(snap['c'], ('counter', 'counter', [({'x': '1'}, 1)]))
+    assert_equals(snap['g'], ('gauge', 'gauge', [
+        ({'k': 'a'}, 1), ({'k': 'b'}, 2),
+    ]))
+    kind, _, [(labels, value)] = snap['h']
+    assert_equals((kind, labels), ('histogram', {}))
+    assert_equals(value['count'], 1)
+    assert_equals(value['buckets'], [(4.0, 1)])
+    assert_true('dead' not in snap)
+
+
+def _raise_reference_error():
+    """ Simulate a dead weak proxy """
+    raise ReferenceError()
+
+
+def test_prometheus():
+    """ Registry.prometheus exports the text format """
+    registry = _metrics.Registry()
+    registry.counter('c', 'a\\b\nc', x='q"\n').inc()
+    hist = registry.histogram('h', 'hist', unit=1.0, m='x')
+    hist.observe(1)
+    hist.observe(3)
+
+    assert_equals(registry.prometheus().splitlines(), [
+        '# HELP c a\\\\b\\nc',
+        '# TYPE c counter',
+        'c{x="q\\"\\n"} 1',
+        '# HELP h hist',
+        '# TYPE h histogram',
+        'h_bucket{m="x",le="2.0"} 1',
+        'h_bucket{m="x",le="4.0"} 2',
+        'h_bucket{m="x",le="+Inf"} 2',
+        'h_sum{m="x"} 4.0',
+        'h_count{m="x"} 2',
+    ])
@@ -0,0 +1,101 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=======================
+ Tests for wolfe._sync
+=======================
+
+Tests for wolfe._sync.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import threading as _threading
+
+from nose.tools import assert_equals, assert_false, assert_true
+
+from wolfe import _sync
+
+# pylint: disable = protected-access
+
+
+def test_lock():
+    """ _sync.lock creates real or dummy locks """
+    assert_true(_sync.lock(False) is _sync.NOLOCK)
+
+    lock = _sync.lock(True)
+    assert_true(lock is not _sync.NOLOCK)
+    assert_true(lock is not _sync.lock(True))
+    with lock:
+        with lock:  # reentrant
+            pass
+
+
+def test_shards_dummy():
+    """ Shards only hand out dummy locks if not thread safe """
+    shards = _sync.Shards(False)
+
+    assert_true(shards._locks is None)
+    assert_true(shards[1] is _sync.NOLOCK)
+    assert_true(shards.guard([1, 2, 3]) is _sync.NOLOCK)
+
+
+def test_shards_select():
+    """ Shards select locks by hashing the key """
+    shards = _sync.Shards(True, 3)
+
+    assert_equals(len(shards._locks), 3)
+    assert_true(shards[0] is shards._locks[0])
+    assert_true(shards[4] is shards._locks[1])
+    assert_true(shards[5] is shards._locks[2])
+    assert_equals(len(_sync.Shards(True)._locks), _sync.SHARDS)
+
+
+def test_shards_guard():
+    """ Shards.guard acquires unique locks in shard order """
+    shards = _sync.Shards(True, 4)
+    guard = shards.guard([7, 1, 3, 5])
+
+    assert_equals(guard._locks, [shards._locks[1], shards._locks[3]])
+
+
+def test_shards_guard_excludes():
+    """ Shards.guard blocks other threads """
+    shards = _sync.Shards(True, 4)
+    result = []
+
+    def other():
+        result.append(shards[3].acquire(False))
+
+    with shards.guard([3]):
+        thread = _threading.Thread(target=other)
+        thread.start()
+        thread.join()
+    assert_false(result[0])
+
+    del result[:]
+    thread = _threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    assert_true(result[0])
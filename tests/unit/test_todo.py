@@ -32,7 +32,7 @@ __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
 
-from nose.tools import assert_equals
+from nose.tools import assert_equals, assert_true
 from .. import _util as _test
 
 from wolfe import _todo
@@ -57,8 +57,10 @@ def test_todo_init_minimal(constants, lock):
         'desc': 'DESC',
         'group': 'some group',
         'importance': 23,
+        'dedup_key': None,
         'locks': [],
         'not_before': None,
+        'not_after': None,
     })
 
 
@@ -88,8 +90,10 @@ def test_todo_init_maximal(constants, lock):
         'desc': 'DESCX',
         'group': 'another group',
         'importance': 2,
+        'dedup_key': None,
         'locks': ['krass', 'krasser'],
         'not_before': not_before,
+        'not_after': None,
     })
     assert_equals(other, [todo])
 
@@ -122,8 +126,10 @@ def test_todo_init_int_delay(dt, constants, lock):
         'desc': 'DESCX',
         'group': 'another group',
         'importance': 2,
+        'dedup_key': None,
         'locks': ['krass', 'krasser'],
         'not_before': 29,
+        'not_after': None,
     })
     assert_equals(other, [todo])
 
@@ -156,12 +162,33 @@ def test_todo_init_int_minus_delay(dt, constants, lock):
         'desc': 'DESCX',
         'group': 'another group',
         'importance': 2,
+        'dedup_key': None,
         'locks': ['krass', 'krasser'],
         'not_before': 0,
+        'not_after': None,
     })
     assert_equals(other, [todo])
 
 
+@_test.patch(_todo, '_dt', name='dt')
+@_test.patch(_todo, '_constants', name='constants')
+@_test.patch(_todo, '_lock', name='lock')
+def test_todo_init_int_deadline(dt, constants, lock):
+    """ Todo properly initializes will integer deadline """
+    dt.datetime.utcnow.side_effect = [12, 14]
+    dt.timedelta.side_effect = lambda seconds=None: seconds
+    constants.Group.DEFAULT = 'some group xx'
+    constants.Importance.DEFAULT = 24
+    lock.validate.side_effect = lambda x: list(x or ())
+
+    todo = _todo.Todo("DESCX", not_before=17, not_after=-3)
+    assert_equals(todo.not_before, 29)
+    assert_equals(todo.not_after, 14)
+
+    todo = _todo.Todo("DESCX", not_after=object)
+    assert_true(todo.not_after is object)
+
+
 @_test.patch(_todo, '_constants', name='constants')
 @_test.patch(_todo, '_lock', name='lock')
 def test_todo_on_success(constants, lock):
@@ -248,7 +275,9 @@ def test_desc_todo(todo_mock, lock):
             'group': 6,
             'importance': 5,
             'locks': [4, 8],
-            'not_before': None
+            'not_before': None,
+            'dedup_key': None,
+            'not_after': None,
         }
     )])
 
@@ -263,7 +292,8 @@ def test_desc_todo_override_defaults(todo_mock, lock):
     desc = _todo.TodoDescription("DESC", locks=(4, 8), importance=5, group=6)
 
     todo = desc.todo(
-        depends_on=18, locks=[20, 22], importance=23, group=24, not_before=28
+        depends_on=18, locks=[20, 22], importance=23, group=24, not_before=28,
+        dedup_key='KEY', not_after=30,
     )
 
     assert_equals(todo, 'lala')
@@ -275,6 +305,8 @@ def test_desc_todo_override_defaults(todo_mock, lock):
             'group': 24,
             'importance': 23,
             'locks': [20, 22],
-            'not_before': 28
+            'not_before': 28,
+            'dedup_key': 'KEY',
+            'not_after': 30,
         }
     )])
@@ -41,6 +41,10 @@ from wolfe._execution import Executor  # noqa
 from wolfe._lock import Lock  # noqa
 from wolfe._todo import Todo, TodoDescription  # noqa
 from wolfe._main import Main  # noqa
+from wolfe.scheduler import (  # noqa
+    Policy, FifoPolicy, PriorityPolicy, AgingPolicy, DeadlinePolicy,
+    CriticalPathPolicy, DependentsPolicy, SeptPolicy, Limits,
+)
 
 #: Version of the wolfe package
 version = _version.Version(*__version__)
@@ -0,0 +1,637 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==============
+ Binary Codec
+==============
+
+Compact binary serialization of todo graphs, jobs and plain values.
+
+Every message starts with a header: the magic byte ``W``, a kind byte
+(``T`` for todo graphs, ``J`` for jobs, ``V`` for plain values) and the
+format version. Integers are stored as varints (signed ones zigzag encoded).
+Names (description, group, lock and executor names) and todo descriptions
+are interned per message: the first occurrence is stored literally, later
+ones refer to it by index. Job dependencies are stored relative to the
+job's ID.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import datetime as _dt
+import struct as _struct
+
+from ._exceptions import DecodeError
+from . import _execution
+from . import _lock
+from . import _todo
+from .scheduler import _job
+
+#: Format version
+#:
+#: :Type: ``int``
+VERSION = 3
+
+_TODO, _JOB, _VALUE = 'T', 'J', 'V'
+
+# value tags
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _UNICODE, _LIST, _TUPLE, _DICT, \
+    _DATETIME = map(chr, xrange(11))
+
+_DOUBLE = _struct.Struct('!d')
+
+
+class _Writer(object):
+    """
+    Message writer
+
+    :IVariables:
+      `_out` : ``list``
+        Output chunks
+
+      `_names` : ``dict``
+        Interned names (``{(type, name): index}``)
+
+      `_descs` : ``dict``
+        Interned descriptions (``{id(desc): index}``)
+    """
+
+    def __init__(self, kind):
+        """
+        Initialization
+
+        :Parameters:
+          `kind` : ``str``
+            Message kind
+        """
+        self._out = ['W', kind, chr(VERSION)]
+        self._names = {}
+        self._descs = {}
+
+    def getvalue(self):
+        """
+        Retrieve the message
+
+        :Return: The encoded message
+        :Rtype: ``str``
+        """
+        return ''.join(self._out)
+
+    def uint(self, value):
+        """ Write unsigned varint """
+        out = self._out
+        while value > 0x7F:
+            out.append(chr(0x80 | (value & 0x7F)))
+            value >>= 7
+        out.append(chr(value))
+
+    def sint(self, value):
+        """ Write signed (zigzag) varint """
+        self.uint(value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+    def bytes(self, value):
+        """ Write length prefixed string """
+        self.uint(len(value))
+        self._out.append(value)
+
+    def value(self, value):
+        """
+        Write plain value
+
+        :Exceptions:
+          - `TypeError` : Unsupported type
+        """
+        # pylint: disable = too-many-branches
+        out = self._out
+        if value is None:
+            out.append(_NONE)
+        elif value is False:
+            out.append(_FALSE)
+        elif value is True:
+            out.append(_TRUE)
+        elif isinstance(value, (int, long)):
+            out.append(_INT)
+            self.sint(value)
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out.append(_DOUBLE.pack(value))
+        elif isinstance(value, str):
+            out.append(_STR)
+            self.bytes(value)
+        elif isinstance(value, unicode):
+            out.append(_UNICODE)
+            self.bytes(value.encode('utf-8'))
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST if isinstance(value, list) else _TUPLE)
+            self.uint(len(value))
+            for item in value:
+                self.value(item)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            self.uint(len(value))
+            for key, item in value.iteritems():
+                self.value(key)
+                self.value(item)
+        elif isinstance(value, _dt.datetime):
+            if value.tzinfo is not None:
+                value = (value - value.utcoffset()).replace(tzinfo=None)
+            out.append(_DATETIME)
+            for item in (value.year, value.month, value.day, value.hour,
+                         value.minute, value.second, value.microsecond):
+                self.uint(item)
+        else:
+            raise TypeError("Cannot encode %r" % (value,))
+
+    def name(self, value):
+        """ Write interned name """
+        key = type(value), value
+        try:
+            self.uint(self._names[key] + 1)
+        except KeyError:
+            self._names[key] = len(self._names)
+            self.uint(0)
+            self.value(value)
+
+    def locks(self, locks):
+        """ Write lock list (or ``None``) """
+        if locks is None:
+            self.uint(0)
+            return
+        self.uint(len(locks) + 1)
+        for lock in locks:
+            self._out.append(_TRUE if lock.exclusive else _FALSE)
+            self.name(lock.name)
+
+    def desc(self, desc):
+        """ Write interned todo description """
+        try:
+            self.uint(self._descs[id(desc)] + 1)
+        except KeyError:
+            self._descs[id(desc)] = len(self._descs)
+            self.uint(0)
+            self.name(desc.name)
+            self.locks(desc.locks)
+            self.value(desc.importance)
+            self.name(desc.group)
+
+
+class _Reader(object):
+    """
+    Message reader
+
+    :IVariables:
+      `_data` : ``str``
+        The message
+
+      `_pos` : ``int``
+        Current read position
+
+      `_names` : ``list``
+        Interned names
+
+      `_descs` : ``list``
+        Interned descriptions
+    """
+
+    def __init__(self, data, kind):
+        """
+        Initialization
+
+        :Parameters:
+          `data` : ``str``
+            The message
+
+          `kind` : ``str``
+            Expected message kind
+
+        :Exceptions:
+          - `DecodeError` : Invalid header
+        """
+        if data[:2] != 'W' + kind:
+            raise DecodeError("Invalid message header")
+        if data[2:3] != chr(VERSION):
+            raise DecodeError("Unsupported version: %r" % (data[2:3],))
+        self._data = data
+        self._pos = 3
+        self._names = []
+        self._descs = []
+
+    def done(self):
+        """
+        Check that the message was read completely
+
+        :Exceptions:
+          - `DecodeError` : Trailing data
+        """
+        if self._pos != len(self._data):
+            raise DecodeError("Trailing data")
+
+    def read(self, size):
+        """ Read raw bytes """
+        pos = self._pos
+        end = pos + size
+        if end > len(self._data):
+            raise DecodeError("Truncated message")
+        self._pos = end
+        return self._data[pos:end]
+
+    def uint(self):
+        """ Read unsigned varint """
+        data, pos = self._data, self._pos
+        result = shift = 0
+        try:
+            while True:
+                byte = ord(data[pos])
+                pos += 1
+                result |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+        except IndexError:
+            raise DecodeError("Truncated message")
+        self._pos = pos
+        return result
+
+    def sint(self):
+        """ Read signed (zigzag) varint """
+        value = self.uint()
+        return -((value + 1) >> 1) if value & 1 else value >> 1
+
+    def bytes(self):
+        """ Read length prefixed string """
+        return self.read(self.uint())
+
+    def value(self):
+        """ Read plain value """
+        tag = self.read(1)
+        read = _VALUE_READERS.get(tag)
+        if read is None:
+            raise DecodeError("Invalid tag: %r" % (tag,))
+        return read(self)
+
+    def float(self):
+        """ Read double """
+        return _DOUBLE.unpack(self.read(_DOUBLE.size))[0]
+
+    def unicode(self):
+        """ Read length prefixed UTF-8 string """
+        try:
+            return self.bytes().decode('utf-8')
+        except UnicodeError as e:
+            raise DecodeError(str(e))
+
+    def list(self):
+        """ Read list of plain values """
+        return [self.value() for _ in xrange(self.uint())]
+
+    def tuple(self):
+        """ Read tuple of plain values """
+        return tuple(self.list())
+
+    def dict(self):
+        """ Read dict of plain values """
+        result = {}
+        for _ in xrange(self.uint()):
+            key = self.value()
+            try:
+                result[key] = self.value()
+            except TypeError:
+                raise DecodeError("Unhashable key: %r" % (key,))
+        return result
+
+    def datetime(self):
+        """ Read naive datetime """
+        try:
+            return _dt.datetime(*[self.uint() for _ in xrange(7)])
+        except ValueError as e:
+            raise DecodeError(str(e))
+
+    def name(self):
+        """ Read interned name """
+        index = self.uint()
+        if index:
+            try:
+                return self._names[index - 1]
+            except IndexError:
+                raise DecodeError("Invalid name reference: %r" % (index,))
+        value = self.value()
+        self._names.append(value)
+        return value
+
+    def locks(self):
+        """ Read lock list (or ``None``) """
+        count = self.uint()
+        if not count:
+            return None
+        locks = []
+        for _ in xrange(count - 1):
+            exclusive = self.read(1) != _FALSE
+            locks.append(_lock.Lock(self.name(), exclusive))
+        return locks
+
+    def desc(self):
+        """ Read interned todo description """
+        index = self.uint()
+        if index:
+            try:
+                return self._descs[index - 1]
+            except IndexError:
+                raise DecodeError(
+                    "Invalid description reference: %r" % (index,)
+                )
+        name = self.name()
+        locks = self.locks()
+        desc = _todo.TodoDescription(
+            name, locks=locks, importance=self.value(), group=self.name()
+        )
+        self._descs.append(desc)
+        return desc
+
+
+# Plain value readers by tag
+_VALUE_READERS = {
+    _NONE: lambda reader: None,
+    _FALSE: lambda reader: False,
+    _TRUE: lambda reader: True,
+    _INT: _Reader.sint,
+    _FLOAT: _Reader.float,
+    _STR: _Reader.bytes,
+    _UNICODE: _Reader.unicode,
+    _LIST: _Reader.list,
+    _TUPLE: _Reader.tuple,
+    _DICT: _Reader.dict,
+    _DATETIME: _Reader.datetime,
+}
+
+
+def dumps(value):
+    """
+    Encode a plain value
+
+    Supported are ``None``, ``bool``, ``int``, ``long``, ``float``, ``str``,
+    ``unicode``, ``list``, ``tuple``, ``dict`` and ``datetime.datetime``.
+    Time zone aware datetimes are converted to naive UTC.
+
+    >>> loads(dumps({'a': [1, -2, (u'x', None)]}))
+    {'a': [1, -2, (u'x', None)]}
+
+    :Parameters:
+      `value` : any
+        The value
+
+    :Return: The encoded value
+    :Rtype: ``str``
+
+    :Exceptions:
+      - `TypeError` : Unsupported type
+    """
+    writer = _Writer(_VALUE)
+    writer.value(value)
+    return writer.getvalue()
+
+
+def loads(data):
+    """
+    Decode a plain value
+
+    :Parameters:
+      `data` : ``str``
+        The encoded value as created by `dumps`
+
+    :Return: The value
+    :Rtype: any
+
+    :Exceptions:
+      - `DecodeError` : Invalid data
+    """
+    reader = _Reader(data, _VALUE)
+    value = reader.value()
+    reader.done()
+    return value
+
+
+def encode_todo(todo):
+    """
+    Encode a todo graph
+
+    The nodes are stored in breadth-first order, the root node first.
+    Successors are stored as node indexes relative to their predecessor's.
+
+    :Parameters:
+      `todo` : `Todo`
+        The root todo
+
+    :Return: The encoded graph
+    :Rtype: ``str``
+
+    :Exceptions:
+      - `TypeError` : Unsupported value type
+    """
+    todos, index = [todo], {id(todo): 0}
+    for node in todos:
+        for succ in node.successors():
+            if id(succ) not in index:
+                index[id(succ)] = len(todos)
+                todos.append(succ)
+
+    writer = _Writer(_TODO)
+    writer.uint(len(todos))
+    for idx, node in enumerate(todos):
+        writer.desc(node.desc)
+        writer.locks(node.locks)
+        writer.value(node.importance)
+        writer.name(node.group)
+        writer.value(node.not_before or None)
+        writer.value(node.dedup_key)
+        writer.value(node.not_after)
+
+        predecessors = node.predecessors()
+        writer.uint(len(predecessors))
+        for job_id in predecessors:
+            writer.uint(job_id)
+
+        successors = node.successors()
+        writer.uint(len(successors))
+        for succ in successors:
+            writer.sint(index[id(succ)] - idx)
+
+    return writer.getvalue()
+
+
+def decode_todo(data):
+    """
+    Decode a todo graph
+
+    :Parameters:
+      `data` : ``str``
+        The encoded graph as created by `encode_todo`
+
+    :Return: The root todo
+    :Rtype: `Todo`
+
+    :Exceptions:
+      - `DecodeError` : Invalid data
+    """
+    reader = _Reader(data, _TODO)
+    count = reader.uint()
+    if not count:
+        raise DecodeError("Empty todo graph")
+
+    todos, links = [], []
+    for idx in xrange(count):
+        desc = reader.desc()
+        locks = reader.locks()
+        importance = reader.value()
+        group = reader.name()
+        not_before = reader.value()
+        dedup_key = reader.value()
+        not_after = reader.value()
+        predecessors = [reader.uint() for _ in xrange(reader.uint())]
+        if 0 in predecessors:
+            raise DecodeError("Invalid predecessor")
+        links.append([idx + reader.sint() for _ in xrange(reader.uint())])
+        todos.append(_todo.Todo(
+            desc, depends_on=predecessors, locks=locks,
+            importance=importance, group=group, not_before=not_before,
+            dedup_key=dedup_key, not_after=not_after,
+        ))
+    reader.done()
+
+    for todo, successors in zip(todos, links):
+        for idx in successors:
+            if not 0 <= idx < count:
+                raise DecodeError("Invalid successor reference")
+            todo.on_success(todos[idx])
+    return todos[0]
+
+
+def encode_job(job):
+    """
+    Encode a job
+
+    The runtime state (the waiting counters) is not stored.
+
+    :Parameters:
+      `job` : `JobInterface`
+        The job
+
+    :Return: The encoded job
+    :Rtype: ``str``
+
+    :Exceptions:
+      - `TypeError` : Unsupported value type
+    """
+    writer = _Writer(_JOB)
+    writer.uint(job.id)
+    writer.desc(job.desc)
+    writer.name(job.group)
+    writer.locks(job.locks)
+    writer.value(job.importance)
+    writer.value(job.not_before or None)
+    writer.value(job.extra)
+    writer.value(job.dedup_key)
+    writer.value(job.not_after)
+
+    last = job.id
+    writer.uint(len(job.predecessors))
+    for job_id in sorted(job.predecessors, reverse=True):
+        writer.uint(last - job_id)
+        last = job_id
+
+    writer.uint(len(job.attempts))
+    for attempt in job.attempts:
+        writer.name(attempt.executor)
+        writer.value(attempt.start)
+        writer.value(attempt.end)
+        result = attempt.result
+        if result is None:
+            writer.value(None)
+        else:
+            exit_code = getattr(result, 'exit_code', None)
+            if exit_code is None:
+                exit_code = int(bool(result.failed))
+            writer.value([
+                exit_code,
+                getattr(result, 'stdout', None),
+                getattr(result, 'stderr', None),
+            ])
+
+    return writer.getvalue()
+
+
+def decode_job(data):
+    """
+    Decode a job
+
+    :Parameters:
+      `data` : ``str``
+        The encoded job as created by `encode_job`
+
+    :Return: The job
+    :Rtype: `JobInterface`
+
+    :Exceptions:
+      - `DecodeError` : Invalid data
+    """
+    reader = _Reader(data, _JOB)
+    job_id = reader.uint()
+    desc = reader.desc()
+    group = reader.name()
+    locks = reader.locks()
+    importance = reader.value()
+    not_before = reader.value()
+    extra = reader.value()
+    dedup_key = reader.value()
+    not_after = reader.value()
+
+    last, predecessors = job_id, []
+    for _ in xrange(reader.uint()):
+        last -= reader.uint()
+        predecessors.append(last)
+
+    attempts = []
+    for _ in xrange(reader.uint()):
+        # Attempts are restored as they were, without starting a new one
+        attempt = _execution.Attempt.__new__(_execution.Attempt)
+        attempt.executor = reader.name()
+        attempt.start = reader.value()
+        attempt.end = reader.value()
+        result = reader.value()
+        if result is None:
+            attempt.result = None
+        else:
+            try:
+                attempt.result = _execution.Result(*result)
+            except TypeError:
+                raise DecodeError("Invalid result")
+        attempts.append(attempt)
+    reader.done()
+
+    try:
+        return _job.Job(
+            job_id, desc, group, locks, importance, not_before, extra,
+            predecessors, attempts, dedup_key, not_after,
+        )
+    except ValueError as e:
+        raise DecodeError(str(e))
@@ -55,6 +55,14 @@ class DependencyCycle(DependencyError):
     """
 
 
+class DependencyCancelled(DependencyError):
+    """
+    Dependencies refer to cancelled jobs
+
+    The exception argument contains the IDs of the cancelled jobs as a list
+    """
+
+
 class JobNotFoundError(Error):
     """ The job was not found """
 
@@ -63,6 +71,27 @@ class InvalidExecutorError(Error):
     """ A job was finished by a different executor than it was started """
 
 
+class JobExecutingError(Error):
+    """ The job is being executed right now """
+
+
+class DecodeError(Error):
+    """ Serialized data could not be decoded """
+
+
+class ProtocolError(Error):
+    """ The dispatcher protocol was violated """
+
+
+class RemoteError(Error):
+    """
+    The dispatcher failed with an unexpected exception
+
+    The exception arguments contain the remote exception name and its
+    arguments.
+    """
+
+
 class Warning(Warning):  # noqa pylint: disable = redefined-builtin, undefined-variable
     """
     Base warning for this package
@@ -24,6 +24,16 @@ r"""
 =======
 
 Lock containers.
+
+Lock names are paths. Segments are separated by `SEPARATOR`, for example
+``db/customers/shard3``. A lock conflicts with its ancestors (``db``,
+``db/customers``) and its descendants (``db/customers/shard3/row1``). Flat
+names are just paths with a single segment.
+
+`Lock` objects are flyweights. They are interned by the `REGISTRY`, which
+also maps lock names to small integers. The lock manager keys its
+bookkeeping by these integers. Locks are interned weakly. Once a lock is
+gone, its name is released and the ID may be reused for another name.
 """
 if __doc__:  # pragma: no cover
     # pylint: disable = redefined-builtin
@@ -32,24 +42,270 @@ __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
 import operator as _op
+import threading as _threading
+import weakref as _weakref
 
 from ._exceptions import LockConflict
 from . import interfaces as _interfaces
 
+#: Lock path separator
+#:
+#: :Type: ``str``
+SEPARATOR = '/'
+
+
+class Registry(object):
+    """
+    Lock name registry
+
+    Every interned lock references the IDs of its name and of its top level
+    path segment. IDs without references are released and reused.
+
+    >>> registry = Registry()
+    >>> lock = registry.lock('db/customers')
+    >>> lock.id, lock.root, registry.id('db'), registry.name(0)
+    (0, 1, 1, 'db/customers')
+    >>> registry.lock('db/customers', exclusive=1) is lock
+    True
+    >>> del lock
+    >>> len(registry)
+    0
+
+    :IVariables:
+      `_ids` : ``dict``
+        Mapping of lock names to IDs
+
+      `_names` : ``list``
+        Lock names by ID (``None`` for released IDs)
+
+      `_refs` : ``list``
+        Reference counts by ID
+
+      `_unused` : ``list``
+        Released IDs
+
+      `_locks` : ``dict``
+        Mapping of ``(name, exclusive)`` to weak references of interned
+        `Lock` instances
+
+      `_dead` : ``list``
+        Weak references of collected locks, which are not released yet
+
+      `_mutex` : ``threading.Lock``
+        Lock guarding registrations and releases
+    """
+
+    def __init__(self):
+        """ Initialization """
+        self._ids = {}
+        self._names = []
+        self._refs = []
+        self._unused = []
+        self._locks = {}
+        self._dead = []
+        self._mutex = _threading.Lock()
+
+    def __len__(self):
+        """
+        Count the registered names
+
+        :Return: The number of names
+        :Rtype: ``int``
+        """
+        with self._mutex:
+            self._collect()
+            return len(self._ids)
+
+    def id(self, name):
+        """
+        Find the ID of a registered lock name
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+        :Return: The lock ID
+        :Rtype: ``int``
+
+        :Exceptions:
+          - `KeyError` : Unknown name
+        """
+        return self._ids[name]
+
+    def name(self, lock_id):
+        """
+        Find the name of a lock ID
+
+        :Parameters:
+          `lock_id` : ``int``
+            Lock ID
+
+        :Return: The lock name
+        :Rtype: ``str``
+
+        :Exceptions:
+          - `IndexError` : Unknown ID
+        """
+        name = self._names[lock_id]
+        if name is None:
+            raise IndexError(lock_id)
+        return name
+
+    def lock(self, name, exclusive=True):
+        """
+        Find the interned lock, create if needed
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `exclusive` : ``bool``
+            Does this lock has to be exclusive?
+
+        :Return: The lock
+        :Rtype: `Lock`
+        """
+        key = name, bool(exclusive)
+        ref = self._locks.get(key)
+        lock = ref and ref()
+        if lock is None:
+            with self._mutex:
+                self._collect()
+                ref = self._locks.get(key)
+                lock = ref and ref()
+                if lock is None:
+                    lock = object.__new__(Lock)
+                    lock.name, lock.exclusive = key
+                    lock.id = self._acquire(name)
+                    lock.root = self._acquire(name.split(SEPARATOR, 1)[0])
+                    self._locks[key] = _LockRef(lock, self._dead.append)
+        return lock
+
+    def _acquire(self, name):
+        """
+        Reference the ID of a lock name, register if needed
+
+        The caller has to hold `_mutex`.
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+        :Return: The lock ID
+        :Rtype: ``int``
+        """
+        lock_id = self._ids.get(name)
+        if lock_id is None:
+            if self._unused:
+                lock_id = self._unused.pop()
+                self._names[lock_id] = name
+            else:
+                lock_id = len(self._names)
+                self._names.append(name)
+                self._refs.append(0)
+            self._ids[name] = lock_id
+        self._refs[lock_id] += 1
+        return lock_id
+
+    def _release(self, lock_id):
+        """
+        Dereference a lock ID, release if unused
+
+        The caller has to hold `_mutex`.
+
+        :Parameters:
+          `lock_id` : ``int``
+            Lock ID
+        """
+        self._refs[lock_id] -= 1
+        if not self._refs[lock_id]:
+            del self._ids[self._names[lock_id]]
+            self._names[lock_id] = None
+            self._unused.append(lock_id)
+
+    def _collect(self):
+        """
+        Release the IDs of collected locks
+
+        The weak reference callbacks only queue the references, because they
+        may run anywhere, even while `_mutex` is held. The caller has to hold
+        `_mutex`.
+        """
+        while self._dead:
+            ref = self._dead.pop()
+            if self._locks.get(ref.key) is ref:
+                del self._locks[ref.key]
+            self._release(ref.lock_id)
+            self._release(ref.root)
+
+
+class _LockRef(_weakref.ref):
+    """
+    Weak reference of an interned lock
+
+    :IVariables:
+      `key` : ``tuple``
+        Interning key (``(name, exclusive)``)
+
+      `lock_id` : ``int``
+        ID of the lock name
+
+      `root` : ``int``
+        ID of the top level path segment
+    """
+    __slots__ = ('key', 'lock_id', 'root')
+
+    def __init__(self, lock, callback):
+        """
+        Initialization
+
+        :Parameters:
+          `lock` : `Lock`
+            The lock
+
+          `callback` : callable
+            Called with the reference, after the lock was collected
+        """
+        super(_LockRef, self).__init__(lock, callback)
+        self.key = lock.name, lock.exclusive
+        self.lock_id = lock.id
+        self.root = lock.root
+
+
+#: Global lock registry
+#:
+#: :Type: `Registry`
+REGISTRY = Registry()
+
 
 class Lock(object):
     """
     Lock container
 
+    Instances are interned: Constructing a lock with the same name and
+    exclusiveness yields the same object.
+
+    >>> Lock('db') is Lock('db')
+    True
+    >>> Lock('db/customers').root == Lock('db').id
+    True
+
     :See: `interfaces.LockInterface`
+
+    :IVariables:
+      `id` : ``int``
+        Lock ID
+
+      `root` : ``int``
+        ID of the top level path segment
     """
     __implements__ = [_interfaces.LockInterface]
 
-    __slots__ = ('name', 'exclusive')
+    __slots__ = ('name', 'exclusive', 'id', 'root', '__weakref__')
 
-    def __init__(self, name, exclusive=True):
+    def __new__(cls, name, exclusive=True):
         """
-        Initialization
+        Construction
 
         :Parameters:
           `name` : ``str``
@@ -57,28 +313,78 @@ class Lock(object):
 
           `exclusive` : ``bool``
             Does this lock has to be exclusive? Default: true
+
+        :Return: The interned lock
+        :Rtype: `Lock`
+        """
+        return REGISTRY.lock(name, exclusive)
+
+    def __reduce__(self):
+        """
+        Pickle support (unpickled locks are interned as well)
+
+        :Return: Reconstruction information
+        :Rtype: ``tuple``
         """
-        self.name = name
-        self.exclusive = bool(exclusive)
+        return Lock, (self.name, self.exclusive)
+
+
+class LockSet(tuple):
+    """
+    Validated and ordered sequence of locks
+
+    `validate` returns lock sets and passes them through unchanged. They are
+    handed on from todo descriptions to todos and jobs without validating and
+    sorting them again.
+    """
+    __slots__ = ()
+
+
+def ancestors(name):
+    """
+    Determine the ancestors of a lock name
+
+    >>> ancestors('db/customers/shard3')
+    ['db', 'db/customers']
+    >>> ancestors('db')
+    []
+
+    :Parameters:
+      `name` : ``str``
+        Lock name
+
+    :Return: List of ancestor names, top level first
+    :Rtype: ``list``
+    """
+    segments = name.split(SEPARATOR)
+    return [
+        SEPARATOR.join(segments[:idx]) for idx in xrange(1, len(segments))
+    ]
 
 
 def validate(locks):
     """
     Validate locks and order by name
 
+    A set of locks containing a lock together with one of its ancestors
+    conflicts with itself. Lock objects other than `Lock` instances are
+    replaced by the interned `Lock` of the same name and exclusiveness.
+
     :Parameters:
       `locks` : iterable
         List of locks (``[LockInterface, ...]``). Empty iterables or ``None``
         result in an empty result list
 
-    :Return: Validated and ordered locks
-    :Rtype: ``list``
+    :Return: Validated and ordered locks (`Lock` instances)
+    :Rtype: `LockSet`
 
     :Exceptions:
       - `LockConflict` : Conflicting locks were provided
     """
     if locks is None:
-        return []
+        return _EMPTY
+    elif type(locks) is LockSet:  # pylint: disable = unidiomatic-typecheck
+        return locks
 
     locks = list(locks)
     result = []
@@ -97,6 +403,17 @@ def validate(locks):
                 raise LockConflict(lock.name)
             continue  # pragma: no cover (coverage.py doesn't get this line)
         last = lock.name, excl
+        if type(lock) is not Lock:  # pylint: disable = unidiomatic-typecheck
+            lock = REGISTRY.lock(lock.name, excl)
         result.append(lock)
 
-    return result
+    names = set(lock.name for lock in result)
+    for lock in result:
+        for name in ancestors(lock.name):
+            if name in names:
+                raise LockConflict(lock.name)
+
+    return LockSet(result)
+
+
+_EMPTY = LockSet()
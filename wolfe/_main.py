@@ -33,8 +33,10 @@ __docformat__ = "restructuredtext en"
 
 import time as _time
 
-from ._exceptions import InvalidExecutorError, JobNotFoundError
+from ._exceptions import InvalidExecutorError, JobExecutingError, \
+    JobNotFoundError
 from . import _junk_yard
+from . import _metrics
 from . import scheduler as _scheduler
 
 
@@ -43,13 +45,74 @@ class Main(object):
     Main API
 
     :IVariables:
+      `metrics` : `_metrics.Registry`
+        Metrics registry. Use its ``snapshot`` or ``prometheus`` methods to
+        inspect the system.
+
       `_scheduler` : `Scheduler`
         actual job manager
     """
 
-    def __init__(self):
-        """ Initialization """
-        self._scheduler = _scheduler.Scheduler(_junk_yard.JunkYard())
+    def __init__(self, threadsafe=False, metrics=False, profile_locks=False,
+                 defer_locks=False, merge_duplicates=True, limits=None,
+                 policy=None, policies=None):
+        """
+        Initialization
+
+        :Parameters:
+          `threadsafe` : ``bool``
+            Allow concurrent calls from multiple threads? Default: false
+
+          `metrics` : ``bool`` or `_metrics.Registry`
+            Record metrics? If a registry is passed, it's used for recording.
+            Default: false
+
+          `profile_locks` : ``bool``
+            Profile lock contention? See `lock_contention`. Default: false
+
+          `defer_locks` : ``bool``
+            Acquire job locks when the job is handed out to an executor
+            instead of when it's queued? Queued jobs do not block other
+            jobs' locks then. Default: false
+
+          `merge_duplicates` : ``bool``
+            When a todo is dropped, because a job with the same deduplication
+            key is pending, pass the todo's importance and scheduling time on
+            to the pending job, if they are higher or earlier? Default: true
+
+          `limits` : `Limits`
+            Dispatch limits per group and todo description name: fair share
+            weights of groups served by the same executors, maximum numbers
+            of jobs executed at the same time, dispatch rates (see
+            `retry_after`) and the group to move expired jobs into (see
+            `expire_jobs`). Default: ``None`` (unlimited)
+
+          `policy` : `SchedulingPolicyInterface`
+            Default scheduling policy of the groups, for example an
+            `AgingPolicy`, a `FifoPolicy` or a custom implementation.
+            Default: ``None`` (a `PriorityPolicy`)
+
+          `policies` : ``dict``
+            Scheduling policies per group (``{name: policy, ...}``), for
+            example a `DeadlinePolicy` for groups ordered by earliest
+            deadline first. They take precedence over `policy`. Default:
+            ``None`` (all groups use the default policy)
+        """
+        if metrics is True:
+            metrics = _metrics.Registry(threadsafe=threadsafe)
+        elif not metrics:
+            metrics = _metrics.NULL
+        self.metrics = metrics
+        self._scheduler = _scheduler.Scheduler(
+            _junk_yard.JunkYard(), threadsafe=threadsafe, metrics=metrics,
+            profile_locks=profile_locks, defer_locks=defer_locks,
+            merge_duplicates=merge_duplicates, limits=limits,
+            policy=policy, policies=policies,
+        )
+        self._latency = dict((name, metrics.histogram(
+            'wolfe_api_seconds', "API call latency", method=name
+        )) for name in ('enter_todo', 'request_job', 'finish_job',
+                        'finish_and_request'))
 
     def enter_todo(self, todo):
         """
@@ -60,10 +123,22 @@ class Main(object):
             The todo
 
         :Return: The assigned job ID. If the passed todo is actually a todo
-                 tree, the root job ID is returned
+                 tree, the root job ID is returned. If the todo was
+                 deduplicated, the ID of the pending job is returned.
         :Rtype: ``int``
+
+        :Exceptions:
+          - `DependencyCycle` : The todo graph contains a cycle
+          - `DependencyCancelled` : The todo (graph) depends on cancelled
+            jobs
         """
-        return self._scheduler.enter_todo(todo)
+        if not self.metrics.enabled:
+            return self._scheduler.enter_todo(todo)
+        start = _time.time()
+        try:
+            return self._scheduler.enter_todo(todo)
+        finally:
+            self._latency['enter_todo'].observe(_time.time() - start)
 
     def request_job(self, executor):
         """
@@ -73,7 +148,32 @@ class Main(object):
           `executor` : `ExecutorInterface`
             Executor requesting a job
         """
-        return self._scheduler.request_job(executor)
+        if not self.metrics.enabled:
+            return self._scheduler.request_job(executor)
+        start = _time.time()
+        try:
+            return self._scheduler.request_job(executor)
+        finally:
+            self._latency['request_job'].observe(_time.time() - start)
+
+    def retry_after(self, executor):
+        """
+        Find out when to request a job again
+
+        If `request_job` returned nothing, because the executor's groups ran
+        out of rate limit tokens, executors can sleep that long instead of
+        polling.
+
+        :Parameters:
+          `executor` : `ExecutorInterface`
+            Executor requesting jobs
+
+        :Return: Number of seconds until the next rate limit token of any of
+                 the executor's groups with queued jobs is available, or
+                 ``None``, if none of them is rate limited
+        :Rtype: ``float``
+        """
+        return self._scheduler.retry_after(executor)
 
     def finish_job(self, ex_id, job_id, result):
         """
@@ -90,10 +190,242 @@ class Main(object):
             Execution result
         """
         end = _time.time()
+        try:
+            self._check_attempt(ex_id, job_id)
+            self._scheduler.finish_job(job_id, end, result)
+        finally:
+            if self.metrics.enabled:
+                self._latency['finish_job'].observe(_time.time() - end)
+
+    def finish_and_request(self, executor, job_id, result):
+        """
+        Mark job as finished and find the next job to execute
+
+        This combines `finish_job` and `request_job`. Jobs freed by the
+        finish (the successors and jobs waiting for its locks) are handed
+        out first, if they belong to the executor's groups. So chains of
+        jobs continue on the same executor.
+
+        :Parameters:
+          `executor` : `ExecutorInterface`
+            Executor, which executed the job, requesting the next one
+
+          `job_id` : ``int``
+            Job ID
+
+          `result` : `ExecutionResultInterface`
+            Execution result
+
+        :Return: The next job or ``None``, if there's nothing to do right
+                 now
+        :Rtype: `JobInterface`
+        """
+        end = _time.time()
+        self._check_attempt(executor.uid, job_id)
+        try:
+            return self._scheduler.finish_and_request(
+                job_id, end, result, executor
+            )
+        finally:
+            if self.metrics.enabled:
+                self._latency['finish_and_request'].observe(
+                    _time.time() - end
+                )
+
+    def _check_attempt(self, ex_id, job_id):
+        """
+        Check that a job is being executed by an executor
+
+        :Parameters:
+          `ex_id` : ``str``
+            Executor ID
+
+          `job_id` : ``int``
+            Job ID
+
+        :Exceptions:
+          - `JobNotFoundError` : The job is not being executed
+          - `InvalidExecutorError` : The job is executed by another executor
+        """
         attempt = self._scheduler.execution_attempt(job_id)
         if attempt is None:
             raise JobNotFoundError(job_id)
         elif ex_id != attempt.executor:
             raise InvalidExecutorError(job_id, ex_id)
 
-        self._scheduler.finish_job(job_id, end, result)
+    def cancel_job(self, job_id):
+        """
+        Cancel a job
+
+        Jobs depending on the cancelled job are cancelled as well. Jobs being
+        executed cannot be cancelled.
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+        :Return: List of IDs of the cancelled jobs, the passed one first
+        :Rtype: ``list``
+
+        :Exceptions:
+          - `JobNotFoundError` : The job is not known (anymore)
+          - `JobExecutingError` : The job is being executed
+        """
+        if self._scheduler.execution_attempt(job_id) is not None:
+            raise JobExecutingError(job_id)
+        result = self._scheduler.cancel_job(job_id)
+        if result is None:
+            raise JobNotFoundError(job_id)
+        return result
+
+    def expire_jobs(self):
+        """
+        Drop or divert jobs, whose deadline passed
+
+        Jobs not handed out to an executor until their deadline
+        (``not_after``) are cancelled, including the jobs depending on them.
+        If an expired group is configured, they are moved into that group
+        instead. `request_job` does this as well, so it's only needed, if
+        nobody requests jobs for a while.
+
+        :Return: List of IDs of the expired jobs
+        :Rtype: ``list``
+        """
+        return self._scheduler.expire_jobs()
+
+    def set_importance(self, job_id, importance):
+        """
+        Change the importance of a job
+
+        Queued jobs are moved within their group queue accordingly.
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+          `importance` : ``int``
+            The new importance
+
+        :Exceptions:
+          - `JobNotFoundError` : The job is not known (anymore)
+        """
+        if not self._scheduler.set_importance(job_id, importance):
+            raise JobNotFoundError(job_id)
+
+    def reprioritize(self, importance, group=None, name=None):
+        """
+        Change the importance of all jobs of a group and/or description
+
+        Jobs being executed are not changed.
+
+        :Parameters:
+          `importance` : ``int``
+            The new importance
+
+          `group` : ``str``
+            Group name. If omitted or ``None``, jobs of all groups are
+            changed.
+
+          `name` : ``str``
+            Todo description name. If omitted or ``None``, jobs of all
+            descriptions are changed.
+
+        :Return: List of IDs of the changed jobs
+        :Rtype: ``list``
+
+        :Exceptions:
+          - `ValueError` : Neither group nor name were passed
+        """
+        if group is None and name is None:
+            raise ValueError("Need a group or a name")
+        return self._scheduler.reprioritize(
+            importance, group=group, name=name
+        )
+
+    def breakdown(self, job_id):
+        """
+        Find out where a job spent its time so far
+
+        Only jobs known to the scheduler can be inspected. Successfully
+        finished jobs are handed over to the junk yard and are not known
+        anymore. Their timings are recorded in the
+        ``wolfe_job_phase_seconds`` metrics histograms, though.
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+        :Return: Mapping of phase names (``delay``, ``dependency``,
+                 ``lock``, ``queue``, ``run``) to durations in seconds.
+                 Phases not completed (yet) are mapped to ``None``.
+        :Rtype: ``dict``
+
+        :Exceptions:
+          - `JobNotFoundError` : The job is not known
+        """
+        result = self._scheduler.breakdown(job_id)
+        if result is None:
+            raise JobNotFoundError(job_id)
+        return result
+
+    def expected_runtime(self, name, quantile=None):
+        """
+        Determine the expected runtime of jobs with a todo description name
+
+        The runtimes of successfully finished jobs are recorded per name.
+        They are used by the `SeptPolicy` and to estimate the critical path.
+
+        :Parameters:
+          `name` : ``str``
+            Todo description name
+
+          `quantile` : ``float``
+            Quantile of the recorded runtimes (between ``0`` and ``1``, e.g.
+            ``0.99``). If omitted or ``None``, the exponentially weighted
+            moving average is returned.
+
+        :Return: The runtime in seconds or ``None``, if no runtime was
+                 recorded for the name
+        :Rtype: ``float``
+
+        :Exceptions:
+          - `ValueError` : `quantile` is out of range
+        """
+        return self._scheduler.durations.expected(name, quantile)
+
+    def runtime_report(self):
+        """
+        Report the recorded runtimes of all todo description names
+
+        :Return: Mapping of names to dicts with the keys ``count`` (number of
+                 recorded runtimes), ``expected`` (see `expected_runtime`)
+                 and ``p50``, ``p90`` and ``p99`` (quantiles)
+        :Rtype: ``dict``
+        """
+        return self._scheduler.durations.report()
+
+    def lock_contention(self, top=10, convoy=3):
+        """
+        Report lock contention
+
+        The report is only filled if lock profiling was enabled on
+        initialization.
+
+        :Parameters:
+          `top` : ``int``
+            Maximum number of contended locks to report
+
+          `convoy` : ``int``
+            Minimum number of consecutive handoffs of a lock to waiting jobs
+            in order to report it as convoy
+
+        :Return: Mapping with the keys ``top`` (most contended locks, ranked
+                 by accumulated wait time) and ``convoys`` (longest handoff
+                 chains first). Both contain lists of dicts with the
+                 statistics per lock (``name``, ``acquisitions``,
+                 ``conflicts``, ``handoffs``, ``max_waiters``,
+                 ``hold_total``, ``hold_max``, ``wait_total``,
+                 ``wait_max``, ``streak``, ``max_streak``)
+        :Rtype: ``dict``
+        """
+        return self._scheduler.contention.report(top, convoy)
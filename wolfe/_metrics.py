@@ -0,0 +1,658 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==================
+ Metrics Registry
+==================
+
+Low overhead metrics: counters, gauges and HDR style histograms.
+
+Metrics are created by a `Registry`. The `NULL` registry hands out dummy
+metrics, which do nothing at all, so instrumented code costs next to nothing
+if metrics are disabled. Registries can be snapshot as plain data or
+exported in the Prometheus text format.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from . import _sync
+
+
+def _labelkey(labels):
+    """ Turn labels into a hashable key """
+    return tuple(sorted(labels.iteritems()))
+
+
+class Counter(object):
+    """
+    Monotonic counter
+
+    >>> counter = Counter(_sync.NOLOCK)
+    >>> counter.inc()
+    >>> counter.inc(2)
+    >>> counter.value
+    3
+
+    :IVariables:
+      `value` : ``int``
+        Current value
+
+      `_lock` : context manager
+        Lock guarding `value`
+    """
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock):
+        """
+        Initialization
+
+        :Parameters:
+          `lock` : context manager
+            Lock guarding the value
+        """
+        self.value = 0
+        self._lock = lock
+
+    def inc(self, amount=1):
+        """
+        Increase the counter
+
+        :Parameters:
+          `amount` : ``int``
+            Amount to add (non-negative)
+        """
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(object):
+    """
+    Gauge
+
+    :IVariables:
+      `value` : number
+        Current value
+
+      `_lock` : context manager
+        Lock guarding `value`
+    """
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock):
+        """
+        Initialization
+
+        :Parameters:
+          `lock` : context manager
+            Lock guarding the value
+        """
+        self.value = 0
+        self._lock = lock
+
+    def set(self, value):
+        """
+        Set the gauge
+
+        :Parameters:
+          `value` : number
+            The new value
+        """
+        self.value = value
+
+    def inc(self, amount=1):
+        """
+        Increase the gauge
+
+        :Parameters:
+          `amount` : number
+            Amount to add
+        """
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        """
+        Decrease the gauge
+
+        :Parameters:
+          `amount` : number
+            Amount to subtract
+        """
+        with self._lock:
+            self.value -= amount
+
+
+class Histogram(object):
+    """
+    HDR style histogram
+
+    Values are recorded as integral multiples of `unit` into log-linear
+    buckets: every power of two range is split into ``2 ** (bits - 1)``
+    linear sub-buckets. The relative error of reported values is therefore
+    bounded by ``2 ** (1 - bits)``, independent from the magnitude. Memory
+    usage only depends on the range of recorded values.
+
+    >>> hist = Histogram(_sync.NOLOCK)
+    >>> for num in xrange(1, 1001):
+    ...     hist.observe(num / 1000.0)
+    >>> hist.count, hist.min, hist.max
+    (1000, 0.001, 1.0)
+    >>> abs(hist.quantile(0.5) - 0.5) < 0.5 / 64
+    True
+
+    :IVariables:
+      `count` : ``int``
+        Number of recorded values
+
+      `sum` : ``float``
+        Sum of the recorded values
+
+      `min` : ``float``
+        Smallest value recorded (or ``None``)
+
+      `max` : ``float``
+        Largest value recorded (or ``None``)
+
+      `unit` : ``float``
+        Resolution
+
+      `_bits` : ``int``
+        Number of significant bits per bucket
+
+      `_buckets` : ``dict``
+        Bucket counts (``{key: count}``)
+
+      `_lock` : context manager
+        Lock guarding the data
+    """
+
+    def __init__(self, lock, unit=1e-6, bits=7):
+        """
+        Initialization
+
+        :Parameters:
+          `lock` : context manager
+            Lock guarding the data
+
+          `unit` : ``float``
+            Resolution. The default is one microsecond (if the values are
+            seconds).
+
+          `bits` : ``int``
+            Number of significant bits per bucket
+        """
+        self.count = 0
+        self.sum = 0.0
+        self.min = self.max = None
+        self.unit = unit
+        self._bits = bits
+        self._buckets = {}
+        self._lock = lock
+
+    def observe(self, value):
+        """
+        Record a value
+
+        :Parameters:
+          `value` : ``float``
+            The value (non-negative)
+        """
+        scaled = int(value / self.unit)
+        if scaled < 0:
+            scaled = 0
+        shift = scaled.bit_length() - self._bits
+        if shift > 0:
+            key = (shift << self._bits) | (scaled >> shift)
+        else:
+            key = scaled
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+            buckets = self._buckets
+            buckets[key] = buckets.get(key, 0) + 1
+
+    def buckets(self):
+        """
+        Determine the bucket boundaries and counts
+
+        :Return: Non-empty buckets (``[(lower, upper, count), ...]``). The
+                 bounds are given in the histogram's unit, the lower bound
+                 is inclusive, the upper bound exclusive.
+        :Rtype: ``list``
+        """
+        mask = (1 << self._bits) - 1
+        result = []
+        with self._lock:
+            items = sorted(self._buckets.iteritems())
+        for key, count in items:
+            shift, top = key >> self._bits, key & mask
+            result.append((top << shift, (top + 1) << shift, count))
+        return result
+
+    def quantile(self, quantile):
+        """
+        Estimate a quantile
+
+        :Parameters:
+          `quantile` : ``float``
+            The quantile (between ``0`` and ``1``)
+
+        :Return: The estimated value or ``None`` if nothing was recorded
+        :Rtype: ``float``
+        """
+        buckets = self.buckets()
+        count = sum(item[2] for item in buckets)
+        if not count:
+            return None
+        rank = quantile * count
+        seen = 0
+        for lower, upper, num in buckets:
+            seen += num
+            if seen >= rank:
+                value = (lower + upper - 1) / 2.0 * self.unit
+                return min(max(value, self.min), self.max)
+        return self.max  # pragma: no cover
+
+    def snapshot(self):
+        """
+        Create a snapshot
+
+        :Return: Plain data (``count``, ``sum``, ``min``, ``max``, a few
+                 quantiles (``p50``, ``p90``, ``p99``, ``p999``) and the
+                 cumulative ``buckets`` as ``[(upper_bound, count), ...]``)
+        :Rtype: ``dict``
+        """
+        buckets, total = [], 0
+        for _, upper, count in self.buckets():
+            total += count
+            buckets.append((upper * self.unit, total))
+        return dict(
+            count=self.count, sum=self.sum, min=self.min, max=self.max,
+            p50=self.quantile(0.5), p90=self.quantile(0.9),
+            p99=self.quantile(0.99), p999=self.quantile(0.999),
+            buckets=buckets,
+        )
+
+
+class _NullMetric(object):
+    """ Dummy metric, which does nothing """
+    __slots__ = ()
+    value = count = 0
+
+    def inc(self, amount=1):
+        """ Do nothing """
+
+    def dec(self, amount=1):
+        """ Do nothing """
+
+    def set(self, value):
+        """ Do nothing """
+
+    def observe(self, value):
+        """ Do nothing """
+
+
+NULL_METRIC = _NullMetric()
+
+_TYPES = {
+    'counter': Counter,
+    'gauge': Gauge,
+    'histogram': Histogram,
+}
+
+
+class Registry(object):
+    """
+    Metrics registry
+
+    Metrics are identified by name and labels. Asking for the same metric
+    twice returns the same object. Metrics of the same name form a family
+    and have to be of the same type.
+
+    >>> registry = Registry()
+    >>> registry.counter('jobs_total', 'Jobs', group='a').inc()
+    >>> registry.counter('jobs_total', 'Jobs', group='b').inc(2)
+    >>> registry.callback('answer', 'The answer', lambda: 42)
+    >>> print registry.prometheus(),
+    # HELP answer The answer
+    # TYPE answer gauge
+    answer 42
+    # HELP jobs_total Jobs
+    # TYPE jobs_total counter
+    jobs_total{group="a"} 1
+    jobs_total{group="b"} 2
+
+    :IVariables:
+      `enabled` : ``bool``
+        Are metrics recorded? Always true here.
+
+      `_families` : ``dict``
+        Metric families (``{name: (type, help, {labelkey: metric})}``)
+
+      `_callbacks` : ``dict``
+        Callback gauges (``{name: (help, callable)}``)
+
+      `_threadsafe` : ``bool``
+        Are metrics updated by multiple threads?
+
+      `_lock` : context manager
+        Lock guarding the registry
+    """
+    enabled = True
+
+    def __init__(self, threadsafe=False):
+        """
+        Initialization
+
+        :Parameters:
+          `threadsafe` : ``bool``
+            Are metrics updated by multiple threads?
+        """
+        self._families = {}
+        self._callbacks = {}
+        self._threadsafe = bool(threadsafe)
+        self._lock = _sync.lock(threadsafe)
+
+    def _metric(self, kind, name, help_, labels, **kwargs):
+        """
+        Find or create a metric
+
+        :Parameters:
+          `kind` : ``str``
+            Metric type
+
+          `name` : ``str``
+            Metric name
+
+          `help_` : ``str``
+            Help text
+
+          `labels` : ``dict``
+            Metric labels
+
+        :Return: The metric
+        :Rtype: any
+
+        :Exceptions:
+          - `ValueError` : The name is already used for a different type
+        """
+        key = _labelkey(labels)
+        with self._lock:
+            if name in self._callbacks:
+                raise ValueError("%s is already registered as callback" % (
+                    name,
+                ))
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = kind, help_, {}
+            elif family[0] != kind:
+                raise ValueError("%s is already registered as %s" % (
+                    name, family[0]
+                ))
+            metric = family[2].get(key)
+            if metric is None:
+                lock = _sync.lock(self._threadsafe)
+                metric = family[2][key] = _TYPES[kind](lock, **kwargs)
+            return metric
+
+    def counter(self, name, help_, **labels):
+        """
+        Find or create a counter
+
+        :Parameters:
+          `name` : ``str``
+            Metric name
+
+          `help_` : ``str``
+            Help text
+
+          `labels` : ``dict``
+            Metric labels
+
+        :Return: The counter
+        :Rtype: `Counter`
+        """
+        return self._metric('counter', name, help_, labels)
+
+    def gauge(self, name, help_, **labels):
+        """
+        Find or create a gauge
+
+        :Parameters:
+          `name` : ``str``
+            Metric name
+
+          `help_` : ``str``
+            Help text
+
+          `labels` : ``dict``
+            Metric labels
+
+        :Return: The gauge
+        :Rtype: `Gauge`
+        """
+        return self._metric('gauge', name, help_, labels)
+
+    def histogram(self, name, help_, unit=1e-6, **labels):
+        """
+        Find or create a histogram
+
+        :Parameters:
+          `name` : ``str``
+            Metric name
+
+          `help_` : ``str``
+            Help text
+
+          `unit` : ``float``
+            Resolution of the recorded values
+
+          `labels` : ``dict``
+            Metric labels
+
+        :Return: The histogram
+        :Rtype: `Histogram`
+        """
+        return self._metric('histogram', name, help_, labels, unit=unit)
+
+    def callback(self, name, help_, func):
+        """
+        Register a gauge, which is computed when needed
+
+        This is the cheapest way to provide gauges for sizes of existing
+        containers: nothing happens until a snapshot is taken. Callbacks
+        raising ``ReferenceError`` (because they refer to a dead weak proxy)
+        are skipped.
+
+        :Parameters:
+          `name` : ``str``
+            Metric name
+
+          `help_` : ``str``
+            Help text
+
+          `func` : callable
+            Function computing the value. It's called without arguments and
+            should return either a number or an iterable of ``(labels,
+            value)`` tuples, where ``labels`` is a ``dict``.
+
+        :Exceptions:
+          - `ValueError` : The name is already used for a different type
+        """
+        with self._lock:
+            if name in self._families:
+                raise ValueError("%s is already registered as %s" % (
+                    name, self._families[name][0]
+                ))
+            self._callbacks[name] = help_, func
+
+    def snapshot(self):
+        """
+        Create a snapshot of all metrics
+
+        :Return: Mapping of metric names to ``(type, help, samples)``.
+                 ``samples`` is a list of ``(labels, value)`` tuples. The
+                 value of histograms is a `Histogram.snapshot`.
+        :Rtype: ``dict``
+        """
+        with self._lock:
+            families = [
+                (name, kind, help_, metrics.items())
+                for name, (kind, help_, metrics) in self._families.items()
+            ]
+            callbacks = self._callbacks.items()
+
+        result = {}
+        for name, kind, help_, metrics in families:
+            samples = []
+            for key, metric in sorted(metrics):
+                if kind == 'histogram':
+                    value = metric.snapshot()
+                else:
+                    value = metric.value
+                samples.append((dict(key), value))
+            result[name] = kind, help_, samples
+
+        for name, (help_, func) in callbacks:
+            try:
+                value = func()
+            except ReferenceError:
+                continue
+            if isinstance(value, (int, long, float)):
+                samples = [({}, value)]
+            else:
+                samples = sorted(
+                    [(dict(labels), val) for labels, val in value],
+                    key=lambda x: _labelkey(x[0])
+                )
+            result[name] = 'gauge', help_, samples
+
+        return result
+
+    def prometheus(self):
+        """
+        Export a snapshot in the Prometheus text format
+
+        :Return: The exposition text
+        :Rtype: ``str``
+        """
+        lines = []
+        for name, (kind, help_, samples) in sorted(
+                self.snapshot().iteritems()):
+            lines.append('# HELP %s %s' % (name, _escape(help_, False)))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in samples:
+                if kind != 'histogram':
+                    lines.append('%s%s %s' % (
+                        name, _labels(labels), _number(value)
+                    ))
+                    continue
+                for upper, count in value['buckets']:
+                    lines.append('%s_bucket%s %d' % (
+                        name, _labels(labels, le=_number(upper)), count
+                    ))
+                lines.append('%s_bucket%s %d' % (
+                    name, _labels(labels, le='+Inf'), value['count']
+                ))
+                lines.append('%s_sum%s %s' % (
+                    name, _labels(labels), _number(value['sum'])
+                ))
+                lines.append('%s_count%s %d' % (
+                    name, _labels(labels), value['count']
+                ))
+        return ''.join(line + '\n' for line in lines)
+
+
+class NullRegistry(object):
+    """
+    Disabled metrics registry
+
+    All metrics are dummies.
+
+    :IVariables:
+      `enabled` : ``bool``
+        Are metrics recorded? Always false here.
+    """
+    enabled = False
+
+    def counter(self, name, help_, **labels):
+        """ Return dummy metric """
+        # pylint: disable = unused-argument, no-self-use
+        return NULL_METRIC
+
+    gauge = counter
+
+    def histogram(self, name, help_, unit=1e-6, **labels):
+        """ Return dummy metric """
+        # pylint: disable = unused-argument, no-self-use
+        return NULL_METRIC
+
+    def callback(self, name, help_, func):
+        """ Do nothing """
+
+    def snapshot(self):
+        """ Return empty snapshot """
+        # pylint: disable = no-self-use
+        return {}
+
+    def prometheus(self):
+        """ Return empty export """
+        # pylint: disable = no-self-use
+        return ''
+
+
+#: Disabled registry
+#:
+#: :Type: `NullRegistry`
+NULL = NullRegistry()
+
+
+def _escape(value, quote=True):
+    """ Escape help texts and label values """
+    value = value.replace('\\', '\\\\').replace('\n', '\\n')
+    if quote:
+        value = value.replace('"', '\\"')
+    return value
+
+
+def _number(value):
+    """ Format a number """
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _labels(labels, **extra):
+    """ Format a label set """
+    items = sorted(labels.items()) + extra.items()
+    if not items:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (key, _escape(unicode(val).encode('utf-8')))
+        for key, val in items
+    )
@@ -0,0 +1,218 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=================
+ Synchronization
+=================
+
+Synchronization primitives for the thread safe mode of the scheduler and
+the metrics.
+
+If thread safety is not requested, all primitives degrade to a shared dummy
+lock, which does nothing.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import threading as _threading
+
+#: Default number of shards
+#:
+#: :Type: ``int``
+SHARDS = 16
+
+
+class NoLock(object):
+    """
+    Dummy lock
+
+    It provides the lock and context manager API, but doesn't do anything.
+
+    >>> with NOLOCK:
+    ...     NOLOCK.acquire()
+    True
+    >>> NOLOCK.release()
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        """ Enter the context """
+        return self
+
+    def __exit__(self, *args):
+        """ Leave the context """
+        pass
+
+    def acquire(self, blocking=True):
+        """
+        Acquire the lock
+
+        :Parameters:
+          `blocking` : ``bool``
+            Ignored
+
+        :Return: Always true
+        :Rtype: ``bool``
+        """
+        # pylint: disable = unused-argument, no-self-use
+        return True
+
+    def release(self):
+        """ Release the lock """
+        pass
+
+
+#: Shared dummy lock instance
+#:
+#: :Type: `NoLock`
+NOLOCK = NoLock()
+
+
+def lock(threadsafe):
+    """
+    Create a lock
+
+    :Parameters:
+      `threadsafe` : ``bool``
+        Create a real lock? If false, the dummy lock is returned.
+
+    :Return: New (reentrant) lock or `NOLOCK`
+    :Rtype: context manager
+    """
+    if threadsafe:
+        return _threading.RLock()
+    return NOLOCK
+
+
+class Shards(object):
+    """
+    Fixed set of locks, selected by hashing keys
+
+    Sharding allows independent keys to be locked concurrently. Locking
+    multiple keys at once (see `guard`) always acquires the locks in shard
+    order, so guards cannot deadlock each other.
+
+    >>> shards = Shards(True, 4)
+    >>> shards['foo'] is shards['foo']
+    True
+    >>> with shards.guard(['foo', 'bar', 'foo']):
+    ...     pass
+
+    >>> shards = Shards(False)
+    >>> shards['foo'] is NOLOCK
+    True
+    >>> shards.guard(['foo', 'bar']) is NOLOCK
+    True
+
+    :IVariables:
+      `_locks` : ``tuple``
+        The locks or ``None`` if thread safety is not requested
+    """
+    __slots__ = ('_locks',)
+
+    def __init__(self, threadsafe, count=None):
+        """
+        Initialization
+
+        :Parameters:
+          `threadsafe` : ``bool``
+            Create real locks? If false, all locks are `NOLOCK`.
+
+          `count` : ``int``
+            Number of shards. If omitted or ``None``, `SHARDS` is used.
+        """
+        if threadsafe:
+            self._locks = tuple(
+                _threading.RLock() for _ in xrange(count or SHARDS)
+            )
+        else:
+            self._locks = None
+
+    def __getitem__(self, key):
+        """
+        Find the lock responsible for a key
+
+        :Parameters:
+          `key` : hashable
+            The key
+
+        :Return: The lock
+        :Rtype: context manager
+        """
+        locks = self._locks
+        if locks is None:
+            return NOLOCK
+        return locks[hash(key) % len(locks)]
+
+    def guard(self, keys):
+        """
+        Create a context manager locking all shards responsible for `keys`
+
+        :Parameters:
+          `keys` : iterable
+            The keys
+
+        :Return: The context manager
+        :Rtype: context manager
+        """
+        locks = self._locks
+        if locks is None:
+            return NOLOCK
+        count = len(locks)
+        return _Guard([
+            locks[idx] for idx in sorted(set(hash(key) % count
+                                             for key in keys))
+        ])
+
+
+class _Guard(object):
+    """
+    Context manager, holding multiple locks
+
+    :IVariables:
+      `_locks` : ``list``
+        Locks to hold, in acquisition order
+    """
+    __slots__ = ('_locks',)
+
+    def __init__(self, locks):
+        """
+        Initialization
+
+        :Parameters:
+          `locks` : ``list``
+            Locks to hold, in acquisition order
+        """
+        self._locks = locks
+
+    def __enter__(self):
+        """ Acquire all locks """
+        for item in self._locks:
+            item.acquire()
+        return self
+
+    def __exit__(self, *args):
+        """ Release all locks """
+        for item in reversed(self._locks):
+            item.release()
@@ -57,6 +57,12 @@ class Todo(object):
       `not_before` : various
         execute job not before this time
 
+      `not_after` : various
+        Deadline. The job is expired, if not executed until then.
+
+      `dedup_key` : hashable
+        Deduplication key or ``None``
+
       `_successors` : ``list``
         List of jobs or todos depending on successful execution of this one
         (``[JobOrTodo, ...]``)
@@ -66,7 +72,8 @@ class Todo(object):
     """
 
     def __init__(self, desc, depends_on=None, locks=None, importance=None,
-                 group=None, not_before=None):
+                 group=None, not_before=None, dedup_key=None,
+                 not_after=None):
         """
         Initialization
 
@@ -102,10 +109,23 @@ class Todo(object):
 
             If omitted or ``None``, ``0`` is assumed.
 
+          `dedup_key` : hashable
+            Deduplication key. While a job with the same key is pending (not
+            handed out to an executor yet), the todo is not entered again.
+            The pending job is used instead. If omitted or ``None``, the todo
+            is never deduplicated.
+
+          `not_after` : various
+            Deadline. If the job is not handed out to an executor until
+            then, it's expired (see `Main.expire_jobs`). Formats are the
+            same as for `not_before`. If omitted or ``None``, the job has no
+            deadline.
+
         :Exceptions:
           - `LockConflict` : Conflicting locks were provided
         """
         self.desc = desc
+        self.dedup_key = dedup_key
         self._successors = []
         self._predecessors = []
         self.locks = _lock.validate(locks)
@@ -129,6 +149,17 @@ class Todo(object):
                     )
         self.not_before = not_before
 
+        if not_after is not None:
+            try:
+                not_after = max(0, int(not_after))
+            except (TypeError, ValueError):
+                pass
+            else:
+                not_after = (
+                    _dt.datetime.utcnow() + _dt.timedelta(seconds=not_after)
+                )
+        self.not_after = not_after
+
         if depends_on is not None:
             for todo in depends_on:
                 try:
@@ -220,7 +251,7 @@ class TodoDescription(object):
         self.group = group
 
     def todo(self, depends_on=None, locks=None, importance=None, group=None,
-             not_before=None):
+             not_before=None, dedup_key=None, not_after=None):
         """
         Construct a todo from this description
 
@@ -252,6 +283,14 @@ class TodoDescription(object):
             ``datetime.datetime``
               a specific point in time
 
+          `dedup_key` : hashable
+            Deduplication key. If omitted or ``None``, the todo is never
+            deduplicated.
+
+          `not_after` : various
+            Deadline. Same formats as for `not_before`. If omitted or
+            ``None``, the todo has no deadline.
+
         :Return: new todo instance
         :Rtype: `Todo`
         """
@@ -268,4 +307,6 @@ class TodoDescription(object):
             importance=importance,
             group=group,
             not_before=not_before,
+            dedup_key=dedup_key,
+            not_after=not_after,
         )
@@ -0,0 +1,495 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+===================
+ Dispatcher Client
+===================
+
+Client library for the dispatcher service. The `Client` provides the same
+API as `Main` and keeps a pool of connections, so it can be shared by
+multiple threads. Multiple requests can be sent at once using a
+`Pipeline`.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import socket as _socket
+import threading as _threading
+
+from .. import _exceptions
+from . import _protocol
+
+#: Receive buffer size
+#:
+#: :Type: ``int``
+BUFSIZE = 64 * 1024
+
+
+class Connection(object):
+    """
+    Single client connection
+
+    :IVariables:
+      `_sock` : ``socket.socket``
+        The socket
+
+      `_reader` : `_protocol.FrameReader`
+        Frame reader
+
+      `_responses` : ``list``
+        Responses received, but not consumed yet
+
+      `_next_id` : ``int``
+        Next request ID
+    """
+
+    def __init__(self, address, timeout=None):
+        """
+        Initialization
+
+        The connection is established and the handshake is performed.
+
+        :Parameters:
+          `address` : ``tuple`` or ``str``
+            Server address. Either a ``(host, port)`` tuple (TCP) or a string
+            (unix domain socket path)
+
+          `timeout` : ``float``
+            Socket timeout in seconds. If omitted or ``None``, socket
+            operations block.
+
+        :Exceptions:
+          - `socket.error` : Connection failed
+          - `ProtocolError` : Handshake failed
+        """
+        if isinstance(address, basestring):
+            sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+        else:
+            sock = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+            sock.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+        except:  # noqa
+            sock.close()
+            raise
+
+        self._sock = sock
+        self._reader = _protocol.FrameReader()
+        self._responses = []
+        self._next_id = 1
+        try:
+            opcode, payload = self.call([(
+                _protocol.HELLO, _protocol.encode(_protocol.VERSION),
+            )])[0]
+            if opcode != _protocol.RESULT:
+                raise _protocol.decode_error(_protocol.decode(payload))
+        except:  # noqa
+            self.close()
+            raise
+
+    def close(self):
+        """ Close the connection """
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+    def call(self, requests):
+        """
+        Send requests and wait for their responses
+
+        All requests are sent at once.
+
+        :Parameters:
+          `requests` : iterable
+            Requests (``[(opcode, payload), ...]``)
+
+        :Return: Responses, in order (``[(opcode, payload), ...]``)
+        :Rtype: ``list``
+
+        :Exceptions:
+          - `socket.error` : Connection failure
+          - `ProtocolError` : Invalid response
+        """
+        ids, frames = [], []
+        for opcode, payload in requests:
+            request_id, self._next_id = \
+                self._next_id, (self._next_id % 0xFFFFFFFF) + 1
+            ids.append(request_id)
+            frames.append(_protocol.frame(opcode, request_id, payload))
+        self._sock.sendall(''.join(frames))
+
+        result = []
+        for request_id in ids:
+            while not self._responses:
+                data = self._sock.recv(BUFSIZE)
+                if not data:
+                    raise _exceptions.ProtocolError("Connection closed")
+                self._reader.feed(data)
+                self._responses.extend(self._reader)
+            opcode, response_id, payload = self._responses.pop(0)
+            if response_id != request_id:
+                if opcode == _protocol.ERROR:
+                    raise _protocol.decode_error(_protocol.decode(payload))
+                raise _exceptions.ProtocolError(
+                    "Unexpected response ID: %r" % (response_id,)
+                )
+            result.append((opcode, payload))
+        return result
+
+
+class Pool(object):
+    """
+    Thread safe connection pool
+
+    :IVariables:
+      `_connect` : callable
+        Connection factory
+
+      `_idle` : ``list``
+        Idle connections
+
+      `_lock` : ``threading.Lock``
+        Lock guarding `_idle`
+
+      `_slots` : ``threading.Semaphore``
+        Limits the number of connections
+    """
+
+    def __init__(self, connect, size):
+        """
+        Initialization
+
+        :Parameters:
+          `connect` : callable
+            Connection factory
+
+          `size` : ``int``
+            Maximum number of connections
+        """
+        self._connect = connect
+        self._idle = []
+        self._lock = _threading.Lock()
+        self._slots = _threading.Semaphore(size)
+
+    def call(self, requests):
+        """
+        Send requests over a pooled connection
+
+        If no connection is available, the call blocks until one is
+        returned to the pool. Connections failing are discarded.
+
+        :See: `Connection.call`
+        """
+        self._slots.acquire()
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            try:
+                result = conn.call(requests)
+            except:  # noqa
+                conn.close()
+                raise
+            with self._lock:
+                self._idle.append(conn)
+            return result
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """ Close all idle connections """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def _none(payload):
+    """ Decode void result """
+    # pylint: disable = unused-argument
+    return None
+
+
+def _int(payload):
+    """ Decode integer result """
+    return int(_protocol.decode(payload))
+
+
+def _str(payload):
+    """ Decode string result """
+    return str(_protocol.decode(payload))
+
+
+class Pipeline(object):
+    """
+    Request pipeline
+
+    Requests are collected and sent at once by `execute`. The methods
+    mirror the `Client` API and return the pipeline for easy chaining.
+
+    :IVariables:
+      `_pool` : `Pool`
+        Connection pool
+
+      `_requests` : ``list``
+        Collected requests (``[(opcode, payload, decoder), ...]``)
+    """
+
+    def __init__(self, pool):
+        """
+        Initialization
+
+        :Parameters:
+          `pool` : `Pool`
+            Connection pool
+        """
+        self._pool = pool
+        self._requests = []
+
+    def __len__(self):
+        """
+        Determine the number of collected requests
+
+        :Return: The number of requests
+        :Rtype: ``int``
+        """
+        return len(self._requests)
+
+    def _add(self, opcode, payload, decoder):
+        """ Collect a request """
+        self._requests.append((opcode, payload, decoder))
+        return self
+
+    def enter_todo(self, todo):
+        """
+        Enter todo into the system
+
+        :See: `Client.enter_todo`
+        """
+        return self._add(
+            _protocol.ENTER_TODO, _protocol.encode_todo(todo), _int
+        )
+
+    def request_job(self, executor):
+        """
+        Find a job to execute
+
+        :See: `Client.request_job`
+        """
+        return self._add(_protocol.REQUEST_JOB, _protocol.encode(
+            _protocol.encode_executor(executor)
+        ), _protocol.decode_job)
+
+    def finish_job(self, ex_id, job_id, result):
+        """
+        Mark job as finished
+
+        :See: `Client.finish_job`
+        """
+        return self._add(_protocol.FINISH_JOB, _protocol.encode([
+            ex_id, job_id, _protocol.encode_result(result),
+        ]), _none)
+
+    def finish_and_request(self, executor, job_id, result):
+        """
+        Mark job as finished and find the next job to execute
+
+        :See: `Client.finish_and_request`
+        """
+        return self._add(_protocol.FINISH_AND_REQUEST, _protocol.encode([
+            _protocol.encode_executor(executor), job_id,
+            _protocol.encode_result(result),
+        ]), _protocol.decode_job)
+
+    def metrics(self):
+        """
+        Export the dispatcher's metrics
+
+        :See: `Client.metrics`
+        """
+        return self._add(_protocol.METRICS, _protocol.encode(None), _str)
+
+    def execute(self):
+        """
+        Send all collected requests and wait for the responses
+
+        The pipeline is empty afterwards. The requests are executed in order.
+        A failing request does not stop the following ones.
+
+        :Return: The results, in order
+        :Rtype: ``list``
+
+        :Exceptions:
+          - `Error` : The first error returned by a request
+          - `socket.error` : Connection failure
+        """
+        requests, self._requests = self._requests, []
+        if not requests:
+            return []
+        responses = self._pool.call(
+            (opcode, payload) for opcode, payload, _ in requests
+        )
+
+        result, error = [], None
+        for (opcode, payload), (_, _, decoder) in zip(responses, requests):
+            if opcode == _protocol.RESULT:
+                result.append(decoder(payload))
+            elif opcode == _protocol.ERROR:
+                result.append(None)
+                if error is None:
+                    error = _protocol.decode_error(_protocol.decode(payload))
+            else:
+                raise _exceptions.ProtocolError(
+                    "Invalid response opcode: %r" % (opcode,)
+                )
+        if error is not None:
+            raise error  # pylint: disable = raising-bad-type
+        return result
+
+
+class Client(object):
+    """
+    Dispatcher client
+
+    The API mirrors the `Main` API.
+
+    :IVariables:
+      `_pool` : `Pool`
+        Connection pool
+    """
+
+    def __init__(self, address, size=4, timeout=None):
+        """
+        Initialization
+
+        Connections are established lazily.
+
+        :Parameters:
+          `address` : ``tuple`` or ``str``
+            Server address. Either a ``(host, port)`` tuple (TCP) or a string
+            (unix domain socket path)
+
+          `size` : ``int``
+            Maximum number of concurrent connections
+
+          `timeout` : ``float``
+            Socket timeout in seconds. If omitted or ``None``, socket
+            operations block.
+        """
+        if not isinstance(address, basestring):
+            address = tuple(address)
+        self._pool = Pool(lambda: Connection(address, timeout), size)
+
+    def close(self):
+        """ Close all idle connections """
+        self._pool.close()
+
+    def pipeline(self):
+        """
+        Create a new request pipeline
+
+        :Return: The pipeline
+        :Rtype: `Pipeline`
+        """
+        return Pipeline(self._pool)
+
+    def enter_todo(self, todo):
+        """
+        Enter todo into the system
+
+        :Parameters:
+          `todo` : `Todo`
+            The todo
+
+        :Return: The assigned job ID. If the passed todo is actually a todo
+                 tree, the root job ID is returned
+        :Rtype: ``int``
+        """
+        return self.pipeline().enter_todo(todo).execute()[0]
+
+    def request_job(self, executor):
+        """
+        Find a job to execute
+
+        :Parameters:
+          `executor` : `ExecutorInterface`
+            Executor requesting a job
+
+        :Return: The job or ``None``, if there's nothing to do right now
+        :Rtype: `JobInterface`
+        """
+        return self.pipeline().request_job(executor).execute()[0]
+
+    def finish_job(self, ex_id, job_id, result):
+        """
+        Mark job as finished
+
+        :Parameters:
+          `ex_id` : ``str``
+            Executor ID
+
+          `job_id` : ``int``
+            Job ID
+
+          `result` : `ExecutionResultInterface`
+            Execution result
+        """
+        self.pipeline().finish_job(ex_id, job_id, result).execute()
+
+    def finish_and_request(self, executor, job_id, result):
+        """
+        Mark job as finished and find the next job to execute
+
+        Both happen in a single round trip. Jobs freed by the finish are
+        preferred, if they belong to the executor's groups.
+
+        :Parameters:
+          `executor` : `ExecutorInterface`
+            Executor, which executed the job, requesting the next one
+
+          `job_id` : ``int``
+            Job ID
+
+          `result` : `ExecutionResultInterface`
+            Execution result
+
+        :Return: The next job or ``None``, if there's nothing to do right
+                 now
+        :Rtype: `JobInterface`
+        """
+        return self.pipeline().finish_and_request(
+            executor, job_id, result
+        ).execute()[0]
+
+    def metrics(self):
+        """
+        Export the dispatcher's metrics
+
+        :Return: The metrics in Prometheus text format. It's empty if the
+                 dispatcher does not record metrics.
+        :Rtype: ``str``
+        """
+        return self.pipeline().metrics().execute()[0]
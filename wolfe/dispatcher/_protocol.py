@@ -0,0 +1,427 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=====================
+ Dispatcher Protocol
+=====================
+
+Wire protocol of the dispatcher service.
+
+Every message is a frame, consisting of a fixed header and a payload. The
+header contains the payload length, a request ID and an opcode (network byte
+order, 9 bytes). Responses carry the ID of the request they answer. Requests
+may be pipelined; they are answered in order.
+
+A connection starts with a `HELLO` request, carrying the client's protocol
+version. Payloads are encoded using the `wolfe._codec` binary format.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import struct as _struct
+
+from .. import _codec
+from .. import _exceptions
+from .. import _execution
+
+ProtocolError = _exceptions.ProtocolError
+
+#: Protocol version
+#:
+#: :Type: ``int``
+VERSION = 2
+
+#: Frame header (payload length, request ID, opcode)
+#:
+#: :Type: ``struct.Struct``
+HEADER = _struct.Struct('!IIB')
+
+#: Maximum accepted payload size
+#:
+#: :Type: ``int``
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+# Request opcodes
+HELLO = 0x01
+ENTER_TODO = 0x02
+REQUEST_JOB = 0x03
+FINISH_JOB = 0x04
+METRICS = 0x05
+FINISH_AND_REQUEST = 0x06
+
+# Response opcodes
+RESULT = 0x80
+ERROR = 0x81
+
+
+def frame(opcode, request_id, payload):
+    """
+    Create a frame
+
+    >>> frame(HELLO, 7, 'xy')
+    '\\x00\\x00\\x00\\x02\\x00\\x00\\x00\\x07\\x01xy'
+
+    :Parameters:
+      `opcode` : ``int``
+        Opcode
+
+      `request_id` : ``int``
+        Request ID
+
+      `payload` : ``str``
+        Encoded payload
+
+    :Return: The frame
+    :Rtype: ``str``
+    """
+    return HEADER.pack(len(payload), request_id, opcode) + payload
+
+
+class FrameReader(object):
+    """
+    Incremental frame parser
+
+    Data is fed in as it arrives. Complete frames are returned by iterating
+    over the reader.
+
+    >>> reader = FrameReader()
+    >>> data = frame(HELLO, 1, 'abc') + frame(RESULT, 2, '')
+    >>> reader.feed(data[:5])
+    >>> list(reader)
+    []
+    >>> reader.feed(data[5:])
+    >>> list(reader)
+    [(1, 1, 'abc'), (128, 2, '')]
+
+    Received data is collected in chunks. They are joined only when a
+    complete header or frame is available, so every byte is copied a
+    constant number of times, regardless of how the data is split up.
+
+    :IVariables:
+      `_chunks` : ``list``
+        Data not parsed yet
+
+      `_size` : ``int``
+        Total length of `_chunks`
+
+      `_need` : ``int``
+        Length of data needed for the next parsing step (a header or the
+        frame announced by it)
+    """
+
+    def __init__(self):
+        """ Initialization """
+        self._chunks = []
+        self._size = 0
+        self._need = HEADER.size
+
+    def __nonzero__(self):
+        """
+        Check for pending (incomplete) data
+
+        :Return: Is there any unparsed data?
+        :Rtype: ``bool``
+        """
+        return self._size > 0
+
+    def feed(self, data):
+        """
+        Feed data
+
+        :Parameters:
+          `data` : ``str``
+            Received data
+        """
+        if data:
+            self._chunks.append(data)
+            self._size += len(data)
+
+    def __iter__(self):
+        """
+        Extract all complete frames
+
+        :Return: Iterator over ``(opcode, request_id, payload)`` tuples
+        :Rtype: iterable
+
+        :Exceptions:
+          - `ProtocolError` : The announced payload is too large
+        """
+        if self._size < self._need:
+            return
+
+        buf, pos, size = ''.join(self._chunks), 0, HEADER.size
+        need = size
+        try:
+            while len(buf) - pos >= size:
+                length, request_id, opcode = HEADER.unpack_from(buf, pos)
+                if length > MAX_PAYLOAD:
+                    raise ProtocolError("Payload too large (%d)" % length)
+                end = pos + size + length
+                if len(buf) < end:
+                    need = size + length
+                    break
+                yield opcode, request_id, buf[pos + size:end]
+                pos = end
+        finally:
+            buf = buf[pos:]
+            self._chunks = [buf] if buf else []
+            self._size = len(buf)
+            self._need = need
+
+
+def encode(value):
+    """
+    Encode a plain payload value
+
+    :Parameters:
+      `value` : any
+        Value (see `_codec.dumps`)
+
+    :Return: The encoded payload
+    :Rtype: ``str``
+    """
+    return _codec.dumps(value)
+
+
+def decode(payload):
+    """
+    Decode a plain payload value
+
+    :Parameters:
+      `payload` : ``str``
+        The encoded payload
+
+    :Return: The decoded value
+    :Rtype: any
+
+    :Exceptions:
+      - `ProtocolError` : Invalid payload
+    """
+    try:
+        return _codec.loads(payload)
+    except _exceptions.DecodeError as e:
+        raise ProtocolError("Invalid payload: %s" % (e,))
+
+
+def encode_todo(todo):
+    """
+    Encode a todo graph
+
+    :Parameters:
+      `todo` : `Todo`
+        The root todo
+
+    :Return: The encoded payload
+    :Rtype: ``str``
+    """
+    return _codec.encode_todo(todo)
+
+
+def decode_todo(payload):
+    """
+    Decode a todo graph
+
+    :Parameters:
+      `payload` : ``str``
+        The encoded payload as created by `encode_todo`
+
+    :Return: The root todo
+    :Rtype: `Todo`
+
+    :Exceptions:
+      - `ProtocolError` : Invalid payload
+    """
+    try:
+        return _codec.decode_todo(payload)
+    except (_exceptions.DecodeError, AssertionError) as e:
+        raise ProtocolError("Invalid todo: %s" % (e,))
+
+
+def encode_job(job):
+    """
+    Encode a job
+
+    :Parameters:
+      `job` : `JobInterface`
+        The job or ``None``
+
+    :Return: The encoded payload
+    :Rtype: ``str``
+    """
+    if job is None:
+        return ''
+    return _codec.encode_job(job)
+
+
+def decode_job(payload):
+    """
+    Decode a job
+
+    :Parameters:
+      `payload` : ``str``
+        The encoded payload as created by `encode_job`
+
+    :Return: The job or ``None``
+    :Rtype: `JobInterface`
+
+    :Exceptions:
+      - `ProtocolError` : Invalid payload
+    """
+    if not payload:
+        return None
+    try:
+        return _codec.decode_job(payload)
+    except _exceptions.DecodeError as e:
+        raise ProtocolError("Invalid job: %s" % (e,))
+
+
+def encode_result(result):
+    """
+    Encode an execution result
+
+    :Parameters:
+      `result` : `ExecutionResultInterface`
+        The result
+
+    :Return: Plain representation
+    :Rtype: ``list``
+    """
+    exit_code = getattr(result, 'exit_code', None)
+    if exit_code is None:
+        exit_code = int(bool(result.failed))
+    return [
+        exit_code,
+        getattr(result, 'stdout', None),
+        getattr(result, 'stderr', None),
+    ]
+
+
+def decode_result(value):
+    """
+    Decode an execution result
+
+    :Parameters:
+      `value` : ``list``
+        Plain representation as created by `encode_result`
+
+    :Return: The result
+    :Rtype: `ExecutionResultInterface`
+
+    :Exceptions:
+      - `ProtocolError` : Invalid representation
+    """
+    try:
+        exit_code, stdout, stderr = value
+    except (TypeError, ValueError) as e:
+        raise ProtocolError("Invalid result: %s" % (e,))
+    return _execution.Result(exit_code, stdout, stderr)
+
+
+def _plain(value):
+    """ Turn exception argument into something encodable """
+    if value is None or isinstance(value, (bool, int, long, float,
+                                           basestring)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return map(_plain, value)
+    return repr(value)
+
+
+def encode_error(exc):
+    """
+    Encode an exception
+
+    :Parameters:
+      `exc` : ``Exception``
+        The exception
+
+    :Return: Plain representation
+    :Rtype: ``list``
+    """
+    return [exc.__class__.__name__, _plain(exc.args)]
+
+
+def decode_error(value):
+    """
+    Decode an exception
+
+    Wolfe exceptions are recreated as such, everything else is wrapped into
+    a `RemoteError`. So are wolfe exceptions, whose constructors do not
+    accept the transmitted arguments.
+
+    :Parameters:
+      `value` : ``list``
+        Plain representation as created by `encode_error`
+
+    :Return: The exception
+    :Rtype: ``Exception``
+    """
+    try:
+        name, args = value
+        name = str(name)
+    except (TypeError, ValueError, UnicodeError) as e:
+        return ProtocolError("Invalid error: %s" % (e,))
+
+    cls = getattr(_exceptions, name, None)
+    if isinstance(cls, type) and issubclass(cls, _exceptions.Error):
+        try:
+            return cls(*args)
+        except TypeError:
+            pass
+    return _exceptions.RemoteError(name, args)
+
+
+def encode_executor(executor):
+    """
+    Encode an executor
+
+    :Parameters:
+      `executor` : `ExecutorInterface`
+        The executor
+
+    :Return: Plain representation
+    :Rtype: ``list``
+    """
+    return [executor.uid, executor.groups and list(executor.groups)]
+
+
+def decode_executor(value):
+    """
+    Decode an executor
+
+    :Parameters:
+      `value` : ``list``
+        Plain representation as created by `encode_executor`
+
+    :Return: The executor
+    :Rtype: `ExecutorInterface`
+
+    :Exceptions:
+      - `ProtocolError` : Invalid representation
+    """
+    try:
+        uid, groups = value
+    except (TypeError, ValueError) as e:
+        raise ProtocolError("Invalid executor: %s" % (e,))
+    return _execution.Executor(uid, groups)
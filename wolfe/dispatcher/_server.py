@@ -0,0 +1,433 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+===================
+ Dispatcher Server
+===================
+
+The dispatcher service exposes a `Main` instance over a socket. Every
+connection is served by its own thread. All frames received at once are
+processed in order and their responses are sent back as one batch.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import SocketServer as _socketserver
+import argparse as _argparse
+import errno as _errno
+import os as _os
+import socket as _socket
+
+from .. import _exceptions
+from .. import _main
+from . import _protocol
+
+#: Receive buffer size
+#:
+#: :Type: ``int``
+BUFSIZE = 64 * 1024
+
+
+class Dispatcher(object):
+    """
+    Request dispatcher
+
+    Maps requests to the `Main` API.
+
+    :IVariables:
+      `main` : `Main`
+        Main API instance
+
+      `_methods` : ``dict``
+        Mapping of opcodes to methods
+    """
+
+    def __init__(self, api):
+        """
+        Initialization
+
+        :Parameters:
+          `api` : `Main`
+            Main API instance. It should be thread safe.
+        """
+        self.main = api
+        self._methods = {
+            _protocol.ENTER_TODO: self.enter_todo,
+            _protocol.REQUEST_JOB: self.request_job,
+            _protocol.FINISH_JOB: self.finish_job,
+            _protocol.METRICS: self.metrics,
+            _protocol.FINISH_AND_REQUEST: self.finish_and_request,
+        }
+
+    def dispatch(self, opcode, payload):
+        """
+        Dispatch a single request
+
+        :Parameters:
+          `opcode` : ``int``
+            Request opcode
+
+          `payload` : ``str``
+            Encoded request payload
+
+        :Return: Response opcode and encoded payload
+                 (``(opcode, payload)``)
+        :Rtype: ``tuple``
+        """
+        # pylint: disable = broad-except
+        try:
+            try:
+                method = self._methods[opcode]
+            except KeyError:
+                raise _exceptions.ProtocolError(
+                    "Invalid opcode: %r" % (opcode,)
+                )
+            return _protocol.RESULT, method(payload)
+        except Exception as e:
+            return _protocol.ERROR, _protocol.encode(
+                _protocol.encode_error(e)
+            )
+
+    def enter_todo(self, payload):
+        """
+        Enter a todo graph
+
+        :Parameters:
+          `payload` : ``str``
+            Encoded todo graph
+
+        :Return: Encoded root job ID
+        :Rtype: ``str``
+        """
+        return _protocol.encode(
+            self.main.enter_todo(_protocol.decode_todo(payload))
+        )
+
+    def request_job(self, payload):
+        """
+        Request a job
+
+        :Parameters:
+          `payload` : ``str``
+            Encoded executor
+
+        :Return: Encoded job (or ``None``)
+        :Rtype: ``str``
+        """
+        return _protocol.encode_job(self.main.request_job(
+            _protocol.decode_executor(_protocol.decode(payload))
+        ))
+
+    def finish_job(self, payload):
+        """
+        Finish a job
+
+        :Parameters:
+          `payload` : ``str``
+            Encoded executor ID, job ID and result
+
+        :Return: Encoded ``None``
+        :Rtype: ``str``
+        """
+        try:
+            ex_id, job_id, result = _protocol.decode(payload)
+        except (TypeError, ValueError) as e:
+            raise _exceptions.ProtocolError("Invalid finish: %s" % (e,))
+        self.main.finish_job(ex_id, job_id, _protocol.decode_result(result))
+        return _protocol.encode(None)
+
+    def finish_and_request(self, payload):
+        """
+        Finish a job and request the next one
+
+        :Parameters:
+          `payload` : ``str``
+            Encoded executor, job ID and result
+
+        :Return: Encoded job (or ``None``)
+        :Rtype: ``str``
+        """
+        try:
+            executor, job_id, result = _protocol.decode(payload)
+        except (TypeError, ValueError) as e:
+            raise _exceptions.ProtocolError("Invalid finish: %s" % (e,))
+        return _protocol.encode_job(self.main.finish_and_request(
+            _protocol.decode_executor(executor), job_id,
+            _protocol.decode_result(result),
+        ))
+
+    def metrics(self, payload):
+        """
+        Export the metrics
+
+        :Parameters:
+          `payload` : ``str``
+            Ignored
+
+        :Return: Encoded metrics in Prometheus text format
+        :Rtype: ``str``
+        """
+        # pylint: disable = unused-argument
+        return _protocol.encode(self.main.metrics.prometheus())
+
+
+class Connection(object):
+    """
+    Server side connection state
+
+    :IVariables:
+      `_dispatcher` : `Dispatcher`
+        Request dispatcher
+
+      `_reader` : `_protocol.FrameReader`
+        Frame reader
+
+      `_ready` : ``bool``
+        Was the handshake successful?
+    """
+
+    def __init__(self, dispatcher):
+        """
+        Initialization
+
+        :Parameters:
+          `dispatcher` : `Dispatcher`
+            Request dispatcher
+        """
+        self._dispatcher = dispatcher
+        self._reader = _protocol.FrameReader()
+        self._ready = False
+
+    def feed(self, data):
+        """
+        Process received data
+
+        :Parameters:
+          `data` : ``str``
+            Received data
+
+        :Return: Responses to all complete requests as one batch
+        :Rtype: ``str``
+
+        :Exceptions:
+          - `ProtocolError` : Unrecoverable framing error. The connection
+            should be closed.
+        """
+        self._reader.feed(data)
+        responses = []
+        for opcode, request_id, payload in self._reader:
+            if opcode == _protocol.HELLO:
+                opcode, payload = self._hello(payload)
+            elif not self._ready:
+                opcode, payload = _protocol.ERROR, _protocol.encode(
+                    _protocol.encode_error(_exceptions.ProtocolError(
+                        "Handshake required"
+                    ))
+                )
+            else:
+                opcode, payload = self._dispatcher.dispatch(opcode, payload)
+            responses.append(_protocol.frame(opcode, request_id, payload))
+        return ''.join(responses)
+
+    def _hello(self, payload):
+        """
+        Process handshake
+
+        :Parameters:
+          `payload` : ``str``
+            Encoded client protocol version
+
+        :Return: Response opcode and encoded payload
+        :Rtype: ``tuple``
+        """
+        try:
+            version = _protocol.decode(payload)
+            if version != _protocol.VERSION:
+                raise _exceptions.ProtocolError(
+                    "Unsupported protocol version: %r" % (version,)
+                )
+        except _exceptions.ProtocolError as e:
+            return _protocol.ERROR, _protocol.encode(
+                _protocol.encode_error(e)
+            )
+        self._ready = True
+        return _protocol.RESULT, _protocol.encode(_protocol.VERSION)
+
+
+class _Handler(_socketserver.BaseRequestHandler):
+    """ Socket request handler """
+
+    def handle(self):
+        """ Serve a single connection """
+        conn = Connection(self.server.dispatcher)
+        sock = self.request
+        if sock.family != _socket.AF_UNIX:
+            sock.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+        while True:
+            data = sock.recv(BUFSIZE)
+            if not data:
+                break
+            try:
+                response = conn.feed(data)
+            except _exceptions.ProtocolError as e:
+                sock.sendall(_protocol.frame(
+                    _protocol.ERROR, 0,
+                    _protocol.encode(_protocol.encode_error(e)),
+                ))
+                break
+            if response:
+                sock.sendall(response)
+
+
+class _TCPServer(_socketserver.ThreadingMixIn, _socketserver.TCPServer):
+    """ Threading TCP server """
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(_socketserver.ThreadingMixIn,
+                  _socketserver.UnixStreamServer):
+    """ Threading unix domain socket server """
+    daemon_threads = True
+
+    def server_close(self):
+        """ Close the listening socket and remove the socket file """
+        _socketserver.UnixStreamServer.server_close(self)
+        try:
+            _os.unlink(self.server_address)
+        except OSError as e:
+            if e.errno != _errno.ENOENT:
+                raise
+
+
+class Server(object):
+    """
+    Dispatcher server
+
+    :IVariables:
+      `dispatcher` : `Dispatcher`
+        Request dispatcher
+
+      `_server` : ``SocketServer.BaseServer``
+        Actual socket server
+    """
+
+    def __init__(self, address, api=None, metrics=False):
+        """
+        Initialization
+
+        The socket is bound immediately.
+
+        :Parameters:
+          `address` : ``tuple`` or ``str``
+            Address to listen on. Either a ``(host, port)`` tuple (TCP) or
+            a string (unix domain socket path)
+
+          `api` : `Main`
+            Main API instance to expose. If omitted or ``None``, a new thread
+            safe instance is created.
+
+          `metrics` : ``bool``
+            Record metrics? This only applies if `api` is omitted.
+        """
+        if api is None:
+            api = _main.Main(threadsafe=True, metrics=metrics)
+        self.dispatcher = Dispatcher(api)
+        if isinstance(address, basestring):
+            server_class = _UnixServer
+        else:
+            server_class, address = _TCPServer, tuple(address)
+        self._server = server_class(address, _Handler)
+        self._server.dispatcher = self.dispatcher
+
+    @property
+    def address(self):
+        """
+        The address the server is bound to
+
+        :Type: ``tuple`` or ``str``
+        """
+        return self._server.server_address
+
+    def serve_forever(self):
+        """ Serve until `shutdown` is called """
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """ Stop `serve_forever` (from a different thread) """
+        self._server.shutdown()
+
+    def close(self):
+        """
+        Close the listening socket
+
+        Unix domain socket files are removed.
+        """
+        self._server.server_close()
+
+
+def _address(value):
+    """ Parse TCP address """
+    host, sep, port = value.rpartition(':')
+    if not sep:
+        raise _argparse.ArgumentTypeError("Expected host:port")
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise _argparse.ArgumentTypeError("Invalid port: %r" % (port,))
+
+
+def main(argv=None):
+    """
+    Run the dispatcher service
+
+    :Parameters:
+      `argv` : ``list``
+        Command line arguments. If omitted or ``None``, ``sys.argv[1:]`` is
+        used.
+    """
+    parser = _argparse.ArgumentParser(
+        prog='python -m wolfe.dispatcher',
+        description="Wolfe dispatcher service",
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        '--tcp', metavar='HOST:PORT', type=_address,
+        help="Listen on TCP address",
+    )
+    group.add_argument(
+        '--unix', metavar='PATH', help="Listen on unix domain socket",
+    )
+    parser.add_argument(
+        '--metrics', action='store_true', help="Record metrics",
+    )
+    options = parser.parse_args(argv)
+
+    server = Server(options.tcp or options.unix, metrics=options.metrics)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -78,7 +78,8 @@ class LockInterface(object):  # pragma: nocover
 
     :IVariables:
       `name` : ``str``
-        Lock name
+        Lock name. Names are ``/``-separated paths. A lock conflicts with
+        its ancestors and descendants.
 
       `exclusive` : ``bool``
         Does this lock has to be acquired exclusively?
@@ -160,6 +161,62 @@ class JunkYardInterface(object):  # pragma: no cover
         """
 
 
+class SchedulingPolicyInterface(object):  # pragma: no cover
+    """
+    Interface for scheduling policies of group queues
+
+    A policy decides, in which order the queued jobs of a group are handed
+    out to executors. It creates the queue of every group it's configured
+    for and is notified about the jobs passing through.
+    """
+
+    def queue(self):
+        """
+        Create an empty group queue
+
+        The queue determines the job order. It has to provide the same
+        methods as ``wolfe.scheduler._job_queue.JobQueue``, which is usually
+        created with an ordering wrapper class, computing the sort key of a
+        job.
+
+        Executors serving multiple groups get the first of the queue heads.
+        Heads wrapped by the same class are compared by the wrappers'
+        order, others by effective importance and then job ID.
+
+        :Return: New queue
+        :Rtype: ``JobQueue``
+        """
+
+    def enqueued(self, job):
+        """
+        Notify about a job put into a group queue
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+        """
+
+    def dequeued(self, job):
+        """
+        Notify about a job taken out of a group queue
+
+        The job was either picked for execution or removed (e.g. cancelled).
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+        """
+
+    def finished(self, job):
+        """
+        Notify about a finished execution attempt
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job. The last of its attempts is the finished one.
+        """
+
+
 class JobInterface(object):  # pragma: no cover
     """
     Interface for jobs after they have been finished
@@ -185,9 +242,19 @@ class JobInterface(object):  # pragma: no cover
       `importance` : ``int``
         Job importance
 
+      `inherited` : ``int``
+        Importance inherited from jobs waiting for this job's locks.
+        ``None`` if nothing was inherited.
+
       `not_before` : various
         execute job not before this time.
 
+      `not_after` : various
+        Deadline or ``None``
+
+      `deadline` : ``float``
+        Deadline in seconds since epoch or ``None``
+
       `extra` : ``dict``
         Extra job data
 
@@ -200,6 +267,25 @@ class JobInterface(object):  # pragma: no cover
 
       `attempts` : ``list``
         List of execution attempts
+
+      `timeline` : `Timeline`
+        Timestamps of the job's state transitions
+
+      `dedup_key` : hashable
+        Deduplication key or ``None``. Todos entered with the key of a
+        pending job are merged into that job.
+
+      `bottom_level` : ``float``
+        Estimated runtime of the longest path from this job to the end of
+        its todo graph, the job itself included. ``None`` if not computed.
+
+      `dependents` : ``int``
+        Number of jobs waiting for this job to finish
+
+      `expected_runtime` : ``float``
+        Runtime expected from the recorded runtimes of the todo description
+        name, when the job was freed from delays and dependencies. ``None``
+        if unknown.
     """
 
     def depend_on(self, job_id):
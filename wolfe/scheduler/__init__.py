@@ -31,4 +31,9 @@ if __doc__:  # pragma: no cover
 __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
+from ._policy import (  # noqa
+    Policy, FifoPolicy, PriorityPolicy, AgingPolicy, DeadlinePolicy,
+    CriticalPathPolicy, DependentsPolicy, SeptPolicy,
+)
+from ._limits import Limits  # noqa
 from ._scheduler import Scheduler  # noqa
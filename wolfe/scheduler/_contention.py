@@ -0,0 +1,368 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==========================
+ Lock Contention Profiler
+==========================
+
+The profiler records per lock name how often and how long jobs wait for
+the lock, how long it's held and how often it's handed over directly from
+one job to the waiting ones. Long chains of such handoffs indicate lock
+convoys: the lock never becomes idle and the waiters queue up behind it.
+
+Profiling is opt-in. The lock manager uses the `NULL` profiler otherwise.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import operator as _op
+
+from . import _timeline
+
+
+class LockStats(object):
+    """
+    Contention statistics of a single lock
+
+    :IVariables:
+      `name` : ``str``
+        Lock name
+
+      `acquisitions` : ``int``
+        Number of times the lock was acquired
+
+      `conflicts` : ``int``
+        Number of times a job had to wait, because the lock was acquired by
+        another job
+
+      `handoffs` : ``int``
+        Number of releases with jobs waiting for the lock
+
+      `max_waiters` : ``int``
+        Maximum number of jobs waiting for the lock at the same time
+
+      `hold_total` : ``float``
+        Accumulated hold time in seconds
+
+      `hold_max` : ``float``
+        Longest hold time in seconds
+
+      `wait_total` : ``float``
+        Accumulated time in seconds jobs spent from announcing the lock until
+        acquiring it
+
+      `wait_max` : ``float``
+        Longest wait time in seconds
+
+      `streak` : ``int``
+        Current number of consecutive handoffs
+
+      `max_streak` : ``int``
+        Longest chain of consecutive handoffs (convoy length)
+    """
+    __slots__ = (
+        'name', 'acquisitions', 'conflicts', 'handoffs', 'max_waiters',
+        'hold_total', 'hold_max', 'wait_total', 'wait_max', 'streak',
+        'max_streak',
+    )
+
+    def __init__(self, name):
+        """
+        Initialization
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+        """
+        self.name = name
+        self.acquisitions = self.conflicts = self.handoffs = 0
+        self.max_waiters = self.streak = self.max_streak = 0
+        self.hold_total = self.hold_max = 0.0
+        self.wait_total = self.wait_max = 0.0
+
+    def as_dict(self):
+        """
+        Create a plain representation
+
+        :Return: Mapping of the statistic names to their values
+        :Rtype: ``dict``
+        """
+        return dict((key, getattr(self, key)) for key in self.__slots__)
+
+
+class Contention(object):
+    """
+    Lock contention profiler
+
+    The lock manager calls the `entered`, `acquired` and `released` hooks
+    while holding the bookkeeping guard of the lock in question. So the
+    statistics of a single lock are never modified concurrently.
+
+    >>> profiler = Contention(clock=iter([1.0, 2.0, 3.0, 3.0, 7.0]).next)
+    >>> profiler.entered('L', 1, 0)
+    >>> profiler.entered('L', 2, 1)
+    >>> profiler.acquired('L', 1)
+    >>> profiler.released('L', 1)
+    >>> profiler.acquired('L', 2)
+    >>> stats = profiler.top(1)[0]
+    >>> stats.name, stats.conflicts, stats.handoffs, stats.wait_total
+    ('L', 1, 1, 3.0)
+
+    :IVariables:
+      `enabled` : ``bool``
+        Is this profiler recording? (always true)
+
+      `_stats` : ``dict``
+        Mapping of lock names to `LockStats`
+
+      `_held` : ``dict``
+        Mapping of acquired lock names to their acquisition times
+
+      `_announced` : ``dict``
+        Mapping of ``(lock name, job ID)`` to the announcement times
+
+      `_clock` : callable
+        Clock
+    """
+    enabled = True
+
+    def __init__(self, clock=None):
+        """
+        Initialization
+
+        :Parameters:
+          `clock` : callable
+            Clock returning seconds as ``float``. If omitted or ``None``,
+            `_timeline.monotonic` is used.
+        """
+        self._stats = {}
+        self._held = {}
+        self._announced = {}
+        self._clock = clock or _timeline.monotonic
+
+    def _get(self, name):
+        """
+        Find statistics of a lock, create if needed
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+        :Return: The statistics
+        :Rtype: `LockStats`
+        """
+        try:
+            return self._stats[name]
+        except KeyError:
+            return self._stats.setdefault(name, LockStats(name))
+
+    def entered(self, name, job_id, waiters):
+        """
+        Record the announcement of a lock by a job
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `job_id` : ``int``
+            Job ID
+
+          `waiters` : ``int``
+            Number of jobs waiting for the lock now, including the announcing
+            one. Zero means, the lock was not acquired by another job.
+        """
+        self._announced[name, job_id] = self._clock()
+        if waiters:
+            stats = self._get(name)
+            stats.conflicts += 1
+            if waiters > stats.max_waiters:
+                stats.max_waiters = waiters
+
+    def acquired(self, name, job_id):
+        """
+        Record the acquisition of a lock
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `job_id` : ``int``
+            Job ID
+        """
+        now = self._held[name] = self._clock()
+        stats = self._get(name)
+        stats.acquisitions += 1
+        start = self._announced.pop((name, job_id), None)
+        if start is not None:
+            wait = now - start
+            stats.wait_total += wait
+            if wait > stats.wait_max:
+                stats.wait_max = wait
+
+    def released(self, name, waiters):
+        """
+        Record the release of a lock
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `waiters` : ``int``
+            Number of jobs the lock is handed over to
+        """
+        stats = self._get(name)
+        start = self._held.pop(name, None)
+        if start is not None:
+            hold = self._clock() - start
+            stats.hold_total += hold
+            if hold > stats.hold_max:
+                stats.hold_max = hold
+        if waiters:
+            stats.handoffs += 1
+            stats.streak += 1
+            if stats.streak > stats.max_streak:
+                stats.max_streak = stats.streak
+        else:
+            stats.streak = 0
+
+    def forget(self, name, job_id):
+        """
+        Forget the announcement of a lock by a job, which went away
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `job_id` : ``int``
+            Job ID
+        """
+        self._announced.pop((name, job_id), None)
+
+    def top(self, count=10):
+        """
+        Find the most contended locks
+
+        Locks are ranked by accumulated wait time, then by number of
+        conflicts.
+
+        :Parameters:
+          `count` : ``int``
+            Maximum number of locks to report
+
+        :Return: List of `LockStats`, most contended first
+        :Rtype: ``list``
+        """
+        stats = [item for item in self._stats.values() if item.conflicts]
+        stats.sort(key=_op.attrgetter('wait_total', 'conflicts'),
+                   reverse=True)
+        return stats[:count]
+
+    def convoys(self, min_length=3):
+        """
+        Find locks, which formed convoys
+
+        A convoy is a chain of consecutive releases, where the lock was
+        handed over to waiting jobs every time.
+
+        :Parameters:
+          `min_length` : ``int``
+            Minimum number of consecutive handoffs
+
+        :Return: List of `LockStats`, longest convoy first
+        :Rtype: ``list``
+        """
+        stats = [item for item in self._stats.values()
+                 if item.max_streak >= min_length]
+        stats.sort(key=_op.attrgetter('max_streak', 'handoffs'),
+                   reverse=True)
+        return stats
+
+    def report(self, count=10, min_length=3):
+        """
+        Create a plain contention report
+
+        :Parameters:
+          `count` : ``int``
+            Maximum number of contended locks to report
+
+          `min_length` : ``int``
+            Minimum convoy length to report
+
+        :Return: Mapping with the keys ``top`` and ``convoys``, containing
+                 lists of plain `LockStats` representations
+        :Rtype: ``dict``
+        """
+        return dict(
+            top=[item.as_dict() for item in self.top(count)],
+            convoys=[item.as_dict() for item in self.convoys(min_length)],
+        )
+
+
+class _NullContention(object):
+    """
+    Profiler recording nothing
+
+    :IVariables:
+      `enabled` : ``bool``
+        Is this profiler recording? (always false)
+    """
+    enabled = False
+
+    def entered(self, name, job_id, waiters):
+        """ Ignore announcement """
+        pass
+
+    def acquired(self, name, job_id):
+        """ Ignore acquisition """
+        pass
+
+    def released(self, name, waiters):
+        """ Ignore release """
+        pass
+
+    def forget(self, name, job_id):
+        """ Ignore forgetting """
+        pass
+
+    @staticmethod
+    def top(count=10):
+        """ Nothing is contended """
+        # pylint: disable = unused-argument
+        return []
+
+    @staticmethod
+    def convoys(min_length=3):
+        """ No convoys either """
+        # pylint: disable = unused-argument
+        return []
+
+    def report(self, count=10, min_length=3):
+        """ Empty report """
+        return dict(top=self.top(count), convoys=self.convoys(min_length))
+
+
+#: Profiler recording nothing
+#:
+#: :Type: `_NullContention`
+NULL = _NullContention()
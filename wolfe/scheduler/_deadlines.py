@@ -0,0 +1,107 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+===========
+ Deadlines
+===========
+
+Jobs with a deadline, which are not handed out to an executor yet.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from .. import _sync
+from . import _job_queue
+from . import _util
+
+
+class Deadlines(object):
+    """
+    Jobs with a deadline, ordered by deadline
+
+    :IVariables:
+      `_queue` : `JobQueue`
+        The queue. It's created with the first job, ``None`` before.
+
+      `_lock` : context manager
+        Lock guarding `_queue`
+    """
+
+    def __init__(self, threadsafe=False):
+        """
+        Initialization
+
+        :Parameters:
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+        """
+        self._queue = None
+        self._lock = _sync.lock(threadsafe)
+
+    def put(self, job):
+        """
+        Add a job, if it has a deadline
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+        """
+        if job.deadline is not None:
+            with self._lock:
+                if self._queue is None:
+                    self._queue = _job_queue.JobQueue(_util.DeadlineJob)
+                self._queue.put(job)
+
+    def discard(self, job):
+        """
+        Remove a job, if it has a deadline
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+        """
+        if job.deadline is not None:
+            with self._lock:
+                self._queue.discard(job.id)
+
+    def expired(self, epoch):
+        """
+        Remove and return the jobs whose deadline passed
+
+        :Parameters:
+          `epoch` : ``int``
+            Current time in seconds since epoch
+
+        :Return: The expired jobs, ordered by deadline (may be empty)
+        :Rtype: ``list``
+        """
+        queue = self._queue
+        if not queue:
+            return []
+
+        result = []
+        with self._lock:
+            while queue and queue.peek().deadline <= epoch:
+                result.append(queue.get())
+        return result
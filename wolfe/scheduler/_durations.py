@@ -0,0 +1,317 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+===========
+ Durations
+===========
+
+Streaming runtime statistics per todo description name.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import math as _math
+
+from .. import _sync
+
+#: Quantiles reported by `Durations.report`
+#:
+#: :Type: ``tuple``
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Sketch(object):
+    """
+    Quantile sketch
+
+    Values are counted in buckets growing exponentially in size, so every
+    quantile is estimated within the relative `accuracy`, using memory
+    logarithmic to the value range. Values not greater than zero are
+    counted as zero.
+
+    >>> sketch = Sketch(0.01)
+    >>> for value in (1, 2, 3, 4, 100):
+    ...     sketch.add(value)
+    >>> round(sketch.quantile(0.5), 1), round(sketch.quantile(1), 0)
+    (3.0, 100.0)
+
+    :IVariables:
+      `count` : ``int``
+        Number of values added
+
+      `_gamma` : ``float``
+        Ratio between the bounds of a bucket
+
+      `_log_gamma` : ``float``
+        Natural logarithm of `_gamma`
+
+      `_buckets` : ``dict``
+        Number of values per bucket index. Bucket ``i`` counts the values in
+        ``(gamma ** (i - 1), gamma ** i]``.
+
+      `_zeros` : ``int``
+        Number of values counted as zero
+    """
+    __slots__ = ('count', '_gamma', '_log_gamma', '_buckets', '_zeros')
+
+    def __init__(self, accuracy=0.01):
+        """
+        Initialization
+
+        :Parameters:
+          `accuracy` : ``float``
+            Relative accuracy of the quantiles
+
+        :Exceptions:
+          - `ValueError` : `accuracy` is not between 0 and 1
+        """
+        if not 0 < accuracy < 1:
+            raise ValueError("accuracy must be between 0 and 1")
+        self.count = 0
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = _math.log(self._gamma)
+        self._buckets = {}
+        self._zeros = 0
+
+    def add(self, value):
+        """
+        Add a value
+
+        :Parameters:
+          `value` : ``float``
+            The value
+        """
+        self.count += 1
+        if value <= 0:
+            self._zeros += 1
+        else:
+            index = int(_math.ceil(_math.log(value) / self._log_gamma))
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, quantile):
+        """
+        Estimate a quantile
+
+        :Parameters:
+          `quantile` : ``float``
+            The quantile (between ``0`` and ``1``)
+
+        :Return: The estimated value or ``None``, if no value was added yet
+        :Rtype: ``float``
+
+        :Exceptions:
+          - `ValueError` : `quantile` is out of range
+        """
+        if not 0 <= quantile <= 1:
+            raise ValueError("Quantile out of range")
+        if not self.count:
+            return None
+
+        rank = quantile * (self.count - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+
+        # rank < count, so some bucket is always found. Start with the
+        # highest one anyway.
+        found = max(self._buckets)
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                found = index
+                break
+        return 2 * self._gamma ** found / (self._gamma + 1)
+
+
+class Stats(object):
+    """
+    Runtime statistics of one todo description name
+
+    :IVariables:
+      `ewma` : ``float``
+        Exponentially weighted moving average of the runtimes
+
+      `sketch` : `Sketch`
+        Quantile sketch of the runtimes
+    """
+    __slots__ = ('ewma', 'sketch')
+
+    def __init__(self, accuracy):
+        """
+        Initialization
+
+        :Parameters:
+          `accuracy` : ``float``
+            Relative accuracy of the quantiles
+        """
+        self.ewma = None
+        self.sketch = Sketch(accuracy)
+
+    def add(self, seconds, alpha):
+        """
+        Add a runtime
+
+        :Parameters:
+          `seconds` : ``float``
+            The runtime
+
+          `alpha` : ``float``
+            Weight of the new runtime within the moving average
+        """
+        if self.ewma is None:
+            self.ewma = seconds
+        else:
+            self.ewma += alpha * (seconds - self.ewma)
+        self.sketch.add(seconds)
+
+
+class Durations(object):
+    """
+    Runtime statistics per todo description name
+
+    The statistics are kept in constant space per name: an exponentially
+    weighted moving average (the expected runtime), which follows changes
+    of the runtimes, and a quantile `Sketch` over all of them.
+
+    >>> durations = Durations()
+    >>> durations.expected('foo') is None
+    True
+    >>> durations.observe('foo', 10)
+    >>> durations.observe('foo', 20)
+    >>> durations.expected('foo')
+    12.0
+
+    :IVariables:
+      `_stats` : ``dict``
+        Statistics per name (``{name: Stats, ...}``)
+
+      `_alpha` : ``float``
+        Weight of a new runtime within the moving average
+
+      `_accuracy` : ``float``
+        Relative accuracy of the quantiles
+
+      `_mutex` : context manager
+        Lock guarding `_stats`
+    """
+
+    def __init__(self, threadsafe=False, alpha=0.2, accuracy=0.01):
+        """
+        Initialization
+
+        :Parameters:
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+
+          `alpha` : ``float``
+            Weight of a new runtime within the moving average. Higher
+            values follow changes faster.
+
+          `accuracy` : ``float``
+            Relative accuracy of the quantiles
+
+        :Exceptions:
+          - `ValueError` : `alpha` or `accuracy` is out of range
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1")
+        if not 0 < accuracy < 1:
+            raise ValueError("accuracy must be between 0 and 1")
+        self._stats = {}
+        self._alpha = float(alpha)
+        self._accuracy = float(accuracy)
+        self._mutex = _sync.lock(threadsafe)
+
+    def __len__(self):
+        """
+        Count the names with recorded runtimes
+
+        :Return: The number of names
+        :Rtype: ``int``
+        """
+        return len(self._stats)
+
+    def observe(self, name, seconds):
+        """
+        Record a runtime
+
+        :Parameters:
+          `name` : ``str``
+            Todo description name
+
+          `seconds` : ``float``
+            The runtime. Negative runtimes (clock adjustments) are recorded
+            as zero.
+        """
+        seconds = max(0.0, float(seconds))
+        with self._mutex:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = Stats(self._accuracy)
+            stats.add(seconds, self._alpha)
+
+    def expected(self, name, quantile=None):
+        """
+        Determine the expected runtime
+
+        :Parameters:
+          `name` : ``str``
+            Todo description name
+
+          `quantile` : ``float``
+            Quantile of the recorded runtimes to return (between ``0`` and
+            ``1``). If omitted or ``None``, the moving average is returned.
+
+        :Return: The runtime in seconds or ``None``, if none was recorded
+        :Rtype: ``float``
+
+        :Exceptions:
+          - `ValueError` : `quantile` is out of range
+        """
+        stats = self._stats.get(name)
+        if stats is None:
+            return None
+        elif quantile is None:
+            return stats.ewma
+        with self._mutex:
+            return stats.sketch.quantile(quantile)
+
+    def report(self):
+        """
+        Report the statistics of all names
+
+        :Return: Mapping of names to dicts with the keys ``count``,
+                 ``expected`` (the moving average) and ``p50``, ``p90`` and
+                 ``p99`` (the quantiles, see `QUANTILES`)
+        :Rtype: ``dict``
+        """
+        result = {}
+        with self._mutex:
+            for name, stats in self._stats.iteritems():
+                item = dict(count=stats.sketch.count, expected=stats.ewma)
+                for quantile in QUANTILES:
+                    item['p%d' % round(quantile * 100)] = \
+                        stats.sketch.quantile(quantile)
+                result[name] = item
+        return result
@@ -0,0 +1,310 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+============
+ Fair Share
+============
+
+Weighted fair share dispatch across job groups.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from .. import _sync
+from . import _job_queue
+
+
+class Share(object):
+    """
+    Fair share account of a group
+
+    :IVariables:
+      `id` : ``str``
+        Group name. It's called ``id``, because the selection heaps index
+        their entries by it.
+
+      `weight` : ``float``
+        Group weight
+
+      `tag` : ``float``
+        Virtual start time of the group's next dispatch
+
+      `active` : ``bool``
+        Is the group queued in the selection heaps?
+
+      `heaps` : ``list``
+        Selection heaps (`_job_queue.JobQueue`) the group is member of
+    """
+    __slots__ = ('id', 'weight', 'tag', 'active', 'heaps')
+
+    def __init__(self, name, weight):
+        """
+        Initialization
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+          `weight` : ``float``
+            Group weight
+        """
+        self.id = name
+        self.weight = weight
+        self.tag = 0.0
+        self.active = False
+        self.heaps = []
+
+
+class RankedShare(object):
+    """
+    Ordering wrapper for shares inside the selection heaps
+
+    :IVariables:
+      `job` : `Share`
+        The wrapped share (named ``job`` for the queue's sake)
+
+      `tag` : ``float``
+        Virtual start time of the share at wrapping time
+    """
+    __slots__ = ('job', 'tag')
+
+    def __init__(self, share):
+        """
+        Initialization
+
+        :Parameters:
+          `share` : `Share`
+            The share to wrap
+        """
+        self.job = share
+        self.tag = share.tag
+
+    def __lt__(self, other):
+        """
+        Compare shares by virtual start time and then group name
+
+        :Parameters:
+          `other` : `RankedShare`
+            The share to compare ourself to
+
+        :Return: Is this share "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        if self.tag != other.tag:
+            return self.tag < other.tag
+        return self.job.id < other.job.id
+
+
+class FairShare(object):
+    """
+    Weighted fair share dispatch across groups
+
+    This implements start-time fair queuing: Every group carries a virtual
+    start time (tag). Dispatching a job from a group advances its tag by the
+    inverse of the group's weight, so a group with weight 3 gets three times
+    as many jobs as a group with weight 1, if both are busy. The group with
+    the lowest tag is picked next.
+
+    Groups becoming busy again start at the current virtual time, so idle
+    groups do not bank credit.
+
+    Only busy (active) groups are kept in the selection heaps. There's one
+    heap per distinct group list of the requesting executors, so selection
+    is logarithmic in the number of groups. Groups are activated when a job
+    is put into them and deactivated lazily, when a selection finds them
+    empty or blocked.
+
+    :IVariables:
+      `_weights` : ``dict``
+        Configured group weights (``{name: weight, ...}``)
+
+      `_shares` : ``dict``
+        Accounts per group name (``{name: Share, ...}``)
+
+      `_heaps` : ``dict``
+        Selection heaps per executor group list
+        (``{(name, ...): JobQueue, ...}``)
+
+      `_clock` : ``float``
+        Current virtual time
+
+      `_mutex` : context manager
+        Lock guarding the accounts and heaps
+    """
+
+    def __init__(self, weights=None, threadsafe=False):
+        """
+        Initialization
+
+        :Parameters:
+          `weights` : ``dict``
+            Group weights (``{name: weight, ...}``). Groups not mentioned
+            weigh ``1``. If omitted or ``None``, all groups weigh the same.
+
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+
+        :Exceptions:
+          - `ValueError` : A weight is not positive
+        """
+        self._weights = dict(weights or ())
+        for name, weight in self._weights.iteritems():
+            if weight <= 0:
+                raise ValueError("Weight of group %r is not positive" % (
+                    name,
+                ))
+        self._shares = {}
+        self._heaps = {}
+        self._clock = 0.0
+        self._mutex = _sync.lock(threadsafe)
+
+    def _share(self, name):
+        """
+        Find the account of a group, create if needed
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: The account
+        :Rtype: `Share`
+        """
+        share = self._shares.get(name)
+        if share is None:
+            share = self._shares[name] = Share(
+                name, float(self._weights.get(name, 1))
+            )
+        return share
+
+    def _heap(self, names):
+        """
+        Find the selection heap of a group list, create if needed
+
+        :Parameters:
+          `names` : ``tuple``
+            Group names
+
+        :Return: The heap
+        :Rtype: `_job_queue.JobQueue`
+        """
+        heap = self._heaps.get(names)
+        if heap is None:
+            heap = self._heaps[names] = _job_queue.JobQueue(RankedShare)
+            for name in set(names):
+                share = self._share(name)
+                share.heaps.append(heap)
+                if share.active:
+                    heap.put(share)
+        return heap
+
+    def activate(self, name, group):
+        """
+        Announce a job put into a group
+
+        The group is put into the selection heaps, if it's not there already.
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+          `group` : `Group`
+            The group or ``None``, if it does not exist (anymore)
+        """
+        with self._mutex:
+            share = self._share(name)
+            if share.active or not group:
+                return
+            share.active = True
+            share.tag = max(share.tag, self._clock)
+            for heap in share.heaps:
+                heap.put(share)
+
+    def pick(self, names, groups, acquirable=None, blocked=None):
+        """
+        Find the next job across groups
+
+        Empty and blocked groups are deactivated. They have to be activated
+        again (see `activate`), once they're busy or unblocked.
+
+        :Parameters:
+          `names` : ``tuple``
+            Names of the groups to search
+
+          `groups` : ``dict``
+            Group mapping (``{name: Group, ...}``)
+
+          `acquirable` : callable
+            Passed to `Group.peek`
+
+          `blocked` : callable
+            Function taking a group name and returning whether the group
+            must not be picked right now. If omitted or ``None``, no group
+            is blocked.
+
+        :Return: The queued job and its group or ``None``, if no group has a
+                 job available
+        :Rtype: ``tuple``
+        """
+        found, idle = [], []
+
+        def available(share):
+            """ Peek into the group, remember empty or blocked ones """
+            group = groups.get(share.id)
+            if not group or (blocked is not None and blocked(share.id)):
+                idle.append(share)
+                return False
+            queued_job = group.peek(acquirable)
+            if queued_job is None:
+                return False
+            found.append((queued_job, group))
+            return True
+
+        with self._mutex:
+            self._heap(names).select(available)
+
+            # Checked again under the mutex, so concurrent activations are
+            # not lost
+            for share in idle:
+                if not groups.get(share.id) or \
+                        (blocked is not None and blocked(share.id)):
+                    share.active = False
+                    for heap in share.heaps:
+                        heap.discard(share.id)
+
+        return found[0] if found else None
+
+    def charge(self, name):
+        """
+        Account a job dispatched from a group
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+        """
+        with self._mutex:
+            share = self._share(name)
+            self._clock = max(self._clock, share.tag)
+            share.tag += 1.0 / share.weight
+            for heap in share.heaps:
+                heap.reorder(name)
@@ -34,8 +34,9 @@ __docformat__ = "restructuredtext en"
 
 import weakref as _weakref
 
-from . import _job_queue
-from . import _util
+from .. import _metrics
+from .. import _sync
+from . import _policy
 
 
 class Group(object):
@@ -46,17 +47,30 @@ class Group(object):
       `name` : ``str``
         Group name
 
+      `policy` : `SchedulingPolicyInterface`
+        Scheduling policy
+
       `_locks` : `Locks`
         Lock manager
 
       `_scheduler` : `Scheduler`
         Scheduler (weakly referenced)
 
-      `_queue` : `JobQueue`
-        Actual queue
+      `_queue` : `JobQueue` or `BucketQueue`
+        Actual queue, created by the policy
+
+      `_mutex` : context manager
+        Lock guarding the queue
+
+      `_scheduled` : `_metrics.Counter`
+        Counter of jobs put into the queue
+
+      `_picked` : `_metrics.Counter`
+        Counter of jobs picked from the queue
     """
 
-    def __init__(self, name, locks, scheduler):
+    def __init__(self, name, locks, scheduler, threadsafe=False,
+                 metrics=None, policy=None):
         """
         Initialization
 
@@ -69,11 +83,46 @@ class Group(object):
 
           `scheduler` : `Scheduler`
             Scheduler
+
+          `threadsafe` : ``bool``
+            Synchronize queue access?
+
+          `metrics` : `_metrics.Registry`
+            Metrics registry. If omitted or ``None``, no metrics are
+            recorded.
+
+          `policy` : `SchedulingPolicyInterface`
+            Scheduling policy. It creates the queue and is notified about
+            jobs put into and taken out of it. If omitted or ``None``, a
+            `_policy.PriorityPolicy` is used.
         """
+        if metrics is None:
+            metrics = _metrics.NULL
+        if policy is None:
+            policy = _policy.PriorityPolicy()
         self.name = name
+        self.policy = policy
         self._locks = locks
         self._scheduler = _weakref.proxy(scheduler)
-        self._queue = _job_queue.JobQueue(_util.QueuedJob)
+        self._queue = policy.queue()
+        self._mutex = _sync.lock(threadsafe)
+        self._scheduled = metrics.counter(
+            'wolfe_group_jobs_scheduled_total', "Jobs queued in group",
+            group=name,
+        )
+        self._picked = metrics.counter(
+            'wolfe_group_jobs_picked_total', "Jobs picked from group",
+            group=name,
+        )
+
+    def __len__(self):
+        """
+        Determine the number of queued jobs
+
+        :Return: The queue length
+        :Rtype: ``int``
+        """
+        return len(self._queue)
 
     def __nonzero__(self):
         """
@@ -105,36 +154,168 @@ class Group(object):
         acquired = self._locks.acquire(job)
         if not acquired:
             raise AssertionError("Lock inconsistency. Should not happen (TM)")
-        self._queue.put(job)
+        self.put(job)
         return True
 
-    def peek(self):
+    def put(self, job):
+        """
+        Put in a new job unconditionally
+
+        The job's locks are not touched. This is used in deferred locking
+        mode, where the locks are acquired when the job is picked.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job to put in.
+        """
+        with self._mutex:
+            self._queue.put(job)
+        self._scheduled.inc()
+        self.policy.enqueued(job)
+
+    def peek(self, acquirable=None):
         """
         Peek at the next job
 
+        :Parameters:
+          `acquirable` : callable
+            Function taking a job and returning whether its locks can be
+            acquired right now. If passed, jobs, whose locks are not
+            available, are skipped. If omitted or ``None``, the queue head is
+            returned.
+
         :Return: The next job todo for this group, or ``None``, if there"s
                  nothing to do right now
         :Rtype: `QueuedJob`
         """
-        if not self._queue:
-            return None
-        return self._queue.peek()
+        with self._mutex:
+            if not self._queue:
+                return None
+            elif acquirable is not None:
+                return self._queue.select(acquirable)
+            return self._queue.peek()
 
-    def get(self):
+    def reorder(self, job):
+        """
+        Restore the queue order after a job's effective importance changed
+
+        :Parameters:
+          `job` : `JobInterface`
+            The changed job
+
+        :Return: Was the job found in the queue?
+        :Rtype: ``bool``
+        """
+        with self._mutex:
+            return self._queue.reorder(job.id)
+
+    def get(self, expected=None):
         """
         Pick the next job
 
         The job is removed from the queue. If the queue is empty afterwards,
         the group reference is removed from the scheduler.
 
-        :Return: The job
+        :Parameters:
+          `expected` : `QueuedJob`
+            The job expected to be picked, as returned by `peek`. If it's
+            not the next job anymore (because a concurrent caller took it),
+            nothing is picked. If omitted or ``None``, the next job is
+            picked unconditionally.
+
+        :Return: The job or ``None`` if `expected` was not the next job
         :Rtype: `JobInterface`
 
         :Exceptions:
           - `IndexError` : The queue was empty
         """
-        try:
-            return self._queue.get()
-        finally:
-            if not self._queue:
-                self._scheduler.del_group(self.name)
+        with self._mutex:
+            try:
+                if expected is not None:
+                    if not self._queue or self._queue.peek() is not expected:
+                        return None
+                job = self._queue.get()
+                self._picked.inc()
+            finally:
+                if not self._queue:
+                    self._scheduler.del_group(self.name)
+        self.policy.dequeued(job)
+        return job
+
+    def discard(self, job_id):
+        """
+        Remove a job from anywhere in the queue
+
+        If the queue is empty afterwards, the group reference is removed from
+        the scheduler.
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the job to remove
+
+        :Return: The job or ``None``, if it was not queued
+        :Rtype: `JobInterface`
+        """
+        with self._mutex:
+            try:
+                job = self._queue.discard(job_id)
+            finally:
+                if not self._queue:
+                    self._scheduler.del_group(self.name)
+        if job is not None:
+            self.policy.dequeued(job)
+        return job
+
+    def pick(self, job_id):
+        """
+        Pick a job by ID from anywhere in the queue
+
+        If the queue is empty afterwards, the group reference is removed from
+        the scheduler.
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the job to pick
+
+        :Return: The job or ``None``, if it's not queued (anymore)
+        :Rtype: `JobInterface`
+        """
+        with self._mutex:
+            try:
+                job = self._queue.discard(job_id)
+            finally:
+                if not self._queue:
+                    self._scheduler.del_group(self.name)
+            if job is None:
+                return None
+            self._picked.inc()
+        self.policy.dequeued(job)
+        return job
+
+    def take(self, expected):
+        """
+        Pick a specific job from anywhere in the queue
+
+        This is used in deferred locking mode, where `peek` may skip the
+        queue head. If the queue is empty afterwards, the group reference is
+        removed from the scheduler.
+
+        :Parameters:
+          `expected` : `QueuedJob`
+            The job to pick, as returned by `peek`. If it's not queued
+            anymore (because a concurrent caller took it), nothing is picked.
+
+        :Return: The job or ``None`` if `expected` was not queued anymore
+        :Rtype: `JobInterface`
+        """
+        with self._mutex:
+            try:
+                job = self._queue.remove(expected)
+            except ValueError:
+                return None
+            finally:
+                if not self._queue:
+                    self._scheduler.del_group(self.name)
+            self._picked.inc()
+        self.policy.dequeued(job)
+        return job
@@ -38,6 +38,8 @@ import itertools as _it
 from .. import _graph
 from .. import interfaces as _interfaces
 from .. import _lock
+from . import _timeline
+from . import _util
 
 #: Exception raised on cycles, when a todo DAG is resolved
 DependencyCycle = _graph.DependencyCycle
@@ -76,7 +78,8 @@ class Job(object):
     __implements__ = [_interfaces.JobInterface]
 
     def __init__(self, job_id, desc, group, locks, importance, not_before,
-                 extra, predecessors, attempts):
+                 extra, predecessors, attempts, dedup_key=None,
+                 not_after=None):
         """
         Initialization
 
@@ -117,6 +120,14 @@ class Job(object):
 
           `attempts` : ``list``
             execution attempts (``[ExecutionAttemptInterface, ...]``)
+
+          `dedup_key` : hashable
+            Deduplication key. If omitted or ``None``, the job is never
+            deduplicated.
+
+          `not_after` : various
+            Deadline. Same formats as for `not_before`. If omitted or
+            ``None``, the job has no deadline.
         """
         self.id = job_id
         self.desc = desc
@@ -124,11 +135,19 @@ class Job(object):
         self.locks = _lock.validate(locks)
         self.locks_waiting = None
         self.importance = importance
+        self.inherited = None
         self.extra = extra
         self.predecessors = set()
         self.predecessors_waiting = None
         self.attempts = attempts
         self.not_before = not_before
+        self.not_after = not_after
+        self.deadline = _util.deadline(self)
+        self.timeline = _timeline.Timeline()
+        self.dedup_key = dedup_key
+        self.bottom_level = None
+        self.dependents = 0
+        self.expected_runtime = None
         for item in predecessors or ():
             self.depend_on(item)
 
@@ -164,11 +183,11 @@ def job_from_todo(todo):
     """
     return Job(
         _gen_id(), todo.desc, todo.group, todo.locks, todo.importance,
-        todo.not_before, {}, set(), []
+        todo.not_before, {}, set(), [], todo.dedup_key, todo.not_after
     )
 
 
-def joblist_from_todo(todo):
+def joblist_from_todo(todo, runtime=None):
     """
     Construct a list of jobs from Todo graph
 
@@ -176,6 +195,11 @@ def joblist_from_todo(todo):
       `todo` : `Todo`
         todo to be inspected.
 
+      `runtime` : callable
+        Runtime estimator (``callable(job) -> float``). If passed, the
+        `bottom_level` of each job is computed. If omitted or ``None``, it's
+        left alone.
+
     :Return: List of jobs (``[JobInterface, ...]``)
     :Rtype: ``list``
     """
@@ -228,4 +252,34 @@ def joblist_from_todo(todo):
             id_mapping[virtual_id] = job.id
             jobs.append(job)
 
+    # 3) compute the bottom levels (longest paths to the sinks)
+    if runtime is not None:
+        bottom_levels(jobs, runtime)
+
     return jobs
+
+
+def bottom_levels(jobs, runtime):
+    """
+    Compute the bottom levels of a job list in topological order
+
+    The bottom level of a job is its estimated runtime plus the largest
+    bottom level of its successors within the list. Jobs on the critical
+    path have the largest bottom levels. The list is walked backwards once,
+    so every successor is done before its predecessors.
+
+    :Parameters:
+      `jobs` : ``list``
+        Jobs in topological order (``[JobInterface, ...]``). Their
+        ``bottom_level`` attributes are set.
+
+      `runtime` : callable
+        Runtime estimator (``callable(job) -> float``)
+    """
+    levels = {}
+    for job in reversed(jobs):
+        level = levels.pop(job.id, 0.0) + runtime(job)
+        job.bottom_level = level
+        for pre in job.predecessors:
+            if levels.get(pre, 0.0) < level:
+                levels[pre] = level
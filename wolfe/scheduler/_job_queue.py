@@ -24,6 +24,9 @@ r"""
 ===========
 
 Job Queue. The queue is implemented as priority queue using a heap.
+
+For bounded importance ranges there's an alternative implementation using a
+bucket per importance level (`BucketQueue`).
 """
 if __doc__:  # pragma: no cover
     # pylint: disable = redefined-builtin
@@ -31,6 +34,7 @@ if __doc__:  # pragma: no cover
 __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
+import collections as _collections
 import heapq as _heapq
 
 
@@ -49,6 +53,9 @@ class JobQueue(object):
     Additionally the queue implements boolean operations (it's false if it's
     empty) and a __contains__ operation based on job IDs.
 
+    The heap positions of the queued jobs are indexed by job ID. Jobs can be
+    removed (`discard`) or moved (`reorder`) in logarithmic time that way.
+
     >>> class Wrapper(object):
     ...     def __init__(self, job):
     ...         self.job = job
@@ -76,8 +83,8 @@ class JobQueue(object):
       `_wrapper` : callable
         Wrapper class factory
 
-      `_ids` : ``set``
-        Set of job IDs currently queued
+      `_ids` : ``dict``
+        Mapping of the job IDs currently queued to their heap positions
     """
 
     def __init__(self, wrapper_class):
@@ -93,7 +100,7 @@ class JobQueue(object):
         """
         self._queue = []
         self._wrapper = wrapper_class
-        self._ids = set()
+        self._ids = {}
 
     def __nonzero__(self):
         """
@@ -134,8 +141,10 @@ class JobQueue(object):
             The job to put in. The object must have an ``id`` attribute,
             which must be hashable.
         """
-        self._ids.add(job.id)
-        _heapq.heappush(self._queue, self._wrapper(job))
+        queue = self._queue
+        queue.append(self._wrapper(job))
+        self._ids[job.id] = len(queue) - 1
+        self._up(len(queue) - 1)
 
     def get(self):
         """
@@ -147,9 +156,7 @@ class JobQueue(object):
         :Exceptions:
           - `IndexError` : Queue was empty
         """
-        job = _heapq.heappop(self._queue).job
-        self._ids.remove(job.id)
-        return job
+        return self._pop(0).job
 
     def peek(self):
         """
@@ -164,3 +171,473 @@ class JobQueue(object):
           - `IndexError` : Queue was empty
         """
         return self._queue[0]
+
+    def select(self, predicate):
+        """
+        Find the first job in queue order matching a predicate
+
+        The heap is traversed in order without modifying it. Only subtrees
+        below non-matching items are visited.
+
+        >>> class Wrapper(object):
+        ...     def __init__(self, job):
+        ...         self.job = job
+        ...     def __lt__(self, other):
+        ...         return self.job.id < other.job.id
+        >>> class Job(object):
+        ...     def __init__(self, job_id):
+        ...         self.id = job_id
+        >>> queue = JobQueue(Wrapper)
+        >>> for job_id in (5, 3, 8, 1, 4):
+        ...     queue.put(Job(job_id))
+        >>> queue.select(lambda job: job.id % 2 == 0).job.id
+        4
+        >>> queue.select(lambda job: job.id > 10) is None
+        True
+
+        :Parameters:
+          `predicate` : callable
+            Function taking a job and returning a boolean
+
+        :Return: The wrapped job or ``None``, if no job matched
+        :Rtype: any
+        """
+        queue = self._queue
+        if not queue:
+            return None
+
+        size = len(queue)
+        candidates = [(queue[0], 0)]
+        while candidates:
+            item, idx = _heapq.heappop(candidates)
+            if predicate(item.job):
+                return item
+            for child in (2 * idx + 1, 2 * idx + 2):
+                if child < size:
+                    _heapq.heappush(candidates, (queue[child], child))
+        return None
+
+    def reorder(self, job_id):
+        """
+        Restore the queue order after a job's ordering attributes changed
+
+        The job is wrapped again, so the wrapper picks up the changes.
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the changed job
+
+        :Return: Was the job found in the queue?
+        :Rtype: ``bool``
+        """
+        idx = self._ids.get(job_id)
+        if idx is None:
+            return False
+
+        queue = self._queue
+        queue[idx] = self._wrapper(queue[idx].job)
+        self._down(self._up(idx))
+        return True
+
+    def remove(self, item):
+        """
+        Remove a wrapped job from anywhere in the queue
+
+        :Parameters:
+          `item` : any
+            The wrapped job, as returned by `peek` or `select`
+
+        :Return: The job
+        :Rtype: any
+
+        :Exceptions:
+          - `ValueError` : The item is not queued
+        """
+        idx = self._ids.get(item.job.id)
+        if idx is None or self._queue[idx] is not item:
+            raise ValueError("Item not queued")
+        return self._pop(idx).job
+
+    def discard(self, job_id):
+        """
+        Remove a job by ID from anywhere in the queue
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the job to remove
+
+        :Return: The job or ``None``, if it was not queued
+        :Rtype: any
+        """
+        idx = self._ids.get(job_id)
+        if idx is None:
+            return None
+        return self._pop(idx).job
+
+    def _pop(self, idx):
+        """
+        Remove the item at a heap position
+
+        :Parameters:
+          `idx` : ``int``
+            Heap position
+
+        :Return: The wrapped job
+        :Rtype: any
+
+        :Exceptions:
+          - `IndexError` : Queue was empty
+        """
+        queue = self._queue
+        last = queue.pop()
+        if idx < len(queue):
+            item, queue[idx] = queue[idx], last
+            self._ids[last.job.id] = idx
+            self._down(self._up(idx))
+        else:
+            item = last
+        del self._ids[item.job.id]
+        return item
+
+    def _up(self, idx):
+        """
+        Move an item towards the heap root until the heap is restored
+
+        :Parameters:
+          `idx` : ``int``
+            Heap position of the item
+
+        :Return: The new heap position
+        :Rtype: ``int``
+        """
+        queue, ids = self._queue, self._ids
+        item = queue[idx]
+        while idx:
+            parent = (idx - 1) >> 1
+            above = queue[parent]
+            if not item < above:
+                break
+            queue[idx] = above
+            ids[above.job.id] = idx
+            idx = parent
+        queue[idx] = item
+        ids[item.job.id] = idx
+        return idx
+
+    def _down(self, idx):
+        """
+        Move an item towards the heap leaves until the heap is restored
+
+        :Parameters:
+          `idx` : ``int``
+            Heap position of the item
+        """
+        queue, ids = self._queue, self._ids
+        size, item = len(queue), queue[idx]
+        child = 2 * idx + 1
+        while child < size:
+            if child + 1 < size and queue[child + 1] < queue[child]:
+                child += 1
+            below = queue[child]
+            if not below < item:
+                break
+            queue[idx] = below
+            ids[below.job.id] = idx
+            idx, child = child, 2 * child + 1
+        queue[idx] = item
+        ids[item.job.id] = idx
+
+
+class BucketQueue(object):
+    """
+    Job queue for a bounded range of importances
+
+    The queue provides the same interface as `JobQueue`. It keeps a FIFO
+    bucket per importance level and a bitmap of the occupied levels. Jobs
+    are expected to enter their bucket in ID order mostly, so putting,
+    getting and peeking is O(1). Jobs entering out of order are inserted at
+    their place.
+
+    The wrapper class has to provide an ``importance`` attribute. Items are
+    ordered by importance (higher first), then by job ID, like
+    `_util.QueuedJob` orders them. Importances outside the range are
+    treated like the nearest bound.
+
+    Removed and reordered jobs leave stale entries in their bucket, which are
+    skipped and dropped later.
+
+    >>> class Wrapper(object):
+    ...     def __init__(self, job):
+    ...         self.job, self.importance = job, job.importance
+    >>> class Job(object):
+    ...     def __init__(self, job_id, importance):
+    ...         self.id, self.importance = job_id, importance
+    >>> queue = BucketQueue(Wrapper, -2, 2)
+    >>> for job_id, importance in ((1, 0), (2, 1), (3, 0), (4, 9)):
+    ...     queue.put(Job(job_id, importance))
+    >>> [job.id for job in queue]
+    [4, 2, 1, 3]
+
+    :IVariables:
+      `_wrapper` : callable
+        Wrapper class factory
+
+      `_low` : ``int``
+        Lowest importance level
+
+      `_buckets` : ``list``
+        Buckets (``collections.deque``) of wrapped jobs per importance level,
+        lowest first
+
+      `_occupied` : ``int``
+        Bitmap of possibly occupied buckets
+
+      `_ids` : ``dict``
+        Mapping of the job IDs currently queued to their live entries
+
+      `_stale` : ``int``
+        Number of stale entries in the buckets
+    """
+
+    def __init__(self, wrapper_class, low, high):
+        """
+        Initialization
+
+        :Parameters:
+          `wrapper_class` : any
+            class factory expected to take a job and represent it inside the
+            queue. It has to provide a ``job`` attribute pointing to the
+            original object and an ``importance`` attribute.
+
+          `low` : ``int``
+            Lowest importance level
+
+          `high` : ``int``
+            Highest importance level
+
+        :Exceptions:
+          - `ValueError` : Empty range
+        """
+        if low > high:
+            raise ValueError("Empty importance range")
+        self._wrapper = wrapper_class
+        self._low = low
+        self._buckets = [_collections.deque() for _ in xrange(high - low + 1)]
+        self._occupied = 0
+        self._ids = {}
+        self._stale = 0
+
+    def __nonzero__(self):
+        """
+        Return false if the queue is empty, true otherwise
+
+        :Return: Is there something in the queue?
+        :Rtype: ``bool``
+        """
+        return bool(self._ids)
+
+    def __contains__(self, job_id):
+        """
+        Check if the passed job_id is currently enqueued
+
+        :Return: Is it?
+        :Rtype: ``bool``
+        """
+        return job_id in self._ids
+
+    def __len__(self):
+        """ Find queue length """
+        return len(self._ids)
+
+    def __iter__(self):
+        """ Iterate over the queue until it's exhausted """
+        try:
+            while True:
+                yield self.get()
+        except IndexError:
+            pass
+
+    def _insert(self, item):
+        """
+        Insert a wrapped job into its bucket
+
+        :Parameters:
+          `item` : any
+            The wrapped job
+        """
+        level = min(max(0, item.importance - self._low),
+                    len(self._buckets) - 1)
+        bucket, job_id = self._buckets[level], item.job.id
+        if not bucket or bucket[-1].job.id < job_id:
+            bucket.append(item)
+        else:
+            idx = len(bucket)
+            while idx and bucket[idx - 1].job.id > job_id:
+                idx -= 1
+            bucket.rotate(-idx)
+            bucket.appendleft(item)
+            bucket.rotate(idx)
+        self._occupied |= 1 << level
+        self._ids[job_id] = item
+
+    def _forget(self, job_id):
+        """
+        Turn the entry of a job stale
+
+        The buckets are compacted, if the stale entries outnumber the live
+        ones.
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+        :Return: The entry or ``None``, if the job was not queued
+        :Rtype: any
+        """
+        item = self._ids.pop(job_id, None)
+        if item is not None:
+            self._stale += 1
+            if self._stale > len(self._ids) + 64:
+                ids = self._ids
+                for bucket in self._buckets:
+                    live = [entry for entry in bucket
+                            if ids.get(entry.job.id) is entry]
+                    bucket.clear()
+                    bucket.extend(live)
+                self._stale = 0
+        return item
+
+    def _head(self):
+        """
+        Find the next live entry, drop stale entries on the way
+
+        :Return: The entry and its bucket
+        :Rtype: ``tuple``
+
+        :Exceptions:
+          - `IndexError` : Queue was empty
+        """
+        ids, buckets = self._ids, self._buckets
+        while self._occupied:
+            level = self._occupied.bit_length() - 1
+            bucket = buckets[level]
+            while bucket:
+                item = bucket[0]
+                if ids.get(item.job.id) is item:
+                    return item, bucket
+                bucket.popleft()
+                self._stale -= 1
+            self._occupied &= ~(1 << level)
+        raise IndexError("Queue is empty")
+
+    def put(self, job):
+        """
+        Put a job into the queue
+
+        :Parameters:
+          `job` : any
+            The job to put in. The object must have an ``id`` attribute,
+            which must be hashable.
+        """
+        self._insert(self._wrapper(job))
+
+    def get(self):
+        """
+        Get the next job from the queue
+
+        :Return: A job
+        :Rtype: any
+
+        :Exceptions:
+          - `IndexError` : Queue was empty
+        """
+        item, bucket = self._head()
+        bucket.popleft()
+        del self._ids[item.job.id]
+        return item.job
+
+    def peek(self):
+        """
+        Return the next job without removing it from the queue
+
+        The job will still be wrapped in the wrapper_class container
+
+        :Return: wrapped job
+        :Rtype: any
+
+        :Exceptions:
+          - `IndexError` : Queue was empty
+        """
+        return self._head()[0]
+
+    def select(self, predicate):
+        """
+        Find the first job in queue order matching a predicate
+
+        :Parameters:
+          `predicate` : callable
+            Function taking a job and returning a boolean
+
+        :Return: The wrapped job or ``None``, if no job matched
+        :Rtype: any
+        """
+        ids, occupied = self._ids, self._occupied
+        for level in xrange(occupied.bit_length() - 1, -1, -1):
+            if occupied & (1 << level):
+                for item in self._buckets[level]:
+                    if ids.get(item.job.id) is item and predicate(item.job):
+                        return item
+        return None
+
+    def reorder(self, job_id):
+        """
+        Restore the queue order after a job's ordering attributes changed
+
+        The job is wrapped again, so the wrapper picks up the changes.
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the changed job
+
+        :Return: Was the job found in the queue?
+        :Rtype: ``bool``
+        """
+        item = self._forget(job_id)
+        if item is None:
+            return False
+        self._insert(self._wrapper(item.job))
+        return True
+
+    def remove(self, item):
+        """
+        Remove a wrapped job from anywhere in the queue
+
+        :Parameters:
+          `item` : any
+            The wrapped job, as returned by `peek` or `select`
+
+        :Return: The job
+        :Rtype: any
+
+        :Exceptions:
+          - `ValueError` : The item is not queued
+        """
+        if self._ids.get(item.job.id) is not item:
+            raise ValueError("Item not queued")
+        return self._forget(item.job.id).job
+
+    def discard(self, job_id):
+        """
+        Remove a job by ID from anywhere in the queue
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the job to remove
+
+        :Return: The job or ``None``, if it was not queued
+        :Rtype: any
+        """
+        item = self._forget(job_id)
+        if item is None:
+            return None
+        return item.job
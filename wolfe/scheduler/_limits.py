@@ -0,0 +1,318 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=================
+ Dispatch Limits
+=================
+
+Limits of the job dispatch per group and todo description name.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import collections as _collections
+
+from .. import _sync
+from . import _fair_share
+from . import _rate
+
+
+class Limits(object):
+    """
+    Dispatch limits
+
+    :IVariables:
+      `weights` : ``dict``
+        Fair share weights per group or ``None``
+
+      `groups` : ``dict``
+        Maximum number of executed jobs per group
+
+      `names` : ``dict``
+        Maximum number of executed jobs per todo description name
+
+      `rates` : ``dict``
+        Dispatch rate limits per group
+
+      `expired_group` : ``str``
+        Group expired jobs are moved to or ``None``
+    """
+
+    def __init__(self, weights=None, groups=None, names=None, rates=None,
+                 expired_group=None):
+        """
+        Initialization
+
+        :Parameters:
+          `weights` : ``dict``
+            Dispatch jobs to executors serving multiple groups by weighted
+            fair share (see `_fair_share.FairShare`) instead of by job
+            order. Every busy group gets a share of the dispatches in
+            proportion to its weight (``{name: weight, ...}``). Groups not
+            mentioned weigh ``1``. If omitted or ``None``, the next job
+            across the executor's groups is dispatched.
+
+          `groups` : ``dict``
+            Maximum number of jobs per group being executed at the same time
+            (``{name: int, ...}``). Groups at their limit are skipped when
+            jobs are requested. If omitted or ``None``, or for groups not
+            mentioned, the number is not limited.
+
+          `names` : ``dict``
+            Maximum number of jobs per todo description name being executed
+            at the same time (``{name: int, ...}``). Jobs whose name is at
+            its limit are skipped when jobs are requested. If omitted or
+            ``None``, or for names not mentioned, the number is not limited.
+
+          `rates` : ``dict``
+            Token bucket rate limits of the dispatches per group. Values are
+            either the rate (jobs per second) or a tuple of rate and burst
+            (``{name: rate, ...}`` or ``{name: (rate, burst), ...}``). The
+            burst defaults to the rate. Groups out of tokens are skipped
+            when jobs are requested. If omitted or ``None``, or for groups
+            not mentioned, the rate is not limited.
+
+          `expired_group` : ``str``
+            Group to move jobs into, whose deadline passed before they were
+            handed out to an executor. If omitted or ``None``, expired jobs
+            are cancelled.
+        """
+        self.weights = weights
+        self.groups = dict(groups or ())
+        self.names = dict(names or ())
+        self.rates = dict(rates or ())
+        self.expired_group = expired_group
+
+
+class Admission(object):
+    """
+    Admission of picked jobs for execution according to the `Limits`
+
+    :IVariables:
+      `fair_share` : `_fair_share.FairShare`
+        Weighted fair share dispatch across groups or ``None``
+
+      `expired_group` : ``str``
+        Group expired jobs are moved to or ``None``
+
+      `_groups` : ``dict``
+        Maximum number of executed jobs per group (``{name: int, ...}``)
+
+      `_names` : ``dict``
+        Maximum number of executed jobs per todo description name
+        (``{name: int, ...}``)
+
+      `_running_groups` : ``defaultdict(int)``
+        Number of executed jobs per group
+
+      `_running_names` : ``defaultdict(int)``
+        Number of executed jobs per todo description name
+
+      `_rates` : `_rate.RateLimits`
+        Dispatch rate limits per group or ``None``
+
+      `_lock` : context manager
+        Lock guarding `_running_groups` and `_running_names`
+    """
+
+    def __init__(self, limits=None, threadsafe=False):
+        """
+        Initialization
+
+        :Parameters:
+          `limits` : `Limits`
+            The limits. If omitted or ``None``, nothing is limited.
+
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+
+        :Exceptions:
+          - `ValueError` : A group weight or a group rate is not positive
+        """
+        if limits is None:
+            limits = Limits()
+        self.fair_share = None
+        if limits.weights is not None:
+            self.fair_share = _fair_share.FairShare(
+                limits.weights, threadsafe
+            )
+        self.expired_group = limits.expired_group
+        self._groups = dict(limits.groups)
+        self._names = dict(limits.names)
+        self._running_groups = _collections.defaultdict(int)
+        self._running_names = _collections.defaultdict(int)
+        self._rates = None
+        if limits.rates:
+            self._rates = _rate.RateLimits(limits.rates, threadsafe)
+        self._lock = _sync.lock(threadsafe)
+
+    @property
+    def limits_names(self):
+        """
+        Are any todo description names limited?
+
+        :Type: ``bool``
+        """
+        return bool(self._names)
+
+    def _capped(self, name):
+        """
+        Check if a group reached its limit of executed jobs
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: Is it?
+        :Rtype: ``bool``
+        """
+        limit = self._groups.get(name)
+        return limit is not None \
+            and self._running_groups.get(name, 0) >= limit
+
+    def blocked(self, name):
+        """
+        Check if no job may be picked from a group right now, because it
+        reached its limit of executed jobs or ran out of rate limit tokens
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: Is it blocked?
+        :Rtype: ``bool``
+        """
+        return self._capped(name) or \
+            (self._rates is not None and self._rates.blocked(name))
+
+    def name_open(self, job):
+        """
+        Check if a job's description name is below its limit of executed
+        jobs
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+        :Return: Is it?
+        :Rtype: ``bool``
+        """
+        name = job.desc.name
+        limit = self._names.get(name)
+        return limit is None or self._running_names.get(name, 0) < limit
+
+    def activate(self, name, group):
+        """
+        Announce a job put into a group to the fair share dispatcher
+
+        This is a noop, if fair share dispatch is not configured or the
+        group is blocked.
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+          `group` : `_group.Group`
+            The group or ``None``
+        """
+        if self.fair_share is not None and not self.blocked(name):
+            self.fair_share.activate(name, group)
+
+    def admit(self, job):
+        """
+        Count a job as executed, if its group and name limits allow that
+
+        A rate limit token is taken for the job's group as well.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+        :Return: Was the job admitted?
+        :Rtype: ``bool``
+        """
+        with self._lock:
+            if self._capped(job.group) or not self.name_open(job):
+                return False
+            elif self._rates is not None and \
+                    not self._rates.take(job.group):
+                return False
+            self._running_groups[job.group] += 1
+            self._running_names[job.desc.name] += 1
+            return True
+
+    def dismiss(self, job, refund=False):
+        """
+        Stop counting a job as executed
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+          `refund` : ``bool``
+            Put the rate limit token taken by `admit` back? This is for jobs
+            admitted, but not executed after all.
+
+        :Return: Did the job's group drop below its limit? It should be
+                 announced to the fair share dispatcher again then (see
+                 `activate`).
+        :Rtype: ``bool``
+        """
+        with self._lock:
+            capped = self._capped(job.group)
+            for running, key in ((self._running_groups, job.group),
+                                 (self._running_names, job.desc.name)):
+                running[key] -= 1
+                if not running[key]:
+                    del running[key]
+        if refund and self._rates is not None:
+            self._rates.refund(job.group)
+        return capped
+
+    def due(self):
+        """
+        Find the rate limited groups, whose tokens were refilled
+
+        :Return: List of group names (may be empty)
+        :Rtype: ``list``
+        """
+        if self._rates is None:
+            return []
+        return self._rates.due()
+
+    def ready_at(self, names):
+        """
+        Determine when the next token of any of the groups is available
+
+        :Parameters:
+          `names` : iterable
+            Group names
+
+        :Return: The `_timeline.monotonic` time or ``None``, if no rate
+                 limited group is passed
+        :Rtype: ``float``
+        """
+        if self._rates is None:
+            return None
+        return self._rates.ready_at(names)
@@ -24,6 +24,18 @@ r"""
 =====================
 
 Job locks are acquired globally. They are managed by the `Locks` class.
+
+Jobs waiting for a lock pass their importance on to the job holding it
+(priority inheritance). The holder is queued (it acquired its locks when it
+was put into its group queue) and may be stuck behind a long backlog of
+less important jobs in its group otherwise.
+
+Lock names are paths (see `wolfe._lock`). A lock conflicts with its
+ancestors and descendants. Conflicts are found through a path index
+(`_trie.LockTrie`).
+
+The bookkeeping is keyed by the integer IDs of the interned locks rather than
+by their names.
 """
 if __doc__:  # pragma: no cover
     # pylint: disable = redefined-builtin
@@ -34,6 +46,12 @@ __docformat__ = "restructuredtext en"
 import collections as _collections
 import weakref as _weakref
 
+from .. import _lock
+from .. import _metrics
+from .. import _sync
+from . import _contention
+from . import _trie
+
 
 class Locks(object):
     """
@@ -41,31 +59,135 @@ class Locks(object):
 
     :IVariables:
       `_waiting` : ``dict``
-        Mapping of locks to job IDs, waiting for release (acquired by another
-        job)
+        Mapping of lock IDs to job IDs, waiting for release (acquired by
+        another job)
 
       `_free` : ``dict``
-        Mapping of locks to job IDs, free to acquire
+        Mapping of lock IDs to job IDs, free to acquire
 
       `_acquired` : ``dict``
-        Mapping of currently acquired locks to job IDs
+        Mapping of currently acquired lock IDs to job IDs
+
+      `_index` : `_trie.LockTrie`
+        Path index of the acquired and announced (free or waiting) locks
 
       `_scheduler` : `Scheduler`
         Scheduler instance (weakref)
+
+      `_shards` : `_sync.Shards`
+        Locks guarding the bookkeeping, sharded by the ID of the top level
+        segment of the lock name. Related locks share the same shard this
+        way.
+
+      `_counters` : `_sync.Shards`
+        Locks guarding the ``locks_waiting`` counters of the jobs, sharded
+        by job ID
+
+      `_conflicts` : `_metrics.Counter`
+        Counter of locks found acquired by another job on entering
+
+      `_acquisitions` : `_metrics.Counter`
+        Counter of acquired locks
+
+      `profiler` : `_contention.Contention`
+        Lock contention profiler
+
+      `deferred` : ``bool``
+        Are the locks of a job acquired when it's picked instead of when
+        it's queued?
     """
 
-    def __init__(self, scheduler):
+    def __init__(self, scheduler, threadsafe=False, metrics=None,
+                 profiler=None, deferred=False):
         """
         Initialization
 
         :Parameters:
           `scheduler` : `Scheduler`
             Scheduler instance, this lock manager is bound to
+
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+
+          `metrics` : `_metrics.Registry`
+            Metrics registry. If omitted or ``None``, no metrics are
+            recorded.
+
+          `profiler` : `_contention.Contention`
+            Lock contention profiler. If omitted or ``None``, contention is
+            not profiled.
+
+          `deferred` : ``bool``
+            Acquire the locks of a job when it's picked instead of when it's
+            queued? The lock manager only records the setting, the
+            scheduler acts on it.
         """
+        if metrics is None:
+            metrics = _metrics.NULL
+        if profiler is None:
+            profiler = _contention.NULL
+        self.profiler = profiler
+        self.deferred = bool(deferred)
         self._waiting = _collections.defaultdict(set)
         self._free = _collections.defaultdict(set)
         self._acquired = {}
+        self._index = _trie.LockTrie()
         self._scheduler = _weakref.proxy(scheduler)
+        self._shards = _sync.Shards(threadsafe)
+        self._counters = _sync.Shards(threadsafe)
+        self._conflicts = metrics.counter(
+            'wolfe_lock_conflicts_total',
+            "Locks found acquired by another job",
+        )
+        self._acquisitions = metrics.counter(
+            'wolfe_locks_acquired_total', "Locks acquired"
+        )
+        if metrics.enabled:
+            this = _weakref.proxy(self)
+            metrics.callback(
+                'wolfe_locks_held', "Locks currently acquired",
+                lambda: this.held_count,
+            )
+            metrics.callback(
+                'wolfe_lock_waiters', "Jobs waiting for acquired locks",
+                lambda: this.waiter_count,
+            )
+
+    @property
+    def held_count(self):
+        """
+        Number of acquired locks
+
+        :Type: ``int``
+        """
+        return len(self._acquired)
+
+    @property
+    def waiter_count(self):
+        """
+        Number of jobs waiting for acquired locks
+
+        Jobs waiting for multiple locks are counted once per lock.
+
+        :Type: ``int``
+        """
+        return sum(map(len, self._waiting.values()))
+
+    def guard(self, job):
+        """
+        Create a context manager holding the bookkeeping of the job's locks
+
+        All methods guard themselves. Holding the guard is only needed in
+        order to combine multiple calls atomically.
+
+        :Parameters:
+          `job` : `JobInterface`
+            Job to guard the locks for
+
+        :Return: The context manager
+        :Rtype: context manager
+        """
+        return self._shards.guard(lock.root for lock in job.locks)
 
     def enter(self, job):
         """
@@ -75,22 +197,143 @@ class Locks(object):
           `job` : `JobInterface`
             Job whose locks should be entered
         """
-        job.locks_waiting = len(job.locks)
-        for lock in job.locks:
-            assert lock.exclusive
-
-            if lock.name in self._acquired:
-                self._waiting[lock.name].add(job.id)
-            else:
-                self._free[lock.name].add(job.id)
-                job.locks_waiting -= 1
+        profiler, index = self.profiler, self._index
+        with self.guard(job):
+            job.locks_waiting = len(job.locks)
+            for lock in job.locks:
+                assert lock.exclusive
+
+                index.announce(lock.name, lock.id)
+                holders = index.holders(lock.name)
+                if holders:
+                    waiting = self._waiting[lock.id]
+                    waiting.add(job.id)
+                    self._conflicts.inc()
+                    for holder_id in holders:
+                        self._inherit(holder_id, job.importance)
+                    if profiler.enabled:
+                        profiler.entered(lock.name, job.id, len(waiting))
+                else:
+                    self._free[lock.id].add(job.id)
+                    job.locks_waiting -= 1
+                    if profiler.enabled:
+                        profiler.entered(lock.name, job.id, 0)
 
         assert job.locks_waiting >= 0
 
+    def _inherit(self, holder_id, importance, reorder=True):
+        """
+        Pass importance on to a lock holder
+
+        :Parameters:
+          `holder_id` : ``int``
+            ID of the job holding the lock
+
+          `importance` : ``int``
+            Importance of the waiting job(s)
+
+          `reorder` : ``bool``
+            Ask the scheduler to restore the queue order, if the holder's
+            effective importance was raised? This is not needed, if the
+            holder is not queued yet.
+        """
+        with self._counters[holder_id]:
+            holder = self._scheduler.jobs[holder_id]
+            current = holder.importance
+            if holder.inherited is not None and holder.inherited > current:
+                current = holder.inherited
+            if importance <= current:
+                return
+            holder.inherited = importance
+        if reorder:
+            self._scheduler.reorder(holder)
+
+    def _recompute(self, holder_id):
+        """
+        Recompute the importance a lock holder inherited from its waiters
+
+        Other than `_inherit` this may lower the inherited importance, e.g.
+        after a waiting job went away or was reprioritized down.
+
+        :Parameters:
+          `holder_id` : ``int``
+            ID of the job holding the lock(s)
+        """
+        jobs, index = self._scheduler.jobs, self._index
+        holder = jobs.get(holder_id)
+        if holder is None or not holder.locks:
+            return
+
+        with self.guard(holder):
+            if self._acquired.get(holder.locks[0].id) != holder_id:
+                return  # released meanwhile
+            importance = None
+            for lock in holder.locks:
+                for lock_id in index.related(lock.name):
+                    for job_id in self._waiting.get(lock_id, ()):
+                        waiter = jobs[job_id].importance
+                        if importance is None or waiter > importance:
+                            importance = waiter
+            if importance is not None and importance <= holder.importance:
+                importance = None
+            with self._counters[holder_id]:
+                changed = holder.inherited != importance
+                holder.inherited = importance
+        if changed:
+            self._scheduler.reorder(holder)
+
+    def reprioritize(self, job):
+        """
+        Pass the changed importance of a waiting job on to the lock holders
+
+        The holders recompute what they inherit from all of their waiters, so
+        the inherited importance is lowered again if needed.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The changed job
+        """
+        if not job.locks_waiting:
+            return
+
+        holders = set()
+        index = self._index
+        with self.guard(job):
+            for lock in job.locks:
+                if job.id in self._waiting.get(lock.id, ()):
+                    holders.update(index.holders(lock.name))
+        for holder_id in holders:
+            self._recompute(holder_id)
+
+    def is_free(self, job):
+        """
+        Check if the job's locks are entered and can be acquired right now
+
+        In thread safe mode a job may be reported free by concurrent
+        releases more than once. This check allows to ignore the stale
+        reports.
+
+        :Parameters:
+          `job` : `JobInterface`
+            Job to check
+
+        :Return: Can the job acquire its locks?
+        :Rtype: ``bool``
+        """
+        if job.locks_waiting:
+            return False
+        elif not job.locks:
+            return True
+        return job.id in self._free.get(job.locks[0].id, ())
+
     def acquire(self, job):
         """
         Acquire locks for job
 
+        In thread safe mode the caller is expected to hold the job's `guard`,
+        so the check of the job's ``locks_waiting`` counter and the
+        acquisition happen atomically.
+
         :Parameters:
           `job` : `JobInterface`
             Job to acquire the locks for
@@ -101,20 +344,137 @@ class Locks(object):
         if job.locks_waiting:
             return False
 
-        jobs = self._scheduler.jobs
+        jobs, counters = self._scheduler.jobs, self._counters
+        profiler, index = self.profiler, self._index
+        with self.guard(job):
+            for lock in job.locks:
+                assert not index.conflicts(lock.name)
+
+                free = self._free.pop(lock.id)
+                free.remove(job.id)
+                if free:
+                    self._free[lock.id] = free
+                index.withdraw(lock.name)
+                index.hold(lock.name, job.id)
+
+                # All free jobs announcing related locks have to wait now
+                blocked = []
+                for lock_id in index.related(lock.name):
+                    waiting = self._free.pop(lock_id, None)
+                    if waiting:
+                        assert lock_id not in self._waiting
+                        self._waiting[lock_id] = waiting
+                        blocked.extend(waiting)
+                for job_id in blocked:
+                    with counters[job_id]:
+                        jobs[job_id].locks_waiting += 1
+                if blocked:
+                    self._inherit(job.id, max(
+                        jobs[job_id].importance for job_id in blocked
+                    ), reorder=False)
+                self._acquired[lock.id] = job.id
+                if profiler.enabled:
+                    profiler.acquired(lock.name, job.id)
+
+        if job.locks:
+            self._acquisitions.inc(len(job.locks))
+        return True
+
+    def is_available(self, job):
+        """
+        Check if none of the job's locks is acquired right now
+
+        This check is used in deferred locking mode, where the locks are not
+        entered beforehand. It does not reserve anything. Use `try_acquire`
+        for that.
+
+        :Parameters:
+          `job` : `JobInterface`
+            Job to check
+
+        :Return: Are all locks available?
+        :Rtype: ``bool``
+        """
+        conflicts = self._index.conflicts
         for lock in job.locks:
-            assert lock.name not in self._acquired
+            if conflicts(lock.name):
+                return False
+        return True
+
+    def try_acquire(self, job):
+        """
+        Acquire all locks of a job at once, if they are available
 
-            waiting = self._free.pop(lock.name)
-            waiting.remove(job.id)
-            if waiting:
-                self._waiting[lock.name] = waiting
-                for job_id in waiting:
-                    jobs[job_id].locks_waiting += 1
-            self._acquired[lock.name] = job.id
+        This is the acquisition in deferred locking mode. The locks are not
+        entered beforehand and nobody waits for them. Either all locks are
+        acquired or none.
+
+        :Parameters:
+          `job` : `JobInterface`
+            Job to acquire the locks for
 
+        :Return: Locks acquired?
+        :Rtype: ``bool``
+        """
+        if not job.locks:
+            return True
+
+        profiler = self.profiler
+        with self.guard(job):
+            if not self.is_available(job):
+                self._conflicts.inc()
+                return False
+            for lock in job.locks:
+                assert lock.exclusive
+                self._index.hold(lock.name, job.id)
+                self._acquired[lock.id] = job.id
+                if profiler.enabled:
+                    profiler.acquired(lock.name, job.id)
+
+        self._acquisitions.inc(len(job.locks))
         return True
 
+    def withdraw(self, job):
+        """
+        Withdraw the entered, but not acquired locks of a job
+
+        This is used for jobs going away before they acquired their locks.
+        Holders of the locks the job waited for recompute the importance they
+        inherited from the remaining waiters.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+        :Return: Were any locks withdrawn?
+        :Rtype: ``bool``
+        """
+        withdrawn = False
+        holders = set()
+        profiler, index = self.profiler, self._index
+        with self.guard(job):
+            for lock in job.locks:
+                for entered in (self._free, self._waiting):
+                    job_ids = entered.get(lock.id)
+                    if job_ids is not None and job.id in job_ids:
+                        if entered is self._waiting:
+                            holders.update(index.holders(lock.name))
+                        job_ids.remove(job.id)
+                        if not job_ids:
+                            del entered[lock.id]
+                        index.withdraw(lock.name)
+                        if profiler.enabled:
+                            profiler.forget(lock.name, job.id)
+                        withdrawn = True
+                        break
+            if withdrawn:
+                job.locks_waiting = None
+
+        # The holders may have inherited their importance from this job
+        for holder_id in holders:
+            self._recompute(holder_id)
+        return withdrawn
+
     def release(self, job):
         """
         Release locks for a job
@@ -128,18 +488,33 @@ class Locks(object):
         """
         assert job.locks_waiting == 0
 
-        candidates = set()
-
-        jobs = self._scheduler.jobs
-        for lock in job.locks:
-            assert self._acquired[lock.name] == job.id
-
-            del self._acquired[lock.name]
-            if lock.name in self._waiting:
-                free = self._free[lock.name] = self._waiting.pop(lock.name)
-                for job_id in free:
-                    jobs[job_id].locks_waiting -= 1
-                    if jobs[job_id].locks_waiting == 0:
-                        candidates.add(job_id)
-
-        return [jobs[x] for x in candidates]
+        job.inherited = None
+        candidates = {}
+
+        jobs, counters = self._scheduler.jobs, self._counters
+        profiler, index = self.profiler, self._index
+        name = _lock.REGISTRY.name
+        with self.guard(job):
+            for lock in job.locks:
+                assert self._acquired[lock.id] == job.id
+
+                del self._acquired[lock.id]
+                index.release(lock.name)
+
+                # Waiting jobs announcing related locks may be free now
+                handed = 0
+                for lock_id in index.related(lock.name):
+                    if lock_id in self._waiting \
+                            and not index.conflicts(name(lock_id)):
+                        free = self._waiting.pop(lock_id)
+                        self._free[lock_id] = free
+                        handed += len(free)
+                        for job_id in free:
+                            with counters[job_id]:
+                                jobs[job_id].locks_waiting -= 1
+                                if jobs[job_id].locks_waiting == 0:
+                                    candidates[job_id] = jobs[job_id]
+                if profiler.enabled:
+                    profiler.released(lock.name, handed)
+
+        return candidates.values()
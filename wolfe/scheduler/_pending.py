@@ -0,0 +1,109 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==============
+ Pending Jobs
+==============
+
+Jobs not handed out to an executor yet, by deduplication key.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from .. import _sync
+
+
+class Pending(object):
+    """
+    Pending jobs by deduplication key
+
+    :IVariables:
+      `_jobs` : ``dict``
+        Mapping of deduplication keys to pending jobs
+
+      `_merge` : ``bool``
+        Merge duplicates into the pending jobs?
+
+      `_lock` : context manager
+        Lock guarding `_jobs`
+    """
+
+    def __init__(self, merge=True, threadsafe=False):
+        """
+        Initialization
+
+        :Parameters:
+          `merge` : ``bool``
+            Merge duplicates into the pending jobs (see `find`)?
+
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+        """
+        self._jobs = {}
+        self._merge = bool(merge)
+        self._lock = _sync.lock(threadsafe)
+
+    def find(self, job, enter, merge):
+        """
+        Find the pending job with the same deduplication key
+
+        If there is none, the job is entered (by calling `enter`) and becomes
+        the pending one. Otherwise the job is merged into the pending one (by
+        calling `merge`), if configured so. Both happen under the lock.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The new job. Its ``dedup_key`` must not be ``None``.
+
+          `enter` : callable
+            Function entering the job, called with the job as argument
+
+          `merge` : callable
+            Function merging the duplicate, called with the pending job and
+            the new job as arguments
+
+        :Return: The pending job or ``None``
+        :Rtype: `JobInterface`
+        """
+        with self._lock:
+            pending = self._jobs.get(job.dedup_key)
+            if pending is None:
+                enter(job)
+                self._jobs[job.dedup_key] = job
+            elif self._merge:
+                merge(pending, job)
+            return pending
+
+    def discard(self, job):
+        """
+        Forget a job, if it's the pending one of its deduplication key
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+        """
+        if job.dedup_key is not None:
+            with self._lock:
+                if self._jobs.get(job.dedup_key) is job:
+                    del self._jobs[job.dedup_key]
@@ -0,0 +1,309 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=====================
+ Scheduling Policies
+=====================
+
+Built-in scheduling policies for group queues.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import functools as _ft
+
+from .. import interfaces as _interfaces
+from . import _job_queue
+from . import _util
+
+
+class Policy(object):
+    """
+    Base class for scheduling policies
+
+    The group queues are heaps ordered by the `wrapper` class. The hooks do
+    nothing.
+
+    :CVariables:
+      `wrapper` : ``type``
+        Ordering wrapper class of the queued jobs
+    """
+    __implements__ = [_interfaces.SchedulingPolicyInterface]
+
+    wrapper = None
+
+    def queue(self):
+        """
+        Create an empty group queue
+
+        :See: `SchedulingPolicyInterface.queue`
+        """
+        return _job_queue.JobQueue(self.wrapper)
+
+    def enqueued(self, job):
+        """
+        Notify about a job put into a group queue
+
+        :See: `SchedulingPolicyInterface.enqueued`
+        """
+
+    def dequeued(self, job):
+        """
+        Notify about a job taken out of a group queue
+
+        :See: `SchedulingPolicyInterface.dequeued`
+        """
+
+    def finished(self, job):
+        """
+        Notify about a finished execution attempt
+
+        :See: `SchedulingPolicyInterface.finished`
+        """
+
+
+class FifoPolicy(Policy):
+    """
+    Hand out jobs in the order they were entered, regardless of importance
+    """
+    wrapper = _util.FifoJob
+
+
+class PriorityPolicy(Policy):
+    """
+    Hand out jobs by importance, then in the order they were entered
+
+    This is the default policy.
+
+    :IVariables:
+      `importance_range` : ``tuple``
+        Bounded importance range (``(low, high)``) or ``None``
+    """
+    wrapper = _util.QueuedJob
+
+    def __init__(self, importance_range=None):
+        """
+        Initialization
+
+        :Parameters:
+          `importance_range` : ``tuple``
+            Bounded importance range (``(low, high)``). If passed, the queue
+            keeps a bucket per importance level (`_job_queue.BucketQueue`)
+            instead of a heap. Importances outside the range are queued like
+            the nearest bound. If omitted or ``None``, the importance is not
+            bounded.
+        """
+        self.importance_range = importance_range and tuple(importance_range)
+
+    def queue(self):
+        """
+        Create an empty group queue
+
+        :See: `SchedulingPolicyInterface.queue`
+        """
+        if self.importance_range is None:
+            return super(PriorityPolicy, self).queue()
+        return _job_queue.BucketQueue(self.wrapper, *self.importance_range)
+
+
+class AgingPolicy(Policy):
+    """
+    Hand out jobs by importance, which grows while they are waiting
+
+    See `_util.AgingJob`.
+
+    :IVariables:
+      `aging` : ``float``
+        Number of waiting seconds worth one importance level
+    """
+
+    def __init__(self, aging):
+        """
+        Initialization
+
+        :Parameters:
+          `aging` : ``float``
+            Number of waiting seconds, which raise the effective importance
+            of a queued job by one
+
+        :Exceptions:
+          - `ValueError` : `aging` is not positive
+        """
+        if aging <= 0:
+            raise ValueError("aging must be positive")
+        self.aging = aging
+        self.wrapper = _ft.partial(_util.AgingJob, aging=aging)
+
+
+class DeadlinePolicy(Policy):
+    """
+    Hand out jobs by earliest deadline first
+
+    Jobs without deadline come last. See `_util.DeadlineJob`.
+    """
+    wrapper = _util.DeadlineJob
+
+
+class CriticalPathPolicy(Policy):
+    """
+    Hand out jobs by importance, then by bottom level
+
+    Jobs with the longest estimated path to the end of their todo graph come
+    first. The scheduler computes the bottom levels of entered jobs, if any
+    group uses this policy. See `_util.CriticalPathJob`.
+
+    :IVariables:
+      `runtimes` : ``dict``
+        Estimated runtimes per todo description name
+    """
+    wrapper = _util.CriticalPathJob
+
+    def __init__(self, runtimes=None):
+        """
+        Initialization
+
+        :Parameters:
+          `runtimes` : ``dict``
+            Estimated runtimes per todo description name
+            (``{name: seconds, ...}``). Jobs with names not mentioned are
+            estimated by the runtimes recorded by the scheduler, or to run
+            for a second, if there are none. If omitted or ``None``, no
+            name is mentioned.
+        """
+        self.runtimes = dict(runtimes or ())
+
+    def estimate(self, job, default=1.0):
+        """
+        Estimate the runtime of a job
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+          `default` : ``float``
+            Estimate for jobs with names not mentioned in `runtimes`
+
+        :Return: Estimated runtime in seconds
+        :Rtype: ``float``
+        """
+        return self.runtimes.get(job.desc.name, default)
+
+
+class DependentsPolicy(Policy):
+    """
+    Hand out jobs by importance, then by the number of jobs waiting for them
+
+    Jobs unblocking the most other jobs come first. Queued jobs are
+    reordered when their number of dependents changes. See
+    `_util.DependentsJob`.
+    """
+    wrapper = _util.DependentsJob
+
+
+class SeptPolicy(Policy):
+    """
+    Hand out jobs by importance, then by shortest expected runtime first
+
+    The expected runtime of a job is the moving average of the recorded
+    runtimes of its todo description name (see `_durations.Durations`) at
+    the time it's freed from delays and dependencies. Mixing short and long
+    jobs, this reduces the mean waiting time. See `_util.ShortestJob`.
+
+    :IVariables:
+      `unknown` : ``float``
+        Runtime assumed for jobs without recorded runtimes
+    """
+
+    def __init__(self, unknown=0.0):
+        """
+        Initialization
+
+        :Parameters:
+          `unknown` : ``float``
+            Runtime assumed for jobs without recorded runtimes. The default
+            runs them before all others, so their runtimes get known
+            quickly.
+        """
+        self.unknown = unknown
+        self.wrapper = _ft.partial(_util.ShortestJob, unknown=unknown)
+
+
+class Policies(object):
+    """
+    Scheduling policies of the groups
+
+    :IVariables:
+      `_default` : `SchedulingPolicyInterface`
+        Default scheduling policy
+
+      `_policies` : ``dict``
+        Scheduling policies per group name, overriding the default
+    """
+
+    def __init__(self, default=None, policies=None):
+        """
+        Initialization
+
+        :Parameters:
+          `default` : `SchedulingPolicyInterface`
+            Default scheduling policy. If omitted or ``None``, groups are
+            ordered by importance (see `PriorityPolicy`).
+
+          `policies` : ``dict``
+            Scheduling policies per group name (``{name: policy, ...}``).
+            If omitted or ``None``, all groups use the default policy.
+        """
+        if default is None:
+            default = PriorityPolicy()
+        self._default = default
+        self._policies = dict(policies or ())
+
+    def get(self, name):
+        """
+        Find the scheduling policy of a group
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: The policy
+        :Rtype: `SchedulingPolicyInterface`
+        """
+        return self._policies.get(name, self._default)
+
+    def uses(self, cls):
+        """
+        Check if any group uses a policy of a particular class
+
+        :Parameters:
+          `cls` : ``type``
+            Policy class
+
+        :Return: Does it?
+        :Rtype: ``bool``
+        """
+        return any(
+            isinstance(policy, cls)
+            for policy in [self._default] + self._policies.values()
+        )
@@ -0,0 +1,308 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=============
+ Rate Limits
+=============
+
+Token bucket rate limits for job groups.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import heapq as _heapq
+
+from .. import _sync
+from . import _timeline
+
+
+class TokenBucket(object):
+    """
+    Token bucket
+
+    The bucket holds up to `burst` tokens and is refilled continuously with
+    `rate` tokens per second. Every dispatch takes one token.
+
+    >>> bucket = TokenBucket(2, 3, now=0.0)
+    >>> [bucket.take(0.0) for _ in range(4)]
+    [True, True, True, False]
+    >>> bucket.ready_at(0.0)
+    0.5
+    >>> bucket.take(0.5)
+    True
+
+    :IVariables:
+      `rate` : ``float``
+        Tokens added per second
+
+      `burst` : ``float``
+        Bucket capacity
+
+      `tokens` : ``float``
+        Tokens available at `stamp`
+
+      `stamp` : ``float``
+        Time of the last refill (`_timeline.monotonic`)
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst=None, now=None):
+        """
+        Initialization
+
+        The bucket starts full.
+
+        :Parameters:
+          `rate` : ``float``
+            Tokens added per second
+
+          `burst` : ``float``
+            Bucket capacity. If omitted or ``None``, it's `rate`, but at
+            least ``1``.
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
+
+        :Exceptions:
+          - `ValueError` : The rate is not positive or the burst is less than
+            one token
+        """
+        if burst is None:
+            burst = max(1, rate)
+        if rate <= 0:
+            raise ValueError("Rate is not positive")
+        elif burst < 1:
+            raise ValueError("Burst is less than one token")
+        if now is None:
+            now = _timeline.monotonic()
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.stamp = now
+
+    def _fill(self, now):
+        """
+        Refill the bucket
+
+        :Parameters:
+          `now` : ``float``
+            Current `_timeline.monotonic` time
+        """
+        if now > self.stamp:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.stamp) * self.rate
+            )
+            self.stamp = now
+
+    def take(self, now):
+        """
+        Take a token, if there is one
+
+        :Parameters:
+          `now` : ``float``
+            Current `_timeline.monotonic` time
+
+        :Return: Was a token taken?
+        :Rtype: ``bool``
+        """
+        self._fill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self):
+        """ Put back a token taken before """
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def ready_at(self, now):
+        """
+        Determine when the next token is available
+
+        :Parameters:
+          `now` : ``float``
+            Current `_timeline.monotonic` time
+
+        :Return: The `_timeline.monotonic` time. It's `now`, if a token is
+                 available already.
+        :Rtype: ``float``
+        """
+        self._fill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+
+class RateLimits(object):
+    """
+    Rate limits per group
+
+    Groups found out of tokens (see `blocked`) are remembered with their
+    refill time, ordered in a heap. `due` tells which of them can be
+    dispatched from again.
+
+    :IVariables:
+      `_buckets` : ``dict``
+        Token buckets per group name (``{name: TokenBucket, ...}``)
+
+      `_refills` : ``list``
+        Heap of refill times of blocked groups (``[(time, name), ...]``)
+
+      `_blocked` : ``set``
+        Names of the groups in `_refills`
+
+      `_mutex` : context manager
+        Lock guarding the buckets and the heap
+    """
+
+    def __init__(self, rates, threadsafe=False):
+        """
+        Initialization
+
+        :Parameters:
+          `rates` : ``dict``
+            Rate limits per group name. Values are either the rate (tokens
+            per second) or a tuple of rate and burst (``{name: rate, ...}``
+            or ``{name: (rate, burst), ...}``).
+
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+
+        :Exceptions:
+          - `ValueError` : Invalid rate or burst
+        """
+        now = _timeline.monotonic()
+        self._buckets = {}
+        for name, rate in dict(rates).iteritems():
+            if not isinstance(rate, (tuple, list)):
+                rate = (rate,)
+            self._buckets[name] = TokenBucket(*rate, now=now)
+        self._refills = []
+        self._blocked = set()
+        self._mutex = _sync.lock(threadsafe)
+
+    def blocked(self, name):
+        """
+        Check if a group is out of tokens
+
+        Blocked groups are remembered for `due`.
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: Is it?
+        :Rtype: ``bool``
+        """
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            return False
+
+        with self._mutex:
+            now = _timeline.monotonic()
+            ready = bucket.ready_at(now)
+            if ready <= now:
+                return False
+            if name not in self._blocked:
+                self._blocked.add(name)
+                _heapq.heappush(self._refills, (ready, name))
+            return True
+
+    def take(self, name):
+        """
+        Take a token for a dispatch from a group
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: Was a token available? Groups without limit always have
+                 tokens.
+        :Rtype: ``bool``
+        """
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            return True
+        with self._mutex:
+            return bucket.take(_timeline.monotonic())
+
+    def refund(self, name):
+        """
+        Put back a token taken by `take`
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+        """
+        bucket = self._buckets.get(name)
+        if bucket is not None:
+            with self._mutex:
+                bucket.refund()
+
+    def due(self):
+        """
+        Find the blocked groups, whose tokens are refilled now
+
+        The groups are forgotten afterwards.
+
+        :Return: List of group names
+        :Rtype: ``list``
+        """
+        refills = self._refills
+        if not refills:
+            return []
+
+        result = []
+        with self._mutex:
+            now = _timeline.monotonic()
+            while refills and refills[0][0] <= now:
+                name = _heapq.heappop(refills)[1]
+                self._blocked.discard(name)
+                result.append(name)
+        return result
+
+    def ready_at(self, names):
+        """
+        Determine when the next token of any of the passed groups is
+        available
+
+        :Parameters:
+          `names` : iterable
+            Group names
+
+        :Return: The `_timeline.monotonic` time or ``None``, if none of the
+                 groups is limited
+        :Rtype: ``float``
+        """
+        result = None
+        with self._mutex:
+            now = _timeline.monotonic()
+            for name in names:
+                bucket = self._buckets.get(name)
+                if bucket is not None:
+                    ready = bucket.ready_at(now)
+                    if result is None or ready < result:
+                        result = ready
+        return result
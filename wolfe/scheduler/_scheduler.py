@@ -34,17 +34,30 @@ __author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
 __docformat__ = "restructuredtext en"
 
 import time as _time
+import weakref as _weakref
 
 from .. import _constants
+from .. import _exceptions
+from .. import _metrics
+from .. import _sync
 
+from . import _contention
+from . import _deadlines
+from . import _durations
 from . import _group
 from . import _job
 from . import _job_queue
+from . import _limits
 from . import _locks
+from . import _pending
+from . import _policy
+from . import _stats
+from . import _timeline
 from . import _util
 from . import _waiting
 
 DependencyCycle = _job.DependencyCycle
+DependencyCancelled = _exceptions.DependencyCancelled
 
 
 class Scheduler(object):
@@ -76,27 +89,213 @@ class Scheduler(object):
       `_failed` : ``set``
         Failed job IDs
 
+      `_cancelled` : ``set``
+        Cancelled job IDs. They are never forgotten, so jobs depending on
+        them are never considered runnable.
+
       `_groups` : ``dict``
         Job group mapping (``{str: Group, ...}``)
+
+      `_threadsafe` : ``bool``
+        Is the scheduler supposed to be used by multiple threads?
+
+      `_delayed_lock` : context manager
+        Lock guarding `_delayed`
+
+      `_groups_lock` : context manager
+        Lock guarding the creation of groups
+
+      `metrics` : `_metrics.Registry`
+        Metrics registry
+
+      `durations` : `_durations.Durations`
+        Runtimes of the successfully finished jobs per todo description name
+
+      `_pending` : `_pending.Pending`
+        Jobs not handed out to an executor yet, by deduplication key
+
+      `_policies` : `_policy.Policies`
+        Scheduling policies of the groups
+
+      `_admission` : `_limits.Admission`
+        Admission of picked jobs according to the dispatch limits
+
+      `_deadlines` : `_deadlines.Deadlines`
+        Jobs with a deadline, which are not handed out to an executor yet
+
+      `_stats` : `_stats.Stats`
+        Job lifecycle metrics
     """
 
-    def __init__(self, finished):
+    def __init__(self, finished, threadsafe=False, metrics=None,
+                 profile_locks=False, defer_locks=False,
+                 merge_duplicates=True, limits=None, policy=None,
+                 policies=None):
         """
         Initialization
 
+        In thread safe mode, the scheduler synchronizes fine-grained: every
+        group queue has its own lock and the lock manager and waiting job
+        bookkeeping are sharded. Requests for disjoint groups do not
+        serialize each other.
+
         :Parameters:
           `finished` : `JunkYardInterface`
             Finished job dump
+
+          `threadsafe` : ``bool``
+            Allow concurrent calls from multiple threads?
+
+          `metrics` : `_metrics.Registry`
+            Metrics registry. If omitted or ``None``, no metrics are
+            recorded.
+
+          `profile_locks` : ``bool``
+            Profile lock contention? The profile is available via
+            `contention`.
+
+          `defer_locks` : ``bool``
+            Acquire the locks of a job when it's picked by `request_job`
+            instead of when it's put into the group queue? Queued jobs
+            waiting for an executor do not block other jobs then. Picking
+            skips jobs whose locks are acquired.
+
+          `merge_duplicates` : ``bool``
+            When a todo is deduplicated (see `enter_todo`), raise the pending
+            job's importance to the duplicate's and move its scheduling time
+            forward to the duplicate's, whichever is earlier? If false, the
+            pending job is left as is.
+
+          `limits` : `_limits.Limits`
+            Dispatch limits: fair share weights, limits of the executed jobs
+            and dispatch rates per group, limits of the executed jobs per
+            todo description name and the group of the expired jobs (see
+            `expire_jobs`). Groups out of rate limit tokens are skipped when
+            jobs are requested, see `retry_after` for the refill time. If
+            omitted or ``None``, nothing is limited.
+
+          `policy` : `SchedulingPolicyInterface`
+            Default scheduling policy of the group queues (see `_policy`).
+            If omitted or ``None``, groups are ordered by importance (see
+            `_policy.PriorityPolicy`).
+
+          `policies` : ``dict``
+            Scheduling policies per group name (``{name: policy, ...}``).
+            They take precedence over the default policy. If omitted or
+            ``None``, all groups use the default policy.
+
+        :Exceptions:
+          - `ValueError` : A group weight or a group rate is not positive
         """
+        if metrics is None:
+            metrics = _metrics.NULL
+        self.metrics = metrics
         self.jobs = {}
+        self.durations = _durations.Durations(threadsafe)
         self._executing = {}
         self._executors = {}
         self._finished = finished
-        self._locks = _locks.Locks(self)
+        self._threadsafe = bool(threadsafe)
+        self._locks = _locks.Locks(
+            self, self._threadsafe, metrics,
+            _contention.Contention() if profile_locks else None,
+            defer_locks,
+        )
         self._delayed = _job_queue.JobQueue(_util.DelayedJob)
-        self._waiting = _waiting.Waiting(self)
+        self._delayed_lock = _sync.lock(self._threadsafe)
+        self._policies = _policy.Policies(policy, policies)
+        self._waiting = _waiting.Waiting(
+            self, self._threadsafe, metrics,
+            self._policies.uses(_policy.DependentsPolicy),
+        )
         self._failed = set()
+        self._cancelled = set()
         self._groups = {}
+        self._groups_lock = _sync.lock(self._threadsafe)
+        self._pending = _pending.Pending(merge_duplicates, self._threadsafe)
+        self._admission = _limits.Admission(limits, self._threadsafe)
+        self._deadlines = _deadlines.Deadlines(self._threadsafe)
+        self._stats = _stats.Stats(metrics)
+        if metrics.enabled:
+            self._register_gauges(metrics)
+
+    def _register_gauges(self, metrics):
+        """
+        Register gauges for the scheduler's containers
+
+        :Parameters:
+          `metrics` : `_metrics.Registry`
+            Metrics registry
+        """
+        this = _weakref.proxy(self)
+        metrics.callback(
+            'wolfe_jobs', "Jobs known to the scheduler",
+            lambda: len(this.jobs),
+        )
+        metrics.callback(
+            'wolfe_jobs_executing', "Jobs being executed",
+            lambda: this.executing_count,
+        )
+        metrics.callback(
+            'wolfe_jobs_delayed', "Jobs delayed until a later time",
+            lambda: this.delayed_count,
+        )
+        metrics.callback(
+            'wolfe_jobs_failed', "Failed jobs",
+            lambda: this.failed_count,
+        )
+        metrics.callback(
+            'wolfe_group_jobs_queued', "Jobs queued per group",
+            lambda: [({'group': name}, count)
+                     for name, count in this.queued_counts.items()],
+        )
+
+    @property
+    def executing_count(self):
+        """
+        Number of jobs being executed
+
+        :Type: ``int``
+        """
+        return len(self._executing)
+
+    @property
+    def delayed_count(self):
+        """
+        Number of jobs delayed until a later time
+
+        :Type: ``int``
+        """
+        return len(self._delayed)
+
+    @property
+    def failed_count(self):
+        """
+        Number of failed jobs
+
+        :Type: ``int``
+        """
+        return len(self._failed)
+
+    @property
+    def queued_counts(self):
+        """
+        Number of queued jobs per group (``{name: int, ...}``)
+
+        :Type: ``dict``
+        """
+        return dict(
+            (name, len(group)) for name, group in self._groups.items()
+        )
+
+    @property
+    def contention(self):
+        """
+        Lock contention profiler
+
+        :Type: `_contention.Contention`
+        """
+        return self._locks.profiler
 
     def is_done(self, job_id):
         """
@@ -112,8 +311,9 @@ class Scheduler(object):
         # Either the job is somewhere around or it's unknown. The latter is
         # defined to be successfully finished, if job_id is not larger than
         # the maximum ID ever given (it cannot be done, if we haven't even
-        # seen it yet)
-        return 0 < job_id <= _job.last_job_id() and job_id not in self.jobs
+        # seen it yet). Cancelled jobs are never done.
+        return 0 < job_id <= _job.last_job_id() \
+            and job_id not in self.jobs and job_id not in self._cancelled
 
     def execution_attempt(self, job_id):
         """
@@ -129,6 +329,125 @@ class Scheduler(object):
         """
         return self._executing.get(job_id)
 
+    def breakdown(self, job_id):
+        """
+        Compute the latency breakdown of a known job
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+        :Return: The breakdown (see `_timeline.Timeline.breakdown`) or
+                 ``None``, if the job is not known (anymore)
+        :Rtype: ``dict``
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return job.timeline.breakdown()
+
+    def reorder(self, job):
+        """
+        Restore the group queue order after a job's effective importance
+        changed
+
+        This is a noop, if the job is not queued (e.g. because it's executed
+        already).
+
+        :Parameters:
+          `job` : `JobInterface`
+            The changed job
+        """
+        group = self._groups.get(job.group)
+        if group is not None:
+            group.reorder(job)
+
+    def set_importance(self, job_id, importance):
+        """
+        Change the importance of a job
+
+        Queued jobs are moved within their group queue. Jobs waiting for
+        locks pass the new importance on to the lock holders, which
+        recompute the importance inherited from their waiters.
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+          `importance` : ``int``
+            The new importance
+
+        :Return: Was the job found?
+        :Rtype: ``bool``
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        self._set_importance(job, importance)
+        return True
+
+    def reprioritize(self, importance, group=None, name=None):
+        """
+        Change the importance of all matching jobs
+
+        Jobs being executed are not changed.
+
+        :Parameters:
+          `importance` : ``int``
+            The new importance
+
+          `group` : ``str``
+            Group name to match. If omitted or ``None``, any group matches.
+
+          `name` : ``str``
+            Todo description name to match. If omitted or ``None``, any
+            name matches.
+
+        :Return: List of IDs of the changed jobs
+        :Rtype: ``list``
+        """
+        result = []
+        for job in self.jobs.values():
+            if job.id in self._executing:
+                continue
+            elif group is not None and job.group != group:
+                continue
+            elif name is not None and job.desc.name != name:
+                continue
+            self._set_importance(job, importance)
+            result.append(job.id)
+        return result
+
+    def _set_importance(self, job, importance):
+        """
+        Change the importance of a job and restore the affected orders
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+          `importance` : ``int``
+            The new importance
+        """
+        if importance == job.importance:
+            return
+        job.importance = importance
+        self.reorder(job)
+        self._locks.reprioritize(job)
+
+    def policy(self, name):
+        """
+        Find the scheduling policy of a group
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+
+        :Return: The policy
+        :Rtype: `SchedulingPolicyInterface`
+        """
+        return self._policies.get(name)
+
     def get_group(self, name):
         """
         Return job group, create if needed
@@ -140,9 +459,16 @@ class Scheduler(object):
         :Return: The job group instance
         :Rtype: `_group.Group`
         """
-        if name not in self._groups:
-            self._groups[name] = _group.Group(name, self._locks, self)
-        return self._groups[name]
+        try:
+            return self._groups[name]
+        except KeyError:
+            with self._groups_lock:
+                if name not in self._groups:
+                    self._groups[name] = _group.Group(
+                        name, self._locks, self, self._threadsafe,
+                        self.metrics, self.policy(name),
+                    )
+                return self._groups[name]
 
     def del_group(self, name):
         """
@@ -151,10 +477,16 @@ class Scheduler(object):
         This is a noop, if the group does not exist. It's asserted that the
         group is empty.
 
+        In thread safe mode, groups are never removed. Otherwise a concurrent
+        caller of `get_group` might put a job into an already removed group.
+
         :Parameters:
           `name` : ``str``
             Group name
         """
+        if self._threadsafe:
+            return
+
         try:
             group = self._groups.pop(name)
             if group:
@@ -163,10 +495,43 @@ class Scheduler(object):
         except KeyError:
             pass
 
+    def _activate(self, name):
+        """
+        Announce a job put into a group to the fair share dispatcher
+
+        This is a noop, if fair share dispatch is not configured.
+
+        :Parameters:
+          `name` : ``str``
+            Group name
+        """
+        self._admission.activate(name, self._groups.get(name))
+
+    def _dismiss(self, job, refund=False):
+        """
+        Stop counting a job as executed
+
+        A group dropping below its limit is announced to the fair share
+        dispatcher again.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+          `refund` : ``bool``
+            Refund the rate limit token taken for the job?
+        """
+        if self._admission.dismiss(job, refund):
+            self._activate(job.group)
+
     def enter_todo(self, todo):
         """
         Turn todo (graph) into a list of jobs and enter them into the system
 
+        Todos carrying the deduplication key of a pending job are not entered.
+        The pending job is used instead (also as predecessor of the todo's
+        successors).
+
         :Parameters:
           `todo` : `Todo`
             The todo to enter into the system
@@ -177,16 +542,116 @@ class Scheduler(object):
 
         :Exceptions:
           - `DependencyCycle` : The todo graph contains a cycle
+          - `DependencyCancelled` : The todo (graph) depends on cancelled
+            jobs. Nothing is entered in this case.
         """
         job_id = None
-        for job in _job.joblist_from_todo(todo):
+        now = _timeline.monotonic()
+        replaced = {}
+        runtime = None
+        if self._policies.uses(_policy.CriticalPathPolicy):
+            runtime = self._estimate_runtime
+        jobs = _job.joblist_from_todo(todo, runtime)
+        cancelled = set()
+        for job in jobs:
+            cancelled.update(self._cancelled.intersection(job.predecessors))
+        if cancelled:
+            raise DependencyCancelled(sorted(cancelled))
+
+        for job in jobs:
+            if replaced:
+                job.predecessors = set(
+                    replaced.get(pre, pre) for pre in job.predecessors
+                )
+            if job.dedup_key is None:
+                self._enter_job(job, now)
+            else:
+                pending = self._deduplicate(job, now)
+                if pending is not None:
+                    replaced[job.id] = pending.id
+                    if job_id is None:
+                        job_id = pending.id
+                    continue
+
             if job_id is None:
                 job_id = job.id
-            self._enter_job(job)
 
         return job_id
 
-    def _enter_job(self, job):
+    def _estimate_runtime(self, job):
+        """
+        Estimate the runtime of a job for the bottom level computation
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+        :Return: Estimated runtime in seconds. Jobs of groups not using a
+                 `_policy.CriticalPathPolicy` and jobs not estimated by the
+                 policy are estimated by their recorded runtimes, or to run
+                 for a second, if there are none.
+        :Rtype: ``float``
+        """
+        expected = self.durations.expected(job.desc.name)
+        if expected is None:
+            expected = 1.0
+        policy = self.policy(job.group)
+        if isinstance(policy, _policy.CriticalPathPolicy):
+            return policy.estimate(job, expected)
+        return expected
+
+    def _deduplicate(self, job, now):
+        """
+        Find the pending job with the same deduplication key
+
+        If there's none, the job is entered and registered as pending itself.
+        Both happen under the same lock, so duplicates never see a pending
+        job, which is not entered yet (and would count as done). Otherwise
+        the job is merged into the pending one (if configured so).
+
+        :Parameters:
+          `job` : `JobInterface`
+            The new job
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time
+
+        :Return: The pending job or ``None``
+        :Rtype: `JobInterface`
+        """
+        pending = self._pending.find(
+            job, lambda job: self._enter_job(job, now), self._merge
+        )
+        if pending is not None:
+            self._stats.deduplicated.inc()
+        return pending
+
+    def _merge(self, pending, job):
+        """
+        Merge a duplicate into the pending job
+
+        The pending job gets the higher importance and the earlier scheduling
+        time of both.
+
+        :Parameters:
+          `pending` : `JobInterface`
+            The pending job
+
+          `job` : `JobInterface`
+            The duplicate
+        """
+        if job.importance > pending.importance:
+            self._set_importance(pending, job.importance)
+
+        if pending.not_before:
+            with self._delayed_lock:
+                if pending.id in self._delayed and \
+                        _util.scheduled_time(job) < \
+                        _util.scheduled_time(pending):
+                    pending.not_before = job.not_before
+                    self._delayed.reorder(pending.id)
+
+    def _enter_job(self, job, now=None):
         """
         Enter a new job into the system
 
@@ -206,14 +671,24 @@ class Scheduler(object):
         :Parameters:
           `job` : `JobInterface`
             The job
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
         """
+        if now is None:
+            now = _timeline.monotonic()
         self.jobs[job.id] = job
+        self._stats.entered.inc()
+        job.timeline.entered = now
+        self._deadlines.put(job)
         if job.not_before:
-            self._delayed.put(job)
+            with self._delayed_lock:
+                self._delayed.put(job)
         else:
-            self._enter_undelayed(job)
+            self._enter_undelayed(job, now)
 
-    def _enter_undelayed(self, job):
+    def _enter_undelayed(self, job, now=None):
         """
         Enter job, which is not delayed
 
@@ -228,11 +703,22 @@ class Scheduler(object):
         :parameters:
           `job` : `JobInterface`
             the job
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
         """
+        if now is None:
+            now = _timeline.monotonic()
+        job.timeline.ready = now
         if not self._waiting.put(job):
-            self._schedule_independent(job)
+            self._schedule_independent(job, now)
+        elif self._cancelled.intersection(job.predecessors):
+            # A predecessor was cancelled while the job was delayed (or
+            # while it was entered concurrently). It would wait forever.
+            self.cancel_job(job.id)
 
-    def _schedule_independent(self, job):
+    def _schedule_independent(self, job, now=None):
         """
         Schedule job, which is neither delayed nor depending on another job
 
@@ -245,11 +731,56 @@ class Scheduler(object):
         :Parameters:
           `job` : `JobInterface`
             the job
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
         """
-        self._locks.enter(job)
-        self.get_group(job.group).schedule(job)
+        if now is None:
+            now = _timeline.monotonic()
+        job.timeline.freed = now
+        job.expected_runtime = self.durations.expected(job.desc.name)
+        if self._locks.deferred:
+            job.locks_waiting = 0
+            job.timeline.queued = now
+            self.get_group(job.group).put(job)
+            self._activate(job.group)
+            return
+
+        with self._locks.guard(job):
+            self._locks.enter(job)
+            queued = self.get_group(job.group).schedule(job)
+            if queued:
+                job.timeline.queued = now
+
+        # Outside the lock guard, which must not be held while the fair
+        # share dispatcher peeks into the groups
+        if queued:
+            self._activate(job.group)
+
+    def _reschedule(self, job, now=None):
+        """
+        Schedule job, whose locks have been released by another job
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
 
-    def _undelay_jobs(self):
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
+        """
+        with self._locks.guard(job):
+            queued = self._locks.is_free(job) \
+                and self.get_group(job.group).schedule(job)
+            if queued:
+                if now is None:
+                    now = _timeline.monotonic()
+                job.timeline.queued = now
+        if queued:
+            self._activate(job.group)
+
+    def _undelay_jobs(self, now=None):
         """
         Schedule jobs, which were delayed until now
 
@@ -261,14 +792,25 @@ class Scheduler(object):
           once the locks *can* be acquired
         - otherwise the job is entered into its group queue, where it can be
           picked up by workers
+
+        :Parameters:
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
         """
         delayed = self._delayed
         if delayed:
-            now = int(_time.time())
-            while delayed and delayed.peek().not_before <= now:
-                self._enter_undelayed(delayed.get())
-
-    def _unwait_jobs(self, finished_id):
+            epoch = int(_time.time())
+            undelayed = []
+            with self._delayed_lock:
+                while delayed and delayed.peek().not_before <= epoch:
+                    undelayed.append(delayed.get())
+            if undelayed and now is None:
+                now = _timeline.monotonic()
+            for job in undelayed:
+                self._enter_undelayed(job, now)
+
+    def _unwait_jobs(self, finished_id, now=None):
         """
         Schedule freed jobs depending on a now finished job
 
@@ -281,6 +823,13 @@ class Scheduler(object):
         :Parameters:
           `finished_id` : ``int``
             ID of the finished job (this property is asserted)
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time. If omitted or ``None``, the
+            clock is read.
+
+        :Return: The freed jobs in scheduling order
+        :Rtype: ``list``
         """
         assert self.is_done(finished_id)
 
@@ -290,10 +839,13 @@ class Scheduler(object):
         queue = _job_queue.JobQueue(_util.QueuedJob)
         for job in self._waiting.free(finished_id):
             queue.put(job)
+        freed = []
         for job in queue:
-            self._schedule_independent(job)
+            self._schedule_independent(job, now)
+            freed.append(job)
+        return freed
 
-    def request_job(self, executor):
+    def request_job(self, executor, prefer=None):
         """
         Find a job for execution
 
@@ -308,6 +860,13 @@ class Scheduler(object):
           `executor` : `ExecutorInterface`
             Executor requesting the job
 
+          `prefer` : iterable
+            Jobs to pick before all others, if they are queued in one of the
+            executor's groups, in order. This is used to hand the jobs freed
+            by `finish_job` to the executor, which just finished their
+            predecessor (see `finish_and_request`). If omitted or ``None``,
+            no job is preferred.
+
         :Return: The next job to be executed (and marked as such), or
                  ``None``, if no matching job is scheduled right now.
         :Rtype: `JobInterface`
@@ -319,27 +878,278 @@ class Scheduler(object):
             assert self._executing[job_id].executor == executor.uid
             return self.jobs[job_id]
 
-        self._undelay_jobs()
+        now = _timeline.monotonic()
+        self._undelay_jobs(now)
+        self.expire_jobs()
+        for name in self._admission.due():
+            self._activate(name)
+
+        groups = executor.groups or (_constants.Group.DEFAULT,)
+        acquirable = self._acquirable()
+        job = None
+        if prefer:
+            job = self._pick_preferred(prefer, groups, acquirable)
+            if job is not None:
+                self._stats.continued.inc()
+        while job is None:
+            found = self._find(groups, acquirable)
+            if found is None:
+                return None
+
+            # A concurrent request may have picked the job in the meantime.
+            # Just try again then.
+            if acquirable is None:
+                job = found[1].get(found[0])
+            else:
+                job = found[1].take(found[0])
+            if job is None:
+                continue
+            assert job.id not in self._executing
+
+            # Same for the limits and the locks in deferred mode. The job is
+            # requeued then.
+            if not self._claim(job):
+                job = None
+
+        self._dispatch(job, executor, now)
+        return job
+
+    def _find(self, groups, acquirable):
+        """
+        Find the next job to pick from the groups
+
+        :Parameters:
+          `groups` : ``tuple``
+            Names of the groups to pick from
+
+          `acquirable` : callable
+            Predicate for jobs, which may be picked besides the queue heads,
+            as created by `_acquirable`, or ``None``
+
+        :Return: Tuple of job and group or ``None``, if no job is queued
+        :Rtype: ``tuple``
+        """
+        admission = self._admission
+        if admission.fair_share is not None:
+            return admission.fair_share.pick(
+                groups, self._groups, acquirable, admission.blocked
+            )
 
         found = None
-        for group in executor.groups or (_constants.Group.DEFAULT,):
-            if group in self._groups:
-                group = self._groups[group]
-                queued_job = group.peek()
-
-                # pylint: disable = unsubscriptable-object
-                if queued_job is not None and \
-                        (found is None or queued_job < found[0]):
-                    found = queued_job, group
-
-        if found is not None:
-            assert found[0].job.id not in self._executing
-
-            found = found[1].get()
-            self._executing[found.id] = executor.attempt()
-            self._executors[executor.uid] = found.id
+        for name in groups:
+            group = self._groups.get(name)
+            if group is None or admission.blocked(name):
+                continue
+            queued_job = group.peek(acquirable)
+
+            # pylint: disable = unsubscriptable-object
+            if queued_job is None:
+                continue
+            elif found is None or _util.precedes(queued_job, found[0]):
+                found = queued_job, group
         return found
 
+    def _dispatch(self, job, executor, now):
+        """
+        Mark a picked job as being executed
+
+        :Parameters:
+          `job` : `JobInterface`
+            The picked job
+
+          `executor` : `ExecutorInterface`
+            Executor requesting the job
+
+          `now` : ``float``
+            Current `_timeline.monotonic` time
+        """
+        if self._admission.fair_share is not None:
+            self._admission.fair_share.charge(job.group)
+
+        self._pending.discard(job)
+        self._deadlines.discard(job)
+
+        self._executing[job.id] = executor.attempt()
+        self._executors[executor.uid] = job.id
+        self._stats.dispatched.inc()
+        job.timeline.dispatched = now
+
+    def _pick_preferred(self, jobs, groups, acquirable):
+        """
+        Pick the first of the passed jobs queued in one of the groups
+
+        :Parameters:
+          `jobs` : iterable
+            Candidate jobs
+
+          `groups` : ``tuple``
+            Names of the groups to pick from
+
+          `acquirable` : callable
+            Predicate for jobs, which may be picked besides the queue heads,
+            as created by `_acquirable`, or ``None``
+
+        :Return: The picked job or ``None``
+        :Rtype: `JobInterface`
+        """
+        for job in jobs:
+            if job.group not in groups or \
+                    self._admission.blocked(job.group):
+                continue
+            elif acquirable is not None and not acquirable(job):
+                continue
+
+            group = self._groups.get(job.group)
+            if group is not None:
+                picked = group.pick(job.id)
+                if picked is not None and self._claim(picked):
+                    return picked
+        return None
+
+    def _claim(self, job):
+        """
+        Admit a picked job for execution
+
+        The job is put back into its group queue, if the group or name
+        limits, the rate limit or (in deferred locking mode) the locks do
+        not allow its execution right now.
+
+        :Parameters:
+          `job` : `JobInterface`
+            The picked job
+
+        :Return: Was the job admitted?
+        :Rtype: ``bool``
+        """
+        if not self._admission.admit(job):
+            self._requeue(job)
+            return False
+        elif self._locks.deferred and not self._locks.try_acquire(job):
+            self._dismiss(job, refund=True)
+            self._requeue(job)
+            return False
+        return True
+
+    def retry_after(self, executor):
+        """
+        Determine how long the executor's rate limited groups are out of
+        tokens
+
+        Executors finding no job can sleep that long instead of polling.
+
+        :Parameters:
+          `executor` : `ExecutorInterface`
+            Executor requesting jobs
+
+        :Return: Number of seconds until the next token of any of the
+                 executor's rate limited groups with queued jobs is
+                 available, or ``None``, if there is no such group. ``0.0``
+                 means, a token is available now.
+        :Rtype: ``float``
+        """
+        groups = executor.groups or (_constants.Group.DEFAULT,)
+        ready = self._admission.ready_at(
+            name for name in groups if self._groups.get(name)
+        )
+        if ready is None:
+            return None
+        return max(0.0, ready - _timeline.monotonic())
+
+    def expire_jobs(self):
+        """
+        Deal with jobs, whose deadline passed before they were handed out to
+        an executor
+
+        Expired jobs are cancelled (see `cancel_job`), including the jobs
+        waiting for them. If an expired group is configured, they are moved
+        into that group instead. Jobs queued already are requeued there,
+        others are queued there, once they're ready.
+
+        This is called by `request_job`, so it only needs to be called
+        explicitly, if expired jobs should be dealt with while nobody
+        requests jobs.
+
+        :Return: List of IDs of the expired jobs
+        :Rtype: ``list``
+        """
+        expired = self._deadlines.expired(int(_time.time()))
+        if not expired:
+            return []
+
+        result = []
+        expired_group = self._admission.expired_group
+        for job in expired:
+            if expired_group is None:
+                if self.cancel_job(job.id) is None:
+                    continue
+            elif not self._divert(job, expired_group):
+                continue
+            result.append(job.id)
+
+        self._stats.expired.inc(len(result))
+        return result
+
+    def _divert(self, job, name):
+        """
+        Move a job, which is not handed out to an executor, into another
+        group
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+          `name` : ``str``
+            Name of the target group
+
+        :Return: Was the job moved? It's not, if it's not known anymore or
+                 picked by a request already.
+        :Rtype: ``bool``
+        """
+        with self._locks.guard(job):
+            if job.id not in self.jobs:
+                return False
+            group = self._groups.get(job.group)
+            queued = group is not None and group.discard(job.id) is not None
+            if not queued and job.timeline.queued is not None:
+                # Picked in the meantime
+                return False
+            job.group = name
+            if queued:
+                self.get_group(name).put(job)
+        if queued:
+            self._activate(name)
+        return True
+
+    def _acquirable(self):
+        """
+        Create the predicate for jobs, which may be picked from the group
+        queues besides the queue heads
+
+        :Return: Function taking a job and returning whether it can be picked
+                 right now or ``None``, if only queue heads may be picked
+        :Rtype: callable
+        """
+        if self._admission.limits_names:
+            name_open = self._admission.name_open
+            if self._locks.deferred:
+                is_available = self._locks.is_available
+                return lambda job: name_open(job) and is_available(job)
+            return name_open
+        elif self._locks.deferred:
+            return self._locks.is_available
+        return None
+
+    def _requeue(self, job):
+        """
+        Put a picked job back into its group queue
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+        """
+        self.get_group(job.group).put(job)
+        self._activate(job.group)
+
     def finish_job(self, job_id, end, result):
         """
         Mark executed job finished
@@ -353,28 +1163,154 @@ class Scheduler(object):
 
           `result` : `ExecutionResultInterface`
             Execution result
+
+        :Return: The jobs freed by the finish, in order: the successors,
+                 which do not wait for other jobs anymore, then the jobs
+                 waiting for the released locks
+        :Rtype: ``list``
         """
+        now = _timeline.monotonic()
         job = self.jobs[job_id]
         attempt = self._executing.pop(job_id)
         del self._executors[attempt.executor]
+        self._dismiss(job)
+        job.timeline.finished = now
+        self._stats.observe(job.timeline)
 
         # We need to maintain the proper scheduling order here, because the
         # jobs may re-acquire locks. The queue ensures that order.
         queue = _job_queue.JobQueue(_util.QueuedJob)
         for released in self._locks.release(job):
             queue.put(released)
+        unlocked = []
         for released in queue:
-            self.get_group(released.group).schedule(released)
+            self._reschedule(released, now)
+            unlocked.append(released)
 
         attempt.finish(end, result)
         job.attempts.append(attempt)
+        self.policy(job.group).finished(job)
 
         if not result.failed:  # success
+            self._stats.succeeded.inc()
+            self.durations.observe(job.desc.name, end - attempt.start)
             del self.jobs[job_id]
-            self._unwait_jobs(job_id)
+            freed = self._unwait_jobs(job_id, now)
             self._finished.put(job)
         else:
+            self._stats.failed.inc()
             self._fail_job(job)
+            freed = []
+        return freed + unlocked
+
+    def finish_and_request(self, job_id, end, result, executor):
+        """
+        Mark executed job finished and find the next job for its executor
+
+        The jobs freed by the finish are preferred, if they belong to the
+        executor's groups. Chains of jobs are continued on the same executor
+        then, which saves a round trip and keeps their data local.
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the finished job
+
+          `end` : ``float``
+            Finishing time in seconds since epoch
+
+          `result` : `ExecutionResultInterface`
+            Execution result
+
+          `executor` : `ExecutorInterface`
+            The executor, which executed the job
+
+        :Return: The next job to be executed (and marked as such), or
+                 ``None``, if no matching job is scheduled right now.
+        :Rtype: `JobInterface`
+        """
+        freed = self.finish_job(job_id, end, result)
+        return self.request_job(executor, prefer=freed)
+
+    def cancel_job(self, job_id):
+        """
+        Cancel a job, which is not executed right now
+
+        The job is taken out of whichever structure holds it. Its locks are
+        withdrawn or released. Jobs waiting for it are cancelled as well,
+        since they cannot be executed anymore. Failed jobs can be cancelled,
+        too.
+
+        :Parameters:
+          `job_id` : ``int``
+            ID of the job to cancel
+
+        :Return: List of IDs of the cancelled jobs, the passed one first, or
+                 ``None``, if the job is not known or executed right now
+        :Rtype: ``list``
+        """
+        if job_id not in self.jobs or job_id in self._executing:
+            return None
+
+        cancelled, stack = [], [job_id]
+        released = _job_queue.JobQueue(_util.QueuedJob)
+        while stack:
+            job = self.jobs.get(stack.pop())
+            if job is None:
+                continue
+            freed = self._remove_job(job)
+            if freed is None:
+                # Picked by a concurrent request in the meantime
+                continue
+            # Collected after the job is marked as cancelled, so jobs
+            # concurrently put into waiting state are either found here or
+            # see the mark themselves (see `_enter_undelayed`)
+            dependents = self._waiting.dependents(job.id)
+            for item in freed:
+                if item.id not in released:
+                    released.put(item)
+            cancelled.append(job.id)
+            stack.extend(dependents)
+
+        if not cancelled:
+            return None
+
+        self._stats.cancelled.inc(len(cancelled))
+        now = _timeline.monotonic()
+        for item in released:
+            self._reschedule(item, now)
+        return cancelled
+
+    def _remove_job(self, job):
+        """
+        Take a job, which is not executed, out of the system
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+        :Return: Jobs, which have free locks now, or ``None`` if the job
+                 could not be found (because it's handed out to an executor)
+        :Rtype: iterable
+        """
+        released = ()
+        with self._delayed_lock:
+            delayed = self._delayed.discard(job.id) is not None
+        if not delayed and not self._waiting.discard(job):
+            group = self._groups.get(job.group)
+            if group is not None and group.discard(job.id) is not None:
+                if not self._locks.deferred:
+                    released = self._locks.release(job)
+            elif job.id not in self._failed and \
+                    not self._locks.withdraw(job):
+                return None
+
+        self._pending.discard(job)
+        self._deadlines.discard(job)
+
+        del self.jobs[job.id]
+        self._failed.discard(job.id)
+        self._cancelled.add(job.id)
+        return released
 
     def _fail_job(self, job):
         """
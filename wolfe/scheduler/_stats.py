@@ -0,0 +1,127 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=================
+ Scheduler Stats
+=================
+
+Counters and histograms of the scheduler's job lifecycle.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from .. import _metrics
+from . import _timeline
+
+
+class Stats(object):
+    """
+    Job lifecycle metrics
+
+    :IVariables:
+      `entered` : `_metrics.Counter`
+        Jobs entered
+
+      `dispatched` : `_metrics.Counter`
+        Jobs handed out to executors
+
+      `continued` : `_metrics.Counter`
+        Jobs handed out to the executor, which freed them
+
+      `cancelled` : `_metrics.Counter`
+        Jobs cancelled
+
+      `expired` : `_metrics.Counter`
+        Jobs not dispatched in time
+
+      `deduplicated` : `_metrics.Counter`
+        Todos merged into pending jobs
+
+      `succeeded` : `_metrics.Counter`
+        Jobs finished successfully
+
+      `failed` : `_metrics.Counter`
+        Jobs finished with a failure
+
+      `_phases` : ``dict``
+        Phase name -> `_metrics.Histogram` mapping
+
+      `_enabled` : ``bool``
+        Are metrics recorded at all?
+    """
+
+    def __init__(self, metrics=None):
+        """
+        Initialization
+
+        :Parameters:
+          `metrics` : `_metrics.Registry`
+            Metrics registry. If omitted or ``None``, nothing is recorded.
+        """
+        if metrics is None:
+            metrics = _metrics.NULL
+        self.entered = metrics.counter(
+            'wolfe_jobs_entered_total', "Jobs entered"
+        )
+        self.dispatched = metrics.counter(
+            'wolfe_jobs_dispatched_total', "Jobs handed out to executors"
+        )
+        self.continued = metrics.counter(
+            'wolfe_jobs_continued_total',
+            "Jobs handed out to the executor, which freed them",
+        )
+        self.cancelled = metrics.counter(
+            'wolfe_jobs_cancelled_total', "Jobs cancelled"
+        )
+        self.expired = metrics.counter(
+            'wolfe_jobs_expired_total', "Jobs not dispatched in time"
+        )
+        self.deduplicated = metrics.counter(
+            'wolfe_jobs_deduplicated_total',
+            "Todos merged into pending jobs with the same key",
+        )
+        self.succeeded = metrics.counter(
+            'wolfe_jobs_finished_total', "Jobs finished", result='success'
+        )
+        self.failed = metrics.counter(
+            'wolfe_jobs_finished_total', "Jobs finished", result='failure'
+        )
+        self._phases = dict((phase, metrics.histogram(
+            'wolfe_job_phase_seconds', "Time spent by jobs per phase",
+            phase=phase,
+        )) for phase in _timeline.PHASES)
+        self._enabled = metrics.enabled
+
+    def observe(self, timeline):
+        """
+        Record the time a finished job spent in the various phases
+
+        :Parameters:
+          `timeline` : `_timeline.Timeline`
+            The job's timeline
+        """
+        if self._enabled:
+            for phase, value in timeline.breakdown().iteritems():
+                if value is not None:
+                    self._phases[phase].observe(value)
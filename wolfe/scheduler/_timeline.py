@@ -0,0 +1,174 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+===============
+ Job Timelines
+===============
+
+Job timelines record when a job passed the scheduler's state transitions.
+The timestamps are taken from a monotonic clock, if available.
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+import sys as _sys
+import time as _time
+
+
+def _find_monotonic():
+    """
+    Find a monotonic clock
+
+    :Return: Clock function returning seconds as ``float``
+    :Rtype: callable
+    """
+    try:
+        return _time.monotonic
+    except AttributeError:
+        pass
+
+    # The value of CLOCK_MONOTONIC is platform specific. Only the Linux one
+    # is known here.
+    if not _sys.platform.startswith('linux'):  # pragma: no cover
+        return _time.time
+
+    try:  # pragma: no cover
+        import ctypes as _ctypes
+        import ctypes.util as _ctypes_util
+
+        class Timespec(_ctypes.Structure):
+            """ struct timespec """
+            _fields_ = [
+                ('tv_sec', _ctypes.c_long), ('tv_nsec', _ctypes.c_long)
+            ]
+
+        lib = _ctypes.CDLL(
+            _ctypes_util.find_library('rt') or _ctypes_util.find_library('c')
+        )
+        clock_gettime = lib.clock_gettime
+        clock_gettime.argtypes = [_ctypes.c_int, _ctypes.POINTER(Timespec)]
+        clock_monotonic = 1  # CLOCK_MONOTONIC on Linux
+        if clock_gettime(clock_monotonic, _ctypes.byref(Timespec())):
+            raise OSError()
+    except (ImportError, AttributeError, TypeError, OSError):
+        return _time.time
+
+    def read_clock(byref=_ctypes.byref):
+        """ Read the monotonic clock """
+        spec = Timespec()
+        clock_gettime(clock_monotonic, byref(spec))
+        return spec.tv_sec + spec.tv_nsec * 1e-9
+    return read_clock
+
+
+#: Monotonic clock (seconds as ``float``). Falls back to ``time.time``.
+#:
+#: :Type: callable
+monotonic = _find_monotonic()
+
+#: Phases of a job's lifetime
+#:
+#: :Type: ``tuple``
+PHASES = ('delay', 'dependency', 'lock', 'queue', 'run')
+
+
+class Timeline(object):
+    """
+    Timestamps of a job's state transitions
+
+    All timestamps are `monotonic` clock values or ``None``, if the
+    transition did not happen (yet).
+
+    >>> timeline = Timeline()
+    >>> timeline.entered, timeline.ready, timeline.freed = 1.0, 3.0, 3.5
+    >>> timeline.queued, timeline.dispatched = 4.0, 6.0
+    >>> sorted(timeline.breakdown().items())
+    [('delay', 2.0), ('dependency', 0.5), ('lock', 0.5), ('queue', 2.0), \
+('run', None)]
+
+    :IVariables:
+      `entered` : ``float``
+        The job was entered into the scheduler
+
+      `ready` : ``float``
+        The job's delay (if any) was over
+
+      `freed` : ``float``
+        All predecessors were finished successfully
+
+      `queued` : ``float``
+        The locks were acquired and the job was put into its group queue
+
+      `dispatched` : ``float``
+        The job was handed out to an executor
+
+      `finished` : ``float``
+        The job was finished
+    """
+    __slots__ = (
+        'entered', 'ready', 'freed', 'queued', 'dispatched', 'finished'
+    )
+
+    def __init__(self):
+        """ Initialization """
+        self.entered = self.ready = self.freed = None
+        self.queued = self.dispatched = self.finished = None
+
+    def breakdown(self):
+        """
+        Compute the time spent in the various phases
+
+        The phases are:
+
+        ``delay``
+          Waiting for the ``not_before`` time
+
+        ``dependency``
+          Waiting for the predecessors to finish
+
+        ``lock``
+          Waiting for the locks
+
+        ``queue``
+          Waiting in the group queue for an executor
+
+        ``run``
+          Executing
+
+        :Return: Mapping of phase names (see `PHASES`) to durations in
+                 seconds. Phases not completed (yet) are mapped to ``None``
+        :Rtype: ``dict``
+        """
+        stamps = (
+            self.entered, self.ready, self.freed, self.queued,
+            self.dispatched, self.finished,
+        )
+        result = {}
+        for idx, phase in enumerate(PHASES):
+            start, end = stamps[idx], stamps[idx + 1]
+            if start is None or end is None:
+                result[phase] = None
+            else:
+                result[phase] = end - start
+        return result
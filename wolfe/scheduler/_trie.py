@@ -0,0 +1,292 @@
+# -*- coding: ascii -*-
+r"""
+:Copyright:
+
+ Copyright 2014 - 2016
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+=================
+ Lock Path Index
+=================
+
+Hierarchical lock names are paths like ``db/customers/shard3``. A lock
+conflicts with its ancestors (``db``, ``db/customers``) and its descendants
+(``db/customers/shard3/row1``). The `LockTrie` indexes held and announced
+locks by path segment, so conflict checks take O(depth).
+"""
+if __doc__:  # pragma: no cover
+    # pylint: disable = redefined-builtin
+    __doc__ = __doc__.encode('ascii').decode('unicode_escape')
+__author__ = r"Andr\xe9 Malo".encode('ascii').decode('unicode_escape')
+__docformat__ = "restructuredtext en"
+
+from .. import _lock
+
+
+class _Node(object):
+    """
+    Trie node
+
+    :IVariables:
+      `name` : ``str``
+        Full lock name of this node
+
+      `id` : ``int``
+        Lock ID of this node (see `_lock.Registry`), if it was announced,
+        ``None`` otherwise
+
+      `children` : ``dict``
+        Mapping of path segments to child nodes
+
+      `holder` : ``int``
+        ID of the job holding this very lock or ``None``
+
+      `held` : ``int``
+        Number of held locks in this subtree (including this node)
+
+      `announced` : ``int``
+        Number of announcements of this very lock
+
+      `pending` : ``int``
+        Number of announcements in this subtree (including this node)
+    """
+    __slots__ = (
+        'name', 'id', 'children', 'holder', 'held', 'announced', 'pending',
+    )
+
+    def __init__(self, name):
+        """
+        Initialization
+
+        :Parameters:
+          `name` : ``str``
+            Full lock name
+        """
+        self.name = name
+        self.id = None
+        self.children = {}
+        self.holder = None
+        self.held = self.announced = self.pending = 0
+
+
+class LockTrie(object):
+    """
+    Prefix index of held and announced locks
+
+    >>> trie = LockTrie()
+    >>> trie.hold('db/customers', 1)
+    >>> trie.conflicts('db'), trie.conflicts('db/customers/shard3')
+    (True, True)
+    >>> trie.conflicts('db/orders'), trie.conflicts('dbx')
+    (False, False)
+    >>> trie.holders('db')
+    [1]
+    >>> trie.announce('db/customers/shard3', 7)
+    >>> trie.related('db')
+    [7]
+
+    The top level is a plain dict without counters. In thread safe mode,
+    callers guard lock names by their first path segment (see
+    `_lock.Lock.root`). Operations on different top level segments touch
+    disjoint nodes then.
+
+    :IVariables:
+      `_root` : ``dict``
+        Mapping of top level path segments to nodes
+    """
+
+    def __init__(self):
+        """ Initialization """
+        self._root = {}
+
+    def _walk(self, name, create=False):
+        """
+        Find the nodes along a lock path
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `create` : ``bool``
+            Create missing nodes?
+
+        :Return: List of nodes from the top level down to the lock. If
+                 `create` is false, the list ends with the deepest existing
+                 node.
+        :Rtype: ``list``
+        """
+        nodes, children, path = [], self._root, []
+        for segment in name.split(_lock.SEPARATOR):
+            path.append(segment)
+            node = children.get(segment)
+            if node is None:
+                if not create:
+                    break
+                node = children[segment] = _Node(_lock.SEPARATOR.join(path))
+            nodes.append(node)
+            children = node.children
+        return nodes
+
+    def _prune(self, name, nodes):
+        """
+        Remove unused nodes along a path
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `nodes` : ``list``
+            Nodes along the path as returned by `_walk`
+        """
+        segments = name.split(_lock.SEPARATOR)
+        for idx in xrange(len(nodes) - 1, -1, -1):
+            node = nodes[idx]
+            if node.held or node.pending:
+                break
+            parent = nodes[idx - 1].children if idx else self._root
+            del parent[segments[idx]]
+
+    def hold(self, name, job_id):
+        """
+        Mark lock as held
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `job_id` : ``int``
+            ID of the holding job
+        """
+        nodes = self._walk(name, create=True)
+        for node in nodes:
+            node.held += 1
+        nodes[-1].holder = job_id
+
+    def release(self, name):
+        """
+        Mark held lock as released
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+        """
+        nodes = self._walk(name)
+        assert nodes[-1].name == name and nodes[-1].holder is not None
+        for node in nodes:
+            node.held -= 1
+        nodes[-1].holder = None
+        self._prune(name, nodes)
+
+    def announce(self, name, lock_id):
+        """
+        Record a job's interest in a lock
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+          `lock_id` : ``int``
+            Lock ID, as returned by `related`
+        """
+        nodes = self._walk(name, create=True)
+        for node in nodes:
+            node.pending += 1
+        nodes[-1].announced += 1
+        nodes[-1].id = lock_id
+
+    def withdraw(self, name):
+        """
+        Remove a job's interest in a lock
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+        """
+        nodes = self._walk(name)
+        assert nodes[-1].name == name and nodes[-1].announced
+        for node in nodes:
+            node.pending -= 1
+        nodes[-1].announced -= 1
+        if not nodes[-1].announced:
+            nodes[-1].id = None
+        self._prune(name, nodes)
+
+    def conflicts(self, name):
+        """
+        Check if the lock, one of its ancestors or descendants is held
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+        :Return: Is there a conflicting held lock?
+        :Rtype: ``bool``
+        """
+        nodes = self._walk(name)
+        for node in nodes:
+            if node.holder is not None:
+                return True
+        return len(nodes) == name.count(_lock.SEPARATOR) + 1 \
+            and nodes[-1].held > 0
+
+    def holders(self, name):
+        """
+        Find the jobs holding conflicting locks
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+        :Return: List of job IDs (may be empty)
+        :Rtype: ``list``
+        """
+        nodes = self._walk(name)
+        result = [node.holder for node in nodes if node.holder is not None]
+        if len(nodes) == name.count(_lock.SEPARATOR) + 1:
+            stack = nodes[-1].children.values()
+            while stack:
+                node = stack.pop()
+                if node.held:
+                    if node.holder is not None:
+                        result.append(node.holder)
+                    stack.extend(node.children.itervalues())
+        return result
+
+    def related(self, name):
+        """
+        Find announced locks related to a lock
+
+        Related are the lock itself, its ancestors and its descendants.
+
+        :Parameters:
+          `name` : ``str``
+            Lock name
+
+        :Return: List of announced lock IDs (may be empty)
+        :Rtype: ``list``
+        """
+        nodes = self._walk(name)
+        result = [node.id for node in nodes if node.announced]
+        if len(nodes) == name.count(_lock.SEPARATOR) + 1:
+            stack = nodes[-1].children.values()
+            while stack:
+                node = stack.pop()
+                if node.pending:
+                    if node.announced:
+                        result.append(node.id)
+                    stack.extend(node.children.itervalues())
+        return result
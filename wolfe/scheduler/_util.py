@@ -39,6 +39,8 @@ try:  # pragma: no cover
 except ImportError:  # pragma: no cover
     _pytz = None
 
+from . import _timeline
+
 
 class DelayedJob(object):
     """
@@ -81,6 +83,11 @@ class QueuedJob(object):
     :IVariables:
       `job` : any
         The wrapped job
+
+      `importance` : ``int``
+        Effective importance of the job at wrapping time. It's the job's
+        importance or the importance inherited from jobs waiting for its
+        locks, whichever is higher.
     """
 
     def __init__(self, job):
@@ -92,6 +99,7 @@ class QueuedJob(object):
             The job to wrap
         """
         self.job = job
+        self.importance = effective_importance(job)
 
     def __lt__(self, other):
         """
@@ -104,11 +112,315 @@ class QueuedJob(object):
         :Return: Is this job "smaller" than the othe?
         :Rtype: ``bool``
         """
-        return (
-            self.job.importance > other.job.importance
-            or
-            self.job.id < other.job.id
-        )
+        if self.importance != other.importance:
+            return self.importance > other.importance
+        return self.job.id < other.job.id
+
+
+class FifoJob(object):
+    """
+    Ordering wrapper for job inside the main queue, first in first out
+
+    Jobs are ordered by ID, which is the order they were entered in.
+
+    :IVariables:
+      `job` : any
+        The wrapped job
+    """
+
+    def __init__(self, job):
+        """
+        Initialization
+
+        :Parameters:
+          `job` : any
+            The job to wrap
+        """
+        self.job = job
+
+    def __lt__(self, other):
+        """
+        Compare jobs by ID
+
+        :Parameters:
+          `other` : `FifoJob`
+            The job to compare ourself to
+
+        :Return: Is this job "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        return self.job.id < other.job.id
+
+
+class AgingJob(QueuedJob):
+    """
+    Ordering wrapper for job inside the main queue, which ages
+
+    The effective importance of a job grows by one per `aging` seconds it
+    has been waiting since it was freed. All waiting jobs age at the same
+    rate, so the order of two jobs never changes while they are queued. It's
+    fixed at wrapping time by a virtual key (`rank`): the importance minus
+    the waiting start in aging units. High importance jobs can delay low
+    importance jobs this way, but not starve them.
+
+    :IVariables:
+      `rank` : ``float``
+        Virtual ordering key. Higher ranks come first.
+    """
+
+    def __init__(self, job, aging):
+        """
+        Initialization
+
+        :Parameters:
+          `job` : any
+            The job to wrap. It's expected to provide a ``timeline``.
+
+          `aging` : ``float``
+            Number of waiting seconds worth one importance level
+        """
+        super(AgingJob, self).__init__(job)
+        since = job.timeline.freed
+        if since is None:
+            since = _timeline.monotonic()
+        self.rank = self.importance - since / float(aging)
+
+    def __lt__(self, other):
+        """
+        Compare jobs by rank and then ID
+
+        :Parameters:
+          `other` : `AgingJob`
+            The job to compare ourself to
+
+        :Return: Is this job "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        if not isinstance(other, AgingJob):
+            return super(AgingJob, self).__lt__(other)
+        elif self.rank != other.rank:
+            return self.rank > other.rank
+        return self.job.id < other.job.id
+
+
+class CriticalPathJob(QueuedJob):
+    """
+    Ordering wrapper for job inside the main queue, critical path first
+
+    Jobs with the same importance are ordered by their bottom level, so jobs
+    with the longest remaining path through their todo graph come first.
+    Jobs without bottom level count as ``0``.
+
+    :IVariables:
+      `bottom_level` : ``float``
+        Bottom level of the job
+    """
+
+    def __init__(self, job):
+        """
+        Initialization
+
+        :Parameters:
+          `job` : any
+            The job to wrap. It's expected to provide a ``bottom_level``.
+        """
+        super(CriticalPathJob, self).__init__(job)
+        self.bottom_level = job.bottom_level or 0.0
+
+    def __lt__(self, other):
+        """
+        Compare jobs by importance, then bottom level and then ID
+
+        :Parameters:
+          `other` : `CriticalPathJob`
+            The job to compare ourself to
+
+        :Return: Is this job "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        if isinstance(other, CriticalPathJob) and \
+                self.importance == other.importance and \
+                self.bottom_level != other.bottom_level:
+            return self.bottom_level > other.bottom_level
+        return super(CriticalPathJob, self).__lt__(other)
+
+
+class DependentsJob(QueuedJob):
+    """
+    Ordering wrapper for job inside the main queue, most dependents first
+
+    Jobs with the same importance are ordered by the number of jobs waiting
+    for them, so finishing them unblocks the most jobs.
+
+    :IVariables:
+      `dependents` : ``int``
+        Number of jobs waiting for the job at wrapping time
+    """
+
+    def __init__(self, job):
+        """
+        Initialization
+
+        :Parameters:
+          `job` : any
+            The job to wrap. It's expected to provide ``dependents``.
+        """
+        super(DependentsJob, self).__init__(job)
+        self.dependents = job.dependents
+
+    def __lt__(self, other):
+        """
+        Compare jobs by importance, then number of dependents and then ID
+
+        :Parameters:
+          `other` : `DependentsJob`
+            The job to compare ourself to
+
+        :Return: Is this job "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        if isinstance(other, DependentsJob) and \
+                self.importance == other.importance and \
+                self.dependents != other.dependents:
+            return self.dependents > other.dependents
+        return super(DependentsJob, self).__lt__(other)
+
+
+class ShortestJob(QueuedJob):
+    """
+    Ordering wrapper for job inside the main queue, shortest expected
+    runtime first
+
+    Jobs with the same importance are ordered by their expected runtime, so
+    short jobs do not wait behind long ones.
+
+    :IVariables:
+      `runtime` : ``float``
+        Expected runtime of the job
+    """
+
+    def __init__(self, job, unknown=0.0):
+        """
+        Initialization
+
+        :Parameters:
+          `job` : any
+            The job to wrap. It's expected to provide an
+            ``expected_runtime``.
+
+          `unknown` : ``float``
+            Runtime assumed for jobs without expected runtime
+        """
+        super(ShortestJob, self).__init__(job)
+        runtime = job.expected_runtime
+        self.runtime = unknown if runtime is None else runtime
+
+    def __lt__(self, other):
+        """
+        Compare jobs by importance, then expected runtime and then ID
+
+        :Parameters:
+          `other` : `ShortestJob`
+            The job to compare ourself to
+
+        :Return: Is this job "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        if isinstance(other, ShortestJob) and \
+                self.importance == other.importance and \
+                self.runtime != other.runtime:
+            return self.runtime < other.runtime
+        return super(ShortestJob, self).__lt__(other)
+
+
+class DeadlineJob(QueuedJob):
+    """
+    Ordering wrapper for job inside the main queue, earliest deadline first
+
+    Jobs without deadline come last. Jobs with the same deadline are ordered
+    like `QueuedJob` orders them.
+
+    :IVariables:
+      `deadline` : ``int``
+        Deadline of the job (seconds since epoch) or ``None``
+    """
+
+    def __init__(self, job):
+        """
+        Initialization
+
+        :Parameters:
+          `job` : any
+            The job to wrap. It's expected to provide a ``deadline``.
+        """
+        super(DeadlineJob, self).__init__(job)
+        self.deadline = job.deadline
+
+    def __lt__(self, other):
+        """
+        Compare jobs by deadline, then importance and then ID
+
+        :Parameters:
+          `other` : `DeadlineJob`
+            The job to compare ourself to
+
+        :Return: Is this job "smaller" than the other?
+        :Rtype: ``bool``
+        """
+        if isinstance(other, DeadlineJob) and \
+                self.deadline != other.deadline:
+            if self.deadline is None:
+                return False
+            elif other.deadline is None:
+                return True
+            return self.deadline < other.deadline
+        return super(DeadlineJob, self).__lt__(other)
+
+
+def precedes(item, other):
+    """
+    Compare the heads of different group queues
+
+    Wrappers of the same type are compared by their own order. Otherwise the
+    groups use different scheduling policies, whose orders are not
+    comparable. The jobs are compared by effective importance and then ID
+    then, which does not depend on any policy.
+
+    :Parameters:
+      `item` : any
+        Wrapped job
+
+      `other` : any
+        The wrapped job to compare `item` to
+
+    :Return: Does `item` come first?
+    :Rtype: ``bool``
+    """
+    if type(item) is type(other):
+        return item < other
+
+    left = effective_importance(item.job)
+    right = effective_importance(other.job)
+    if left != right:
+        return left > right
+    return item.job.id < other.job.id
+
+
+def effective_importance(job):
+    """
+    Determine the effective importance of a job
+
+    :Parameters:
+      `job` : `JobInterface`
+        The job
+
+    :Return: The job's importance or the importance inherited from jobs
+             waiting for its locks, whichever is higher
+    :Rtype: ``int``
+    """
+    if job.inherited is not None and job.inherited > job.importance:
+        return job.inherited
+    return job.importance
 
 
 def scheduled_time(job):
@@ -130,12 +442,50 @@ def scheduled_time(job):
     try:
         not_before = int(not_before)
     except (TypeError, ValueError):
-        now = _dt.datetime.utcnow()
-        if not_before.tzinfo is not None:
-            if _pytz is None:
-                raise RuntimeError("Need pytz for timezone support")
-            # pylint: disable = no-value-for-parameter
-            now = _pytz.UTC.localize(now)
-        not_before = max(0, int((not_before - now).total_seconds()))
+        not_before = max(0, _seconds_until(not_before))
 
     return time_now + not_before
+
+
+def deadline(job):
+    """
+    Determine the deadline of a job
+
+    :Parameters:
+      `job` : `JobInterface`
+        Job to inspect
+
+    :Return: Deadline of the job in seconds since epoch or ``None``, if the
+             job has no deadline
+    :Rtype: ``int``
+    """
+    not_after = job.not_after
+    if not_after is None:
+        return None
+
+    try:
+        not_after = int(not_after)
+    except (TypeError, ValueError):
+        not_after = _seconds_until(not_after)
+
+    return int(_time.time()) + not_after
+
+
+def _seconds_until(when):
+    """
+    Determine the number of seconds from now until a point in time
+
+    :Parameters:
+      `when` : ``datetime.datetime``
+        The point in time. Naive date times are assumed to be UTC.
+
+    :Return: Number of seconds. It's negative for points in the past.
+    :Rtype: ``int``
+    """
+    now = _dt.datetime.utcnow()
+    if when.tzinfo is not None:
+        if _pytz is None:
+            raise RuntimeError("Need pytz for timezone support")
+        # pylint: disable = no-value-for-parameter
+        now = _pytz.UTC.localize(now)
+    return int((when - now).total_seconds())
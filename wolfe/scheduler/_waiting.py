@@ -34,6 +34,9 @@ __docformat__ = "restructuredtext en"
 import collections as _collections
 import weakref as _weakref
 
+from .. import _metrics
+from .. import _sync
+
 
 class Waiting(object):
     """
@@ -53,24 +56,77 @@ class Waiting(object):
 
       `_scheduler` : `Scheduler`
         Weak reference to the scheduler
+
+      `_shards` : `_sync.Shards`
+        Locks guarding `_waiting_for`, sharded by the waited-for job ID
+
+      `_counters` : `_sync.Shards`
+        Locks guarding the ``predecessors_waiting`` counters of the jobs,
+        sharded by job ID
+
+      `_waited` : `_metrics.Counter`
+        Counter of jobs put into waiting state
+
+      `_reorder` : ``bool``
+        Ask the scheduler to reorder jobs, whose number of dependents
+        changed?
     """
 
-    def __init__(self, scheduler):
+    def __init__(self, scheduler, threadsafe=False, metrics=None,
+                 reorder=False):
         """
         Initialization
 
         :Parameters:
           `scheduler` : `Scheduler`
             The scheduler instance. It will be stored as a weakref
+
+          `threadsafe` : ``bool``
+            Synchronize the bookkeeping?
+
+          `metrics` : `_metrics.Registry`
+            Metrics registry. If omitted or ``None``, no metrics are
+            recorded.
+
+          `reorder` : ``bool``
+            Ask the scheduler to restore the queue order of jobs, whose
+            number of dependents changed? This is needed, if the group
+            queues are ordered by the number of dependents.
         """
+        if metrics is None:
+            metrics = _metrics.NULL
         self._waiting = set()
         self._waiting_for = _collections.defaultdict(set)
         self._scheduler = _weakref.proxy(scheduler)
+        self._shards = _sync.Shards(threadsafe)
+        self._counters = _sync.Shards(threadsafe)
+        self._reorder = bool(reorder)
+        self._waited = metrics.counter(
+            'wolfe_jobs_waited_total', "Jobs waiting for predecessors"
+        )
+        if metrics.enabled:
+            this = _weakref.proxy(self)
+            metrics.callback(
+                'wolfe_jobs_waiting', "Jobs waiting for predecessors",
+                lambda: len(this),
+            )
+
+    def __len__(self):
+        """
+        Count the waiting jobs
+
+        :Return: The number of jobs
+        :Rtype: ``int``
+        """
+        return len(self._waiting)
 
     def put(self, job):
         """
         Put a job into waiting state, if needed
 
+        The ``dependents`` counters of the predecessors waited for are
+        increased.
+
         :Parameters:
           `job` : `JobInterface`
             Job to inspect
@@ -78,18 +134,29 @@ class Waiting(object):
         :Return: Was it added to waiting?
         :Rtype: ``bool``
         """
-        job.predecessors_waiting = len(job.predecessors)
-        for job_id in job.predecessors:
-            if not self._scheduler.is_done(job_id):
-                self._waiting_for[job_id].add(job.id)
-            else:
-                job.predecessors_waiting -= 1
+        # Holding all predecessor shards keeps them from being freed while
+        # the counter is set up.
+        changed = []
+        with self._shards.guard(job.predecessors):
+            jobs = self._scheduler.jobs
+            job.predecessors_waiting = len(job.predecessors)
+            for job_id in job.predecessors:
+                if not self._scheduler.is_done(job_id):
+                    self._waiting_for[job_id].add(job.id)
+                    predecessor = jobs.get(job_id)
+                    if predecessor is not None:
+                        predecessor.dependents += 1
+                        changed.append(predecessor)
+                else:
+                    job.predecessors_waiting -= 1
+
+            assert job.predecessors_waiting >= 0
 
-        assert job.predecessors_waiting >= 0
-
-        if job.predecessors_waiting == 0:
-            return False
-        self._waiting.add(job.id)
+            if job.predecessors_waiting == 0:
+                return False
+            self._waiting.add(job.id)
+        self._waited.inc()
+        self._reordered(changed)
         return True
 
     def free(self, finished_id):
@@ -105,12 +172,77 @@ class Waiting(object):
         """
         assert finished_id not in self._waiting
 
+        with self._shards[finished_id]:
+            job_ids = self._waiting_for.pop(finished_id, ())
+
         freed = []
-        for job_id in self._waiting_for.pop(finished_id, ()):
-            job = self._scheduler.jobs[job_id]
-            job.predecessors_waiting -= 1
-            if job.predecessors_waiting == 0:
+        jobs, counters = self._scheduler.jobs, self._counters
+        for job_id in job_ids:
+            job = jobs[job_id]
+            with counters[job_id]:
+                job.predecessors_waiting -= 1
+                done = job.predecessors_waiting == 0
+            if done:
                 freed.append(job)
                 self._waiting.remove(job_id)
 
         return freed
+
+    def discard(self, job):
+        """
+        Take a job out of waiting state
+
+        :Parameters:
+          `job` : `JobInterface`
+            The job
+
+        :Return: Was the job waiting?
+        :Rtype: ``bool``
+        """
+        changed = []
+        with self._shards.guard(job.predecessors):
+            if job.id not in self._waiting:
+                return False
+            jobs = self._scheduler.jobs
+            for job_id in job.predecessors:
+                waiters = self._waiting_for.get(job_id)
+                if waiters is not None and job.id in waiters:
+                    waiters.remove(job.id)
+                    if not waiters:
+                        del self._waiting_for[job_id]
+                    predecessor = jobs.get(job_id)
+                    if predecessor is not None:
+                        predecessor.dependents -= 1
+                        changed.append(predecessor)
+            self._waiting.remove(job.id)
+        self._reordered(changed)
+        return True
+
+    def _reordered(self, jobs):
+        """
+        Ask the scheduler to reorder jobs, whose number of dependents changed
+
+        This is a noop, unless configured so.
+
+        :Parameters:
+          `jobs` : iterable
+            The changed jobs
+        """
+        if self._reorder:
+            reorder = self._scheduler.reorder
+            for job in jobs:
+                reorder(job)
+
+    def dependents(self, job_id):
+        """
+        Find the jobs waiting for a job
+
+        :Parameters:
+          `job_id` : ``int``
+            Job ID
+
+        :Return: List of IDs of the waiting jobs (may be empty)
+        :Rtype: ``list``
+        """
+        with self._shards[job_id]:
+            return list(self._waiting_for.get(job_id, ()))